@@ -0,0 +1,114 @@
+"""
+请求取消模块
+用户关闭对话框或离开页面时，前端会中止搜索请求，但 aiohttp 默认不会取消已经开始的处理函数，
+Civitai、Hugging Face 的请求和打分任务会继续执行，占用并发数和搜索 API 的配额。
+
+- cancel_on_disconnect: 在处理函数中执行协程，客户端断开连接时取消它
+- SingleFlight: 同一个键同时只执行一次（如同一个模型的用户搜索和后台预取共享一次搜索），
+  按等待者计数，最后一个等待者离开时才取消共享的任务
+
+取消的数量记录在 metrics 中（requests.disconnected、<名称>.cancelled、<名称>.detached）。
+"""
+
+import asyncio
+
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+# 检查客户端是否断开连接的间隔（秒）
+DISCONNECT_POLL_INTERVAL = 0.25
+# 客户端断开连接时使用的状态码（客户端不会收到这个响应，只用于访问日志）
+CLIENT_CLOSED_STATUS = 499
+
+
+class ClientDisconnected(Exception):
+    """客户端在处理完成前断开了连接"""
+
+
+def is_disconnected(request):
+    """客户端是否已经断开连接（连接关闭后 request.transport 为 None）"""
+    transport = request.transport
+    return transport is None or transport.is_closing()
+
+
+async def cancel_on_disconnect(request, awaitable, poll_interval=DISCONNECT_POLL_INTERVAL):
+    """
+    执行 awaitable 并返回结果，客户端断开连接时取消它
+
+    处理函数本身被取消时（aiohttp 开启 handler_cancellation）同样取消 awaitable。
+
+    Raises:
+        ClientDisconnected: 客户端在完成前断开了连接
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if is_disconnected(request):
+                metrics.incr("requests.disconnected")
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+class SingleFlight:
+    """
+    合并同一个键的并发调用（同时只执行一次，所有调用者得到同一个结果）
+
+    调用者被取消时只离开等待，其他调用者仍在等待时共享的任务继续执行（记录为 <名称>.detached）；
+    最后一个调用者离开时取消共享的任务（记录为 <名称>.cancelled）。
+
+    Args:
+        name: metrics 中使用的名称
+    """
+
+    def __init__(self, name):
+        self.name = name
+        # 键 -> [任务, 等待者数]
+        self._calls = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    def waiters(self, key):
+        call = self._calls.get(key)
+        return call[1] if call is not None else 0
+
+    async def run(self, key, factory):
+        """
+        执行 factory()（同一个键正在执行时等待已有的任务）
+
+        Args:
+            key: 合并调用使用的键
+            factory: 返回协程的函数（只在没有正在执行的任务时调用）
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = [asyncio.ensure_future(factory()), 0]
+            call[0].add_done_callback(lambda _: self._calls.pop(key) if self._calls.get(key) is call else None)
+        else:
+            metrics.incr(f"{self.name}.shared")
+        task = call[0]
+        call[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done():
+                if call[1] > 1:
+                    metrics.incr(f"{self.name}.detached")
+                else:
+                    metrics.incr(f"{self.name}.cancelled")
+                    # 新的调用者不再加入正在取消的任务
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+                    task.cancel()
+            raise
+        finally:
+            call[1] -= 1
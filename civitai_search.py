@@ -0,0 +1,266 @@
+"""
+Civitai 搜索模块
+在 Civitai 上搜索模型，流式解析响应，找到精确的文件名匹配后立即停止读取
+"""
+
+import os
+import asyncio
+import aiohttp
+
+try:
+    from .name_matcher import MATCH_THRESHOLD, calculate_name_similarity, generate_query_variants
+    from .civitai_stream import CivitaiItemStream
+    from .executors import ExecutorBusy, run_cpu
+except ImportError:
+    from name_matcher import MATCH_THRESHOLD, calculate_name_similarity, generate_query_variants
+    from civitai_stream import CivitaiItemStream
+    from executors import ExecutorBusy, run_cpu
+
+CIVITAI_MODELS_URL = "https://civitai.com/api/v1/models"
+
+# 每次从响应体读取的块大小
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# 深度搜索：每个关键词变体最多翻页数和每页条目数
+DEEP_SEARCH_MAX_PAGES = 3
+DEEP_SEARCH_PAGE_SIZE = 20
+# 深度搜索：相似度达到该值时视为命中，停止继续请求
+DEEP_SEARCH_STOP_SIMILARITY = 0.95
+# 深度搜索结果中附带的候选数量
+DEEP_SEARCH_MAX_CANDIDATES = 5
+
+
+def build_civitai_result(item, version, file_info):
+    """根据条目、版本和文件信息构建搜索结果"""
+    return {
+        "source": "Civitai",
+        "name": item.get("name"),
+        "url": f"https://civitai.com/models/{item.get('id')}",
+        "download_url": file_info.get("downloadUrl"),
+        "version": version.get("name"),
+        "file_name": file_info.get("name"),
+        "file_size": file_info.get("sizeKB", 0) * 1024 if file_info.get("sizeKB") else None,
+        "sha256": ((file_info.get("hashes") or {}).get("SHA256") or "").lower() or None
+    }
+
+
+def find_exact_file(item, model_name):
+    """在单个条目中查找文件名完全一致的文件，返回搜索结果或 None"""
+    for version in item.get("modelVersions", []):
+        for file_info in version.get("files", []):
+            if file_info.get("name") == model_name:
+                return build_civitai_result(item, version, file_info)
+    return None
+
+
+def iter_similar_files(items, model_name):
+    """
+    使用名称相似度为每个文件打分（支持 snake_case, camelCase, kebab-case, PascalCase 等）
+
+    Yields:
+        (similarity, result)
+    """
+    for item in items:
+        model_item_name = item.get("name", "") or ""
+        # 模型名称相似度与文件无关，每个条目只计算一次
+        model_similarity = calculate_name_similarity(model_name, model_item_name)
+
+        for version in item.get("modelVersions", []):
+            for file_info in version.get("files", []):
+                file_name = file_info.get("name", "") or ""
+
+                # 同时比较文件名和模型名称，文件名权重更高
+                file_similarity = calculate_name_similarity(model_name, file_name)
+                similarity = file_similarity * 0.7 + model_similarity * 0.3
+
+                result = build_civitai_result(item, version, file_info)
+                result["similarity"] = similarity
+                yield similarity, result
+
+
+def score_similar_files(items, model_name):
+    """为所有文件打分，返回 [(similarity, result), ...]（在线程池中调用）"""
+    return list(iter_similar_files(items, model_name))
+
+
+def find_best_similar_file(items, model_name):
+    """
+    找出相似度最高的文件
+
+    Returns:
+        (best_match, best_score)，没有任何文件时 best_match 为 None
+    """
+    best_match = None
+    best_score = 0.0
+    for similarity, result in iter_similar_files(items, model_name):
+        if similarity > best_score:
+            best_score = similarity
+            best_match = result
+    return best_match, best_score
+
+
+def mark_match_quality(best_match, best_score):
+    """标记是否为非精准匹配（相似度 < 0.85），前端会过滤显示"""
+    best_match["is_non_exact_match"] = best_score < MATCH_THRESHOLD
+    best_match["similarity"] = best_score
+    return best_match
+
+
+async def read_civitai_items(response, model_name=None):
+    """
+    流式读取 Civitai 搜索响应
+
+    Args:
+        response: aiohttp 响应对象
+        model_name: 如果提供，找到文件名完全一致的文件后立即停止读取
+
+    Returns:
+        (items, exact_match, metadata)：已解析的精简条目、精确匹配结果（可能为 None）、分页元数据
+    """
+    stream = CivitaiItemStream()
+    items = []
+    async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+        for item in stream.feed(chunk):
+            items.append(item)
+            if model_name:
+                exact = find_exact_file(item, model_name)
+                if exact:
+                    return items, exact, stream.metadata
+        if stream.finished:
+            break
+    items.extend(stream.close())
+    return items, None, stream.metadata
+
+
+async def search_civitai_model(model_name):
+    """
+    在 Civitai 上搜索模型
+
+    Raises:
+        ExecutorBusy: 打分线程池繁忙
+    """
+    try:
+        # 移除文件扩展名进行搜索
+        search_query = os.path.splitext(model_name)[0]
+        params = {"query": search_query, "limit": 5}
+
+        # 使用环境变量中的代理设置（HTTP_PROXY 和 HTTPS_PROXY）
+        async with aiohttp.ClientSession(trust_env=True) as session:
+            async with session.get(CIVITAI_MODELS_URL, params=params, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                if response.status == 200:
+                    # 流式解析，精确匹配文件名后立即返回（不再读取剩余响应体）
+                    items, exact, _ = await read_civitai_items(response, model_name)
+                    if exact:
+                        return exact
+
+                    # 如果没有精确匹配，尝试使用名称相似度匹配
+                    if items:
+                        # 名称相似度打分是纯计算，放到线程池中执行，不阻塞事件循环
+                        best_match, best_score = await run_cpu(find_best_similar_file, items, model_name)
+                        # 返回最佳匹配结果，无论相似度如何（用于缓存）
+                        if best_match:
+                            return mark_match_quality(best_match, best_score)
+                        # 没有找到任何匹配
+                        return None
+    except ExecutorBusy:
+        # 打分线程池繁忙时不能当作“没有找到”，否则调用方会缓存不完整的结果
+        raise
+    except Exception as e:
+        # logger.warning(f"Civitai 搜索错误: {e}")
+        pass
+    return None
+
+
+def _candidate_key(result):
+    """候选结果的去重键（同一个文件可能被多个关键词变体搜到）"""
+    return result.get("download_url") or f"{result.get('url')}#{result.get('version')}"
+
+
+async def search_civitai_model_deep(model_name, max_pages=DEEP_SEARCH_MAX_PAGES, page_size=DEEP_SEARCH_PAGE_SIZE):
+    """
+    在 Civitai 上深度搜索模型
+
+    用 generate_query_variants 生成的多个关键词变体并发搜索，每个变体按 cursor 翻页，
+    所有候选合并到同一个排序集合中。一旦找到文件名完全一致或相似度 >= 0.95 的文件，
+    立即停止所有请求。
+
+    Raises:
+        ExecutorBusy: 打分线程池繁忙（没有命中时才抛出）
+
+    Returns:
+        最佳匹配结果（额外包含 candidates 字段：排序后的前几个候选），没有找到时返回 None
+    """
+    candidates = {}
+    hit = asyncio.Event()
+
+    def add_candidate(result):
+        key = _candidate_key(result)
+        existing = candidates.get(key)
+        if existing is None or result["similarity"] > existing["similarity"]:
+            candidates[key] = result
+
+    async def search_variant(session, query):
+        cursor = None
+        for _ in range(max_pages):
+            if hit.is_set():
+                return
+            params = {"query": query, "limit": page_size}
+            if cursor:
+                params["cursor"] = cursor
+            async with session.get(CIVITAI_MODELS_URL, params=params, timeout=aiohttp.ClientTimeout(total=15)) as response:
+                if response.status != 200:
+                    return
+                items, exact, metadata = await read_civitai_items(response, model_name)
+
+            if exact:
+                exact["similarity"] = 1.0
+                add_candidate(exact)
+                hit.set()
+                return
+
+            scored = await run_cpu(score_similar_files, items, model_name)
+            for similarity, result in scored:
+                add_candidate(result)
+                if similarity >= DEEP_SEARCH_STOP_SIMILARITY:
+                    hit.set()
+            if hit.is_set():
+                return
+
+            cursor = (metadata or {}).get("nextCursor")
+            if not cursor or not items:
+                return
+
+    try:
+        async with aiohttp.ClientSession(trust_env=True) as session:
+            tasks = [asyncio.ensure_future(search_variant(session, query))
+                     for query in generate_query_variants(model_name)]
+            hit_waiter = asyncio.ensure_future(hit.wait())
+            try:
+                pending = set(tasks)
+                while pending and not hit.is_set():
+                    done, _ = await asyncio.wait(pending | {hit_waiter}, return_when=asyncio.FIRST_COMPLETED)
+                    pending -= done
+            finally:
+                # 命中后取消仍在进行的请求
+                for task in tasks + [hit_waiter]:
+                    if not task.done():
+                        task.cancel()
+                await asyncio.gather(*tasks, hit_waiter, return_exceptions=True)
+        # 没有命中且有变体因为打分线程池繁忙而失败时，候选不完整
+        if not hit.is_set():
+            for task in tasks:
+                if not task.cancelled() and isinstance(task.exception(), ExecutorBusy):
+                    raise task.exception()
+    except ExecutorBusy:
+        raise
+    except Exception as e:
+        # logger.warning(f"Civitai 深度搜索错误: {e}")
+        pass
+
+    if not candidates:
+        return None
+
+    ranked = sorted(candidates.values(), key=lambda r: r["similarity"], reverse=True)
+    best_match = dict(ranked[0])
+    best_match["candidates"] = [dict(r) for r in ranked[:DEEP_SEARCH_MAX_CANDIDATES]]
+    return mark_match_quality(best_match, best_match["similarity"])
@@ -0,0 +1,200 @@
+"""
+Civitai 响应流式解析模块
+增量解析 /api/v1/models 的响应体，逐个提取 items 中的模型条目，只保留搜索需要的字段
+"""
+
+import codecs
+import json
+import re
+
+# 字符串外需要关注的结构字符
+_STRUCTURAL_RE = re.compile(r'[{}\[\]":]')
+# 字符串内需要关注的字符（结束引号和转义符）
+_STRING_RE = re.compile(r'["\\]')
+
+
+def compact_item(item):
+    """
+    只保留搜索用到的字段：条目 id 和名称、版本名称、文件名称/大小/下载地址/SHA-256
+
+    Args:
+        item: 完整的 Civitai 模型条目（dict）
+
+    Returns:
+        精简后的条目，结构与原始条目一致（modelVersions[].files[]），便于沿用原有匹配逻辑
+    """
+    versions = []
+    for version in item.get("modelVersions") or []:
+        if not isinstance(version, dict):
+            continue
+        files = []
+        for file_info in version.get("files") or []:
+            if not isinstance(file_info, dict):
+                continue
+            hashes = file_info.get("hashes") or {}
+            files.append({
+                "name": file_info.get("name"),
+                "sizeKB": file_info.get("sizeKB"),
+                "downloadUrl": file_info.get("downloadUrl"),
+                "hashes": {"SHA256": hashes.get("SHA256")} if hashes.get("SHA256") else {},
+            })
+        versions.append({"name": version.get("name"), "files": files})
+    return {
+        "id": item.get("id"),
+        "name": item.get("name"),
+        "modelVersions": versions,
+    }
+
+
+class CivitaiItemStream:
+    """
+    Civitai 搜索响应的增量解析器
+
+    按块喂入响应体（bytes 或 str），每当 items 数组中的一个条目完整到达时立即返回精简后的条目，
+    不需要等整个响应体下载完毕。同一时刻只在内存中保留当前这一个条目的原始文本，
+    调用方可以在找到精确匹配后直接停止读取。
+
+    用法:
+        stream = CivitaiItemStream()
+        for chunk in chunks:
+            for item in stream.feed(chunk):
+                ...
+        stream.close()
+    """
+
+    def __init__(self, compact=True):
+        self._compact = compact
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buf = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._string_start = -1
+        self._last_string = None
+        self._key = None
+        self._items_depth_open = False
+        self._item_start = -1
+        self._meta_start = -1
+        self.metadata = None
+        self.finished = False
+
+    def feed(self, chunk):
+        """
+        喂入一块响应数据
+
+        Args:
+            chunk: 响应体的一部分（bytes 或 str）
+
+        Returns:
+            本次新解析出的条目列表（可能为空）
+        """
+        if self.finished or not chunk:
+            return []
+        if isinstance(chunk, (bytes, bytearray)):
+            chunk = self._decoder.decode(chunk)
+        self._buf += chunk
+        items = self._scan()
+        self._trim()
+        return items
+
+    def close(self):
+        """结束解析，刷新解码器中残留的数据"""
+        tail = self._decoder.decode(b"", final=True)
+        items = []
+        if tail and not self.finished:
+            self._buf += tail
+            items = self._scan()
+        self.finished = True
+        return items
+
+    def _scan(self):
+        items = []
+        buf = self._buf
+        pos = self._pos
+        end = len(buf)
+        stack = self._stack
+
+        while pos < end:
+            if self._in_string:
+                match = _STRING_RE.search(buf, pos)
+                if match is None:
+                    pos = end
+                    break
+                idx = match.start()
+                if buf[idx] == "\\":
+                    # 转义符后面的字符还没到达，等待下一块数据
+                    if idx + 1 >= end:
+                        pos = idx
+                        break
+                    pos = idx + 2
+                    continue
+                self._in_string = False
+                if len(stack) == 1:
+                    self._last_string = buf[self._string_start + 1:idx]
+                pos = idx + 1
+                continue
+
+            match = _STRUCTURAL_RE.search(buf, pos)
+            if match is None:
+                pos = end
+                break
+            idx = match.start()
+            char = buf[idx]
+            depth = len(stack)
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = idx
+            elif char == ":":
+                if depth == 1:
+                    self._key = self._last_string
+            elif char in "{[":
+                if depth == 1:
+                    if char == "[" and self._key == "items":
+                        self._items_depth_open = True
+                    elif char == "{" and self._key == "metadata":
+                        self._meta_start = idx
+                elif depth == 2 and self._items_depth_open and char == "{":
+                    self._item_start = idx
+                stack.append(char)
+            else:
+                if stack:
+                    stack.pop()
+                depth = len(stack)
+                if depth == 2 and char == "}" and self._item_start >= 0:
+                    item = json.loads(buf[self._item_start:idx + 1])
+                    self._item_start = -1
+                    items.append(compact_item(item) if self._compact else item)
+                elif depth == 1:
+                    if char == "]" and self._items_depth_open:
+                        self._items_depth_open = False
+                    elif char == "}" and self._meta_start >= 0:
+                        self.metadata = json.loads(buf[self._meta_start:idx + 1])
+                        self._meta_start = -1
+                elif depth == 0:
+                    self.finished = True
+                    pos = idx + 1
+                    break
+            pos = idx + 1
+
+        self._pos = pos
+        return items
+
+    def _trim(self):
+        # 丢弃已经处理完的文本，只保留当前未完成的条目/字符串
+        keep = self._pos
+        for start in (self._item_start, self._meta_start):
+            if start >= 0:
+                keep = min(keep, start)
+        if self._in_string and self._string_start >= 0:
+            keep = min(keep, self._string_start)
+        if keep <= 0:
+            return
+        self._buf = self._buf[keep:]
+        self._pos -= keep
+        if self._item_start >= 0:
+            self._item_start -= keep
+        if self._meta_start >= 0:
+            self._meta_start -= keep
+        if self._string_start >= 0:
+            self._string_start -= keep
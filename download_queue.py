@@ -0,0 +1,529 @@
+"""
+下载队列模块
+持久化的服务器端下载队列：按优先级调度、限制并行任务数、全局和每个主机的带宽限制（令牌桶），
+支持暂停/继续，同一个目标路径只保留一个未完成的任务
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+from urllib.parse import urlparse
+
+try:
+    from .model_downloader import ModelDownloader, DownloadError
+    from .model_paths import get_model_folder_name
+except ImportError:
+    from model_downloader import ModelDownloader, DownloadError
+    from model_paths import get_model_folder_name
+
+# 未完成的任务状态（同一个目标路径只允许存在一个）
+ACTIVE_STATUSES = ("queued", "downloading", "verifying", "paused")
+# 已结束的任务状态
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+# 最多保留的已结束任务数（超出时删除最早的记录）
+MAX_FINISHED_JOBS = 100
+# 保存队列文件失败（线程池繁忙等）后重试的间隔（秒）
+SAVE_RETRY_DELAY = 1.0
+
+# 模型目录的下载优先级（数字越小越先下载）：先下载主模型，LoRA 等附加模型靠后
+TYPE_PRIORITY = {
+    "checkpoints": 0,
+    "diffusion_models": 0,
+    "unet": 0,
+    "text_encoders": 1,
+    "clip": 1,
+    "vae": 2,
+    "controlnet": 3,
+    "clip_vision": 3,
+    "ipadapter": 3,
+    "loras": 4,
+    "upscale_models": 5,
+}
+DEFAULT_TYPE_PRIORITY = 6
+# 未使用节点（已禁用/旁路）中的模型排在所有使用中的模型之后
+UNUSED_PRIORITY_OFFSET = 10
+
+# 保存到队列文件中的任务字段（速度等瞬时数据不保存）
+_PERSISTED_FIELDS = (
+    "id", "seq", "model_name", "model_type", "url", "path", "sha256", "file_size",
+    "is_used", "priority", "overwrite", "status", "downloaded", "total", "error", "created_at",
+)
+
+
+def compute_priority(model_type, is_used=True):
+    """
+    计算下载任务的优先级（数字越小越先下载）
+
+    Args:
+        model_type: 前端的模型类型（如 "LoRA"）或 ComfyUI 目录名
+        is_used: 模型所在的节点是否在使用中
+
+    Returns:
+        优先级（int）
+    """
+    priority = TYPE_PRIORITY.get(get_model_folder_name(model_type), DEFAULT_TYPE_PRIORITY)
+    if not is_used:
+        priority += UNUSED_PRIORITY_OFFSET
+    return priority
+
+
+class TokenBucket:
+    """
+    令牌桶限速器
+
+    rate 为每秒补充的令牌（字节）数，capacity 为允许的突发量（默认 1 秒的流量）。
+    令牌不足时允许透支，调用方等待到透支的部分补回为止，因此多个调用方会按到达顺序排队。
+    rate 为 0 时不限速。
+    """
+
+    def __init__(self, rate=0, capacity=None):
+        self.rate = 0.0
+        self.capacity = 0.0
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self.set_rate(rate, capacity)
+
+    def set_rate(self, rate, capacity=None):
+        """修改速率（字节/秒）"""
+        self.rate = max(0.0, float(rate or 0))
+        self.capacity = float(capacity) if capacity else max(self.rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    async def consume(self, amount):
+        """取走 amount 个令牌，令牌不足时等待"""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= amount
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+
+
+class BandwidthLimiter:
+    """全局带宽限制 + 每个主机的带宽限制"""
+
+    def __init__(self, global_rate=0, per_host_rate=0):
+        self.global_bucket = TokenBucket(global_rate)
+        self.per_host_rate = per_host_rate
+        self._host_buckets = {}
+
+    def configure(self, global_rate=None, per_host_rate=None):
+        """修改限速（字节/秒，0 表示不限制）"""
+        if global_rate is not None:
+            self.global_bucket.set_rate(global_rate)
+        if per_host_rate is not None:
+            self.per_host_rate = per_host_rate
+            for bucket in self._host_buckets.values():
+                bucket.set_rate(per_host_rate)
+
+    def throttle_for(self, url):
+        """获取某个下载地址的限速回调（传给 ModelDownloader 的 throttle 参数）"""
+        host = (urlparse(url).hostname or "").lower()
+        bucket = self._host_buckets.get(host)
+        if bucket is None:
+            bucket = self._host_buckets[host] = TokenBucket(self.per_host_rate)
+
+        async def throttle(amount):
+            await bucket.consume(amount)
+            await self.global_bucket.consume(amount)
+
+        return throttle
+
+
+class DownloadQueue:
+    """
+    下载队列
+
+    - 任务按 (优先级, 加入顺序) 调度，同时最多运行 max_parallel_jobs 个
+    - 队列保存在 JSON 文件中，重启后未完成的任务会重新排队，并从 .part 文件继续下载
+    - 暂停单个任务会中断下载但保留已下载的部分；暂停整个队列时正在下载的任务回到排队状态
+    - 任务状态变化时调用 on_change(job)，用于推送到前端
+    - 队列文件通过 run_blocking 在线程池中写入，多次变化合并为一次写入
+
+    用法:
+        queue = DownloadQueue(state_path, on_change=callback)
+        queue.start()
+        job = queue.enqueue(url, model_name, model_type, target_path)
+    """
+
+    def __init__(self, state_path, max_parallel_jobs=2, segments=4,
+                 global_bandwidth_limit=0, per_host_bandwidth_limit=0,
+                 on_change=None, downloader_factory=ModelDownloader, headers_for=None, run_blocking=None):
+        self.state_path = state_path
+        self.max_parallel_jobs = max(1, int(max_parallel_jobs))
+        self.segments = max(1, int(segments))
+        self.limiter = BandwidthLimiter(global_bandwidth_limit, per_host_bandwidth_limit)
+        self.on_change = on_change
+        self.paused = False
+        self.jobs = {}
+        self._downloader_factory = downloader_factory
+        # 根据下载地址获取额外的请求头（如局域网节点的令牌，不保存到任务中）
+        self._headers_for = headers_for
+        # 执行阻塞函数的协程函数 run_blocking(func, *args)，默认使用事件循环的默认线程池
+        self.run_blocking = run_blocking
+        self._writer = None
+        self._dirty = False
+        self._tasks = {}
+        self._seq = 0
+        self._started = False
+        self._load()
+
+    # ---- 配置 ----
+
+    def configure(self, max_parallel_jobs=None, segments=None,
+                  global_bandwidth_limit=None, per_host_bandwidth_limit=None):
+        """修改队列设置（已经在运行的任务不会被中断）"""
+        if max_parallel_jobs is not None:
+            self.max_parallel_jobs = max(1, int(max_parallel_jobs))
+        if segments is not None:
+            self.segments = max(1, int(segments))
+        self.limiter.configure(global_bandwidth_limit, per_host_bandwidth_limit)
+        self._schedule()
+
+    def get_settings(self):
+        return {
+            "max_parallel_jobs": self.max_parallel_jobs,
+            "segments": self.segments,
+            "global_bandwidth_limit": self.limiter.global_bucket.rate,
+            "per_host_bandwidth_limit": self.limiter.per_host_rate,
+        }
+
+    # ---- 查询 ----
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list_jobs(self):
+        """按调度顺序列出所有任务（未完成的在前）"""
+        return sorted(
+            self.jobs.values(),
+            key=lambda job: (job["status"] in FINISHED_STATUSES, job["priority"], job["seq"])
+        )
+
+    def find_active(self, target_path):
+        """查找某个目标路径上未完成的任务"""
+        for job in self.jobs.values():
+            if job["path"] == target_path and job["status"] in ACTIVE_STATUSES:
+                return job
+        return None
+
+    # ---- 操作 ----
+
+    def start(self):
+        """开始调度（需要在事件循环中调用）"""
+        self._started = True
+        self._schedule()
+
+    def enqueue(self, url, model_name, model_type, target_path, sha256=None,
+                file_size=None, is_used=True, priority=None, overwrite=False):
+        """
+        添加下载任务
+
+        同一个目标路径已经有未完成的任务时不会重复添加，直接返回已有的任务
+        （如果新任务的优先级更高，会提升已有任务的优先级）。
+
+        Returns:
+            任务（dict）
+        """
+        if priority is None:
+            priority = compute_priority(model_type, is_used)
+
+        existing = self.find_active(target_path)
+        if existing is not None:
+            if priority < existing["priority"]:
+                existing["priority"] = priority
+                self._changed(existing)
+                self._schedule()
+            return existing
+
+        self._seq += 1
+        job = {
+            "id": uuid.uuid4().hex,
+            "seq": self._seq,
+            "model_name": model_name,
+            "model_type": model_type,
+            "url": url,
+            "path": target_path,
+            "sha256": sha256.lower() if sha256 else None,
+            "file_size": file_size,
+            "is_used": bool(is_used),
+            "priority": int(priority),
+            "overwrite": bool(overwrite),
+            "status": "queued",
+            "downloaded": 0,
+            "total": file_size,
+            "speed": 0,
+            "error": None,
+            "created_at": time.time(),
+        }
+        self.jobs[job["id"]] = job
+        self._trim_finished()
+        self._changed(job)
+        self._schedule()
+        return job
+
+    async def pause(self, job_id):
+        """暂停任务（保留已下载的部分）"""
+        job = self.jobs.get(job_id)
+        if job is None or job["status"] not in ACTIVE_STATUSES:
+            return job
+        job["status"] = "paused"
+        job["speed"] = 0
+        await self._stop_task(job_id)
+        self._changed(job)
+        self._schedule()
+        return job
+
+    def resume(self, job_id):
+        """继续已暂停、失败或已取消的任务（重新排队）"""
+        job = self.jobs.get(job_id)
+        if job is None or job["status"] not in ("paused", "failed", "cancelled"):
+            return job
+        if job["status"] != "paused" and self.find_active(job["path"]) is not None:
+            # 同一个目标路径已经有新的任务
+            return job
+        job["status"] = "queued"
+        job["error"] = None
+        self._changed(job)
+        self._schedule()
+        return job
+
+    async def remove(self, job_id, delete_partial=False):
+        """
+        取消并删除任务
+
+        Args:
+            job_id: 任务 ID
+            delete_partial: 是否同时删除已下载的部分（.part 和 .part.json）
+
+        Returns:
+            被删除的任务，不存在时返回 None
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        if job["status"] in ACTIVE_STATUSES:
+            job["status"] = "cancelled"
+        await self._stop_task(job_id)
+        self.jobs.pop(job_id, None)
+        if delete_partial and job["status"] != "completed":
+            for path in (job["path"] + ".part", job["path"] + ".part.json"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        job["speed"] = 0
+        self._save()
+        self._notify(job)
+        self._schedule()
+        return job
+
+    def clear_finished(self):
+        """删除所有已结束的任务记录"""
+        for job_id in [job["id"] for job in self.jobs.values() if job["status"] in FINISHED_STATUSES]:
+            self.jobs.pop(job_id, None)
+        self._save()
+
+    async def pause_all(self):
+        """暂停整个队列：不再开始新的任务，正在下载的任务回到排队状态"""
+        self.paused = True
+        for job_id in list(self._tasks):
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job["status"] = "queued"
+                job["speed"] = 0
+            await self._stop_task(job_id)
+            if job is not None:
+                self._notify(job)
+        self._save()
+
+    def resume_all(self):
+        """继续整个队列"""
+        self.paused = False
+        self._save()
+        self._schedule()
+
+    async def shutdown(self):
+        """停止所有正在下载的任务（保留状态，下次启动时继续）"""
+        self._started = False
+        for job_id in list(self._tasks):
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job["status"] = "queued"
+            await self._stop_task(job_id)
+        self._save()
+        await self.flush()
+
+    # ---- 调度 ----
+
+    def _schedule(self):
+        if not self._started or self.paused:
+            return
+        free = self.max_parallel_jobs - len(self._tasks)
+        if free <= 0:
+            return
+        waiting = sorted(
+            (job for job in self.jobs.values() if job["status"] == "queued" and job["id"] not in self._tasks),
+            key=lambda job: (job["priority"], job["seq"])
+        )
+        for job in waiting[:free]:
+            job["status"] = "downloading"
+            job["error"] = None
+            self._tasks[job["id"]] = asyncio.ensure_future(self._run(job))
+            self._changed(job)
+
+    async def _run(self, job):
+        def on_progress(progress):
+            # 暂停/取消后不再接受进度更新覆盖状态
+            if job["status"] not in ("downloading", "verifying"):
+                return
+            job.update(progress)
+            self._notify(job)
+
+        downloader = self._downloader_factory(
+            job["url"],
+            job["path"],
+            expected_sha256=job.get("sha256"),
+            expected_size=job.get("file_size"),
+            segments=self.segments,
+            progress_callback=on_progress,
+            throttle=self.limiter.throttle_for(job["url"]),
+            overwrite=job.get("overwrite", False),
+            headers=self._headers_for(job["url"]) if self._headers_for else None,
+        )
+        try:
+            result = await downloader.run()
+            job.update(result)
+            job["downloaded"] = result.get("size", job["downloaded"])
+            job["status"] = "completed"
+        except asyncio.CancelledError:
+            # 状态由 pause/remove/pause_all 设置
+            if job["status"] in ("downloading", "verifying"):
+                job["status"] = "queued"
+        except DownloadError as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            job["speed"] = 0
+            self._tasks.pop(job["id"], None)
+            if job["id"] in self.jobs:
+                self._changed(job)
+            self._schedule()
+
+    async def _stop_task(self, job_id):
+        task = self._tasks.pop(job_id, None)
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            pass
+
+    def _trim_finished(self):
+        finished = sorted(
+            (job for job in self.jobs.values() if job["status"] in FINISHED_STATUSES),
+            key=lambda job: job["seq"]
+        )
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            self.jobs.pop(job["id"], None)
+
+    # ---- 持久化 ----
+
+    def _changed(self, job):
+        self._save()
+        self._notify(job)
+
+    def _notify(self, job):
+        if self.on_change is None:
+            return
+        try:
+            self.on_change(job)
+        except Exception:
+            pass
+
+    def _load(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.paused = bool(state.get("paused", False))
+        for stored in state.get("jobs") or []:
+            if not isinstance(stored, dict) or not stored.get("id") or not stored.get("path"):
+                continue
+            job = {field: stored.get(field) for field in _PERSISTED_FIELDS}
+            job["speed"] = 0
+            job["priority"] = int(job["priority"] or 0)
+            job["seq"] = int(job["seq"] or 0)
+            job["downloaded"] = job["downloaded"] or 0
+            # 上次退出时正在下载的任务重新排队
+            if job["status"] in ("downloading", "verifying"):
+                job["status"] = "queued"
+            elif job["status"] not in ACTIVE_STATUSES + FINISHED_STATUSES:
+                job["status"] = "queued"
+            self.jobs[job["id"]] = job
+            self._seq = max(self._seq, job["seq"])
+
+    def _state(self):
+        return {
+            "paused": self.paused,
+            "jobs": [{field: job.get(field) for field in _PERSISTED_FIELDS}
+                     for job in sorted(self.jobs.values(), key=lambda job: job["seq"])],
+        }
+
+    def _save(self):
+        """保存队列状态（在线程池中写文件；写入期间的变化在写完后合并为一次写入）"""
+        self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 不在事件循环中时直接写入
+            self._dirty = False
+            _write_state(self.state_path, self._state())
+            return
+        if self._writer is None or self._writer.done():
+            self._writer = loop.create_task(self._write_pending())
+
+    async def _write_pending(self):
+        while self._dirty:
+            self._dirty = False
+            state = self._state()
+            try:
+                if self.run_blocking is not None:
+                    await self.run_blocking(_write_state, self.state_path, state)
+                else:
+                    await asyncio.get_running_loop().run_in_executor(None, _write_state, self.state_path, state)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # 线程池繁忙时稍后重试
+                self._dirty = True
+                await asyncio.sleep(SAVE_RETRY_DELAY)
+
+    async def flush(self):
+        """等待队列文件写入完成"""
+        if self._writer is not None:
+            await asyncio.shield(self._writer)
+
+
+def _write_state(path, state):
+    """写入队列文件（先写临时文件再替换，在线程池中调用）"""
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError:
+        pass
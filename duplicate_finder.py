@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+重复模型查找模块
+在所有模型目录（包括 extra_model_paths.yaml 中配置的路径）中查找内容相同的模型文件，
+可以把重复的文件替换为硬链接或符号链接
+
+分阶段比较，尽量少读取数据：
+1. 按文件大小分组（只需要 stat）
+2. 大小相同的文件比较开头和结尾各 1MB 的哈希
+3. 前两步都相同的文件才并行计算完整的 SHA-256
+
+命令行用法:
+    python duplicate_finder.py /path/to/models /path/to/other/models
+    python duplicate_finder.py /path/to/models --link hardlink --apply
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import folder_paths
+except ImportError:
+    # 命令行运行时没有 folder_paths，需要指定目录
+    folder_paths = None
+
+try:
+    from .model_paths import NON_MODEL_FOLDERS, format_size
+except ImportError:
+    # 作为命令行脚本运行
+    from model_paths import NON_MODEL_FOLDERS, format_size
+
+# 比较开头和结尾时读取的字节数
+EDGE_SIZE = 1024 * 1024
+# 计算完整哈希时每次读取的字节数
+READ_SIZE = 4 * 1024 * 1024
+# 默认忽略的小文件（配置文件、预览图等）
+DEFAULT_MIN_SIZE = 1024 * 1024
+# 计算完整哈希的默认并发数
+DEFAULT_WORKERS = 4
+# 支持的链接方式
+LINK_MODES = ("hardlink", "symlink")
+
+
+def get_model_directories(folder_names=None):
+    """
+    获取 ComfyUI 的模型目录（包括 extra_model_paths.yaml 中配置的路径）
+
+    Args:
+        folder_names: 只包含这些模型目录（如 ["checkpoints", "loras"]），None 表示全部
+
+    Returns:
+        存在的目录列表（已去重）
+    """
+    if folder_paths is None:
+        return []
+    directories = []
+    for name, value in folder_paths.folder_names_and_paths.items():
+        if name in NON_MODEL_FOLDERS or (folder_names and name not in folder_names):
+            continue
+        for path in value[0]:
+            if os.path.isdir(path) and path not in directories:
+                directories.append(path)
+    return directories
+
+
+def scan_files(directories, min_size=DEFAULT_MIN_SIZE):
+    """
+    扫描目录中的文件
+
+    符号链接文件会被跳过（链接本身不占用空间），硬链接到同一个 inode 的多个路径只保留一个。
+
+    Returns:
+        [(路径, 大小), ...]
+    """
+    files = []
+    seen_inodes = set()
+    seen_dirs = set()
+    for directory in directories:
+        for root, dirs, names in os.walk(directory, followlinks=True):
+            real_root = os.path.realpath(root)
+            if real_root in seen_dirs:
+                dirs[:] = []
+                continue
+            seen_dirs.add(real_root)
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.islink(path):
+                        continue
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if stat.st_size < min_size:
+                    continue
+                inode = (stat.st_dev, stat.st_ino)
+                if inode in seen_inodes:
+                    continue
+                seen_inodes.add(inode)
+                files.append((path, stat.st_size))
+    return files
+
+
+def edge_hash(path, size, edge_size=EDGE_SIZE):
+    """计算文件开头和结尾各 edge_size 字节的哈希（小文件即为完整内容）"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        hasher.update(f.read(edge_size))
+        if size > edge_size * 2:
+            f.seek(size - edge_size)
+            hasher.update(f.read(edge_size))
+        elif size > edge_size:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+
+
+def full_hash(path, read_size=READ_SIZE):
+    """计算文件的完整 SHA-256"""
+    hasher = hashlib.sha256()
+    buffer = bytearray(read_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            hasher.update(view[:count])
+    return hasher.hexdigest()
+
+
+def _group_by(items, key_func, workers):
+    """并行计算 key_func 并分组，只返回有两个以上成员的组 {key: [成员...]}（读取失败的文件被丢弃）"""
+    def safe_key(item):
+        try:
+            return key_func(item)
+        except OSError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        keys = list(executor.map(safe_key, items))
+    groups = {}
+    for item, key in zip(items, keys):
+        if key is not None:
+            groups.setdefault(key, []).append(item)
+    return {key: members for key, members in groups.items() if len(members) > 1}
+
+
+def find_duplicates(directories, min_size=DEFAULT_MIN_SIZE, workers=DEFAULT_WORKERS):
+    """
+    查找内容相同的文件
+
+    Args:
+        directories: 要扫描的目录列表
+        min_size: 忽略小于此大小的文件
+        workers: 计算哈希的并发数
+
+    Returns:
+        {
+            "groups": [{"size", "sha256", "files": [路径...], "reclaimable_bytes"}],
+            "duplicate_files": 可以被替换的文件数,
+            "reclaimable_bytes": 替换后可以释放的空间,
+            "scanned_files": 扫描的文件数,
+            "bytes_read": 实际读取的字节数
+        }
+    """
+    files = scan_files(directories, min_size)
+    bytes_read = 0
+
+    # 第 1 步：按大小分组
+    by_size = {}
+    for path, size in files:
+        by_size.setdefault(size, []).append(path)
+    candidates = [(size, paths) for size, paths in by_size.items() if len(paths) > 1]
+
+    # 第 2 步：大小相同的文件比较开头和结尾
+    edge_groups = []
+    for size, paths in candidates:
+        bytes_read += len(paths) * min(size, EDGE_SIZE * 2)
+        for digest, members in _group_by(paths, lambda path: edge_hash(path, size), workers).items():
+            edge_groups.append((size, digest, members))
+
+    # 第 3 步：并行计算完整哈希（不超过 2MB 的文件在第 2 步已经读取了完整内容，哈希即为 SHA-256）
+    groups = []
+    for size, digest, paths in sorted(edge_groups, key=lambda group: -group[0]):
+        if size <= EDGE_SIZE * 2:
+            hashed = {digest: paths}
+        else:
+            bytes_read += len(paths) * size
+            hashed = _group_by(paths, full_hash, workers)
+        for sha256, members in hashed.items():
+            groups.append({
+                "size": size,
+                "sha256": sha256,
+                "files": sorted(members),
+                "reclaimable_bytes": size * (len(members) - 1),
+            })
+
+    return {
+        "groups": groups,
+        "duplicate_files": sum(len(group["files"]) - 1 for group in groups),
+        "reclaimable_bytes": sum(group["reclaimable_bytes"] for group in groups),
+        "scanned_files": len(files),
+        "bytes_read": bytes_read,
+    }
+
+
+def replace_with_link(source, duplicate, mode="hardlink"):
+    """
+    把重复文件替换为指向 source 的链接（先创建临时链接，再原子替换）
+
+    Raises:
+        ValueError: 不支持的链接方式
+        OSError: 创建链接失败（例如硬链接跨文件系统）
+    """
+    if mode not in LINK_MODES:
+        raise ValueError(f"不支持的链接方式: {mode}")
+    temp_path = duplicate + ".dedupe-tmp"
+    if os.path.lexists(temp_path):
+        os.remove(temp_path)
+    if mode == "hardlink":
+        os.link(source, temp_path)
+    else:
+        os.symlink(os.path.abspath(source), temp_path)
+    try:
+        os.replace(temp_path, duplicate)
+    except OSError:
+        os.remove(temp_path)
+        raise
+
+
+def dedupe(report, mode="hardlink", dry_run=True):
+    """
+    把每组重复文件中除第一个以外的文件替换为链接
+
+    Args:
+        report: find_duplicates 的返回值
+        mode: "hardlink" 或 "symlink"
+        dry_run: 为 True 时只返回将要执行的操作，不修改文件
+
+    Returns:
+        {"replaced": [{"source", "duplicate"}], "errors": [{"duplicate", "error"}], "reclaimed_bytes"}
+    """
+    if mode not in LINK_MODES:
+        raise ValueError(f"不支持的链接方式: {mode}")
+    replaced = []
+    errors = []
+    reclaimed = 0
+    for group in report["groups"]:
+        source = group["files"][0]
+        for duplicate in group["files"][1:]:
+            try:
+                # 扫描之后文件可能被修改，替换前再确认一次大小
+                if os.path.getsize(duplicate) != group["size"] or os.path.getsize(source) != group["size"]:
+                    raise OSError("文件在扫描后被修改")
+                if not dry_run:
+                    replace_with_link(source, duplicate, mode)
+                replaced.append({"source": source, "duplicate": duplicate})
+                reclaimed += group["size"]
+            except OSError as e:
+                errors.append({"duplicate": duplicate, "error": str(e)})
+    return {"replaced": replaced, "errors": errors, "reclaimed_bytes": reclaimed, "dry_run": dry_run}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查找重复的模型文件")
+    parser.add_argument("directories", nargs="*", help="要扫描的目录（在 ComfyUI 中运行时默认扫描所有模型目录）")
+    parser.add_argument("--min-size", type=int, default=DEFAULT_MIN_SIZE, help="忽略小于此大小的文件（字节）")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="计算哈希的并发数")
+    parser.add_argument("--link", choices=LINK_MODES, help="把重复文件替换为硬链接或符号链接")
+    parser.add_argument("--apply", action="store_true", help="实际执行替换（默认只显示将要执行的操作）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 格式输出")
+    args = parser.parse_args(argv)
+
+    directories = args.directories or get_model_directories()
+    if not directories:
+        parser.error("请指定要扫描的目录")
+
+    report = find_duplicates(directories, min_size=args.min_size, workers=args.workers)
+    result = dedupe(report, args.link, dry_run=not args.apply) if args.link else None
+
+    if args.json:
+        print(json.dumps({"report": report, "dedupe": result}, ensure_ascii=False, indent=2))
+        return 0
+
+    for group in report["groups"]:
+        print(f"{format_size(group['size'])}  {group['sha256']}")
+        for path in group["files"]:
+            print(f"    {path}")
+    print()
+    print(f"扫描 {report['scanned_files']} 个文件，读取 {format_size(report['bytes_read'])}")
+    print(f"重复文件 {report['duplicate_files']} 个，可释放 {format_size(report['reclaimable_bytes'])}")
+    if result is not None:
+        action = "已替换" if not result["dry_run"] else "将替换"
+        print(f"{action} {len(result['replaced'])} 个文件为 {args.link}，释放 {format_size(result['reclaimed_bytes'])}")
+        for error in result["errors"]:
+            print(f"    失败: {error['duplicate']}: {error['error']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
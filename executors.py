@@ -0,0 +1,133 @@
+"""
+线程池模块
+把 CPU 密集的计算（名称相似度打分）和阻塞的文件 I/O（YAML、页面文件、文件列表、模型头部）
+放到有界的线程池中执行，避免阻塞 ComfyUI 的事件循环（同一个循环还负责向所有客户端推送生成进度）
+
+每个线程池限制等待中的任务数，超过时抛出 ExecutorBusy，调用方返回 503 或稍后重试。
+
+计算整个文件的哈希（完整性校验、重复文件查找）一个文件就可能需要几分钟，使用单独的 hash 线程池，
+不占用 I/O 线程池（YAML、页面、文件列表等短任务不会排在哈希后面）。
+
+CPU 任务也使用线程池而不是进程池：ComfyUI 按目录名加载自定义节点，子进程无法按同样的模块名导入本插件。
+打分在线程中执行时，解释器每隔几毫秒切换一次线程，事件循环不会被整段计算阻塞。
+"""
+
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+# CPU 任务（名称相似度打分）的线程数和最多等待的任务数
+CPU_WORKERS = 2
+CPU_MAX_QUEUE = 32
+# 文件 I/O 任务的线程数和最多等待的任务数
+IO_WORKERS = 4
+IO_MAX_QUEUE = 64
+# 计算文件哈希的线程数和最多等待的任务数（受磁盘读取速度限制，线程多了没有用）
+HASH_WORKERS = 2
+HASH_MAX_QUEUE = 16
+
+
+class ExecutorBusy(RuntimeError):
+    """线程池等待中的任务已满"""
+
+
+class BoundedExecutor:
+    """
+    有界的线程池（线程在第一次使用时创建）
+
+    同时存在的任务（执行中 + 等待中）不超过 max_workers + max_queue，
+    任务的等待时间和执行时间记录在 metrics 中（executor.<name>.wait / executor.<name>.run）。
+    """
+
+    def __init__(self, name, max_workers, max_queue):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=f"find-models-{self.name}"
+                )
+            return self._executor
+
+    async def run(self, func, *args):
+        """
+        在线程池中执行 func(*args) 并等待结果
+
+        Raises:
+            ExecutorBusy: 等待中的任务已满
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                metrics.incr(f"executor.{self.name}.rejected")
+                raise ExecutorBusy(f"{self.name} 线程池繁忙（{self._pending} 个任务），请稍后重试")
+            self._pending += 1
+        submitted = time.monotonic()
+
+        def call():
+            started = time.monotonic()
+            metrics.observe(f"executor.{self.name}.wait", started - submitted)
+            try:
+                return func(*args)
+            finally:
+                metrics.observe(f"executor.{self.name}.run", time.monotonic() - started)
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), call)
+        except asyncio.CancelledError:
+            # 调用方被取消时，还在等待的任务不再执行；已经开始的任务会执行完，结果被丢弃
+            metrics.incr(f"executor.{self.name}.cancelled")
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def status(self):
+        return {"workers": self.max_workers, "max_queue": self.max_queue, "pending": self._pending}
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+cpu_executor = BoundedExecutor("cpu", CPU_WORKERS, CPU_MAX_QUEUE)
+io_executor = BoundedExecutor("io", IO_WORKERS, IO_MAX_QUEUE)
+hash_executor = BoundedExecutor("hash", HASH_WORKERS, HASH_MAX_QUEUE)
+
+
+async def run_cpu(func, *args):
+    """在 CPU 线程池中执行（名称相似度打分等纯计算）"""
+    return await cpu_executor.run(func, *args)
+
+
+async def run_io(func, *args):
+    """在 I/O 线程池中执行（读取文件、解析 YAML、列出目录）"""
+    return await io_executor.run(func, *args)
+
+
+async def run_hash(func, *args):
+    """在哈希线程池中执行（读取整个文件计算 SHA-256）"""
+    return await hash_executor.run(func, *args)
+
+
+def executors_status():
+    return {executor.name: executor.status() for executor in (cpu_executor, io_executor, hash_executor)}
@@ -0,0 +1,591 @@
+"""
+多节点模型清单同步模块（渲染农场）
+每个 ComfyUI 实例把自己的已安装模型清单（目录、文件名、大小和已缓存的 SHA-256）发送给其他节点或协调节点，
+第一次发送完整清单，之后只发送两个版本之间的变化。收到其他节点的清单后，可以检查一个工作流
+在哪些节点上可以直接运行，以及其他节点各缺少哪些文件。
+
+同步协议（推送）:
+- 本机清单每次变化时版本号加 1，并保存最近的变化记录；epoch 在每次启动时重新生成
+- 发送 {node_id, name, url, epoch, base, version, full, added, removed}，base 是对方已确认的版本
+- 对方持有的版本与 base 不一致（对方重启、丢失了某次变化）时返回 409 和它持有的版本，
+  发送方从这个版本开始重新发送（变化记录已经不够时发送完整清单）
+
+所有节点必须启用并设置相同的令牌（请求头 X-Find-Models-Token），没有令牌时不会启用，
+没有启用的节点对清单和文件接口都返回 404。
+
+协调节点就是其他节点都把清单发送给它的普通节点（它自己可以不配置其他节点），在协调节点上检查工作流
+可以看到所有节点的情况；每个节点都配置其他所有节点时，在任何一个节点上都可以检查。
+"""
+
+import os
+import re
+import hmac
+import json
+import time
+import uuid
+import asyncio
+
+import aiohttp
+
+try:
+    from .model_paths import MODEL_TYPE_TO_DIR, NON_MODEL_FOLDERS, base_key, get_model_folder_names
+except ImportError:
+    from model_paths import MODEL_TYPE_TO_DIR, NON_MODEL_FOLDERS, base_key, get_model_folder_names
+
+try:
+    import folder_paths
+except ImportError:
+    # 在 ComfyUI 之外运行（测试）时没有 folder_paths，需要传入 collect
+    folder_paths = None
+
+# 接收清单的 API 路径
+INVENTORY_PATH = "/comfyui-find-models/api/v1/federation/inventory"
+# 保存令牌的请求头
+TOKEN_HEADER = "X-Find-Models-Token"
+# 两次同步之间的默认间隔（秒）
+DEFAULT_SYNC_INTERVAL = 30.0
+# 保存的变化记录数（对方落后更多版本时发送完整清单）
+MAX_LOG = 64
+# 超过这么多个同步间隔没有收到某个节点的消息时，报告中标记为过期
+STALE_INTERVALS = 3
+# 单个请求的超时时间（秒）
+REQUEST_TIMEOUT = 30
+# 最多保存的其他节点数
+MAX_NODES = 64
+# 每个节点的清单最多包含的条目数
+MAX_ENTRIES = 100000
+# 清单中的 SHA-256（64 位十六进制）
+_SHA256_RE = re.compile(r"^[0-9a-fA-F]{64}$")
+
+
+class DeltaConflict(Exception):
+    """收到的增量与本地保存的版本不一致，version 是本地保存的版本（0 表示需要完整清单）"""
+
+    def __init__(self, version):
+        super().__init__(f"清单版本不一致，当前持有版本 {version}")
+        self.version = version
+
+
+def entry_key(folder_name, name):
+    """清单条目的键："目录名/文件名"（文件名可以包含子目录）"""
+    return f"{folder_name}/{name.replace(os.sep, '/')}"
+
+
+def collect_local_inventory(hash_lookup=None):
+    """
+    读取本机所有模型目录，返回 {"目录名/文件名": [大小, SHA-256 或 None]}
+
+    会读取文件列表和文件大小，应该在线程池中调用。
+
+    Args:
+        hash_lookup: 获取已缓存哈希的函数 hash_lookup(路径) -> 哈希或 None（不计算哈希），可选
+    """
+    entries = {}
+    if folder_paths is None:
+        return entries
+    for folder_name in list(getattr(folder_paths, "folder_names_and_paths", {}).keys()):
+        if folder_name in NON_MODEL_FOLDERS:
+            continue
+        try:
+            names = folder_paths.get_filename_list(folder_name)
+        except Exception:
+            continue
+        for name in names:
+            try:
+                path = folder_paths.get_full_path(folder_name, name)
+                size = os.path.getsize(path) if path else None
+            except Exception:
+                continue
+            if size is None:
+                continue
+            entries[entry_key(folder_name, name)] = [size, hash_lookup(path) if hash_lookup else None]
+    return entries
+
+
+class InventoryLog:
+    """
+    本机的模型清单和最近的变化记录
+
+    版本号从 0 开始（空清单），每次变化加 1；epoch 区分不同的启动，对方 epoch 不一致时需要完整清单。
+    """
+
+    def __init__(self, max_log=MAX_LOG):
+        self.epoch = uuid.uuid4().hex
+        self.version = 0
+        self.entries = {}
+        self.max_log = max_log
+        # [(版本, {添加或修改的条目}, [删除的键]), ...]
+        self._log = []
+
+    def update(self, entries):
+        """
+        用新的完整清单更新，只记录变化的部分
+
+        Returns:
+            是否有变化
+        """
+        entries = {key: list(value) for key, value in entries.items()}
+        added = {key: value for key, value in entries.items() if self.entries.get(key) != value}
+        removed = [key for key in self.entries if key not in entries]
+        if not added and not removed:
+            return False
+        self.entries = entries
+        self.version += 1
+        self._log.append((self.version, added, removed))
+        del self._log[:-self.max_log]
+        return True
+
+    def delta(self, since, epoch=None):
+        """
+        获取从版本 since 到当前版本的变化
+
+        epoch 不一致、since 为 0 或者变化记录已经不够时返回完整清单（full 为 True）。
+        """
+        oldest_base = self._log[0][0] - 1 if self._log else self.version
+        if epoch != self.epoch or since <= 0 or since > self.version or since < oldest_base:
+            return {"epoch": self.epoch, "base": 0, "version": self.version, "full": True,
+                    "added": dict(self.entries), "removed": []}
+        added = {}
+        removed = set()
+        for version, changed, deleted in self._log:
+            if version <= since:
+                continue
+            for key in deleted:
+                added.pop(key, None)
+                removed.add(key)
+            for key, value in changed.items():
+                added[key] = value
+                removed.discard(key)
+        return {"epoch": self.epoch, "base": since, "version": self.version, "full": False,
+                "added": added, "removed": sorted(removed)}
+
+
+class PeerInventories:
+    """其他节点的模型清单（按节点 ID 保存）"""
+
+    def __init__(self):
+        self._nodes = {}
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def apply(self, message):
+        """
+        应用收到的完整清单或增量
+
+        Returns:
+            应用后持有的版本
+
+        Raises:
+            ValueError: 消息格式不正确，或者节点数、条目数超过上限
+            DeltaConflict: 增量的 base 与持有的版本不一致
+        """
+        node_id = message.get("node_id")
+        epoch = message.get("epoch")
+        version = message.get("version")
+        added = message.get("added") or {}
+        removed = message.get("removed") or []
+        if not node_id or not isinstance(node_id, str) or not epoch or not isinstance(epoch, str) \
+                or not isinstance(version, int) or not isinstance(added, dict) or not isinstance(removed, list) \
+                or not isinstance(message.get("name") or "", str) or not isinstance(message.get("url") or "", str):
+            raise ValueError("清单格式不正确")
+        added = {key: _check_entry(key, value) for key, value in added.items()}
+        removed = set(removed)
+        if not all(isinstance(key, str) for key in removed):
+            raise ValueError("清单格式不正确")
+        node = self._nodes.get(node_id)
+        if node is None and len(self._nodes) >= MAX_NODES:
+            raise ValueError(f"其他节点数超过上限 {MAX_NODES}")
+        if message.get("full"):
+            entries = {}
+        elif node is not None and node["epoch"] == epoch and node["version"] == message.get("base"):
+            entries = node["entries"]
+        else:
+            raise DeltaConflict(node["version"] if node is not None and node["epoch"] == epoch else 0)
+        # 先检查条目数再修改（增量直接修改持有的清单）
+        count = len(entries) - sum(1 for key in removed if key in entries and key not in added) \
+            + sum(1 for key in added if key not in entries)
+        if count > MAX_ENTRIES:
+            raise ValueError(f"清单条目数超过上限 {MAX_ENTRIES}")
+        for key in removed:
+            entries.pop(key, None)
+        entries.update(added)
+        self._nodes[node_id] = {
+            "node_id": node_id,
+            "name": message.get("name") or node_id,
+            "url": message.get("url") or "",
+            "epoch": epoch,
+            "version": version,
+            "entries": entries,
+            "last_seen": time.time(),
+        }
+        return version
+
+    def remove(self, node_id):
+        self._nodes.pop(node_id, None)
+
+    def nodes(self):
+        return list(self._nodes.values())
+
+
+def _check_entry(key, value):
+    """检查收到的清单条目：键是 "目录名/文件名"，值是 [大小（非负整数）, SHA-256 或 None]"""
+    if not isinstance(key, str) or "/" not in key or not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ValueError(f"清单条目格式不正确: {key!r}")
+    size, sha256 = value
+    if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+        raise ValueError(f"文件大小不正确: {key!r}")
+    if sha256 is not None and not (isinstance(sha256, str) and _SHA256_RE.match(sha256)):
+        raise ValueError(f"SHA-256 格式不正确: {key!r}")
+    return [size, sha256]
+
+
+def check_settings(values):
+    """
+    检查多节点同步设置（启用时必须设置令牌，否则任何人都可以推送清单和下载模型文件）
+
+    Raises:
+        ValueError: 启用但没有设置令牌
+    """
+    if values.get("enabled") and not str(values.get("token") or "").strip():
+        raise ValueError("启用多节点同步需要设置令牌")
+
+
+def _index_entries(entries):
+    """把清单按目录和小写文件名索引：{目录名: {小写文件名: [大小, 哈希]}}"""
+    index = {}
+    for key, value in entries.items():
+        folder_name, _, name = key.partition("/")
+        index.setdefault(folder_name, {})[base_key(name)] = value
+    return index
+
+
+def check_workflow(models, nodes, stale_after=None):
+    """
+    检查工作流中的模型在每个节点上是否都已安装
+
+    Args:
+        models: [{"name", "type"}, ...]（workflow_models.extract_models 的结果）
+        nodes: [{"node_id", "name", "url", "entries", "last_seen", "self"(可选), "index"(可选)}, ...]
+        stale_after: 超过这么多秒没有消息的节点标记为过期（None 表示不检查）
+
+    Returns:
+        {"models", "nodes": [{..., "complete", "missing"}], "ready": [节点名], "conflicts": [...]}
+    """
+    now = time.time()
+    unique = {}
+    for model in models:
+        unique.setdefault((model.get("type") or "其他", model["name"]), model)
+
+    report_nodes = []
+    # (类型, 名称) -> {节点名: [大小, 哈希]}
+    found = {}
+    for node in nodes:
+        index = node.get("index")
+        if index is None:
+            index = _index_entries(node["entries"])
+        missing = []
+        for (model_type, model_name) in unique:
+            key = base_key(model_name)
+            folders = get_model_folder_names(model_type) if model_type in MODEL_TYPE_TO_DIR else list(index)
+            value = next((index[folder][key] for folder in folders if key in index.get(folder, {})), None)
+            if value is None:
+                missing.append({"name": model_name, "type": model_type})
+            else:
+                found.setdefault((model_type, model_name), {})[node["name"]] = value
+        stale = bool(stale_after and not node.get("self") and now - node.get("last_seen", now) > stale_after)
+        report_nodes.append({
+            "node_id": node["node_id"],
+            "name": node["name"],
+            "url": node.get("url") or "",
+            "self": bool(node.get("self")),
+            "version": node.get("version"),
+            "stale": stale,
+            "complete": not missing,
+            "missing": missing,
+        })
+
+    # 同名文件在不同节点上大小或哈希不同（可能是不同的版本）
+    conflicts = []
+    for (model_type, model_name), by_node in found.items():
+        sizes = {value[0] for value in by_node.values()}
+        hashes = {value[1].lower() for value in by_node.values() if len(value) > 1 and value[1]}
+        if len(sizes) > 1 or len(hashes) > 1:
+            conflicts.append({
+                "name": model_name,
+                "type": model_type,
+                "nodes": {name: {"size": value[0], "sha256": value[1] if len(value) > 1 else None}
+                          for name, value in by_node.items()},
+            })
+
+    report_nodes.sort(key=lambda node: (not node["self"], len(node["missing"]), node["name"]))
+    return {
+        "models": len(unique),
+        "nodes": report_nodes,
+        "ready": [node["name"] for node in report_nodes if node["complete"]],
+        "conflicts": conflicts,
+    }
+
+
+def parse_peers(peers):
+    """把设置中的节点地址（逗号、空格或换行分隔的字符串，或列表）转换成去重的地址列表"""
+    if isinstance(peers, str):
+        peers = peers.replace(",", " ").split()
+    result = []
+    for peer in peers or []:
+        peer = str(peer).strip().rstrip("/")
+        if peer and peer not in result:
+            result.append(peer)
+    return result
+
+
+class Federation:
+    """
+    多节点清单同步（单个工作协程，定期读取本机清单并推送给所有配置的节点）
+
+    Args:
+        collect: 读取本机清单的函数 collect() -> {"目录名/文件名": [大小, 哈希]}，
+                 返回 None 表示没有变化（阻塞函数，通过 run_blocking 执行）
+        node_id: 本机的节点 ID（重启后保持不变）
+        run_blocking: 执行阻塞函数的协程函数 run_blocking(func, *args)，默认使用事件循环的默认线程池
+        enabled: 是否启用（定期推送清单、接收其他节点的清单；没有设置令牌时不会启用）
+        node_name: 显示用的节点名称
+        public_url: 其他节点访问本机的地址（如 http://192.168.1.10:8188）
+        peers: 接收本机清单的节点地址
+        sync_interval: 两次同步之间的间隔（秒）
+        token: 节点之间共享的令牌（必须设置）
+        include_hashes: 是否在清单中包含已缓存的 SHA-256（只使用缓存，不计算哈希）
+    """
+
+    def __init__(self, collect, node_id, run_blocking=None, enabled=False, node_name="", public_url="",
+                 peers="", sync_interval=DEFAULT_SYNC_INTERVAL, token="", include_hashes=True):
+        self.collect = collect
+        self.node_id = node_id
+        self.run_blocking = run_blocking
+        self.local = InventoryLog()
+        self.remote = PeerInventories()
+        self._peer_state = {}
+        self._index_cache = {}
+        self._worker = None
+        self._wakeup = None
+        self._refresh_lock = None
+        self.configure(enabled=enabled, node_name=node_name, public_url=public_url, peers=peers,
+                       sync_interval=sync_interval, token=token, include_hashes=include_hashes)
+
+    def configure(self, enabled=None, node_name=None, public_url=None, peers=None, sync_interval=None,
+                  token=None, include_hashes=None):
+        """修改设置（修改后立即同步一次）"""
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if node_name is not None:
+            self.node_name = node_name or self.node_id
+        if public_url is not None:
+            self.public_url = public_url.rstrip("/")
+        if peers is not None:
+            self.peers = parse_peers(peers)
+        if sync_interval is not None:
+            self.sync_interval = max(1.0, float(sync_interval))
+        if token is not None:
+            self.token = str(token).strip()
+        if include_hashes is not None:
+            self.include_hashes = bool(include_hashes)
+        if not self.token:
+            # 没有令牌时任何人都可以推送清单和下载模型文件，不启用
+            self.enabled = False
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        """启动工作协程（需要在事件循环中调用）"""
+        if self._worker is not None and not self._worker.done():
+            return
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+            self._refresh_lock = asyncio.Lock()
+        self._worker = asyncio.get_running_loop().create_task(self._work())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+    async def _run_blocking(self, func, *args):
+        if self.run_blocking is not None:
+            return await self.run_blocking(func, *args)
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def refresh_local(self):
+        """重新读取本机清单，返回是否有变化"""
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            entries = await self._run_blocking(self.collect)
+            if entries is None:
+                return False
+            if not self.include_hashes:
+                entries = {key: [value[0], None] for key, value in entries.items()}
+            return self.local.update(entries)
+
+    def _message(self, since, epoch):
+        message = self.local.delta(since, epoch)
+        message.update(node_id=self.node_id, name=self.node_name, url=self.public_url)
+        return message
+
+    async def push(self, session, peer):
+        """
+        把本机清单推送给一个节点（对方已确认的版本之后的变化；对方版本不一致时重新发送一次）
+
+        Returns:
+            是否推送成功
+        """
+        state = self._peer_state.setdefault(peer, {
+            "epoch": None, "acked": 0, "last_sync": None, "last_error": None, "full_sent": 0, "delta_sent": 0
+        })
+        headers = {TOKEN_HEADER: self.token} if self.token else {}
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        since, epoch = state["acked"], state["epoch"]
+        try:
+            for _ in range(2):
+                message = self._message(since, epoch)
+                async with session.post(peer + INVENTORY_PATH, json=message, headers=headers,
+                                        timeout=timeout) as response:
+                    try:
+                        data = await response.json(content_type=None)
+                    except ValueError:
+                        data = None
+                    state["full_sent" if message["full"] else "delta_sent"] += 1
+                    if response.status == 409:
+                        # 对方持有的版本（0 表示需要完整清单），从这个版本开始重新发送
+                        since, epoch = int((data or {}).get("version") or 0), self.local.epoch
+                        continue
+                    if response.status != 200:
+                        raise aiohttp.ClientResponseError(response.request_info, response.history,
+                                                          status=response.status,
+                                                          message=(data or {}).get("error") or response.reason)
+                    state.update(epoch=message["epoch"], acked=message["version"], last_sync=time.time(),
+                                 last_error=None)
+                    return True
+            raise DeltaConflict(since)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 已确认的版本保持不变，对方版本不一致时会返回 409
+            state["last_error"] = str(e) or type(e).__name__
+            return False
+
+    async def sync_once(self):
+        """读取本机清单并推送给所有节点，返回推送成功的节点数"""
+        await self.refresh_local()
+        if not self.peers:
+            return 0
+        async with aiohttp.ClientSession(trust_env=True) as session:
+            results = await asyncio.gather(*(self.push(session, peer) for peer in self.peers))
+        return sum(1 for result in results if result)
+
+    async def _work(self):
+        while True:
+            if self.enabled:
+                try:
+                    await self.sync_once()
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    # 读取清单失败（线程池繁忙等）时下次再试
+                    pass
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.sync_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def authorized(self, token):
+        """请求中的令牌是否正确（没有启用时总是不正确）"""
+        if not self.enabled or not self.token:
+            return False
+        return hmac.compare_digest(str(token or "").encode("utf-8"), self.token.encode("utf-8"))
+
+    def handle_push(self, message, token=None):
+        """
+        处理其他节点推送的清单
+
+        Returns:
+            (HTTP 状态码, 响应内容)；没有启用时返回 404，令牌不正确时返回 401
+        """
+        if not self.enabled:
+            return 404, {"error": "没有启用多节点同步"}
+        if not self.authorized(token):
+            return 401, {"error": "令牌不正确"}
+        if not isinstance(message, dict):
+            return 400, {"error": "清单格式不正确"}
+        if message.get("node_id") == self.node_id:
+            return 400, {"error": "不能把清单发送给自己"}
+        try:
+            version = self.remote.apply(message)
+        except DeltaConflict as e:
+            return 409, {"error": str(e), "version": e.version}
+        except (ValueError, TypeError, AttributeError) as e:
+            return 400, {"error": str(e)}
+        return 200, {"version": version, "node_id": self.node_id}
+
+    def _nodes_for_check(self):
+        """本机和其他节点的清单（索引按节点和版本缓存）"""
+        nodes = [{"node_id": self.node_id, "name": self.node_name, "url": self.public_url, "self": True,
+                  "epoch": self.local.epoch, "version": self.local.version, "entries": self.local.entries}]
+        nodes.extend(self.remote.nodes())
+        result = []
+        for node in nodes:
+            cached = self._index_cache.get(node["node_id"])
+            if cached is None or cached[0] != (node["epoch"], node["version"]):
+                cached = self._index_cache[node["node_id"]] = ((node["epoch"], node["version"]),
+                                                               _index_entries(node["entries"]))
+            result.append(dict(node, index=cached[1]))
+        return result
+
+    def check(self, models):
+        """检查工作流中的模型在每个节点上是否都已安装（见 check_workflow）"""
+        return check_workflow(models, self._nodes_for_check(), stale_after=self.sync_interval * STALE_INTERVALS)
+
+    def status(self):
+        stale_after = self.sync_interval * STALE_INTERVALS
+        now = time.time()
+        return {
+            "enabled": self.enabled,
+            "node_id": self.node_id,
+            "node_name": self.node_name,
+            "public_url": self.public_url,
+            "sync_interval": self.sync_interval,
+            "version": self.local.version,
+            "entries": len(self.local.entries),
+            "peers": [dict(url=peer, **{key: value for key, value in self._peer_state.get(peer, {}).items()
+                                        if key != "epoch"})
+                      for peer in self.peers],
+            "nodes": [{
+                "node_id": node["node_id"],
+                "name": node["name"],
+                "url": node["url"],
+                "version": node["version"],
+                "entries": len(node["entries"]),
+                "last_seen": node["last_seen"],
+                "stale": now - node["last_seen"] > stale_after,
+            } for node in self.remote.nodes()],
+        }
+
+
+def load_node_id(data_dir):
+    """读取本机的节点 ID（第一次使用时生成并保存）"""
+    path = os.path.join(data_dir, "federation_node.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            node_id = (json.load(f) or {}).get("node_id")
+        if node_id:
+            return node_id
+    except (OSError, ValueError, AttributeError):
+        pass
+    node_id = uuid.uuid4().hex
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"node_id": node_id}, f)
+    except OSError:
+        pass
+    return node_id
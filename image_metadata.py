@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+图片元数据读取模块
+读取 ComfyUI 保存在图片中的工作流（workflow）和 prompt，不解码像素：
+- PNG: tEXt / zTXt / iTXt 块（iTXt 可以是压缩的）
+- WebP: EXIF 块（ComfyUI 写在 IFD0 的 Make/Model 等字段中，格式为 "workflow:{...}"）
+- JSON: 直接读取
+
+通过 mmap 按块的长度跳过图像数据，只解析需要的文本块，找到 workflow 后立即停止。
+
+命令行用法（测试读取速度）:
+    python image_metadata.py /path/to/output
+    python image_metadata.py /path/to/output --models
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import zlib
+import struct
+import argparse
+
+try:
+    from .workflow_models import extract_models
+except ImportError:
+    # 作为命令行脚本运行
+    from workflow_models import extract_models
+
+# ComfyUI 保存工作流使用的键（workflow 优先，其次是 API 格式的 prompt）
+WORKFLOW_KEYS = ("workflow", "prompt")
+# 支持的文件扩展名
+METADATA_EXTENSIONS = (".png", ".webp", ".json")
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_TEXT_CHUNKS = (b"tEXt", b"zTXt", b"iTXt")
+# TIFF 中的字符串类型（ASCII、UNDEFINED）
+_EXIF_TEXT_TYPES = (2, 7)
+# 压缩文本块（zTXt/iTXt）解压后的最大字节数（防止构造的图片解压出大量数据耗尽内存）
+MAX_TEXT_BYTES = 32 * 1024 * 1024
+
+
+def _inflate(data):
+    """解压文本块，解压后超过 MAX_TEXT_BYTES 时返回 None（忽略这个块）"""
+    decompressor = zlib.decompressobj()
+    text = decompressor.decompress(data, MAX_TEXT_BYTES)
+    if decompressor.unconsumed_tail:
+        return None
+    return text
+
+
+def _decode_png_text(chunk_type, data, keys):
+    """解析 PNG 文本块，返回 (键, 文本)；不需要的键不解压，返回 (键, None)"""
+    key, _, rest = data.partition(b"\x00")
+    key = key.decode("latin-1")
+    if key not in keys:
+        return key, None
+    if chunk_type == b"tEXt":
+        return key, _decode_latin1_text(rest)
+    if chunk_type == b"zTXt":
+        # 第一个字节是压缩方法（只有 0: zlib）
+        text = _inflate(rest[1:])
+        return key, _decode_latin1_text(text) if text is not None else None
+    # iTXt: 压缩标志、压缩方法、语言标签\0、翻译后的键\0、UTF-8 文本
+    if len(rest) < 2:
+        return key, None
+    compressed = rest[0]
+    _, _, rest = rest[2:].partition(b"\x00")
+    _, _, text = rest.partition(b"\x00")
+    if compressed:
+        text = _inflate(text)
+        if text is None:
+            return key, None
+    return key, text.decode("utf-8")
+
+
+def _decode_latin1_text(data):
+    """tEXt 规定为 Latin-1，但有的程序直接写入 UTF-8，能按 UTF-8 解码时优先使用"""
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("latin-1")
+
+
+def _read_png(buffer, keys):
+    texts = {}
+    offset = len(_PNG_SIGNATURE)
+    size = len(buffer)
+    while offset + 8 <= size:
+        length, chunk_type = struct.unpack_from(">I4s", buffer, offset)
+        start = offset + 8
+        end = start + length
+        if end > size or chunk_type == b"IEND":
+            break
+        if chunk_type in _PNG_TEXT_CHUNKS:
+            key, text = _decode_png_text(chunk_type, buffer[start:end], keys)
+            if text is not None:
+                texts.setdefault(key, text)
+                if key == keys[0] or len(texts) == len(keys):
+                    break
+        # 跳过数据和 CRC
+        offset = end + 4
+    return texts
+
+
+def _read_exif(data, keys):
+    """读取 EXIF（TIFF）IFD0 中 "键:文本" 格式的字符串"""
+    if data.startswith(b"Exif\x00\x00"):
+        data = data[6:]
+    if len(data) < 8 or data[:2] not in (b"II", b"MM"):
+        return {}
+    endian = "<" if data[:2] == b"II" else ">"
+    texts = {}
+    ifd = struct.unpack_from(endian + "I", data, 4)[0]
+    if ifd + 2 > len(data):
+        return texts
+    count = struct.unpack_from(endian + "H", data, ifd)[0]
+    for index in range(count):
+        entry = ifd + 2 + index * 12
+        if entry + 12 > len(data):
+            break
+        _, value_type, length = struct.unpack_from(endian + "HHI", data, entry)
+        if value_type not in _EXIF_TEXT_TYPES:
+            continue
+        if length <= 4:
+            value = data[entry + 8:entry + 8 + length]
+        else:
+            value_offset = struct.unpack_from(endian + "I", data, entry + 8)[0]
+            value = data[value_offset:value_offset + length]
+        key, sep, text = bytes(value).rstrip(b"\x00").partition(b":")
+        key = key.decode("latin-1", errors="replace")
+        if sep and key in keys:
+            texts.setdefault(key, text.decode("utf-8", errors="replace"))
+            if key == keys[0] or len(texts) == len(keys):
+                break
+    return texts
+
+
+def _read_webp(buffer, keys):
+    offset = 12
+    size = len(buffer)
+    while offset + 8 <= size:
+        chunk_type, length = struct.unpack_from("<4sI", buffer, offset)
+        start = offset + 8
+        if chunk_type == b"EXIF":
+            return _read_exif(buffer[start:start + length], keys)
+        # 块的长度为奇数时有一个填充字节
+        offset = start + length + (length & 1)
+    return {}
+
+
+def read_embedded_texts(path, keys=WORKFLOW_KEYS):
+    """
+    读取图片中嵌入的文本（不解码像素）
+
+    Args:
+        path: PNG 或 WebP 文件路径
+        keys: 需要的键，找到第一个键（workflow）后停止读取
+
+    Returns:
+        {键: 文本}，不支持的格式或没有元数据时返回空 dict
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < 12:
+            return {}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if buffer[:8] == _PNG_SIGNATURE:
+                return _read_png(buffer, keys)
+            if buffer[:4] == b"RIFF" and buffer[8:12] == b"WEBP":
+                return _read_webp(buffer, keys)
+    return {}
+
+
+def read_workflow(path):
+    """
+    读取文件中的工作流（.json 文件，或嵌入了工作流的 PNG/WebP）
+
+    Returns:
+        工作流数据（dict），优先使用 workflow，没有时使用 prompt；都没有时返回 None
+    """
+    if path.lower().endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    texts = read_embedded_texts(path)
+    for key in WORKFLOW_KEYS:
+        if key in texts:
+            try:
+                return json.loads(texts[key])
+            except ValueError:
+                continue
+    return None
+
+
+def extract_models_from_file(path):
+    """读取文件中的工作流并提取模型（没有工作流时返回空列表）"""
+    data = read_workflow(path)
+    return extract_models(data) if data is not None else []
+
+
+def benchmark(paths, models=False):
+    """
+    测试读取速度
+
+    Args:
+        paths: 文件路径列表
+        models: 是否同时提取模型
+
+    Returns:
+        {"files", "with_workflow", "failed", "elapsed", "files_per_second"}
+    """
+    started = time.perf_counter()
+    with_workflow = 0
+    failed = 0
+    for path in paths:
+        try:
+            data = read_workflow(path)
+            if data is not None:
+                with_workflow += 1
+                if models:
+                    extract_models(data)
+        except (OSError, ValueError, zlib.error, struct.error):
+            failed += 1
+    elapsed = time.perf_counter() - started
+    return {
+        "files": len(paths),
+        "with_workflow": with_workflow,
+        "failed": failed,
+        "elapsed": elapsed,
+        "files_per_second": len(paths) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="测试从图片中读取工作流的速度")
+    parser.add_argument("directory", help="图片目录（如 ComfyUI 的 output）")
+    parser.add_argument("--models", action="store_true", help="同时提取模型")
+    args = parser.parse_args(argv)
+
+    paths = []
+    for root, _, files in os.walk(args.directory):
+        paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(METADATA_EXTENSIONS))
+    result = benchmark(paths, models=args.models)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+"""
+已安装模型名称索引模块
+在后端为所有模型目录中的文件名建立索引，支持前缀、子串和分词搜索（自动补全），
+不需要把几万个文件名都发送到前端
+
+- 文件名使用 sys.intern 保存，同一个名称只保存一份
+- 前缀查询：按小写文件名排序的条目 ID 数组（array，每个条目 4 字节）+ 二分查找
+- 子串和分词查询：三元组（3-gram）倒排表，每个三元组对应一个条目 ID 数组，候选项再逐个验证
+- 增量更新：刷新时按目录比较文件列表，只添加新文件、标记删除的文件；删除的条目超过一定比例时整体重建
+- 版本：文件列表的摘要，只在文件增删时变化（前端用它判断缓存的分析结果是否仍然有效）
+
+只对文件名（不含子目录）建立索引，子目录只保存在返回的名称中。
+"""
+
+import os
+import re
+import sys
+import time
+import hashlib
+import threading
+from array import array
+
+try:
+    import folder_paths
+except ImportError:
+    # 在 ComfyUI 之外运行（测试）时没有 folder_paths，需要传入 list_files
+    folder_paths = None
+
+try:
+    from .model_paths import NON_MODEL_FOLDERS, base_key
+except ImportError:
+    from model_paths import NON_MODEL_FOLDERS, base_key
+
+# 三元组长度
+GRAM_SIZE = 3
+# 默认返回的结果数量
+DEFAULT_LIMIT = 20
+# 最多返回的结果数量
+MAX_LIMIT = 200
+# 两次自动刷新之间的最短间隔（秒）
+REFRESH_INTERVAL = 10
+# 删除的条目超过这个比例时重建索引
+COMPACT_RATIO = 0.25
+# 分词规则（与前端 search.js 一致）
+TOKEN_SPLIT = re.compile(r"[_\-\s\.]+")
+
+# 匹配类型（数字越小排名越靠前）
+_MATCH_EXACT = 0
+_MATCH_PREFIX = 1
+_MATCH_WORD = 2
+_MATCH_SUBSTRING = 3
+_MATCH_TOKENS = 4
+
+
+def list_installed_files():
+    """列出 ComfyUI 所有模型目录中的文件，返回 {目录名: [文件名, ...]}"""
+    if folder_paths is None:
+        return {}
+    listing = {}
+    for folder_name in list(getattr(folder_paths, "folder_names_and_paths", {}).keys()):
+        if folder_name in NON_MODEL_FOLDERS:
+            continue
+        try:
+            listing[folder_name] = folder_paths.get_filename_list(folder_name)
+        except Exception:
+            continue
+    return listing
+
+
+def _grams(text):
+    """文本中所有不重复的三元组"""
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+class InstalledModelIndex:
+    """
+    已安装模型文件名的索引
+
+    条目 ID 是条目在 _names 中的位置；删除的条目名称设为 None，在查询时跳过，重建时回收。
+    """
+
+    def __init__(self, list_files=None, refresh_interval=REFRESH_INTERVAL):
+        self._list_files = list_files or list_installed_files
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._last_refresh = 0
+        self._reset()
+
+    def _reset(self):
+        # 条目数据（按条目 ID 保存）
+        self._names = []          # 原始名称（可能包含子目录），删除后为 None
+        self._lower = []          # 小写文件名（不含子目录）
+        self._folder_ids = array("H")
+        # 目录名和目录 ID
+        self._folders = []
+        self._folder_index = {}
+        # {目录 ID: {原始名称: 条目 ID}}，用于增量更新
+        self._by_folder = {}
+        # 按小写文件名排序的条目 ID（前缀查询）
+        self._sorted = array("I")
+        # {三元组: 条目 ID 数组}（ID 递增，删除的条目在查询时跳过）
+        self._postings = {}
+        self._removed = 0
+        # 文件列表的摘要（None 表示需要重新计算）
+        self._version = None
+
+    def __len__(self):
+        return len(self._names) - self._removed
+
+    def _folder_id(self, folder_name):
+        folder_id = self._folder_index.get(folder_name)
+        if folder_id is None:
+            folder_id = len(self._folders)
+            self._folders.append(sys.intern(folder_name))
+            self._folder_index[folder_name] = folder_id
+            self._by_folder[folder_id] = {}
+        return folder_id
+
+    def _lower_bound(self, key, lo=0):
+        """_sorted 中第一个小写文件名 >= key 的位置"""
+        hi = len(self._sorted)
+        lower = self._lower
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if lower[self._sorted[mid]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _add_entry(self, folder_id, name, keep_sorted=True):
+        entry_id = len(self._names)
+        name = sys.intern(name)
+        lower = sys.intern(base_key(name))
+        self._names.append(name)
+        self._lower.append(lower)
+        self._folder_ids.append(folder_id)
+        self._by_folder[folder_id][name] = entry_id
+        if keep_sorted:
+            self._sorted.insert(self._lower_bound(lower), entry_id)
+        else:
+            self._sorted.append(entry_id)
+        for gram in _grams(lower):
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = array("I")
+            posting.append(entry_id)
+
+    def _remove_entry(self, folder_id, name):
+        entry_id = self._by_folder[folder_id].pop(name)
+        self._names[entry_id] = None
+        self._removed += 1
+        # 从排序数组中删除（倒排表中的 ID 在查询时跳过）
+        lower = self._lower[entry_id]
+        position = self._lower_bound(lower)
+        while position < len(self._sorted) and self._sorted[position] != entry_id:
+            position += 1
+        if position < len(self._sorted):
+            del self._sorted[position]
+
+    def _rebuild(self, listing):
+        self._reset()
+        for folder_name, names in listing.items():
+            folder_id = self._folder_id(folder_name)
+            for name in names:
+                if name not in self._by_folder[folder_id]:
+                    self._add_entry(folder_id, name, keep_sorted=False)
+        self._sorted = array("I", sorted(self._sorted, key=self._lower.__getitem__))
+
+    def update(self, listing):
+        """
+        按目录比较文件列表，只添加新文件、删除不存在的文件
+
+        Args:
+            listing: {目录名: [文件名, ...]}（没有出现的目录视为已经删除）
+
+        Returns:
+            (添加的数量, 删除的数量)
+        """
+        added = removed = 0
+        with self._lock:
+            if not self._names:
+                self._rebuild(listing)
+                return len(self._names), 0
+            for folder_name in self._folders:
+                if folder_name not in listing:
+                    folder_id = self._folder_index[folder_name]
+                    for name in list(self._by_folder[folder_id]):
+                        self._remove_entry(folder_id, name)
+                        removed += 1
+            for folder_name, names in listing.items():
+                folder_id = self._folder_id(folder_name)
+                current = self._by_folder[folder_id]
+                names = set(names)
+                for name in [name for name in current if name not in names]:
+                    self._remove_entry(folder_id, name)
+                    removed += 1
+                for name in names:
+                    if name not in current:
+                        self._add_entry(folder_id, name)
+                        added += 1
+            # 删除的条目太多时重建，回收倒排表中的空间
+            if self._removed > len(self._names) * COMPACT_RATIO:
+                self._rebuild({folder: list(self._by_folder[folder_id]) for folder, folder_id in self._folder_index.items()})
+            if added or removed:
+                self._version = None
+        return added, removed
+
+    def refresh(self, force=False):
+        """
+        重新读取模型目录并增量更新索引（距离上次刷新不到 refresh_interval 秒时跳过）
+
+        会读取文件列表，应该在线程池中调用。
+        """
+        with self._refresh_lock:
+            if not force and self._names and time.time() - self._last_refresh < self.refresh_interval:
+                return False
+            self.update(self._list_files())
+            self._last_refresh = time.time()
+            return True
+
+    def version(self):
+        """
+        已安装模型列表的版本（按目录排序的文件名的摘要）
+
+        文件增删时变化，内容相同时在重启后也相同；只在文件列表变化后重新计算。
+        """
+        with self._lock:
+            if self._version is None:
+                digest = hashlib.sha1()
+                for folder_name in sorted(self._folder_index):
+                    digest.update(folder_name.encode("utf-8", "surrogatepass") + b"\x00")
+                    for name in sorted(self._by_folder[self._folder_index[folder_name]]):
+                        digest.update(name.encode("utf-8", "surrogatepass") + b"\x01")
+                self._version = digest.hexdigest()[:16]
+            return self._version
+
+    def invalidate(self):
+        """下次查询时重新读取模型目录（例如下载完成后）"""
+        self._last_refresh = 0
+
+    def _candidates(self, terms):
+        """用三元组倒排表找出候选条目 ID（选择最短的倒排表），没有可用的三元组时返回 None"""
+        best = None
+        for term in terms:
+            for gram in _grams(term):
+                posting = self._postings.get(gram)
+                if posting is None:
+                    return array("I")
+                if best is None or len(posting) < len(best):
+                    best = posting
+        return best
+
+    @staticmethod
+    def _match_tokens(lower, tokens):
+        """每个搜索分词都是文件名中某个单词的开头（顺序无关）"""
+        words = TOKEN_SPLIT.split(lower)
+        return all(any(word.startswith(token) for word in words) for token in tokens)
+
+    def search(self, query, folders=None, limit=DEFAULT_LIMIT):
+        """
+        搜索已安装的模型
+
+        排序：完全匹配 > 前缀匹配 > 单词开头匹配 > 子串匹配 > 每个分词都是某个单词的开头，同一类中名称短的在前
+
+        Args:
+            query: 搜索词（不区分大小写）
+            folders: 只搜索这些 ComfyUI 目录（如 ["loras"]），None 表示所有目录
+            limit: 最多返回的数量
+
+        Returns:
+            [{"name": 文件名（可能包含子目录）, "folder": 目录名}, ...]
+        """
+        query = (query or "").strip().lower()
+        limit = max(1, min(int(limit or DEFAULT_LIMIT), MAX_LIMIT))
+        if not query:
+            return []
+        tokens = [token for token in TOKEN_SPLIT.split(query) if token]
+        with self._lock:
+            folder_ids = None
+            if folders is not None:
+                folder_ids = {self._folder_index[name] for name in folders if name in self._folder_index}
+                if not folder_ids:
+                    return []
+
+            def accept(entry_id):
+                return self._names[entry_id] is not None and (folder_ids is None or self._folder_ids[entry_id] in folder_ids)
+
+            matches = []
+            seen = set()
+            # 前缀匹配：排序数组中的连续区间（按字母顺序，完全匹配排在最前面）
+            position = self._lower_bound(query)
+            while position < len(self._sorted) and len(matches) < limit:
+                entry_id = self._sorted[position]
+                lower = self._lower[entry_id]
+                if not lower.startswith(query):
+                    break
+                if accept(entry_id):
+                    kind = _MATCH_EXACT if lower == query or os.path.splitext(lower)[0] == query else _MATCH_PREFIX
+                    matches.append((kind, len(lower), lower, entry_id))
+                    seen.add(entry_id)
+                position += 1
+
+            if len(matches) < limit:
+                # 子串和分词匹配：三元组不够时（搜索词太短）逐个检查所有条目
+                # 子串匹配一定包含所有分词，所以只用分词的三元组找候选项
+                candidates = self._candidates([token for token in tokens if len(token) >= GRAM_SIZE])
+                if candidates is None:
+                    candidates = self._sorted
+                others = []
+                for entry_id in candidates:
+                    if entry_id in seen or not accept(entry_id):
+                        continue
+                    lower = self._lower[entry_id]
+                    index = lower.find(query)
+                    if index > 0:
+                        kind = _MATCH_WORD if TOKEN_SPLIT.match(lower[index - 1]) else _MATCH_SUBSTRING
+                    elif len(tokens) > 1 and self._match_tokens(lower, tokens):
+                        kind = _MATCH_TOKENS
+                    else:
+                        continue
+                    others.append((kind, len(lower), lower, entry_id))
+                others.sort()
+                matches.extend(others[:limit - len(matches)])
+
+            matches.sort()
+            return [
+                {"name": self._names[entry_id], "folder": self._folders[self._folder_ids[entry_id]]}
+                for _, _, _, entry_id in matches[:limit]
+            ]
+
+    def stats(self):
+        """索引的条目数量和倒排表大小"""
+        with self._lock:
+            return {
+                "entries": len(self),
+                "removed": self._removed,
+                "folders": len(self._folders),
+                "grams": len(self._postings),
+                "postings": sum(len(posting) for posting in self._postings.values()),
+            }
@@ -0,0 +1,351 @@
+"""
+模型完整性校验模块
+只比较文件名时，下载中断或损坏的文件也会显示为"已安装"，直到加载模型时才报错。
+这里把已安装文件的大小和 SHA-256 与 Civitai / Hugging Face 上对应文件的信息比较：
+- 大小不一致时直接判定为损坏（不需要读取文件）
+- 大小一致且上游提供了哈希时计算完整的 SHA-256（读取和计算并行），结果按路径、大小和修改时间缓存
+"""
+
+import os
+import json
+import queue
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .model_paths import base_key
+except ImportError:
+    from model_paths import base_key
+
+# 计算哈希时每次读取的字节数
+READ_SIZE = 8 * 1024 * 1024
+# 同时计算哈希的文件数
+DEFAULT_WORKERS = 2
+# 缓存格式版本
+CACHE_VERSION = 1
+# Civitai 只提供 sizeKB（浮点数），换算成字节后允许的误差
+APPROX_SIZE_TOLERANCE = 1024
+# 提供文件哈希和大小的来源（Google 结果没有这些信息）
+HASH_SOURCES = ("Civitai", "Hugging Face")
+
+# 校验结果
+STATUS_OK = "ok"
+STATUS_CORRUPT = "corrupt"
+STATUS_UNVERIFIED = "unverified"
+
+
+def sha256_file(path, read_size=READ_SIZE):
+    """
+    流式计算文件的 SHA-256
+
+    读取线程预先读取下一块，当前线程计算上一块的哈希（读取和 hashlib 都会释放 GIL，两者并行）
+    """
+    chunks = queue.Queue(maxsize=2)
+
+    def read():
+        try:
+            with open(path, "rb", buffering=0) as f:
+                while True:
+                    chunk = f.read(read_size)
+                    chunks.put(chunk)
+                    if not chunk:
+                        break
+        except OSError as e:
+            chunks.put(e)
+
+    reader = threading.Thread(target=read, name="find-models-hash-reader", daemon=True)
+    reader.start()
+    hasher = hashlib.sha256()
+    while True:
+        chunk = chunks.get()
+        if isinstance(chunk, OSError):
+            raise chunk
+        if not chunk:
+            break
+        hasher.update(chunk)
+    reader.join()
+    return hasher.hexdigest()
+
+
+class HashCache:
+    """
+    文件哈希缓存（按路径缓存，文件大小和修改时间不变时直接返回）
+
+    可以保存到 JSON 文件中，下次启动时不需要重新计算。
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self._entries = data.get("entries") or {}
+        except (OSError, ValueError, AttributeError):
+            self._entries = {}
+
+    def save(self):
+        """把有变化的缓存写入文件"""
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            data = {"version": CACHE_VERSION, "entries": dict(self._entries)}
+            self._dirty = False
+        try:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def peek(self, path):
+        """获取缓存的哈希（没有缓存或文件已变化时返回 None，不计算）"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        entry = self._entries.get(os.path.abspath(path))
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            return entry["sha256"]
+        return None
+
+    def get(self, path):
+        """
+        获取文件的 SHA-256（缓存失效时重新计算）
+
+        Raises:
+            OSError: 无法读取文件
+        """
+        digest = self.peek(path)
+        if digest is not None:
+            return digest
+        stat = os.stat(path)
+        digest = sha256_file(path)
+        with self._lock:
+            self._entries[os.path.abspath(path)] = {
+                "size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": digest
+            }
+            self._dirty = True
+        return digest
+
+    def get_many(self, paths, workers=DEFAULT_WORKERS):
+        """
+        批量计算哈希（多个文件并行）
+
+        Returns:
+            {路径: 哈希}，无法读取的文件为 None
+        """
+        def safe_get(path):
+            try:
+                return self.get(path)
+            except OSError:
+                return None
+
+        paths = list(paths)
+        if len(paths) <= 1:
+            return {path: safe_get(path) for path in paths}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return dict(zip(paths, executor.map(safe_get, paths)))
+
+
+def expected_from_links(links, model_name):
+    """
+    从搜索结果中取上游文件的哈希和大小
+
+    只使用 Civitai 和 Hugging Face 上文件名与模型文件名一致（不含子目录，不区分大小写）的文件：
+    相似度匹配到的文件（如 xxx_fp16 和 xxx）可能是另一个文件，用它的哈希和大小校验会把正常的文件判定为损坏。
+
+    Returns:
+        {"source", "sha256", "size", "size_exact"}；没有可用的信息时返回 None
+    """
+    name_key = base_key(model_name or "")
+    if not name_key:
+        return None
+    for link in links or []:
+        if not isinstance(link, dict):
+            continue
+        source = link.get("source")
+        if source not in HASH_SOURCES or base_key(link.get("file_name") or "") != name_key:
+            continue
+        sha256 = (link.get("sha256") or "").lower() or None
+        size = int(link["file_size"]) if link.get("file_size") else None
+        if sha256 or size:
+            return {
+                "source": source,
+                "sha256": sha256,
+                "size": size,
+                # Hugging Face 的大小是字节数，Civitai 的是换算后的近似值
+                "size_exact": source == "Hugging Face",
+            }
+    return None
+
+
+def verify_file(path, expected, hash_cache=None, compute_hash=True):
+    """
+    校验单个文件
+
+    Args:
+        path: 已安装模型的路径
+        expected: expected_from_links 的结果（None 表示没有上游信息）
+        hash_cache: HashCache，None 时不缓存
+        compute_hash: 为 False 时只使用缓存中的哈希（只比较大小，不读取文件）
+
+    Returns:
+        {"status": ok | corrupt | unverified, "checked": size | sha256 | None, "reason", "path", "size", ...}
+    """
+    result = {"path": path, "status": STATUS_UNVERIFIED, "checked": None, "reason": None}
+    try:
+        size = os.path.getsize(path)
+    except OSError as e:
+        result["reason"] = str(e)
+        return result
+    result["size"] = size
+    if not expected:
+        result["reason"] = "没有上游文件的哈希和大小"
+        return result
+    result.update(source=expected.get("source"), expected_size=expected.get("size"),
+                  expected_sha256=expected.get("sha256"))
+
+    expected_size = expected.get("size")
+    if expected_size:
+        tolerance = 0 if expected.get("size_exact") else APPROX_SIZE_TOLERANCE
+        if abs(size - expected_size) > tolerance:
+            result.update(status=STATUS_CORRUPT, checked="size",
+                          reason=f"文件大小不一致: {size}，期望 {expected_size}")
+            return result
+        result.update(status=STATUS_OK, checked="size")
+
+    expected_sha256 = expected.get("sha256")
+    if expected_sha256:
+        cache = hash_cache or HashCache()
+        try:
+            digest = cache.get(path) if compute_hash else cache.peek(path)
+        except OSError as e:
+            result.update(status=STATUS_UNVERIFIED, checked=None, reason=str(e))
+            return result
+        if digest is not None:
+            result["sha256"] = digest
+            if digest != expected_sha256:
+                result.update(status=STATUS_CORRUPT, checked="sha256",
+                              reason=f"SHA-256 不一致: {digest}，期望 {expected_sha256}")
+            else:
+                result.update(status=STATUS_OK, checked="sha256")
+        elif result["status"] == STATUS_UNVERIFIED:
+            result["reason"] = "尚未计算 SHA-256"
+    return result
+
+
+class IntegrityVerifier:
+    """
+    后台校验任务（多个工作协程，计算哈希在线程池中执行）
+
+    Args:
+        resolve_expected: 获取上游文件信息的协程函数 resolve_expected(model_name) -> expected 或 None
+        hash_cache: 哈希缓存（HashCache）
+        on_result: 每个模型校验完成后的回调 on_result(result)
+        run_blocking: 执行阻塞函数的协程函数 run_blocking(func, *args)，默认使用事件循环的默认线程池
+        workers: 同时校验的模型数
+    """
+
+    def __init__(self, resolve_expected, hash_cache, on_result=None, run_blocking=None,
+                 workers=DEFAULT_WORKERS):
+        self.resolve_expected = resolve_expected
+        self.hash_cache = hash_cache
+        self.on_result = on_result
+        self.run_blocking = run_blocking
+        self.workers = workers
+        self.results = {}
+        self._queue = None
+        self._pending = set()
+        self._tasks = []
+        self.current = set()
+        self.verified = 0
+        self.corrupt = 0
+
+    def start(self):
+        """启动工作协程（需要在事件循环中调用）"""
+        if self._tasks and not all(task.done() for task in self._tasks):
+            return
+        loop = asyncio.get_running_loop()
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, models):
+        """
+        添加要校验的模型
+
+        Args:
+            models: [{"key", "name", "path"}, ...]，key 用于区分同名的不同类型模型
+
+        Returns:
+            新加入等待队列的模型数
+        """
+        self.start()
+        added = 0
+        for model in models:
+            if model["key"] in self._pending:
+                continue
+            self._pending.add(model["key"])
+            self._queue.put_nowait(model)
+            added += 1
+        return added
+
+    def status(self):
+        return {
+            "pending": len(self._pending),
+            "current": sorted(self.current),
+            "verified": self.verified,
+            "corrupt": self.corrupt,
+        }
+
+    async def _run_blocking(self, func, *args):
+        if self.run_blocking is not None:
+            return await self.run_blocking(func, *args)
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def _work(self):
+        while True:
+            model = await self._queue.get()
+            self.current.add(model["name"])
+            try:
+                try:
+                    expected = await self.resolve_expected(model["name"])
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    expected = None
+                result = await self._run_blocking(verify_file, model["path"], expected, self.hash_cache)
+                result.update(key=model["key"], name=model["name"])
+                self.results[model["key"]] = result
+                self.verified += 1
+                if result["status"] == STATUS_CORRUPT:
+                    self.corrupt += 1
+                await self._run_blocking(self.hash_cache.save)
+                if self.on_result is not None:
+                    self.on_result(result)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # 线程池繁忙等错误：这个模型的校验结果保持未知，下次打开对话框时重新提交
+                pass
+            finally:
+                self.current.discard(model["name"])
+                self._pending.discard(model["key"])
@@ -0,0 +1,234 @@
+"""
+下载链接检查模块
+搜索结果中的 download_url 可能已经失效（404）、需要登录或授权（gated）、或者被移动。
+这里对每个链接并发发送 HEAD 请求（服务器不支持 HEAD 时改用只请求 1 个字节的 Range GET），
+记录状态码、文件大小以及是否需要授权，结果按 URL 缓存一段时间。
+
+每个主机同时进行的请求数有上限，避免一次检查很多链接时触发限流。
+"""
+
+import re
+import time
+import asyncio
+from urllib.parse import urlsplit
+
+import aiohttp
+
+try:
+    from .cancellation import SingleFlight
+except ImportError:
+    from cancellation import SingleFlight
+
+# 检查结果的缓存时间（秒）
+DEFAULT_TTL = 6 * 60 * 60
+# 网络错误和服务器错误（5xx）的缓存时间（秒），较短以便稍后重试
+ERROR_TTL = 10 * 60
+# 每个主机同时进行的请求数
+DEFAULT_PER_HOST_LIMIT = 4
+# 单个请求的超时时间（秒）
+DEFAULT_TIMEOUT = 10
+# 最多缓存的链接数
+MAX_ENTRIES = 5000
+
+# HEAD 返回这些状态码时改用 Range GET 再试一次（不支持 HEAD，或签名地址只允许 GET）
+_HEAD_FALLBACK_STATUSES = (400, 403, 405, 501)
+# 表示需要登录或授权的状态码
+_GATED_STATUSES = (401, 403)
+# Hugging Face 在 X-Error-Code 中说明原因（仓库或文件不存在时也返回 401，不算需要授权）
+_NOT_FOUND_ERROR_CODES = ("RepoNotFound", "EntryNotFound", "RevisionNotFound")
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+\d+-\d+/(\d+)")
+
+
+def _host(url):
+    try:
+        return urlsplit(url).netloc.lower()
+    except ValueError:
+        return ""
+
+
+def _content_length(response):
+    """从响应头中取文件大小（Range 响应使用 Content-Range 中的总大小）"""
+    match = _CONTENT_RANGE_RE.match(response.headers.get("Content-Range", ""))
+    if match:
+        return int(match.group(1))
+    value = response.headers.get("Content-Length")
+    if value and value.isdigit():
+        return int(value)
+    # 重定向到 CDN 之前的响应中带有 LFS 文件的大小
+    for redirect in response.history:
+        value = redirect.headers.get("X-Linked-Size")
+        if value and value.isdigit():
+            return int(value)
+    return None
+
+
+def _is_gated(response):
+    error_code = response.headers.get("X-Error-Code")
+    if error_code == "GatedRepo":
+        return True
+    if response.status in _GATED_STATUSES and error_code not in _NOT_FOUND_ERROR_CODES:
+        return True
+    # Civitai 需要登录的模型会重定向到登录页
+    return "/login" in response.url.path
+
+
+def _link_status(result):
+    """搜索结果中保存的检查结果字段"""
+    return {key: result[key] for key in ("ok", "status", "gated", "content_length", "checked_at")}
+
+
+class LinkValidator:
+    """
+    下载链接检查器
+
+    用法:
+        validator = LinkValidator()
+        result = await validator.probe(url)
+        await validator.annotate(links)  # 在每个链接上添加 link_status
+        links = validator.apply_cached(cached_links)  # 按缓存的检查结果添加 link_status（不发送请求）
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, per_host_limit=DEFAULT_PER_HOST_LIMIT, timeout=DEFAULT_TIMEOUT):
+        self.ttl = ttl
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        # url -> (过期时间, 结果)
+        self._cache = {}
+        self._host_limits = {}
+        # 正在检查的链接（同一个链接只发送一次请求，所有等待者都取消时才取消请求）
+        self._inflight = SingleFlight("links.probe")
+        self.probes = 0
+
+    def get_cached(self, url):
+        """获取缓存的检查结果（没有缓存或已过期时返回 None）"""
+        entry = self._cache.get(url)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[1]
+
+    def invalidate(self, url=None):
+        if url is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(url, None)
+
+    def _store(self, url, result):
+        ttl = ERROR_TTL if result["status"] is None or result["status"] >= 500 else self.ttl
+        if len(self._cache) >= MAX_ENTRIES:
+            now = time.time()
+            self._cache = {key: entry for key, entry in self._cache.items() if entry[0] > now}
+            if len(self._cache) >= MAX_ENTRIES:
+                # 仍然太多时丢弃最早过期的一半
+                keep = sorted(self._cache.items(), key=lambda item: item[1][0])[MAX_ENTRIES // 2:]
+                self._cache = dict(keep)
+        self._cache[url] = (time.time() + ttl, result)
+
+    def _limit(self, url):
+        host = _host(url)
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return limit
+
+    async def probe(self, url, session=None):
+        """
+        检查单个链接（使用缓存）
+
+        Returns:
+            {"url", "ok", "status", "content_length", "gated", "final_url", "error", "checked_at"}
+        """
+        cached = self.get_cached(url)
+        if cached is not None:
+            return cached
+        return await self._inflight.run(url, lambda: self._probe_and_store(url, session))
+
+    async def _probe_and_store(self, url, session):
+        result = await self._probe_with_session(url, session)
+        self._store(url, result)
+        return result
+
+    async def _probe_with_session(self, url, session):
+        if session is not None:
+            return await self._probe(url, session)
+        # 使用环境变量中的代理设置（HTTP_PROXY 和 HTTPS_PROXY）
+        async with aiohttp.ClientSession(trust_env=True) as own_session:
+            return await self._probe(url, own_session)
+
+    async def _probe(self, url, session):
+        result = {
+            "url": url, "ok": False, "status": None, "content_length": None,
+            "gated": False, "final_url": None, "error": None, "checked_at": time.time(),
+        }
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with self._limit(url):
+            self.probes += 1
+            try:
+                async with session.head(url, allow_redirects=True, timeout=timeout) as response:
+                    status = response.status
+                    self._fill(result, response)
+                if status in _HEAD_FALLBACK_STATUSES:
+                    async with session.get(url, headers={"Range": "bytes=0-0"}, allow_redirects=True,
+                                           timeout=timeout) as response:
+                        self._fill(result, response)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                result["error"] = str(e) or type(e).__name__
+        return result
+
+    @staticmethod
+    def _fill(result, response):
+        result["status"] = response.status
+        result["final_url"] = str(response.url)
+        result["content_length"] = _content_length(response)
+        result["gated"] = _is_gated(response)
+        result["ok"] = response.status in (200, 206) and not result["gated"]
+
+    async def probe_many(self, urls):
+        """
+        并发检查多个链接（每个主机的并发数受 per_host_limit 限制）
+
+        Returns:
+            {url: 检查结果}
+        """
+        urls = list(dict.fromkeys(url for url in urls if url))
+        if not urls:
+            return {}
+        async with aiohttp.ClientSession(trust_env=True) as session:
+            results = await asyncio.gather(*(self.probe(url, session) for url in urls))
+        return dict(zip(urls, results))
+
+    async def annotate(self, links):
+        """
+        检查搜索结果中的下载链接，在每个有 download_url 的链接上添加 link_status，
+        并用 Content-Length 补全缺少的 file_size
+
+        Returns:
+            传入的 links（原地修改）
+        """
+        results = await self.probe_many(link.get("download_url") for link in links or [] if isinstance(link, dict))
+        for link in links or []:
+            if not isinstance(link, dict):
+                continue
+            result = results.get(link.get("download_url"))
+            if result is None:
+                continue
+            link["link_status"] = _link_status(result)
+            if not link.get("file_size") and result["ok"] and result["content_length"]:
+                link["file_size"] = result["content_length"]
+        return links
+
+    def apply_cached(self, links):
+        """
+        返回搜索结果的副本，link_status 使用当前缓存的检查结果
+
+        没有缓存或已过期的链接不包含 link_status（前端会重新检查），
+        搜索结果缓存中的结果保存了 7 天，不能直接使用当时的检查结果。
+        """
+        applied = []
+        for link in links or []:
+            if isinstance(link, dict):
+                link = {key: value for key, value in link.items() if key != "link_status"}
+                result = self.get_cached(link["download_url"]) if link.get("download_url") else None
+                if result is not None:
+                    link["link_status"] = _link_status(result)
+            applied.append(link)
+        return applied
@@ -0,0 +1,165 @@
+"""
+事件循环卡顿监控模块
+事件循环中定时更新心跳，后台线程检查心跳；循环超过阈值没有响应时，在卡顿期间记录：
+- 正在执行的请求处理函数（由中间件登记，包括 ComfyUI 自己的路由）
+- 事件循环线程当前的调用栈（没有登记的回调也能找到原因）
+卡顿结束后把持续时间和上面的信息写入 metrics（事件 loop_stall）
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import traceback
+import weakref
+
+from aiohttp import web
+
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+# 默认的卡顿阈值（毫秒）
+DEFAULT_THRESHOLD_MS = 200
+# 记录的调用栈深度
+STACK_DEPTH = 8
+# asyncio 和 aiohttp 内部的文件（确定卡顿原因时跳过）
+_INTERNAL_DIRS = (os.path.dirname(asyncio.__file__), os.path.dirname(web.__file__))
+
+
+def _handler_name(request):
+    """请求对应的处理函数名称（找不到时使用方法和路径）"""
+    try:
+        handler = request.match_info.handler
+        name = getattr(handler, "__qualname__", None) or getattr(handler, "__name__", None)
+        if name:
+            return f"{name} ({request.method} {request.path})"
+    except Exception:
+        pass
+    return f"{request.method} {request.path}"
+
+
+class LoopWatchdog:
+    """
+    事件循环卡顿监控
+
+    用法:
+        watchdog = LoopWatchdog(loop, threshold_ms=200)
+        loop.call_soon(watchdog.start)
+        app.middlewares.append(watchdog.middleware)
+    """
+
+    def __init__(self, loop, threshold_ms=DEFAULT_THRESHOLD_MS):
+        self.loop = loop
+        self.threshold = threshold_ms / 1000
+        # 心跳间隔（阈值的四分之一，卡顿的测量误差不超过一个间隔）
+        self.interval = max(self.threshold / 4, 0.01)
+        self.stalls = 0
+        self._beat = time.monotonic()
+        self._loop_thread_id = None
+        self._handlers = weakref.WeakKeyDictionary()
+        self._stop = threading.Event()
+        self._thread = None
+        self._timer = None
+        self._stall = None
+
+        @web.middleware
+        async def middleware(request, handler):
+            task = asyncio.current_task()
+            if task is not None:
+                self._handlers[task] = _handler_name(request)
+            try:
+                return await handler(request)
+            finally:
+                if task is not None:
+                    self._handlers.pop(task, None)
+
+        self.middleware = middleware
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """开始监控（需要在事件循环线程中调用，例如 loop.call_soon(watchdog.start)）"""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._heartbeat()
+        self._thread = threading.Thread(target=self._run, name="find-models-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._thread is not None:
+            # 监控线程最多等待一个心跳间隔就会退出
+            self._thread.join(self.interval * 2)
+            self._thread = None
+
+    def configure(self, threshold_ms=None):
+        if threshold_ms is not None:
+            self.threshold = threshold_ms / 1000
+            self.interval = max(self.threshold / 4, 0.01)
+
+    def _heartbeat(self):
+        self._beat = time.monotonic()
+        if not self._stop.is_set():
+            self._timer = self.loop.call_later(self.interval, self._heartbeat)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            # 下一次心跳应该在 _beat + interval 时发生，超出的部分就是卡顿时间
+            lag = time.monotonic() - self._beat - self.interval
+            if lag >= self.threshold:
+                if self._stall is None:
+                    self._stall = self._capture()
+                self._stall["duration_ms"] = round(lag * 1000, 1)
+            elif self._stall is not None:
+                self._report(self._stall)
+                self._stall = None
+
+    def _capture(self):
+        """记录卡顿期间事件循环正在做什么"""
+        handler = None
+        try:
+            task = asyncio.current_task(self.loop)
+            if task is not None:
+                handler = self._handlers.get(task)
+        except Exception:
+            task = None
+        stack = []
+        culprit = None
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is not None:
+            frames = traceback.extract_stack(frame)
+            stack = [f"{os.path.basename(f.filename)}:{f.lineno} {f.name}" for f in frames[-STACK_DEPTH:]]
+            # 最内层不属于 asyncio/aiohttp 的函数
+            for f in reversed(frames):
+                if not f.filename.startswith(_INTERNAL_DIRS):
+                    culprit = f"{f.name} ({os.path.basename(f.filename)}:{f.lineno})"
+                    break
+        return {
+            "handler": handler or culprit or "unknown",
+            "task": task.get_name() if task is not None else None,
+            "culprit": culprit,
+            "stack": stack,
+        }
+
+    def _report(self, stall):
+        self.stalls += 1
+        metrics.incr("loop.stalls")
+        metrics.observe("loop.stall", stall["duration_ms"] / 1000)
+        metrics.record_event("loop_stall", stall)
+
+    def status(self):
+        return {
+            "running": self.running,
+            "threshold_ms": round(self.threshold * 1000),
+            "stalls": self.stalls,
+        }
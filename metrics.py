@@ -0,0 +1,85 @@
+"""
+运行指标模块
+进程内的计数器、耗时统计和最近的事件（如事件循环卡顿），线程安全，
+通过 /comfyui-find-models/api/v1/system/metrics 查看
+"""
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# 每种事件最多保留的条数
+MAX_EVENTS = 50
+
+
+class Metrics:
+    """计数器（incr）、耗时统计（observe：次数、总和、最大值）和最近的事件（record_event）"""
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self.max_events = max_events
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._timings = {}
+            self._events = {}
+
+    def incr(self, name, value=1):
+        """计数器加 value"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        """记录一次耗时（秒）"""
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = [0, 0.0, 0.0]
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+
+    @contextmanager
+    def timer(self, name):
+        """记录 with 块的耗时"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started)
+
+    def record_event(self, name, event):
+        """记录一个事件（dict），只保留最近的 max_events 条"""
+        with self._lock:
+            events = self._events.get(name)
+            if events is None:
+                events = self._events[name] = deque(maxlen=self.max_events)
+            events.append(dict(event, time=time.time()))
+
+    def get_counter(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self):
+        """所有指标的副本（耗时单位为毫秒）"""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "timings": {
+                    name: {
+                        "count": count,
+                        "total_ms": round(total * 1000, 3),
+                        "avg_ms": round(total * 1000 / count, 3) if count else 0,
+                        "max_ms": round(maximum * 1000, 3),
+                    }
+                    for name, (count, total, maximum) in self._timings.items()
+                },
+                "events": {name: list(events) for name, events in self._events.items()},
+            }
+
+
+# 插件共用的指标
+metrics = Metrics()
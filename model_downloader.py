@@ -0,0 +1,387 @@
+"""
+模型下载模块
+多连接分段下载（HTTP Range），支持断点续传，下载过程中流式计算 SHA-256，
+先写入临时文件，校验通过后原子重命名到目标路径
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import aiohttp
+
+# 默认并发连接（分段）数
+DEFAULT_SEGMENTS = 4
+# 每个分段的最小大小，小文件不再拆分
+MIN_SEGMENT_SIZE = 8 * 1024 * 1024
+# 每次从网络读取的块大小
+CHUNK_SIZE = 1024 * 1024
+# 计算哈希时从临时文件回读的块大小
+HASH_READ_SIZE = 4 * 1024 * 1024
+# 保存断点续传状态的间隔（秒）
+STATE_SAVE_INTERVAL = 2.0
+# 进度回调的最小间隔（秒）
+PROGRESS_INTERVAL = 0.5
+# 单个分段失败后的最大重试次数
+MAX_SEGMENT_RETRIES = 3
+
+
+class DownloadError(Exception):
+    """下载失败（网络错误、服务器响应不正确、大小或哈希校验失败等）"""
+
+
+def _write_all(handle, data):
+    """写入全部数据（无缓冲的文件对象可能只写入一部分）"""
+    view = memoryview(data)
+    while view:
+        written = handle.write(view)
+        view = view[written:]
+
+
+class _Segment:
+    """文件中的一个分段 [start, end)，written 为已写入的字节数"""
+
+    __slots__ = ("start", "end", "written")
+
+    def __init__(self, start, end, written=0):
+        self.start = start
+        self.end = end
+        self.written = written
+
+    @property
+    def done(self):
+        return self.start + self.written >= self.end
+
+
+class ModelDownloader:
+    """
+    单个模型文件的下载器
+
+    - 服务器支持 Range 时，把文件拆分为多个分段并发下载，否则退化为单连接下载
+    - 下载状态保存在 <目标>.part.json 中，中断后再次运行会从已写入的位置继续
+    - SHA-256 按文件顺序流式计算：顺序到达的数据直接计算，乱序完成的分段在前面的数据到齐后从临时文件回读
+    - 所有数据先写入 <目标>.part，大小和哈希校验通过后再用 os.replace 原子重命名
+
+    用法:
+        downloader = ModelDownloader(url, target_path, expected_sha256=sha256, progress_callback=callback)
+        result = await downloader.run()
+    """
+
+    def __init__(self, url, target_path, expected_sha256=None, expected_size=None,
+                 segments=DEFAULT_SEGMENTS, headers=None, progress_callback=None,
+                 session=None, overwrite=False, throttle=None):
+        self.url = url
+        self.target_path = os.path.abspath(target_path)
+        self.temp_path = self.target_path + ".part"
+        self.state_path = self.target_path + ".part.json"
+        self.expected_sha256 = expected_sha256.lower() if expected_sha256 else None
+        self.expected_size = expected_size
+        self.max_segments = max(1, int(segments))
+        self.headers = dict(headers or {})
+        self.progress_callback = progress_callback
+        self.overwrite = overwrite
+        # 限速回调：async throttle(字节数)，每收到一块数据后等待它返回
+        self.throttle = throttle
+        self._session = session
+
+        self.total = None
+        self._segments = []
+        self._hasher = hashlib.sha256()
+        self._hash_offset = 0
+        self._hash_lock = asyncio.Lock()
+        self._read_handle = None
+        self._resolved_url = url
+        self._etag = None
+        self._started_at = None
+        self._resumed_bytes = 0
+        self._last_progress = 0.0
+
+    @property
+    def downloaded(self):
+        """已写入临时文件的字节数"""
+        return sum(seg.written for seg in self._segments)
+
+    async def run(self):
+        """
+        执行下载
+
+        Returns:
+            {"path": 目标路径, "size": 文件大小, "sha256": 十六进制哈希}
+
+        Raises:
+            DownloadError: 下载或校验失败
+            asyncio.CancelledError: 被取消（已下载的部分会保留，下次可以继续）
+        """
+        if os.path.exists(self.target_path) and not self.overwrite:
+            raise DownloadError(f"目标文件已存在: {self.target_path}")
+        os.makedirs(os.path.dirname(self.target_path), exist_ok=True)
+
+        session = self._session
+        owns_session = session is None
+        if owns_session:
+            # 使用环境变量中的代理设置（HTTP_PROXY 和 HTTPS_PROXY）
+            session = aiohttp.ClientSession(
+                trust_env=True,
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=60)
+            )
+        try:
+            return await self._run(session)
+        finally:
+            if self._read_handle is not None:
+                self._read_handle.close()
+                self._read_handle = None
+            if owns_session:
+                await session.close()
+
+    async def _run(self, session):
+        self._started_at = time.monotonic()
+        supports_range = await self._probe(session)
+
+        if self.expected_size and self.total and self.total != self.expected_size:
+            raise DownloadError(f"文件大小不一致: 服务器 {self.total}，期望 {self.expected_size}")
+
+        if supports_range and self.total:
+            await self._download_segmented(session)
+        else:
+            await self._download_single(session)
+
+        self._report_progress("verifying", force=True)
+        digest = self._hasher.hexdigest()
+        size = os.path.getsize(self.temp_path)
+        if self.total and size != self.total:
+            raise DownloadError(f"文件大小不一致: 已下载 {size}，期望 {self.total}")
+        if self.expected_sha256 and digest != self.expected_sha256:
+            self._discard_partial()
+            raise DownloadError(f"SHA-256 校验失败: {digest}，期望 {self.expected_sha256}")
+
+        # 校验通过，原子重命名到目标路径
+        os.replace(self.temp_path, self.target_path)
+        self._remove_state()
+        self._report_progress("completed", force=True)
+        return {"path": self.target_path, "size": size, "sha256": digest}
+
+    async def _probe(self, session):
+        """请求第一个字节，获取最终地址（跟随重定向）、文件大小以及是否支持 Range"""
+        headers = dict(self.headers)
+        headers["Range"] = "bytes=0-0"
+        async with session.get(self.url, headers=headers, allow_redirects=True) as response:
+            self._resolved_url = str(response.url)
+            self._etag = response.headers.get("ETag")
+            if response.status == 206:
+                content_range = response.headers.get("Content-Range", "")
+                total = content_range.rsplit("/", 1)[-1] if "/" in content_range else ""
+                self.total = int(total) if total.isdigit() else None
+                return self.total is not None
+            if response.status == 200:
+                self.total = response.content_length
+                return False
+            raise DownloadError(f"HTTP {response.status}: {self.url}")
+
+    def _plan_segments(self):
+        count = max(1, min(self.max_segments, self.total // MIN_SEGMENT_SIZE))
+        size = -(-self.total // count)
+        return [_Segment(start, min(start + size, self.total)) for start in range(0, self.total, size)]
+
+    def _load_state(self):
+        """读取断点续传状态，只有文件大小和 ETag 一致时才继续使用"""
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("total") != self.total or state.get("etag") != self._etag:
+                return None
+            if not os.path.exists(self.temp_path) or os.path.getsize(self.temp_path) != self.total:
+                return None
+            return [_Segment(*seg) for seg in state["segments"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _save_state(self):
+        state = {
+            "url": self.url,
+            "total": self.total,
+            "etag": self._etag,
+            "segments": [[seg.start, seg.end, seg.written] for seg in self._segments],
+        }
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    def _remove_state(self):
+        try:
+            os.remove(self.state_path)
+        except OSError:
+            pass
+
+    def _discard_partial(self):
+        for path in (self.temp_path, self.state_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    async def _download_segmented(self, session):
+        segments = self._load_state()
+        if segments is None:
+            segments = self._plan_segments()
+            with open(self.temp_path, "wb") as f:
+                f.truncate(self.total)
+        self._segments = segments
+        self._resumed_bytes = self.downloaded
+        self._read_handle = self._open_for_hashing()
+
+        # 续传时先计算已下载的连续前缀的哈希
+        async with self._hash_lock:
+            await self._catch_up_hash()
+
+        async def save_state_periodically():
+            while True:
+                await asyncio.sleep(STATE_SAVE_INTERVAL)
+                self._save_state()
+
+        saver = asyncio.ensure_future(save_state_periodically())
+        tasks = [asyncio.ensure_future(self._download_segment(session, seg))
+                 for seg in segments if not seg.done]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # 保留已下载的部分，下次继续
+            self._save_state()
+            raise
+        finally:
+            saver.cancel()
+
+        async with self._hash_lock:
+            await self._catch_up_hash()
+        if self._hash_offset != self.total:
+            raise DownloadError("哈希计算不完整")
+
+    async def _download_segment(self, session, seg):
+        loop = asyncio.get_running_loop()
+        attempts = 0
+        # 不使用缓冲：计算哈希时会从另一个句柄回读，写入必须立即对其可见
+        with open(self.temp_path, "r+b", buffering=0) as handle:
+            while not seg.done:
+                offset = seg.start + seg.written
+                headers = dict(self.headers)
+                headers["Range"] = f"bytes={offset}-{seg.end - 1}"
+                try:
+                    async with session.get(self._resolved_url, headers=headers) as response:
+                        if response.status != 206:
+                            raise DownloadError(f"服务器未返回分段数据: HTTP {response.status}")
+                        content_range = response.headers.get("Content-Range", "")
+                        if not content_range.startswith(f"bytes {offset}-"):
+                            raise DownloadError(f"分段范围不一致: {content_range}")
+                        await loop.run_in_executor(None, handle.seek, offset)
+                        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                            chunk = chunk[:seg.end - (seg.start + seg.written)]
+                            if not chunk:
+                                break
+                            if self.throttle is not None:
+                                await self.throttle(len(chunk))
+                            chunk_offset = seg.start + seg.written
+                            await loop.run_in_executor(None, _write_all, handle, chunk)
+                            seg.written += len(chunk)
+                            await self._feed_hash(chunk_offset, chunk)
+                            self._report_progress("downloading")
+                    if not seg.done:
+                        raise DownloadError("连接提前关闭")
+                except (aiohttp.ClientError, asyncio.TimeoutError, DownloadError) as e:
+                    attempts += 1
+                    if attempts > MAX_SEGMENT_RETRIES:
+                        raise DownloadError(f"分段 {seg.start}-{seg.end} 下载失败: {e}") from e
+                    await asyncio.sleep(min(2 ** attempts, 10))
+
+    async def _feed_hash(self, offset, chunk):
+        """按文件顺序更新哈希：正好接在已计算位置之后的数据直接计算，其余的稍后从临时文件回读"""
+        loop = asyncio.get_running_loop()
+        async with self._hash_lock:
+            if offset == self._hash_offset:
+                await loop.run_in_executor(None, self._hasher.update, chunk)
+                self._hash_offset += len(chunk)
+            await self._catch_up_hash()
+
+    def _hashable_end(self):
+        """从当前哈希位置开始，临时文件中连续写入完成的数据的结束位置"""
+        end = self._hash_offset
+        for seg in self._segments:
+            if seg.end <= end:
+                continue
+            if seg.start > end:
+                break
+            end = seg.start + seg.written
+            if not seg.done:
+                break
+        return end
+
+    async def _catch_up_hash(self):
+        """回读已写入但尚未计算哈希的连续数据（调用方需持有 _hash_lock）"""
+        loop = asyncio.get_running_loop()
+        while True:
+            end = self._hashable_end()
+            if end <= self._hash_offset:
+                return
+            length = min(HASH_READ_SIZE, end - self._hash_offset)
+            data = await loop.run_in_executor(None, self._read_at, self._hash_offset, length)
+            if not data:
+                raise DownloadError("读取临时文件失败")
+            await loop.run_in_executor(None, self._hasher.update, data)
+            self._hash_offset += len(data)
+
+    def _open_for_hashing(self):
+        """
+        打开回读临时文件的句柄
+
+        不使用缓冲：预读的数据可能是其他分段还没有写入的部分，之后在缓冲区内 seek 会读到旧数据。
+        """
+        return open(self.temp_path, "rb", buffering=0)
+
+    def _read_at(self, offset, length):
+        self._read_handle.seek(offset)
+        return self._read_handle.read(length)
+
+    async def _download_single(self, session):
+        """服务器不支持 Range 时使用单连接下载（无法续传，从头开始）"""
+        loop = asyncio.get_running_loop()
+        self._remove_state()
+        self._segments = [_Segment(0, self.total or 0)]
+        seg = self._segments[0]
+        async with session.get(self._resolved_url, headers=self.headers) as response:
+            if response.status != 200:
+                raise DownloadError(f"HTTP {response.status}: {self.url}")
+            with open(self.temp_path, "wb") as handle:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    if self.throttle is not None:
+                        await self.throttle(len(chunk))
+                    await loop.run_in_executor(None, handle.write, chunk)
+                    await loop.run_in_executor(None, self._hasher.update, chunk)
+                    seg.written += len(chunk)
+                    if self.total is None or seg.written > seg.end:
+                        seg.end = seg.written
+                    self._report_progress("downloading")
+        if self.total is None:
+            self.total = seg.written
+
+    def _report_progress(self, status, force=False):
+        if self.progress_callback is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        elapsed = max(now - (self._started_at or now), 1e-6)
+        downloaded = self.downloaded
+        try:
+            self.progress_callback({
+                "status": status,
+                "downloaded": downloaded,
+                "total": self.total,
+                "speed": (downloaded - self._resumed_bytes) / elapsed,
+                "path": self.target_path,
+            })
+        except Exception:
+            pass
@@ -0,0 +1,480 @@
+"""
+模型元数据模块
+通过 mmap 只读取模型文件的头部（不读取张量数据），识别模型的派系（SD1.5、SDXL、Flux 等）和类型（主模型、LoRA、VAE 等）
+
+- .safetensors: 8 字节的头部长度 + JSON 头部（张量名称、形状和 __metadata__）
+- .gguf: 键值对部分和张量信息（名称、形状）
+结果按路径缓存，文件大小或修改时间变化时重新读取
+"""
+
+import os
+import re
+import json
+import mmap
+import struct
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 支持读取头部的文件扩展名
+SAFETENSORS_EXTENSIONS = (".safetensors", ".sft")
+GGUF_EXTENSIONS = (".gguf",)
+# safetensors 头部的最大长度（防止读取损坏的文件时分配过大的内存）
+MAX_HEADER_SIZE = 100 * 1024 * 1024
+# 保存到结果中的元数据值的最大长度（ss_tag_frequency 等字段可能非常大）
+MAX_METADATA_VALUE_LENGTH = 512
+# GGUF 中保存的数组的最大长度（词表等大数组只跳过不保存）
+MAX_GGUF_ARRAY_LENGTH = 16
+# 缓存格式版本（分类规则变化时递增，使旧缓存失效）
+CACHE_VERSION = 2
+# 批量读取的默认并发数
+DEFAULT_WORKERS = 8
+
+# GGUF 值类型: (struct 格式, 字节数)
+_GGUF_SCALAR_TYPES = {
+    0: ("<B", 1), 1: ("<b", 1), 2: ("<H", 2), 3: ("<h", 2),
+    4: ("<I", 4), 5: ("<i", 4), 6: ("<f", 4), 7: ("<?", 1),
+    10: ("<Q", 8), 11: ("<q", 8), 12: ("<d", 8),
+}
+_GGUF_STRING = 8
+_GGUF_ARRAY = 9
+
+# 元数据中的架构名称到派系的映射（按顺序匹配，"stable-diffusion-xl-v1-base" 要先匹配 xl）
+# 每个名称必须从单词开头匹配，短名称后面不能紧跟字母（"wan" 不匹配 "swan"，"xl" 不匹配 "t5xxl"），
+# 单独的 "v1"、"v2" 不表示 SD 版本（"mochi_v1"）
+_ARCHITECTURE_FAMILIES = [(re.compile(r"(?<![a-z0-9])(?:" + pattern + ")"), family) for pattern, family in (
+    (r"flux", "Flux"),
+    (r"sd3|stable-diffusion-v?3", "SD3"),
+    (r"pony", "Pony"),
+    (r"sdxl|xl(?![a-z])", "SDXL"),
+    (r"wan(?![a-z])", "Wan"),
+    (r"ltx(?:v|video)?(?![a-z])", "LTX"),
+    (r"hunyuan|hyvid", "Hunyuan"),
+    (r"svd(?![a-z])|stable-video", "SVD"),
+    (r"lumina|z-?image", "ZImage"),
+    (r"(?:sd[_-]?v?2|stable-diffusion-v2)(?![a-z])", "SD2"),
+    (r"(?:sd[_-]?v?1|stable-diffusion-v1)(?![a-z])", "SD1.5"),
+)]
+
+# LoRA / LyCORIS 张量名称中的特征
+_LORA_MARKERS = ("lora_up", "lora_down", "lora_A", "lora_B", "lora.up", "lora.down", "hada_w1", "lokr_w1")
+
+
+class MetadataError(Exception):
+    """模型文件格式不正确或无法读取"""
+
+
+def read_safetensors_header(path):
+    """
+    读取 safetensors 文件的头部
+
+    Returns:
+        (metadata, tensors): __metadata__ 字典和 {张量名称: 形状列表}
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < 8:
+            raise MetadataError("文件太小")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            (header_size,) = struct.unpack_from("<Q", mm, 0)
+            if header_size > MAX_HEADER_SIZE or 8 + header_size > size:
+                raise MetadataError(f"头部长度不正确: {header_size}")
+            try:
+                header = json.loads(mm[8:8 + header_size])
+            except ValueError as e:
+                raise MetadataError(f"头部不是有效的 JSON: {e}") from e
+    if not isinstance(header, dict):
+        raise MetadataError("头部不是 JSON 对象")
+    metadata = header.pop("__metadata__", None) or {}
+    tensors = {
+        name: list(info.get("shape") or [])
+        for name, info in header.items() if isinstance(info, dict)
+    }
+    return metadata, tensors
+
+
+class _GGUFReader:
+    """在 mmap 上顺序读取 GGUF 的字段"""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.pos = 0
+        self.count_format = ("<Q", 8)
+
+    def unpack(self, fmt, size):
+        if self.pos + size > len(self.buffer):
+            raise MetadataError("GGUF 文件不完整")
+        (value,) = struct.unpack_from(fmt, self.buffer, self.pos)
+        self.pos += size
+        return value
+
+    def count(self):
+        return self.unpack(*self.count_format)
+
+    def string(self):
+        length = self.count()
+        if self.pos + length > len(self.buffer):
+            raise MetadataError("GGUF 文件不完整")
+        value = bytes(self.buffer[self.pos:self.pos + length]).decode("utf-8", errors="replace")
+        self.pos += length
+        return value
+
+    def skip_string(self):
+        length = self.count()
+        self.pos += length
+
+    def value(self, value_type):
+        """读取一个值（大数组只跳过，返回 None）"""
+        if value_type in _GGUF_SCALAR_TYPES:
+            return self.unpack(*_GGUF_SCALAR_TYPES[value_type])
+        if value_type == _GGUF_STRING:
+            return self.string()
+        if value_type == _GGUF_ARRAY:
+            item_type = self.unpack("<I", 4)
+            length = self.count()
+            if length <= MAX_GGUF_ARRAY_LENGTH:
+                return [self.value(item_type) for _ in range(length)]
+            if item_type in _GGUF_SCALAR_TYPES:
+                self.pos += _GGUF_SCALAR_TYPES[item_type][1] * length
+            elif item_type == _GGUF_STRING:
+                for _ in range(length):
+                    self.skip_string()
+            else:
+                for _ in range(length):
+                    self.value(item_type)
+            return None
+        raise MetadataError(f"未知的 GGUF 值类型: {value_type}")
+
+
+def read_gguf_header(path):
+    """
+    读取 GGUF 文件的键值对和张量信息
+
+    Returns:
+        (metadata, tensors): 键值对字典（不含大数组）和 {张量名称: 形状列表}
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < 16:
+            raise MetadataError("文件太小")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:4] != b"GGUF":
+                raise MetadataError("不是 GGUF 文件")
+            reader = _GGUFReader(mm)
+            reader.pos = 4
+            version = reader.unpack("<I", 4)
+            if version == 1:
+                # 第 1 版的数量和字符串长度是 32 位的
+                reader.count_format = ("<I", 4)
+            tensor_count = reader.count()
+            kv_count = reader.count()
+
+            metadata = {"GGUF.version": version}
+            for _ in range(kv_count):
+                key = reader.string()
+                value = reader.value(reader.unpack("<I", 4))
+                if value is not None:
+                    metadata[key] = value
+
+            tensors = {}
+            for _ in range(tensor_count):
+                name = reader.string()
+                n_dims = reader.unpack("<I", 4)
+                # GGUF 中的维度顺序与 PyTorch 相反
+                dims = [reader.count() for _ in range(n_dims)]
+                reader.unpack("<I", 4)  # 数据类型
+                reader.unpack("<Q", 8)  # 数据偏移
+                tensors[name] = dims[::-1]
+    return metadata, tensors
+
+
+def family_from_architecture(text):
+    """从元数据中的架构名称（如 "stable-diffusion-xl-v1-base"、"sdxl_base_v1-0"、"flux"）识别派系"""
+    text = str(text or "").lower()
+    if not text:
+        return None
+    for pattern, family in _ARCHITECTURE_FAMILIES:
+        if pattern.search(text):
+            return family
+    return None
+
+
+class _KeyIndex:
+    """把所有张量名称拼接成一个字符串，前缀和子串检查只需要一次字符串查找"""
+
+    __slots__ = ("text",)
+
+    def __init__(self, keys):
+        self.text = "\n" + "\n".join(keys)
+
+    def __contains__(self, part):
+        return part in self.text
+
+
+def _has_prefix(keys, prefix):
+    return "\n" + prefix in keys.text
+
+
+def _has_part(keys, part):
+    return part in keys.text
+
+
+def _has_segment(keys, part):
+    """张量名称中某一段以 part 开头（前面是名称开头或 "."，"blocks.0." 不匹配 "down_blocks.0."）"""
+    return "\n" + part in keys.text or "." + part in keys.text
+
+
+def _diffusion_family(keys, tensors, prefix=""):
+    """根据扩散模型（UNet/DiT）的张量名称和形状识别派系，prefix 为张量名称的公共前缀"""
+    def has(name):
+        return _has_prefix(keys, prefix + name)
+
+    if has("double_blocks.") and has("single_blocks."):
+        return "Hunyuan" if has("txt_in.individual_token_refiner") else "Flux"
+    if has("joint_blocks."):
+        return "SD3"
+    if has("blocks.0.cross_attn.") or (has("patch_embedding.") and has("blocks.0.")):
+        return "Wan"
+    if has("adaln_single.") and has("transformer_blocks."):
+        return "LTX"
+    if has("noise_refiner.") and has("context_refiner."):
+        return "ZImage"
+    if _has_part(keys, "motion_modules."):
+        return "AnimateDiff"
+    if has("input_blocks."):
+        if _has_part(keys, "time_stack.") or _has_part(keys, "time_mixer"):
+            return "SVD"
+        if has("label_emb."):
+            return "SDXL"
+        # 交叉注意力的上下文维度：768 为 SD1.5，1024 为 SD2
+        shape = tensors.get(prefix + "input_blocks.1.1.transformer_blocks.0.attn2.to_k.weight")
+        if shape and len(shape) == 2:
+            if shape[1] == 768:
+                return "SD1.5"
+            if shape[1] == 1024:
+                return "SD2"
+    return None
+
+
+def _lora_family(keys):
+    """根据 LoRA 的张量名称识别派系"""
+    # diffusers / ComfyUI 格式（"diffusion_model.double_blocks.0..."）和 kohya 格式（"lora_unet_double_blocks_0_..."）
+    if _has_segment(keys, "double_blocks.") or _has_segment(keys, "single_blocks.") \
+            or _has_segment(keys, "single_transformer_blocks.") \
+            or _has_prefix(keys, "lora_unet_double_blocks_") or _has_prefix(keys, "lora_unet_single_blocks_"):
+        return "Flux"
+    if _has_segment(keys, "joint_blocks.") or _has_prefix(keys, "lora_unet_joint_blocks_") \
+            or _has_part(keys, "transformer.transformer_blocks.0.attn.add_q_proj"):
+        return "SD3"
+    if _has_segment(keys, "blocks.0.cross_attn.") or _has_prefix(keys, "lora_unet_blocks_0_cross_attn_"):
+        return "Wan"
+    if _has_prefix(keys, "lora_te1_") or _has_prefix(keys, "lora_te2_"):
+        return "SDXL"
+    if _has_prefix(keys, "lora_unet_input_blocks") or _has_prefix(keys, "lora_unet_down_blocks") or _has_prefix(keys, "lora_te_"):
+        return "SD1.5"
+    return None
+
+
+def classify(metadata, tensors):
+    """
+    根据元数据和张量名称/形状识别模型类型和派系
+
+    Returns:
+        (类型, 派系列表, 判断依据列表, 元数据中的架构名称)
+        类型使用前端的类型名称（"主模型"、"LoRA" 等），无法识别时为 None
+    """
+    keys = _KeyIndex(tensors)
+    hints = []
+    model_type = None
+    family = None
+
+    if any(marker in keys for marker in _LORA_MARKERS):
+        model_type = "LoRA"
+        family = _lora_family(keys)
+        hints.append("lora keys")
+    elif _has_prefix(keys, "model.diffusion_model."):
+        model_type = "主模型"
+        family = _diffusion_family(keys, tensors, "model.diffusion_model.")
+        hints.append("checkpoint keys")
+    elif _has_prefix(keys, "control_model.") or _has_prefix(keys, "input_hint_block.") or _has_prefix(keys, "controlnet_"):
+        model_type = "ControlNet"
+        family = _diffusion_family(keys, tensors, "control_model.") or _diffusion_family(keys, tensors)
+        hints.append("controlnet keys")
+    elif _has_prefix(keys, "image_proj.") and _has_prefix(keys, "ip_adapter."):
+        model_type = "IP-Adapter"
+        hints.append("ip-adapter keys")
+    elif _has_prefix(keys, "vision_model.encoder.") or _has_prefix(keys, "visual."):
+        model_type = "CLIP Vision"
+        hints.append("vision encoder keys")
+    elif (_has_prefix(keys, "encoder.down") and _has_prefix(keys, "decoder.up")) or _has_prefix(keys, "first_stage_model."):
+        model_type = "VAE"
+        # 潜空间通道数：16 通道的 VAE 属于 Flux/SD3
+        shape = tensors.get("decoder.conv_in.weight")
+        if shape and len(shape) == 4 and shape[1] == 16:
+            family = "Flux"
+        hints.append("vae keys")
+    elif _has_prefix(keys, "text_model.encoder.") or _has_prefix(keys, "transformer.text_model."):
+        model_type = "CLIP"
+        hints.append("clip text encoder keys")
+    elif _has_prefix(keys, "encoder.block.") or _has_prefix(keys, "shared.") or _has_prefix(keys, "model.layers."):
+        model_type = "文本编码器"
+        hints.append("text encoder keys")
+    elif _has_prefix(keys, "conv_first.") or _has_prefix(keys, "body.") or _has_prefix(keys, "model.1.sub."):
+        model_type = "放大模型"
+        hints.append("upscaler keys")
+    else:
+        family = _diffusion_family(keys, tensors)
+        if family is not None:
+            # 只有扩散模型权重（UNETLoader 加载的文件）
+            model_type = "主模型"
+            hints.append("diffusion model keys")
+
+    # 元数据中明确的架构信息优先于张量名称的推断
+    architecture = None
+    for field in ("modelspec.architecture", "ss_base_model_version", "general.architecture"):
+        if metadata.get(field):
+            architecture = str(metadata[field])
+            break
+    declared = family_from_architecture(architecture)
+    if declared is not None:
+        if family is not None and declared != family and not (declared == "Pony" and family == "SDXL"):
+            hints.append(f"architecture {architecture} overrides {family}")
+        family = declared
+    if model_type is None and str(metadata.get("ss_network_module", "")).startswith(("networks.lora", "lycoris")):
+        model_type = "LoRA"
+        hints.append("ss_network_module")
+
+    return model_type, [family] if family else [], hints, architecture
+
+
+def shape_fingerprint(tensors):
+    """张量名称和形状的指纹（同一个模型的不同文件名/格式转换后相同）"""
+    text = json.dumps(sorted(tensors.items()), separators=(",", ":"))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _compact_metadata(metadata):
+    """只保留 modelspec.*、ss_* 和 general.* 中较短的字段"""
+    compact = {}
+    for key, value in metadata.items():
+        if not (key.startswith("modelspec.") or key.startswith("ss_") or key.startswith("general.") or key == "format"):
+            continue
+        if isinstance(value, str) and len(value) > MAX_METADATA_VALUE_LENGTH:
+            continue
+        if isinstance(value, (list, dict)) and len(json.dumps(value, ensure_ascii=False)) > MAX_METADATA_VALUE_LENGTH:
+            continue
+        compact[key] = value
+    return compact
+
+
+def read_model_metadata(path):
+    """
+    读取单个模型文件的头部并分类
+
+    Returns:
+        {"format", "type", "families", "architecture", "metadata", "tensor_count", "fingerprint", "hints"}
+        不支持的格式（.ckpt/.pt 等）返回 format 为 None 的结果
+
+    Raises:
+        MetadataError: 文件格式不正确
+        OSError: 无法读取文件
+    """
+    lower = path.lower()
+    if lower.endswith(SAFETENSORS_EXTENSIONS):
+        file_format = "safetensors"
+        metadata, tensors = read_safetensors_header(path)
+    elif lower.endswith(GGUF_EXTENSIONS):
+        file_format = "gguf"
+        metadata, tensors = read_gguf_header(path)
+    else:
+        return {"format": None, "type": None, "families": [], "architecture": None,
+                "metadata": {}, "tensor_count": 0, "fingerprint": None, "hints": []}
+
+    model_type, families, hints, architecture = classify(metadata, tensors)
+    return {
+        "format": file_format,
+        "type": model_type,
+        "families": families,
+        "architecture": architecture,
+        "metadata": _compact_metadata(metadata),
+        "tensor_count": len(tensors),
+        "fingerprint": shape_fingerprint(tensors),
+        "hints": hints,
+    }
+
+
+class MetadataCache:
+    """
+    元数据缓存（按路径缓存，文件大小和修改时间不变时直接返回）
+
+    可以保存到 JSON 文件中，下次启动时不需要重新读取文件头部。
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self._entries = data.get("entries") or {}
+        except (OSError, ValueError, AttributeError):
+            self._entries = {}
+
+    def save(self):
+        """把有变化的缓存写入文件"""
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            data = {"version": CACHE_VERSION, "entries": dict(self._entries)}
+            self._dirty = False
+        try:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def get(self, path):
+        """
+        获取模型的元数据（缓存失效时读取文件头部）
+
+        Returns:
+            元数据（dict）；读取失败时返回带 error 字段的结果
+        """
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            return {"error": str(e)}
+        key = os.path.abspath(path)
+        entry = self._entries.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            return entry["info"]
+        try:
+            info = read_model_metadata(path)
+        except (MetadataError, OSError, ValueError, struct.error) as e:
+            info = {"error": str(e)}
+        with self._lock:
+            self._entries[key] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "info": info}
+            self._dirty = True
+        return info
+
+    def get_many(self, paths, workers=DEFAULT_WORKERS):
+        """
+        批量获取元数据（并行读取文件头部）
+
+        Returns:
+            {路径: 元数据}
+        """
+        paths = list(paths)
+        if len(paths) <= 1:
+            return {path: self.get(path) for path in paths}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return dict(zip(paths, executor.map(self.get, paths)))
@@ -0,0 +1,144 @@
+"""
+模型目录模块
+把前端的模型类型映射到 ComfyUI 的模型目录（与 workflowModelExtractor.js 中的 MODEL_TYPE_TO_DIR / buildLocalPath 一致）
+"""
+
+import os
+
+try:
+    import folder_paths
+except ImportError:
+    # 在 ComfyUI 之外运行（命令行工具、测试）时没有 folder_paths
+    folder_paths = None
+
+# 模型类型到目录的映射（与 web/workflowModelExtractor.js 保持一致）
+MODEL_TYPE_TO_DIR = {
+    "主模型": "checkpoints",
+    "Checkpoint": "checkpoints",
+    "VAE": "vae",
+    "LoRA": "loras",
+    "ControlNet": "controlnet",
+    "放大模型": "upscale_models",
+    "Upscale": "upscale_models",
+    "CLIP": "clip",
+    "CLIP Vision": "clip_vision",
+    "IP-Adapter": "ipadapter",
+    "文本编码器": "text_encoders"
+}
+
+
+# 同一类型的模型可能存放在多个目录中（如 UNETLoader 加载的主模型在 diffusion_models/unet 中）
+MODEL_TYPE_EXTRA_DIRS = {
+    "主模型": ["diffusion_models", "unet"],
+    "Checkpoint": ["diffusion_models", "unet"],
+    "CLIP": ["text_encoders"],
+    "文本编码器": ["clip"],
+}
+
+# 不属于模型的 ComfyUI 目录（扫描、同步和提供下载时跳过）
+NON_MODEL_FOLDERS = ("custom_nodes", "configs")
+
+
+def base_key(name):
+    """比较用的名称（不含子目录，不区分大小写）"""
+    return os.path.basename(name.replace("\\", "/")).lower()
+
+
+def format_size(size):
+    """格式化文件大小"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def get_model_folder_name(model_type):
+    """获取模型类型对应的 ComfyUI 目录名（未知类型使用小写的类型名）"""
+    return MODEL_TYPE_TO_DIR.get(model_type) or (model_type or "checkpoints").lower()
+
+
+def get_model_folder_names(model_type):
+    """获取模型类型对应的所有 ComfyUI 目录名（包括同一类型的其他目录）"""
+    return [get_model_folder_name(model_type)] + MODEL_TYPE_EXTRA_DIRS.get(model_type, [])
+
+
+def get_folder_paths(folder_name):
+    """获取 ComfyUI 中某个模型目录的所有路径（包括 extra_model_paths.yaml 中配置的路径）"""
+    if folder_paths is None:
+        return []
+    try:
+        return list(folder_paths.get_folder_paths(folder_name) or [])
+    except Exception:
+        return []
+
+
+def find_installed_path(model_type, model_name):
+    """查找已安装模型文件的完整路径（找不到时返回 None）"""
+    if folder_paths is None or not model_name:
+        return None
+    for folder_name in get_model_folder_names(model_type):
+        try:
+            path = folder_paths.get_full_path(folder_name, model_name)
+        except Exception:
+            path = None
+        if path:
+            return path
+    return None
+
+
+def get_installed_file_names(model_type):
+    """
+    获取某个类型已安装模型的文件名集合（只保留文件名，不含子目录）
+
+    未知类型（如 "其他"）会检查 ComfyUI 注册的所有模型目录。
+    """
+    if folder_paths is None:
+        return set()
+    if model_type in MODEL_TYPE_TO_DIR:
+        folder_names = get_model_folder_names(model_type)
+    else:
+        folder_names = list(getattr(folder_paths, "folder_names_and_paths", {}).keys())
+    names = set()
+    for folder_name in folder_names:
+        try:
+            file_list = folder_paths.get_filename_list(folder_name)
+        except Exception:
+            continue
+        names.update(os.path.basename(name.replace("\\", "/")) for name in file_list)
+    return names
+
+
+def resolve_target_path(model_type, model_name, base_dir=None):
+    """
+    计算模型下载的目标路径
+
+    与前端 buildLocalPath 的逻辑一致：使用该类型的默认路径（folder_names_and_paths 中的第一个路径，
+    也就是 extra_model_paths 的 default_path）。模型名可以包含子目录，但不能跳出模型目录。
+
+    Args:
+        model_type: 前端的模型类型（如 "LoRA"）或 ComfyUI 目录名（如 "loras"）
+        model_name: 模型文件名（可以包含子目录）
+        base_dir: 指定目标目录（可选，不指定时从 folder_paths 获取）
+
+    Returns:
+        目标文件的绝对路径
+
+    Raises:
+        ValueError: 找不到目标目录或模型名不合法
+    """
+    if base_dir is None:
+        paths = get_folder_paths(get_model_folder_name(model_type))
+        if not paths:
+            raise ValueError(f"找不到模型类型 {model_type} 对应的目录")
+        base_dir = paths[0]
+
+    relative = (model_name or "").replace("\\", "/").strip("/")
+    if not relative or any(part in ("", ".", "..") for part in relative.split("/")):
+        raise ValueError(f"不合法的模型名: {model_name}")
+
+    base_dir = os.path.abspath(base_dir)
+    target = os.path.abspath(os.path.join(base_dir, *relative.split("/")))
+    if os.path.commonpath([base_dir, target]) != base_dir:
+        raise ValueError(f"不合法的模型名: {model_name}")
+    return target
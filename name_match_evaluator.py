@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+名称匹配评估模块
+用带标注的语料（需要的模型名、候选名、是否为同一个模型）评估 calculate_name_similarity，
+在多个 CPU 核心上并行打分，报告每个阈值的精确率和召回率，以及每秒处理的名称对数。
+修改匹配规则（权重、阈值）后重新运行，可以同时看到对准确率和速度的影响。
+
+语料格式:
+- CSV: required,candidate,label（第一行可以是表头，label 为 1/0、true/false、yes/no）
+- JSON Lines: 每行 {"required", "candidate", "label"} 或 [required, candidate, label]
+- JSON: 上述对象或数组组成的列表
+
+命令行中打分在进程池中执行（纯 Python 计算受 GIL 限制），进程池不可用时退回到线程池；
+在 ComfyUI 中（evaluate_async）按块交给插件的 CPU 线程池，不创建子进程，也不长时间占用线程池。
+
+命令行用法:
+    python name_match_evaluator.py corpus.csv
+    python name_match_evaluator.py corpus.jsonl --workers 8 --thresholds 0.8,0.85,0.9 --jaccard-weight 0.5
+"""
+
+import os
+import io
+import csv
+import sys
+import json
+import time
+import pickle
+import asyncio
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from .name_matcher import (calculate_name_similarity, JACCARD_WEIGHT, SEQUENCE_WEIGHT, CONTAINMENT_SIMILARITY,
+                               MATCH_THRESHOLD, STRICT_MATCH_THRESHOLD)
+except ImportError:
+    # 作为命令行脚本运行
+    from name_matcher import (calculate_name_similarity, JACCARD_WEIGHT, SEQUENCE_WEIGHT, CONTAINMENT_SIMILARITY,
+                              MATCH_THRESHOLD, STRICT_MATCH_THRESHOLD)
+
+# 打分的默认进程数（命令行）或同时打分的块数（ComfyUI）
+DEFAULT_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+# 默认评估的阈值（0.50 到 0.95，包含当前使用的 0.85 和 0.9）
+DEFAULT_THRESHOLDS = tuple(round(0.5 + 0.05 * index, 2) for index in range(10))
+# 每块的名称对数（太小时进程间通信和调度的开销超过打分本身）
+CHUNK_SIZE = 500
+# 报告中列出的误判样例数
+MAX_MISTAKES = 20
+# 语料的最大名称对数（接口）
+MAX_PAIRS = 200000
+
+_TRUE_LABELS = ("1", "true", "yes", "y", "same", "match")
+_FALSE_LABELS = ("0", "false", "no", "n", "different", "mismatch")
+
+
+def default_weights():
+    """calculate_name_similarity 当前使用的权重"""
+    return {
+        "jaccard_weight": JACCARD_WEIGHT,
+        "sequence_weight": SEQUENCE_WEIGHT,
+        "containment_similarity": CONTAINMENT_SIMILARITY,
+    }
+
+
+def parse_label(value):
+    """把标注转换为 bool（无法识别时抛出 ValueError）"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return value != 0
+    text = str(value).strip().lower()
+    if text in _TRUE_LABELS:
+        return True
+    if text in _FALSE_LABELS:
+        return False
+    raise ValueError(f"无法识别的标注: {value!r}")
+
+
+def parse_pairs(items):
+    """
+    把语料条目转换为 [(required, candidate, label), ...]
+
+    Args:
+        items: {"required", "candidate", "label"} 或 [required, candidate, label] 组成的列表
+
+    Raises:
+        ValueError: 条目格式不正确
+    """
+    pairs = []
+    for index, item in enumerate(items):
+        if isinstance(item, dict):
+            values = (item.get("required"), item.get("candidate"), item.get("label"))
+        elif isinstance(item, (list, tuple)) and len(item) >= 3:
+            values = tuple(item[:3])
+        else:
+            raise ValueError(f"第 {index + 1} 条格式不正确")
+        required, candidate, label = values
+        if not isinstance(required, str) or not isinstance(candidate, str) or label is None:
+            raise ValueError(f"第 {index + 1} 条缺少 required、candidate 或 label")
+        try:
+            pairs.append((required, candidate, parse_label(label)))
+        except ValueError as e:
+            raise ValueError(f"第 {index + 1} 条: {e}")
+    return pairs
+
+
+def load_corpus(path):
+    """读取语料文件（按扩展名识别 CSV、JSON Lines 或 JSON）"""
+    with open(path, "r", encoding="utf-8-sig") as f:
+        text = f.read()
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".json":
+        return parse_pairs(json.loads(text))
+    if ext in (".jsonl", ".ndjson"):
+        return parse_pairs(json.loads(line) for line in text.splitlines() if line.strip())
+    rows = [row for row in csv.reader(io.StringIO(text)) if row and any(cell.strip() for cell in row)]
+    if rows and rows[0][0].strip().lower() in ("required", "required_name", "name1"):
+        rows = rows[1:]
+    return parse_pairs(rows)
+
+
+def _score_chunk(pairs, weights):
+    """为一组名称对打分（在进程池中调用）"""
+    return [calculate_name_similarity(required, candidate, **weights) for required, candidate in pairs]
+
+
+def _chunk_pairs(pairs):
+    """把名称对按 CHUNK_SIZE 分块（只保留 required 和 candidate）"""
+    pairs = [(required, candidate) for required, candidate, *_ in pairs]
+    return [pairs[start:start + CHUNK_SIZE] for start in range(0, len(pairs), CHUNK_SIZE)]
+
+
+def score_pairs(pairs, weights=None, workers=DEFAULT_WORKERS, use_processes=False):
+    """
+    并行计算名称对的相似度
+
+    Args:
+        pairs: [(required, candidate), ...]
+        weights: calculate_name_similarity 的权重参数，None 表示使用当前的默认值
+        workers: 线程数（或进程数）
+        use_processes: 使用进程池打分（只用于命令行，ComfyUI 进程中不能创建子进程）
+
+    Returns:
+        相似度列表（与输入顺序一致）
+    """
+    weights = dict(default_weights(), **(weights or {}))
+    chunks = _chunk_pairs(pairs)
+    score = partial(_score_chunk, weights=weights)
+    if workers <= 1 or len(chunks) <= 1:
+        results = [score(chunk) for chunk in chunks]
+    else:
+        results = None
+        if use_processes:
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(score, chunks))
+            except (OSError, BrokenProcessPool, ImportError, AttributeError, pickle.PicklingError):
+                # 子进程无法启动或无法导入本模块，改用线程池
+                pass
+        if results is None:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(score, chunks))
+    return [similarity for chunk in results for similarity in chunk]
+
+
+async def score_pairs_async(pairs, run_blocking, weights=None, workers=DEFAULT_WORKERS):
+    """
+    在事件循环中计算名称对的相似度（每块单独交给 run_blocking，同时最多 workers 块）
+
+    Args:
+        pairs: [(required, candidate), ...]
+        run_blocking: 执行阻塞函数的协程函数 run_blocking(func, *args)（如 executors.run_cpu）
+        weights: calculate_name_similarity 的权重参数，None 表示使用当前的默认值
+        workers: 同时打分的块数
+
+    Returns:
+        相似度列表（与输入顺序一致）
+    """
+    weights = dict(default_weights(), **(weights or {}))
+    chunks = _chunk_pairs(pairs)
+    workers = max(1, workers)
+    scores = []
+    for start in range(0, len(chunks), workers):
+        results = await asyncio.gather(*(run_blocking(_score_chunk, chunk, weights)
+                                         for chunk in chunks[start:start + workers]))
+        scores.extend(similarity for chunk in results for similarity in chunk)
+    return scores
+
+
+def threshold_metrics(scores, labels, threshold):
+    """某个阈值下的混淆矩阵、精确率、召回率和 F1（相似度 >= 阈值判断为同一个模型）"""
+    tp = fp = fn = tn = 0
+    for similarity, label in zip(scores, labels):
+        predicted = similarity >= threshold
+        if predicted and label:
+            tp += 1
+        elif predicted:
+            fp += 1
+        elif label:
+            fn += 1
+        else:
+            tn += 1
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "threshold": threshold,
+        "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1": round(f1, 4),
+    }
+
+
+def _build_report(pairs, scores, thresholds, weights, workers, elapsed, mistakes_threshold):
+    """根据打分结果生成报告（evaluate 和 evaluate_async 共用）"""
+    labels = [label for _, _, label in pairs]
+    results = [threshold_metrics(scores, labels, threshold) for threshold in thresholds]
+    best = max(results, key=lambda result: (result["f1"], result["threshold"])) if results else None
+
+    mistakes = []
+    for (required, candidate, label), similarity in zip(pairs, scores):
+        if (similarity >= mistakes_threshold) != label:
+            mistakes.append({"required": required, "candidate": candidate, "label": label,
+                             "similarity": round(similarity, 4)})
+    # 离阈值最远的误判最值得查看
+    mistakes.sort(key=lambda mistake: -abs(mistake["similarity"] - mistakes_threshold))
+
+    return {
+        "pairs": len(pairs),
+        "positives": sum(labels),
+        "weights": weights,
+        "workers": workers,
+        "elapsed": round(elapsed, 4),
+        "pairs_per_second": round(len(pairs) / elapsed, 1) if elapsed > 0 else None,
+        "thresholds": results,
+        "best_threshold": best["threshold"] if best else None,
+        "current_thresholds": {"match": MATCH_THRESHOLD, "strict_match": STRICT_MATCH_THRESHOLD},
+        "mistakes_threshold": mistakes_threshold,
+        "mistakes": mistakes[:MAX_MISTAKES],
+        "mistake_count": len(mistakes),
+    }
+
+
+def _thresholds_to_check(thresholds, mistakes_threshold):
+    return sorted(set(float(threshold) for threshold in thresholds) | {float(mistakes_threshold)})
+
+
+def evaluate(pairs, thresholds=DEFAULT_THRESHOLDS, weights=None, workers=DEFAULT_WORKERS,
+             mistakes_threshold=MATCH_THRESHOLD, use_processes=False):
+    """
+    评估名称匹配规则
+
+    Args:
+        pairs: [(required, candidate, label), ...]
+        thresholds: 要评估的阈值
+        weights: calculate_name_similarity 的权重参数（只需要提供要修改的项）
+        workers: 打分的线程数（或进程数）
+        mistakes_threshold: 列出误判样例时使用的阈值
+        use_processes: 使用进程池打分（只用于命令行）
+
+    Returns:
+        报告（dict）：每个阈值的精确率和召回率、F1 最高的阈值、打分速度（pairs_per_second）和误判样例
+    """
+    weights = dict(default_weights(), **(weights or {}))
+    thresholds = _thresholds_to_check(thresholds, mistakes_threshold)
+    started = time.perf_counter()
+    scores = score_pairs(pairs, weights, workers, use_processes=use_processes)
+    elapsed = time.perf_counter() - started
+    return _build_report(pairs, scores, thresholds, weights, workers, elapsed, mistakes_threshold)
+
+
+async def evaluate_async(pairs, run_blocking, thresholds=DEFAULT_THRESHOLDS, weights=None, workers=DEFAULT_WORKERS,
+                         mistakes_threshold=MATCH_THRESHOLD):
+    """
+    在事件循环中评估名称匹配规则（打分和生成报告都交给 run_blocking，参数和返回值见 evaluate）
+
+    Raises:
+        ExecutorBusy: run_blocking 的线程池繁忙
+    """
+    weights = dict(default_weights(), **(weights or {}))
+    thresholds = _thresholds_to_check(thresholds, mistakes_threshold)
+    started = time.perf_counter()
+    scores = await score_pairs_async(pairs, run_blocking, weights, workers)
+    elapsed = time.perf_counter() - started
+    return await run_blocking(_build_report, pairs, scores, thresholds, weights, workers, elapsed,
+                              mistakes_threshold)
+
+
+def format_report(report):
+    """把报告格式化为文本表格"""
+    lines = [f"{'阈值':>6}  {'精确率':>8}  {'召回率':>8}  {'F1':>6}  {'TP':>6}  {'FP':>6}  {'FN':>6}  {'TN':>6}"]
+    for result in report["thresholds"]:
+        marker = " *" if result["threshold"] == report["best_threshold"] else ""
+        lines.append(f"{result['threshold']:>6.2f}  {result['precision']:>8.4f}  {result['recall']:>8.4f}  "
+                     f"{result['f1']:>6.4f}  {result['tp']:>6}  {result['fp']:>6}  {result['fn']:>6}  "
+                     f"{result['tn']:>6}{marker}")
+    lines.append("")
+    lines.append(f"{report['pairs']} 对（{report['positives']} 对为同一个模型），{report['workers']} 个进程，"
+                 f"耗时 {report['elapsed']:.3f} 秒，{report['pairs_per_second'] or 0:.0f} 对/秒")
+    weights = report["weights"]
+    lines.append(f"权重: jaccard={weights['jaccard_weight']} sequence={weights['sequence_weight']} "
+                 f"containment={weights['containment_similarity']}（* 为 F1 最高的阈值）")
+    if report["mistakes"]:
+        lines.append("")
+        lines.append(f"阈值 {report['mistakes_threshold']} 下的误判（共 {report['mistake_count']} 个）:")
+        for mistake in report["mistakes"]:
+            expected = "同一个模型" if mistake["label"] else "不同的模型"
+            lines.append(f"    {mistake['similarity']:.4f}  {mistake['required']}  <->  {mistake['candidate']}  "
+                         f"（应为{expected}）")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="用带标注的语料评估名称匹配的精确率、召回率和速度")
+    parser.add_argument("corpus", help="语料文件（.csv、.jsonl 或 .json）")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="打分的进程数")
+    parser.add_argument("--thresholds", help="要评估的阈值（逗号分隔，默认 0.50 到 0.95）")
+    parser.add_argument("--jaccard-weight", type=float, default=JACCARD_WEIGHT, help="单词相似度的权重")
+    parser.add_argument("--sequence-weight", type=float, default=SEQUENCE_WEIGHT, help="字符相似度的权重")
+    parser.add_argument("--containment-similarity", type=float, default=CONTAINMENT_SIMILARITY,
+                        help="一个名称完全包含另一个时的最低相似度")
+    parser.add_argument("--format", choices=("text", "json"), default="text", help="输出格式")
+    parser.add_argument("-o", "--output", help="输出文件（默认输出到标准输出）")
+    args = parser.parse_args(argv)
+
+    try:
+        pairs = load_corpus(args.corpus)
+        thresholds = [float(value) for value in args.thresholds.split(",")] if args.thresholds else DEFAULT_THRESHOLDS
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    weights = {
+        "jaccard_weight": args.jaccard_weight,
+        "sequence_weight": args.sequence_weight,
+        "containment_similarity": args.containment_similarity,
+    }
+    report = evaluate(pairs, thresholds, weights, workers=args.workers, use_processes=True)
+    text = json.dumps(report, ensure_ascii=False, indent=2) + "\n" if args.format == "json" else format_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
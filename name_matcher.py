@@ -7,6 +7,16 @@ import os
 import re
 from difflib import SequenceMatcher
 
+# 综合相似度中单词相似度（Jaccard）和字符相似度（SequenceMatcher）的默认权重
+JACCARD_WEIGHT = 0.6
+SEQUENCE_WEIGHT = 0.4
+# 一个名称完全包含另一个时的最低相似度
+CONTAINMENT_SIMILARITY = 0.90
+# 相似度低于这个值时 Civitai 的结果标记为非精确匹配
+MATCH_THRESHOLD = 0.85
+# 名称匹配测试接口判断为同一个模型的阈值
+STRICT_MATCH_THRESHOLD = 0.9
+
 
 def normalize_name(name):
     """
@@ -48,7 +58,8 @@ def normalize_name(name):
     return name
 
 
-def calculate_name_similarity(name1, name2):
+def calculate_name_similarity(name1, name2, jaccard_weight=JACCARD_WEIGHT, sequence_weight=SEQUENCE_WEIGHT,
+                              containment_similarity=CONTAINMENT_SIMILARITY):
     """
     计算两个名称的相似度（0.0 到 1.0）
     支持多种命名格式的匹配
@@ -56,6 +67,9 @@ def calculate_name_similarity(name1, name2):
     Args:
         name1: 第一个名称
         name2: 第二个名称
+        jaccard_weight: 单词相似度的权重（调整规则时用 name_match_evaluator.py 评估效果）
+        sequence_weight: 字符相似度的权重
+        containment_similarity: 一个名称完全包含另一个时的最低相似度
     
     Returns:
         相似度值（0.0 到 1.0），1.0 表示完全匹配
@@ -99,7 +113,7 @@ def calculate_name_similarity(name1, name2):
     
     # 综合相似度：单词相似度权重 0.6，字符相似度权重 0.4
     # 这样可以避免因为共同词（如 "Concept"）导致误匹配
-    combined_similarity = jaccard_similarity * 0.6 + sequence_similarity * 0.4
+    combined_similarity = jaccard_similarity * jaccard_weight + sequence_similarity * sequence_weight
     
     # 如果单词交集占比很高（>= 80%），但总单词数差异很大，降低相似度
     # 例如："pov cheek grabbing concept" vs "open door concept sliding doors"
@@ -117,7 +131,7 @@ def calculate_name_similarity(name1, name2):
     # 例如："zuki cute ill v40" 包含在 "zuki cute ill v40 sdxl" 中
     if norm1 in norm2 or norm2 in norm1:
         # 完全包含时，相似度至少为 0.90
-        combined_similarity = max(combined_similarity, 0.90)
+        combined_similarity = max(combined_similarity, containment_similarity)
     
     # 检查核心单词是否完全匹配（即使有额外后缀）
     # 例如："zuki cute ill v40" vs "zuki cute ill v40 sdxl"
@@ -136,3 +150,56 @@ def calculate_name_similarity(name1, name2):
                 combined_similarity = max(combined_similarity, min(0.95, jaccard_similarity * 1.2))
     
     return combined_similarity
+
+
+# 文件名中常见的修饰词（精度、剪枝、EMA 等），搜索时去掉这些词更容易找到原始模型
+_DECORATION_PATTERNS = [
+    r'\b(?:fp|bf)\d+\b',            # fp16, fp32, bf16, fp8
+    r'\be\d+m\d+(?:fn)?\b',         # e4m3fn, e5m2
+    r'\b(?:pruned|emaonly|nonema|ema|only|full|fixed)\b',
+    r'\b\d{4,}\b',                  # 训练步数，例如 -000010
+]
+
+# 版本号（normalize_name 会把 v1.5 转换为 "v1 5"）
+_VERSION_PATTERN = r'\bv\d+(?: \d+)*\b'
+
+
+def generate_query_variants(name):
+    """
+    根据文件名生成多个搜索关键词变体（从最具体到最宽泛）
+
+    例如 "myModel_v1.5-pruned_fp16-000010.safetensors" 会生成：
+    - myModel_v1.5-pruned_fp16-000010（原始文件名，去掉扩展名）
+    - my model v1 5（去掉精度、剪枝、训练步数等修饰词）
+    - my model（再去掉版本号）
+
+    Args:
+        name: 模型文件名
+
+    Returns:
+        去重后的关键词列表，第一个总是原始文件名（不含扩展名）
+    """
+    if not name:
+        return []
+
+    variants = [os.path.splitext(name)[0]]
+
+    normalized = normalize_name(name)
+    for pattern in _DECORATION_PATTERNS:
+        normalized = re.sub(pattern, ' ', normalized)
+    normalized = re.sub(r'\s+', ' ', normalized).strip()
+    variants.append(normalized)
+
+    without_version = re.sub(_VERSION_PATTERN, ' ', normalized)
+    without_version = re.sub(r'\s+', ' ', without_version).strip()
+    variants.append(without_version)
+
+    # 去重并保留顺序（忽略大小写）
+    seen = set()
+    unique_variants = []
+    for variant in variants:
+        key = variant.lower()
+        if variant and key not in seen:
+            seen.add(key)
+            unique_variants.append(variant)
+    return unique_variants
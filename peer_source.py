@@ -0,0 +1,161 @@
+"""
+局域网节点下载来源
+农场中的其他 ComfyUI 节点已经有某个模型时，直接从这个节点通过局域网下载，不经过外网。
+节点和它们的模型清单来自多节点同步（federation.py），按文件名或 SHA-256 查找；
+下载地址是对方节点的文件接口（支持 Range），由下载队列分段、可续传地下载并校验哈希。
+清单是对方节点自己报告的，只有哈希与 Civitai / Hugging Face 的文件一致的链接才排在上游链接前面，
+只有文件名匹配的链接标记为未验证，排在上游链接后面。
+"""
+
+import time
+from urllib.parse import quote
+
+try:
+    from .integrity import APPROX_SIZE_TOLERANCE, expected_from_links
+    from .federation import STALE_INTERVALS
+    from .model_paths import NON_MODEL_FOLDERS, base_key
+except ImportError:
+    from integrity import APPROX_SIZE_TOLERANCE, expected_from_links
+    from federation import STALE_INTERVALS
+    from model_paths import NON_MODEL_FOLDERS, base_key
+
+# 搜索结果中的来源名称
+SOURCE_NAME = "LAN Peer"
+# 提供模型文件的 API 路径（后面是 "目录名/文件名"）
+FILE_PATH_PREFIX = "/comfyui-find-models/api/v1/peer/files/"
+
+# 匹配方式（数字越小排名越靠前）
+_MATCH_NAME_AND_HASH = 0
+_MATCH_HASH = 1
+_MATCH_NAME = 2
+_MATCH_LABELS = {_MATCH_NAME_AND_HASH: "name+sha256", _MATCH_HASH: "sha256", _MATCH_NAME: "name"}
+# 哈希与上游文件一致的匹配方式（可以排在上游链接前面）
+_VERIFIED_MATCHES = (_MATCH_NAME_AND_HASH, _MATCH_HASH)
+
+
+def peer_file_url(node_url, key):
+    """节点上某个清单条目（"目录名/文件名"）的下载地址"""
+    return node_url.rstrip("/") + FILE_PATH_PREFIX + quote(key, safe="/")
+
+
+def split_file_key(folder_name, name):
+    """
+    检查请求的目录名和文件名（只能是模型目录中的文件，不能跳出目录）
+
+    Returns:
+        (目录名, 文件名)；不允许时返回 None
+    """
+    name = (name or "").replace("\\", "/")
+    parts = name.split("/")
+    if not folder_name or folder_name in NON_MODEL_FOLDERS or not name or name.startswith("/") \
+            or any(part in ("", ".", "..") for part in parts):
+        return None
+    return folder_name, name
+
+
+class PeerSource:
+    """
+    在其他节点的清单中查找模型文件
+
+    Args:
+        federation: 多节点同步（Federation），提供其他节点的清单、地址和令牌
+    """
+
+    def __init__(self, federation):
+        self.federation = federation
+        # node_id -> ((epoch, version), {小写文件名: [键]}, {哈希: [键]})
+        self._indexes = {}
+
+    def _node_index(self, node):
+        cached = self._indexes.get(node["node_id"])
+        if cached is not None and cached[0] == (node["epoch"], node["version"]):
+            return cached[1], cached[2]
+        by_name = {}
+        by_hash = {}
+        for key, value in node["entries"].items():
+            by_name.setdefault(base_key(key.partition("/")[2]), []).append(key)
+            if len(value) > 1 and value[1]:
+                by_hash.setdefault(value[1].lower(), []).append(key)
+        self._indexes[node["node_id"]] = ((node["epoch"], node["version"]), by_name, by_hash)
+        return by_name, by_hash
+
+    def available_nodes(self):
+        """可以下载的节点（有地址且没有过期）"""
+        federation = self.federation
+        if not federation.enabled:
+            return []
+        stale_after = federation.sync_interval * STALE_INTERVALS
+        now = time.time()
+        return [node for node in federation.remote.nodes()
+                if node["url"] and now - node["last_seen"] <= stale_after]
+
+    def find(self, model_name, upstream_links=None):
+        """
+        在其他节点上查找模型（按文件名，以及上游搜索结果中的 SHA-256）
+
+        Args:
+            model_name: 模型文件名
+            upstream_links: Civitai / Hugging Face 的搜索结果（用于按哈希查找，并给没有哈希的文件补上用于校验的哈希；
+                只使用文件名与 model_name 一致的文件，相似度匹配到的可能是另一个文件）
+
+        Returns:
+            搜索结果格式的链接列表（每个节点最多一个，文件名和哈希都匹配的在前；
+            verified 表示哈希与上游文件一致）
+        """
+        expected = expected_from_links(upstream_links, model_name)
+        expected_sha256 = expected["sha256"] if expected else None
+        name_key = base_key(model_name)
+        ranked = []
+        for node in self.available_nodes():
+            by_name, by_hash = self._node_index(node)
+            candidates = []
+            for key in by_name.get(name_key, []):
+                size, sha256 = (node["entries"][key] + [None])[:2]
+                match = _MATCH_NAME_AND_HASH if expected_sha256 and (sha256 or "").lower() == expected_sha256 \
+                    else _MATCH_NAME
+                candidates.append((match, key, size, sha256))
+            for key in by_hash.get(expected_sha256, []) if expected_sha256 else []:
+                size, sha256 = node["entries"][key][:2]
+                candidates.append((_MATCH_NAME_AND_HASH if base_key(key) == name_key else _MATCH_HASH,
+                                   key, size, sha256))
+            if not candidates:
+                continue
+            match, key, size, sha256 = min(candidates)
+            if not sha256 and expected and expected["sha256"] and expected["size"]:
+                # 对方没有缓存哈希时，大小与上游文件一致就用上游的哈希校验下载的文件
+                tolerance = 0 if expected["size_exact"] else APPROX_SIZE_TOLERANCE
+                if abs(size - expected["size"]) <= tolerance:
+                    sha256 = expected_sha256
+            ranked.append((match, -node["last_seen"], {
+                "source": SOURCE_NAME,
+                "name": node["name"],
+                "url": node["url"],
+                "download_url": peer_file_url(node["url"], key),
+                "file_size": size,
+                "sha256": sha256,
+                "peer_node": node["node_id"],
+                "match": _MATCH_LABELS[match],
+                "verified": match in _VERIFIED_MATCHES,
+            }))
+        # 匹配方式相同时最近同步过的节点在前
+        ranked.sort(key=lambda item: item[:2])
+        return [link for _, _, link in ranked]
+
+    def rank(self, model_name, results):
+        """
+        把局域网节点的链接加入搜索结果（去掉结果中已有的旧的节点链接）
+
+        哈希与上游文件一致的链接放在最前面，未验证的链接（只有文件名匹配）放在最后面。
+        """
+        upstream = [link for link in results or [] if link.get("source") != SOURCE_NAME]
+        peers = self.find(model_name, upstream)
+        return [link for link in peers if link["verified"]] + upstream \
+            + [link for link in peers if not link["verified"]]
+
+    def is_peer_url(self, url):
+        """下载地址是否属于已知的节点（需要带上令牌）"""
+        if not url or FILE_PATH_PREFIX not in url:
+            return False
+        prefixes = [node["url"] for node in self.federation.remote.nodes() if node["url"]]
+        prefixes += self.federation.peers
+        return any(url.startswith(prefix.rstrip("/") + FILE_PATH_PREFIX) for prefix in prefixes)
@@ -0,0 +1,186 @@
+"""
+预取模块
+在后台预先搜索工作流中缺失模型的下载链接：监听提交到 ComfyUI 队列的 prompt 和前端加载的工作流，
+在服务器端提取模型文件名，把未安装的模型逐个搜索并写入搜索结果缓存。
+用户主动搜索时后台搜索暂停，打开对话框时可以直接使用缓存的结果。
+"""
+
+import asyncio
+import itertools
+from contextlib import contextmanager
+
+try:
+    from .download_queue import compute_priority
+    from .executors import ExecutorBusy, run_io
+    from .model_paths import get_installed_file_names
+    from .search_cache import cache_key
+    from .workflow_models import extract_models
+except ImportError:
+    from download_queue import compute_priority
+    from executors import ExecutorBusy, run_io
+    from model_paths import get_installed_file_names
+    from search_cache import cache_key
+    from workflow_models import extract_models
+
+# 最多等待预取的模型数（超出时丢弃新的模型）
+MAX_PENDING = 500
+# 两次后台搜索之间的默认间隔（秒）
+DEFAULT_DELAY = 2.0
+
+
+class Prefetcher:
+    """
+    后台预取器（单个工作协程，按下载优先级依次搜索）
+
+    Args:
+        resolve: 搜索模型链接的协程函数 resolve(model_name) -> 结果列表（负责写入搜索结果缓存）
+        cache: 搜索结果缓存（SearchCache，只用于跳过已有结果的模型）
+        on_result: 每个模型搜索完成后的回调 on_result(model_name, results)
+        enabled: 是否启用
+        delay: 两次后台搜索之间的间隔（秒）
+    """
+
+    def __init__(self, resolve, cache, on_result=None, enabled=False, delay=DEFAULT_DELAY):
+        self.resolve = resolve
+        self.cache = cache
+        self.on_result = on_result
+        self.enabled = bool(enabled)
+        self.delay = max(0.0, float(delay))
+        self._queue = None
+        self._pending = set()
+        self._seq = itertools.count()
+        self._worker = None
+        self._loop = None
+        # 正在进行的用户搜索数，为 0 时 _idle 被设置
+        self._user_searches = 0
+        self._idle = None
+        self.current = None
+        self.resolved = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def start(self):
+        """启动后台工作协程（需要在事件循环中调用）"""
+        if self._worker is not None and not self._worker.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+            self._idle = asyncio.Event()
+            if self._user_searches == 0:
+                self._idle.set()
+        self._worker = self._loop.create_task(self._work())
+
+    def configure(self, enabled=None, delay=None):
+        """修改设置（关闭时清空等待中的模型）"""
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if delay is not None:
+            self.delay = max(0.0, float(delay))
+        if not self.enabled:
+            self._clear()
+
+    def status(self):
+        """获取预取状态"""
+        return {
+            "enabled": self.enabled,
+            "delay": self.delay,
+            "pending": len(self._pending),
+            "current": self.current,
+            "resolved": self.resolved,
+            "failed": self.failed,
+            "skipped": self.skipped,
+        }
+
+    def submit(self, models):
+        """
+        添加要预取的模型
+
+        Args:
+            models: [{"name", "type", "is_used"}, ...]（workflow_models.extract_models 的结果）
+
+        Returns:
+            新加入等待队列的模型数
+        """
+        if not self.enabled or self._queue is None:
+            return 0
+        added = 0
+        for model in models:
+            name = model.get("name")
+            key = cache_key(name)
+            if not key or key in self._pending or name in self.cache:
+                continue
+            if len(self._pending) >= MAX_PENDING:
+                break
+            priority = compute_priority(model.get("type"), model.get("is_used", True))
+            self._pending.add(key)
+            self._queue.put_nowait((priority, next(self._seq), name, model.get("type") or "其他"))
+            added += 1
+        return added
+
+    def submit_data(self, data):
+        """从 workflow 或 prompt 中提取模型并添加到预取队列"""
+        if not self.enabled:
+            return 0
+        return self.submit(extract_models(data))
+
+    @contextmanager
+    def user_search(self):
+        """用户主动搜索期间暂停后台搜索"""
+        self._user_searches += 1
+        if self._idle is not None:
+            self._idle.clear()
+        try:
+            yield
+        finally:
+            self._user_searches -= 1
+            if self._user_searches == 0 and self._idle is not None:
+                self._idle.set()
+
+    def _clear(self):
+        if self._queue is None:
+            return
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._pending.clear()
+
+    async def _work(self):
+        while True:
+            _, _, model_name, model_type = await self._queue.get()
+            key = cache_key(model_name)
+            try:
+                if not self.enabled or key not in self._pending:
+                    continue
+                await self._idle.wait()
+                if model_name in self.cache:
+                    continue
+                # 读取模型目录列表可能需要遍历磁盘，放到线程池中执行
+                try:
+                    installed = await run_io(get_installed_file_names, model_type)
+                except ExecutorBusy:
+                    # 线程池繁忙时跳过，下次提交包含这个模型的工作流时重新预取
+                    self.failed += 1
+                    await asyncio.sleep(self.delay)
+                    continue
+                if model_name in installed:
+                    self.skipped += 1
+                    continue
+                self.current = model_name
+                try:
+                    results = await self.resolve(model_name)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # logger.warning(f"[{model_name}] 预取失败: {e}")
+                    self.failed += 1
+                    results = None
+                # resolve 完成完整搜索时已经写入搜索结果缓存
+                if results is not None:
+                    self.resolved += 1
+                    if self.on_result is not None:
+                        self.on_result(model_name, results)
+                # 限制后台搜索频率，不占满搜索 API 的配额
+                await asyncio.sleep(self.delay)
+            finally:
+                self.current = None
+                self._pending.discard(key)
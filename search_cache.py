@@ -0,0 +1,134 @@
+"""
+搜索结果缓存模块
+服务器端的模型链接搜索结果缓存（按模型文件名，保存到数据目录中的 JSON 文件），
+后台预取的结果和用户主动搜索的结果都写入这里
+"""
+
+import os
+import json
+import time
+import threading
+
+# 缓存格式版本（版本 2 的 Civitai / Hugging Face 结果带有上游文件名 file_name）
+CACHE_VERSION = 2
+# 缓存有效期（与前端 web/utils/cache.js 的 CACHE_DURATION 一致，7 天）
+DEFAULT_TTL = 7 * 24 * 60 * 60
+# 最多缓存的模型数（超出时删除最早写入的记录）
+DEFAULT_MAX_ENTRIES = 5000
+# 写入后延迟保存的时间（秒）
+SAVE_DELAY = 5.0
+# 不写入缓存的字段：下载链接的检查结果有自己的有效期（6 小时，出错时 10 分钟），
+# 返回缓存的结果时由 LinkValidator.apply_cached 按当前的检查结果重新添加
+VOLATILE_FIELDS = ("link_status",)
+
+
+def cache_key(model_name):
+    """缓存键（不区分大小写）"""
+    return (model_name or "").strip().lower()
+
+
+class SearchCache:
+    """模型链接搜索结果缓存"""
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._save_handle = None
+        self._load()
+
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self._entries = data.get("entries") or {}
+        except (OSError, ValueError, AttributeError):
+            self._entries = {}
+
+    def save(self):
+        """把有变化的缓存写入文件（过期的记录不再保存）"""
+        if not self.path or not self._dirty:
+            return
+        now = time.time()
+        with self._lock:
+            entries = {key: entry for key, entry in self._entries.items() if now - entry["time"] < self.ttl}
+            self._entries = entries
+            data = {"version": CACHE_VERSION, "entries": dict(entries)}
+            self._dirty = False
+        try:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def schedule_save(self, loop, delay=SAVE_DELAY):
+        """延迟保存（多次写入合并为一次，在线程池中写文件，不阻塞事件循环）"""
+        if self._save_handle is not None:
+            return
+
+        def run():
+            self._save_handle = None
+            loop.run_in_executor(None, self.save)
+
+        self._save_handle = loop.call_later(delay, run)
+
+    def get(self, model_name):
+        """
+        获取缓存的搜索结果
+
+        Returns:
+            搜索结果列表；没有缓存或已过期时返回 None
+        """
+        entry = self._entries.get(cache_key(model_name))
+        if entry is None or time.time() - entry["time"] >= self.ttl:
+            return None
+        return entry["results"]
+
+    def get_many(self, model_names):
+        """
+        批量获取缓存的搜索结果
+
+        Returns:
+            {模型名: 搜索结果列表}（只包含有缓存的模型）
+        """
+        found = {}
+        for model_name in model_names:
+            results = self.get(model_name)
+            if results is not None:
+                found[model_name] = results
+        return found
+
+    def __contains__(self, model_name):
+        return self.get(model_name) is not None
+
+    def set(self, model_name, results):
+        """写入搜索结果（保存副本，不包含 VOLATILE_FIELDS）"""
+        key = cache_key(model_name)
+        if not key:
+            return
+        results = [
+            {field: value for field, value in link.items() if field not in VOLATILE_FIELDS}
+            if isinstance(link, dict) else link
+            for link in results or []
+        ]
+        with self._lock:
+            # 重新插入到末尾，字典顺序就是写入顺序
+            self._entries.pop(key, None)
+            self._entries[key] = {"time": time.time(), "results": results}
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._dirty = True
+
+    def delete(self, model_name):
+        """删除某个模型的缓存"""
+        with self._lock:
+            if self._entries.pop(cache_key(model_name), None) is not None:
+                self._dirty = True
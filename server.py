@@ -10,11 +10,33 @@ import folder_paths
 import logging
 import aiohttp
 import asyncio
+import time
 from urllib.parse import quote
 from server import PromptServer
 from aiohttp import web
-from .name_matcher import normalize_name, calculate_name_similarity
+from .name_matcher import normalize_name, calculate_name_similarity, STRICT_MATCH_THRESHOLD
 from .google_search import search_google_model
+from .civitai_search import search_civitai_model, search_civitai_model_deep
+from .download_queue import DownloadQueue
+from .model_paths import resolve_target_path, find_installed_path, get_model_folder_names, NON_MODEL_FOLDERS
+from .model_metadata import MetadataCache
+from .search_cache import SearchCache, cache_key
+from .prefetcher import Prefetcher
+from .installed_index import InstalledModelIndex
+from .link_validator import LinkValidator
+from .sidecar_cache import SidecarCache
+from .cancellation import CLIENT_CLOSED_STATUS, ClientDisconnected, SingleFlight, cancel_on_disconnect
+from .federation import Federation, check_settings, collect_local_inventory, load_node_id, TOKEN_HEADER
+from .workflow_models import extract_models
+from .peer_source import PeerSource, split_file_key
+from .integrity import HashCache, IntegrityVerifier, expected_from_links, verify_file
+from .settings import get_data_dir, load_settings, update_settings
+from .executors import ExecutorBusy, cpu_executor, run_cpu, run_io, run_hash, executors_status
+from .loop_watchdog import LoopWatchdog
+from .metrics import metrics
+from . import duplicate_finder
+from . import workflow_auditor
+from . import name_match_evaluator
 
 # 配置日志
 # logger = logging.getLogger("ComfyUI-find-models")
@@ -43,91 +65,7 @@ else:
     # logger.info("未检测到代理设置，将直接连接")
     pass
 
-# 搜索 Civitai 模型
-async def search_civitai_model(model_name):
-    """在 Civitai 上搜索模型"""
-    try:
-        # 移除文件扩展名进行搜索
-        search_query = os.path.splitext(model_name)[0]
-        url = "https://civitai.com/api/v1/models"
-        params = {"query": search_query, "limit": 5}
-        
-        # 使用环境变量中的代理设置（HTTP_PROXY 和 HTTPS_PROXY）
-        async with aiohttp.ClientSession(trust_env=True) as session:
-            async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    items = data.get("items", [])
-                    
-                    # 尝试精确匹配文件名
-                    for item in items:
-                        model_versions = item.get("modelVersions", [])
-                        for version in model_versions:
-                            files = version.get("files", [])
-                            for file_info in files:
-                                if file_info.get("name") == model_name:
-                                    return {
-                                        "source": "Civitai",
-                                        "name": item.get("name"),
-                                        "url": f"https://civitai.com/models/{item.get('id')}",
-                                        "download_url": file_info.get("downloadUrl"),
-                                        "version": version.get("name"),
-                                        "file_size": file_info.get("sizeKB", 0) * 1024 if file_info.get("sizeKB") else None
-                                    }
-                    
-                    # 如果没有精确匹配，尝试使用名称相似度匹配
-                    # 支持多种命名格式：snake_case, camelCase, kebab-case, PascalCase 等
-                    if items:
-                        best_match = None
-                        best_score = 0.0
-                        
-                        for item in items:
-                            model_versions = item.get("modelVersions", [])
-                            model_item_name = item.get("name", "")
-                            
-                            for version in model_versions:
-                                files = version.get("files", [])
-                                for file_info in files:
-                                    file_name = file_info.get("name", "")
-                                    
-                                    # 同时比较文件名和模型名称，取较高的相似度
-                                    file_similarity = calculate_name_similarity(model_name, file_name)
-                                    model_similarity = calculate_name_similarity(model_name, model_item_name)
-                                    
-                                    # 使用文件名和模型名称相似度的平均值，但文件名权重更高
-                                    similarity = file_similarity * 0.7 + model_similarity * 0.3
-                                    
-                                    if similarity > best_score:
-                                        best_score = similarity
-                                        best_match = {
-                                            "source": "Civitai",
-                                            "name": model_item_name,
-                                            "url": f"https://civitai.com/models/{item.get('id')}",
-                                            "download_url": file_info.get("downloadUrl"),
-                                            "version": version.get("name"),
-                                            "file_size": file_info.get("sizeKB", 0) * 1024 if file_info.get("sizeKB") else None,
-                                            "similarity": similarity
-                                        }
-                        
-                        # 返回最佳匹配结果，无论相似度如何（用于缓存）
-                        # 但标记是否为非精准匹配（相似度 < 0.85）
-                        if best_match:
-                            if best_score < 0.85:
-                                # 非精准匹配，添加标记
-                                best_match["is_non_exact_match"] = True
-                                best_match["similarity"] = best_score
-                            else:
-                                # 精准匹配
-                                best_match["is_non_exact_match"] = False
-                                best_match["similarity"] = best_score
-                            return best_match
-                        else:
-                            # 没有找到任何匹配
-                            return None
-    except Exception as e:
-        # logger.warning(f"Civitai 搜索错误: {e}")
-        pass
-    return None
+# search_civitai_model 函数已移至 civitai_search.py 模块
 
 # 搜索 Hugging Face 模型
 async def search_huggingface_model(model_name):
@@ -160,9 +98,11 @@ async def search_huggingface_model(model_name):
                                                 "name": model_id,
                                                 "url": f"https://huggingface.co/{model_id}",
                                                 "download_url": f"https://huggingface.co/{model_id}/resolve/main/{quote(model_name)}?download=true",
-                                                "file_size": file_info.get("size")
+                                                "file_name": model_name,
+                                                "file_size": file_info.get("size"),
+                                                "sha256": (file_info.get("lfs") or {}).get("oid")
                                             }
-                        except:
+                        except Exception:
                             continue
                     
                     # 如果没有精确匹配，尝试获取第一个模型的文件信息
@@ -182,11 +122,13 @@ async def search_huggingface_model(model_name):
                                                 "name": model_id,
                                                 "url": f"https://huggingface.co/{model_id}",
                                                 "download_url": f"https://huggingface.co/{model_id}/resolve/main/{quote(model_name)}?download=true",
-                                                "file_size": file_info.get("size")
+                                                "file_name": model_name,
+                                                "file_size": file_info.get("size"),
+                                                "sha256": (file_info.get("lfs") or {}).get("oid")
                                             }
                             # 如果找不到文件，返回 None（不返回没有 file_size 的结果）
                             return None
-                        except:
+                        except Exception:
                             # 如果无法验证文件，返回 None（不返回没有 file_size 的结果）
                             return None
     except Exception as e:
@@ -252,12 +194,21 @@ if routes is not None:
         """返回名称匹配测试页面"""
         try:
             test_page_path = os.path.join(os.path.dirname(__file__), "web", "test_name_match.html")
-            if os.path.exists(test_page_path):
+            
+            def read_page():
+                if not os.path.exists(test_page_path):
+                    return None
                 with open(test_page_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
+                    return f.read()
+            
+            # 在 I/O 线程池中读取文件，不阻塞事件循环
+            content = await run_io(read_page)
+            if content is not None:
                 return web.Response(text=content, content_type='text/html')
             else:
                 return web.Response(text="测试页面未找到", status=404)
+        except ExecutorBusy as e:
+            return web.Response(text=str(e), status=503)
         except Exception as e:
             # logger.error(f"加载测试页面失败: {e}")
             return web.Response(text=f"加载测试页面失败: {e}", status=500)
@@ -277,9 +228,10 @@ if routes is not None:
                     "error": "请提供 name1 和 name2 参数"
                 }, status=400)
             
-            norm1 = normalize_name(name1)
-            norm2 = normalize_name(name2)
-            similarity = calculate_name_similarity(name1, name2)
+            def score():
+                return normalize_name(name1), normalize_name(name2), calculate_name_similarity(name1, name2)
+            
+            norm1, norm2, similarity = await run_cpu(score)
             
             return web.json_response({
                 "name1": name1,
@@ -287,8 +239,10 @@ if routes is not None:
                 "normalized1": norm1,
                 "normalized2": norm2,
                 "similarity": similarity,
-                "is_match": similarity >= 0.9
+                "is_match": similarity >= STRICT_MATCH_THRESHOLD
             })
+        except ExecutorBusy as e:
+            return web.json_response({"error": str(e)}, status=503)
         except Exception as e:
             # logger.error(f"名称匹配测试失败: {e}")
             import traceback
@@ -297,123 +251,168 @@ if routes is not None:
     
     # logger.info("✓ API 路由 GET /comfyui-find-models/api/v1/test/name-match 注册成功")
     
-    # 注册模型搜索 API（搜索 Civitai 和 Hugging Face）
-    @routes.post("/comfyui-find-models/api/v1/models/search")
-    async def search_model_links(request):
-        """搜索模型链接（Civitai 和 Hugging Face）"""
+    # 注册名称匹配评估 API（用带标注的语料评估阈值和权重，按块在 CPU 线程池中打分）
+    @routes.post("/comfyui-find-models/api/v1/test/name-match/evaluate")
+    async def evaluate_name_match(request):
+        """
+        评估名称匹配的精确率、召回率和速度
+        
+        请求体: {pairs: [{required, candidate, label}, ...] 或 [[required, candidate, label], ...],
+                thresholds, weights: {jaccard_weight, sequence_weight, containment_similarity}, workers}
+        返回: 每个阈值的精确率和召回率、F1 最高的阈值、每秒处理的名称对数和误判样例
+        """
         try:
             data = await request.json()
-            model_name = data.get("model_name", "")
-            model_type = data.get("model_type", "其他")
-            search_civitai = data.get("search_civitai", True)
-            search_hf = data.get("search_hf", True)
-            search_google = data.get("search_google", False)  # 默认不搜索 Google，因为需要手动操作
-            
-            if not model_name:
-                return web.json_response({"error": "未提供模型名称"}, status=400)
-            
-            results = []
-            civitai_result = None
-            should_search_hf = search_hf
-            should_search_google = False
-            civitai_size_mb = 0
+            pairs = name_match_evaluator.parse_pairs(data.get("pairs") or [])
+            if not pairs:
+                return web.json_response({"error": "请提供 pairs 参数"}, status=400)
+            if len(pairs) > name_match_evaluator.MAX_PAIRS:
+                return web.json_response({"error": f"名称对不能超过 {name_match_evaluator.MAX_PAIRS} 个"}, status=400)
+            thresholds = [float(threshold) for threshold in data.get("thresholds") or name_match_evaluator.DEFAULT_THRESHOLDS]
+            weights = data.get("weights") or {}
+            unknown = set(weights) - set(name_match_evaluator.default_weights())
+            if unknown:
+                return web.json_response({"error": f"不支持的权重: {', '.join(sorted(unknown))}"}, status=400)
+            weights = {key: float(value) for key, value in weights.items()}
+            # 同时打分的块数不超过 CPU 核心数和 CPU 线程池的线程数（不在 ComfyUI 进程中创建子进程）
+            workers = int(data.get("workers") or name_match_evaluator.DEFAULT_WORKERS)
+            workers = max(1, min(workers, os.cpu_count() or 1, cpu_executor.max_workers))
             
-            # 搜索 Civitai
-            if search_civitai:
-                try:
+            report = await name_match_evaluator.evaluate_async(pairs, run_cpu, thresholds, weights, workers=workers)
+            return web.json_response(report)
+        except ExecutorBusy as e:
+            return web.json_response({"error": str(e)}, status=503)
+        except (ValueError, TypeError, AttributeError) as e:
+            return web.json_response({"error": str(e)}, status=400)
+        except Exception as e:
+            # logger.error(f"评估名称匹配失败: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+    
+    # logger.info("✓ API 路由 POST /comfyui-find-models/api/v1/test/name-match/evaluate 注册成功")
+    
+    # 服务器端搜索结果缓存（后台预取和用户搜索的结果，保存在插件数据目录中）
+    search_cache = SearchCache(os.path.join(get_data_dir(), "search_cache.json"))
+    
+    # 下载链接检查（HEAD / Range 请求，结果按 URL 缓存）
+    link_validator = LinkValidator()
+    
+    # 模型信息和预览图（搜索完成后在后台获取，保存在数据目录中）
+    sidecar_settings = load_settings().get("sidecar", {})
+    sidecar_cache = SidecarCache(os.path.join(get_data_dir(), "sidecars"),
+                                 max_bytes=int(sidecar_settings.get("max_size_mb", 64.0) * 1024 * 1024),
+                                 run_blocking=run_io)
+    
+    async def resolve_model_links(model_name, search_civitai=True, search_hf=True, deep_search=False):
+        """
+        搜索模型的下载链接（Civitai、Hugging Face 和 Google）
+
+        用户搜索和后台预取都使用这个函数，结果会写入服务器端的搜索缓存。
+
+        Raises:
+            ExecutorBusy: 打分线程池繁忙（不写入缓存）
+        """
+        results = []
+        civitai_result = None
+        should_search_hf = search_hf
+        should_search_google = False
+        civitai_size_mb = 0
+        
+        # 搜索 Civitai
+        if search_civitai:
+            try:
+                if deep_search:
+                    civitai_result = await search_civitai_model_deep(model_name)
+                else:
                     civitai_result = await search_civitai_model(model_name)
-                    if civitai_result:
-                        # 检查是否为非精确匹配（基于 similarity 字段）
-                        is_non_exact_match = civitai_result.get("is_non_exact_match", False)
+                if civitai_result:
+                    # 检查是否为非精确匹配（基于 similarity 字段）
+                    is_non_exact_match = civitai_result.get("is_non_exact_match", False)
+                    
+                    # 检查文件大小：如果没有文件大小或小于 10MB，说明文件可能不存在或不可靠，需要搜索 Google
+                    file_size = civitai_result.get("file_size")
+                    if file_size is not None:
+                        civitai_size_mb = file_size / (1024 * 1024)  # 转换为 MB
                         
-                        # 检查文件大小：如果没有文件大小或小于 10MB，说明文件可能不存在或不可靠，需要搜索 Google
-                        file_size = civitai_result.get("file_size")
-                        if file_size is not None:
-                            civitai_size_mb = file_size / (1024 * 1024)  # 转换为 MB
-                            
-                            if civitai_size_mb < 10:
-                                # 文件小于 10MB，不添加到结果，搜索 Google
-                                should_search_hf = False  # 不搜索 HF，因为文件太小不可靠
-                                should_search_google = True
-                                civitai_result = None  # 清空结果，不添加到最终结果
-                            else:
-                                # 文件足够大，无论是否精准匹配都添加到结果（用于缓存）
-                                # 但标记是否为非精准匹配，前端会过滤显示
-                                results.append(civitai_result)
-                                if is_non_exact_match:
-                                    # 非精确匹配，触发 Google 搜索
-                                    should_search_hf = False
-                                    should_search_google = True
-                                else:
-                                    # 精确匹配且文件足够大，直接使用
-                                    should_search_hf = False
-                                    should_search_google = False
-                        else:
-                            # 如果没有文件大小，说明文件可能不存在，不添加到结果，直接搜索 Google
-                            should_search_hf = False  # 不搜索 HF，因为没有文件大小说明结果不可靠
+                        if civitai_size_mb < 10:
+                            # 文件小于 10MB，不添加到结果，搜索 Google
+                            should_search_hf = False  # 不搜索 HF，因为文件太小不可靠
                             should_search_google = True
                             civitai_result = None  # 清空结果，不添加到最终结果
+                        else:
+                            # 文件足够大，无论是否精准匹配都添加到结果（用于缓存）
+                            # 但标记是否为非精准匹配，前端会过滤显示
+                            results.append(civitai_result)
+                            if is_non_exact_match:
+                                # 非精确匹配，触发 Google 搜索
+                                should_search_hf = False
+                                should_search_google = True
+                            else:
+                                # 精确匹配且文件足够大，直接使用
+                                should_search_hf = False
+                                should_search_google = False
                     else:
-                        should_search_hf = search_hf
+                        # 如果没有文件大小，说明文件可能不存在，不添加到结果，直接搜索 Google
+                        should_search_hf = False  # 不搜索 HF，因为没有文件大小说明结果不可靠
                         should_search_google = True
-                except Exception as e:
-                    # logger.warning(f"[{model_name}] Civitai 搜索失败: {e}")
-                    # Civitai 搜索失败时，如果原本要搜索 HF，则继续搜索
+                        civitai_result = None  # 清空结果，不添加到最终结果
+                else:
                     should_search_hf = search_hf
                     should_search_google = True
-            
-            # 搜索 Hugging Face（如果 Civitai 没找到）
-            if should_search_hf:
-                try:
-                    hf_result = await search_huggingface_model(model_name)
-                    if hf_result:
-                        hf_size = hf_result.get("file_size") or 0
-                        hf_size_mb = hf_size / (1024 * 1024) if hf_size > 0 else 0
-                        
-                        # 如果没有文件大小或小于 10MB，说明文件可能不存在或不可靠，不添加到结果，直接搜索 Google
-                        if hf_size == 0:
-                            should_search_google = True
-                            hf_result = None  # 清空结果，不添加到最终结果
-                        elif hf_size_mb < 10:
-                            should_search_google = True
-                            hf_result = None  # 清空结果，不添加到最终结果
-                        else:
-                            # 文件足够大，直接使用 Hugging Face 结果
-                            results.append(hf_result)
+            except ExecutorBusy:
+                # 线程池繁忙时整个搜索失败（不缓存缺少 Civitai 的结果），调用方返回 503
+                raise
+            except Exception as e:
+                # logger.warning(f"[{model_name}] Civitai 搜索失败: {e}")
+                # Civitai 搜索失败时，如果原本要搜索 HF，则继续搜索
+                should_search_hf = search_hf
+                should_search_google = True
+        
+        # 搜索 Hugging Face（如果 Civitai 没找到）
+        if should_search_hf:
+            try:
+                hf_result = await search_huggingface_model(model_name)
+                if hf_result and not hf_result.get("file_size") and hf_result.get("download_url"):
+                    # 文件列表中没有大小（如 LFS 文件）时用 HEAD 请求获取，避免因为小于 10MB 的规则丢弃有效的文件
+                    probe = await link_validator.probe(hf_result["download_url"])
+                    if probe["ok"] and probe["content_length"]:
+                        hf_result["file_size"] = probe["content_length"]
+                if hf_result:
+                    hf_size = hf_result.get("file_size") or 0
+                    hf_size_mb = hf_size / (1024 * 1024) if hf_size > 0 else 0
+                    
+                    # 如果没有文件大小或小于 10MB，说明文件可能不存在或不可靠，不添加到结果，直接搜索 Google
+                    if hf_size == 0:
+                        should_search_google = True
+                        hf_result = None  # 清空结果，不添加到最终结果
+                    elif hf_size_mb < 10:
+                        should_search_google = True
+                        hf_result = None  # 清空结果，不添加到最终结果
                     else:
-                        # 如果 Civitai 也没找到，触发 Google 搜索
-                        if not civitai_result:
-                            should_search_google = True
-                except Exception as e:
-                    # logger.warning(f"[{model_name}] Hugging Face 搜索失败: {e}")
+                        # 文件足够大，直接使用 Hugging Face 结果
+                        results.append(hf_result)
+                else:
                     # 如果 Civitai 也没找到，触发 Google 搜索
                     if not civitai_result:
                         should_search_google = True
-            
-            # 总是搜索 Google（无论其他搜索是否找到结果）
-            try:
-                google_results = await search_google_model(model_name)
-                # search_google_model 现在总是返回至少一个结果，所以这里应该总是有结果
-                if google_results and len(google_results) > 0:
-                    # Google 搜索返回的是结果列表（最多 5 个）
-                    for google_result in google_results[:5]:  # 只取前 5 个
-                        # 移除 note 中的提示信息（会在表格顶部显示）
-                        if google_result.get("note") and "点击打开 Google 搜索页面" in google_result.get("note", ""):
-                            google_result["note"] = None
-                        results.append(google_result)
-                else:
-                    # 如果 Google 搜索没有返回结果（不应该发生，但作为保险），创建一个搜索链接
-                    google_search_url = f"https://www.google.com/search?q={quote(model_name + ' (site:civitai.com/models OR site:huggingface.co OR site:github.com)')}&num=5"
-                    results.append({
-                        "source": "Google",
-                        "name": model_name,
-                        "url": google_search_url,
-                        "download_url": None,
-                        "note": None  # 不在结果中显示提示，会在表格顶部显示
-                    })
             except Exception as e:
-                # logger.warning(f"[{model_name}] Google 搜索失败: {e}")
-                # 即使搜索失败，也提供一个 Google 搜索链接
+                # logger.warning(f"[{model_name}] Hugging Face 搜索失败: {e}")
+                # 如果 Civitai 也没找到，触发 Google 搜索
+                if not civitai_result:
+                    should_search_google = True
+        
+        # 总是搜索 Google（无论其他搜索是否找到结果）
+        try:
+            google_results = await search_google_model(model_name)
+            # search_google_model 现在总是返回至少一个结果，所以这里应该总是有结果
+            if google_results and len(google_results) > 0:
+                # Google 搜索返回的是结果列表（最多 5 个）
+                for google_result in google_results[:5]:  # 只取前 5 个
+                    # 移除 note 中的提示信息（会在表格顶部显示）
+                    if google_result.get("note") and "点击打开 Google 搜索页面" in google_result.get("note", ""):
+                        google_result["note"] = None
+                    results.append(google_result)
+            else:
+                # 如果 Google 搜索没有返回结果（不应该发生，但作为保险），创建一个搜索链接
                 google_search_url = f"https://www.google.com/search?q={quote(model_name + ' (site:civitai.com/models OR site:huggingface.co OR site:github.com)')}&num=5"
                 results.append({
                     "source": "Google",
@@ -422,9 +421,113 @@ if routes is not None:
                     "download_url": None,
                     "note": None  # 不在结果中显示提示，会在表格顶部显示
                 })
+        except Exception as e:
+            # logger.warning(f"[{model_name}] Google 搜索失败: {e}")
+            # 即使搜索失败，也提供一个 Google 搜索链接
+            google_search_url = f"https://www.google.com/search?q={quote(model_name + ' (site:civitai.com/models OR site:huggingface.co OR site:github.com)')}&num=5"
+            results.append({
+                "source": "Google",
+                "name": model_name,
+                "url": google_search_url,
+                "download_url": None,
+                "note": None  # 不在结果中显示提示，会在表格顶部显示
+            })
+        
+        # 检查下载链接是否可用（失效、需要授权的链接在前端标记出来）
+        try:
+            await link_validator.annotate(results)
+        except Exception as e:
+            # logger.warning(f"[{model_name}] 检查下载链接失败: {e}")
+            pass
+        
+        # 只缓存完整搜索的结果（只搜索部分来源的结果不完整），link_status 不写入缓存
+        if search_civitai and search_hf:
+            search_cache.set(model_name, results)
+            search_cache.schedule_save(asyncio.get_running_loop())
+            # 在后台保存模型信息和预览图（对话框直接显示，不需要打开模型页面）
+            if sidecar_settings.get("enabled", True):
+                sidecar_cache.schedule(model_name, results)
+        return results
+    
+    # 正在进行的搜索（同一个模型的并发搜索只执行一次）
+    search_flights = SingleFlight("search")
+    
+    async def resolve_model_links_shared(model_name, search_civitai=True, search_hf=True, deep_search=False):
+        """
+        合并同一个模型的并发搜索（多个对话框、用户搜索和后台预取共享一次搜索）
+
+        调用者被取消（客户端断开连接）时，只有没有其他调用者等待才取消 Civitai、Hugging Face 请求和打分任务。
+        """
+        key = (cache_key(model_name), bool(search_civitai), bool(search_hf), bool(deep_search))
+        return await search_flights.run(
+            key, lambda: resolve_model_links(model_name, search_civitai, search_hf, deep_search))
+    
+    def send_prefetch_event(model_name, results):
+        """通过 websocket 推送后台预取到的搜索结果（前端写入本地缓存）"""
+        try:
+            PromptServer.instance.send_sync("comfyui-find-models.prefetch", {"model_name": model_name, "results": results})
+        except Exception:
+            pass
+    
+    # 后台预取器（默认关闭，在 ComfyUI 设置中开启）
+    prefetcher = Prefetcher(resolve_model_links_shared, search_cache, on_result=send_prefetch_event,
+                            **load_settings().get("prefetch", {}))
+    try:
+        PromptServer.instance.loop.call_soon(prefetcher.start)
+    except Exception:
+        pass
+    
+    def prefetch_on_prompt(json_data):
+        """提交到队列的 prompt 中缺失的模型加入后台预取（不修改 prompt）"""
+        try:
+            if prefetcher.enabled:
+                prefetcher.submit_data(json_data.get("prompt"))
+        except Exception as e:
+            # logger.warning(f"预取 prompt 中的模型失败: {e}")
+            pass
+        return json_data
+    
+    try:
+        PromptServer.instance.add_on_prompt_handler(prefetch_on_prompt)
+    except Exception:
+        pass
+    
+    # 注册模型搜索 API（搜索 Civitai 和 Hugging Face）
+    @routes.post("/comfyui-find-models/api/v1/models/search")
+    async def search_model_links(request):
+        """搜索模型链接（Civitai 和 Hugging Face）"""
+        try:
+            data = await request.json()
+            model_name = data.get("model_name", "")
+            model_type = data.get("model_type", "其他")
+            search_civitai = data.get("search_civitai", True)
+            search_hf = data.get("search_hf", True)
+            search_google = data.get("search_google", False)  # 默认不搜索 Google，因为需要手动操作
+            deep_search = data.get("deep_search", False)  # 深度搜索：多个关键词变体 + 翻页
+            skip_cache = data.get("skip_cache", False)  # 重新搜索时跳过服务器端缓存
             
-            return web.json_response({"results": results})
+            if not model_name:
+                return web.json_response({"error": "未提供模型名称"}, status=400)
             
+            # 使用服务器端缓存（后台预取的结果），深度搜索总是重新搜索
+            # 局域网中其他节点已有的文件排在最前面（不写入缓存，每次按最新的节点清单查找）
+            if not skip_cache and not deep_search:
+                cached = search_cache.get(model_name)
+                if cached is not None:
+                    # 链接的检查结果不写入搜索缓存，使用检查器中还没有过期的结果
+                    cached = link_validator.apply_cached(cached)
+                    return web.json_response({"results": peer_source.rank(model_name, cached), "cached": True})
+            
+            # 用户搜索期间暂停后台预取；用户关闭对话框（前端中止请求）时取消搜索
+            with prefetcher.user_search():
+                results = await cancel_on_disconnect(
+                    request, resolve_model_links_shared(model_name, search_civitai, search_hf, deep_search))
+            return web.json_response({"results": peer_source.rank(model_name, results)})
+            
+        except ClientDisconnected:
+            return web.Response(status=CLIENT_CLOSED_STATUS)
+        except ExecutorBusy as e:
+            return web.json_response({"error": str(e)}, status=503)
         except Exception as e:
             # logger.error(f"搜索模型链接失败: {e}")
             import traceback
@@ -433,11 +536,689 @@ if routes is not None:
     
     # logger.info("✓ API 路由 POST /comfyui-find-models/api/v1/models/search 注册成功")
     
+    @routes.post("/comfyui-find-models/api/v1/models/search/cached")
+    async def get_cached_model_links(request):
+        """批量获取服务器端缓存的搜索结果（不发起搜索）"""
+        try:
+            data = await request.json()
+            model_names = [name for name in data.get("model_names") or [] if isinstance(name, str)]
+            results = search_cache.get_many(model_names)
+            return web.json_response({"results": {name: peer_source.rank(name, link_validator.apply_cached(links))
+                                                  for name, links in results.items()}})
+        except Exception as e:
+            return web.json_response({"error": str(e)}, status=500)
+    
+    @routes.post("/comfyui-find-models/api/v1/links/validate")
+    async def validate_links(request):
+        """
+        检查下载链接是否可用（HEAD 或 1 字节的 Range 请求，结果缓存 6 小时）
+        
+        请求体: {"urls": [下载地址, ...]}
+        返回: {"results": {下载地址: {ok, status, content_length, gated, final_url, error, checked_at}}}
+        """
+        try:
+            data = await request.json()
+            urls = [url for url in data.get("urls") or [] if isinstance(url, str) and url.startswith(("http://", "https://"))]
+            results = await cancel_on_disconnect(request, link_validator.probe_many(urls))
+            return web.json_response({"results": results})
+        except ClientDisconnected:
+            return web.Response(status=CLIENT_CLOSED_STATUS)
+        except Exception as e:
+            # logger.error(f"检查下载链接失败: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+    
+    @routes.post("/comfyui-find-models/api/v1/models/sidecar")
+    async def get_model_sidecars(request):
+        """
+        批量获取本地保存的模型信息（名称、版本、触发词、基础模型、哈希、是否有预览图）
+        
+        请求体: {"model_names": [模型文件名, ...]}
+        返回: {"results": {模型文件名: 信息}}（没有记录的模型不包含在结果中，有搜索缓存时在后台获取）
+        """
+        try:
+            data = await request.json()
+            model_names = [name for name in data.get("model_names") or [] if isinstance(name, str)]
+            results = await run_io(sidecar_cache.get_many, model_names)
+            if sidecar_settings.get("enabled", True):
+                for name in model_names:
+                    links = search_cache.get(name) if name not in results else None
+                    if links:
+                        sidecar_cache.schedule(name, links)
+            return web.json_response({"results": results})
+        except ExecutorBusy as e:
+            return web.json_response({"error": str(e)}, status=503)
+        except Exception as e:
+            # logger.error(f"获取模型信息失败: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+    
+    @routes.get("/comfyui-find-models/api/v1/models/sidecar/{key}/thumbnail")
+    async def get_model_thumbnail(request):
+        """本地保存的模型预览图（WebP）"""
+        path = sidecar_cache.thumbnail_path(request.match_info["key"])
+        if path is None:
+            return web.json_response({"error": "没有预览图"}, status=404)
+        return web.FileResponse(path, headers={"Cache-Control": "max-age=86400"})
+    
+    @routes.get("/comfyui-find-models/api/v1/models/sidecar/status")
+    async def get_sidecar_status(request):
+        """模型信息缓存的记录数和总大小"""
+        return web.json_response(dict(sidecar_cache.status(), enabled=sidecar_settings.get("enabled", True)))
+    
+    # 注册后台预取 API
+    @routes.get("/comfyui-find-models/api/v1/prefetch")
+    async def get_prefetch_status(request):
+        """获取后台预取的状态"""
+        return web.json_response(prefetcher.status())
+    
+    @routes.post("/comfyui-find-models/api/v1/prefetch")
+    async def prefetch_workflow(request):
+        """把前端加载的工作流中缺失的模型加入后台预取"""
+        try:
+            data = await request.json()
+            workflow = data.get("workflow")
+            if not isinstance(workflow, dict):
+                return web.json_response({"error": "请提供 workflow 参数"}, status=400)
+            prefetcher.start()
+            queued = prefetcher.submit_data(workflow)
+            return web.json_response({"queued": queued, **prefetcher.status()})
+        except Exception as e:
+            # logger.error(f"添加预取任务失败: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+    
+    @routes.put("/comfyui-find-models/api/v1/prefetch/settings")
+    async def update_prefetch_settings(request):
+        """修改后台预取设置（enabled、delay）"""
+        try:
+            data = await request.json()
+            values = update_settings("prefetch", data)
+            prefetcher.configure(**values)
+            return web.json_response(prefetcher.status())
+        except (TypeError, ValueError) as e:
+            return web.json_response({"error": str(e)}, status=400)
+    
+    def send_download_event(job):
+        """通过 websocket 推送下载任务状态"""
+        try:
+            PromptServer.instance.send_sync("comfyui-find-models.download", job)
+        except Exception:
+            pass
+        # 下载完成后下次搜索时重新读取模型目录
+        if job.get("status") == "completed":
+            installed_index.invalidate()
+    
+    # 下载队列（保存在插件数据目录中，重启后继续未完成的任务），进度通过 websocket 事件推送到前端
+    download_queue = DownloadQueue(
+        os.path.join(get_data_dir(), "download_queue.json"),
+        on_change=send_download_event,
+        headers_for=lambda url: get_peer_headers(url),
+        run_blocking=run_io,
+        **load_settings().get("download", {})
+    )
+    try:
+        # 事件循环启动后开始调度（恢复上次未完成的任务）
+        PromptServer.instance.loop.call_soon(download_queue.start)
+    except Exception:
+        pass
+    
+    def enqueue_download(data):
+        """根据请求数据添加下载任务，返回 (任务, 错误信息)"""
+        url = data.get("url", "")
+        model_name = data.get("model_name", "")
+        model_type = data.get("model_type", "其他")
+        if not url or not model_name:
+            return None, "请提供 url 和 model_name 参数"
+        try:
+            target_path = resolve_target_path(model_type, model_name)
+        except ValueError as e:
+            return None, str(e)
+        # 替换损坏的模型时允许覆盖已有的文件（下载并校验完成后才替换）
+        overwrite = data.get("overwrite") is True
+        if os.path.exists(target_path) and not overwrite:
+            return None, f"模型已存在: {target_path}"
+        download_queue.start()
+        job = download_queue.enqueue(
+            url,
+            model_name,
+            model_type,
+            target_path,
+            sha256=data.get("sha256"),
+            file_size=data.get("file_size"),
+            is_used=data.get("is_used", True),
+            priority=data.get("priority"),
+            overwrite=overwrite
+        )
+        return job, None
+    
+    # 注册下载队列 API（在服务器端分段下载到模型目录）
+    @routes.get("/comfyui-find-models/api/v1/downloads")
+    async def list_downloads(request):
+        """获取下载队列"""
+        return web.json_response({
+            "paused": download_queue.paused,
+            "settings": download_queue.get_settings(),
+            "jobs": download_queue.list_jobs()
+        })
+    
+    @routes.post("/comfyui-find-models/api/v1/downloads")
+    async def add_downloads(request):
+        """
+        添加下载任务
+        
+        请求体为单个任务 {url, model_name, model_type, sha256, file_size, is_used, priority, overwrite}，
+        或者 {"jobs": [...]} 批量添加
+        """
+        try:
+            data = await request.json()
+            if isinstance(data.get("jobs"), list):
+                jobs = []
+                errors = []
+                for item in data["jobs"]:
+                    job, error = enqueue_download(item or {})
+                    if job is not None:
+                        jobs.append(job)
+                    else:
+                        errors.append({"model_name": (item or {}).get("model_name"), "error": error})
+                return web.json_response({"jobs": jobs, "errors": errors})
+            
+            job, error = enqueue_download(data)
+            if job is None:
+                return web.json_response({"error": error}, status=400)
+            return web.json_response(job)
+        except Exception as e:
+            # logger.error(f"添加下载任务失败: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+    
+    @routes.get("/comfyui-find-models/api/v1/downloads/settings")
+    async def get_download_settings(request):
+        """获取下载设置"""
+        return web.json_response(download_queue.get_settings())
+    
+    @routes.put("/comfyui-find-models/api/v1/downloads/settings")
+    async def update_download_settings(request):
+        """修改下载设置（并行任务数、分段数、全局和每个主机的带宽限制，单位字节/秒）"""
+        try:
+            data = await request.json()
+            values = update_settings("download", data)
+            download_queue.configure(**values)
+            return web.json_response(download_queue.get_settings())
+        except (TypeError, ValueError) as e:
+            return web.json_response({"error": str(e)}, status=400)
+    
+    @routes.post("/comfyui-find-models/api/v1/downloads/pause")
+    async def pause_all_downloads(request):
+        """暂停整个下载队列"""
+        await download_queue.pause_all()
+        return web.json_response({"paused": download_queue.paused})
+    
+    @routes.post("/comfyui-find-models/api/v1/downloads/resume")
+    async def resume_all_downloads(request):
+        """继续整个下载队列"""
+        download_queue.start()
+        download_queue.resume_all()
+        return web.json_response({"paused": download_queue.paused})
+    
+    @routes.post("/comfyui-find-models/api/v1/downloads/clear")
+    async def clear_finished_downloads(request):
+        """删除已结束的任务记录"""
+        download_queue.clear_finished()
+        return web.json_response({"jobs": download_queue.list_jobs()})
+    
+    @routes.get("/comfyui-find-models/api/v1/downloads/{job_id}")
+    async def get_download(request):
+        """获取下载任务状态"""
+        job = download_queue.get(request.match_info["job_id"])
+        if job is None:
+            return web.json_response({"error": "下载任务不存在"}, status=404)
+        return web.json_response(job)
+    
+    @routes.post("/comfyui-find-models/api/v1/downloads/{job_id}/pause")
+    async def pause_download(request):
+        """暂停下载任务（已下载的部分会保留）"""
+        job = await download_queue.pause(request.match_info["job_id"])
+        if job is None:
+            return web.json_response({"error": "下载任务不存在"}, status=404)
+        return web.json_response(job)
+    
+    @routes.post("/comfyui-find-models/api/v1/downloads/{job_id}/resume")
+    async def resume_download(request):
+        """继续下载任务"""
+        download_queue.start()
+        job = download_queue.resume(request.match_info["job_id"])
+        if job is None:
+            return web.json_response({"error": "下载任务不存在"}, status=404)
+        return web.json_response(job)
+    
+    @routes.delete("/comfyui-find-models/api/v1/downloads/{job_id}")
+    async def remove_download(request):
+        """取消并删除下载任务（?delete_partial=1 同时删除已下载的部分）"""
+        delete_partial = request.query.get("delete_partial", "").lower() in ("1", "true", "yes")
+        job = await download_queue.remove(request.match_info["job_id"], delete_partial=delete_partial)
+        if job is None:
+            return web.json_response({"error": "下载任务不存在"}, status=404)
+        return web.json_response(job)
+    
+    # logger.info("✓ API 路由 /comfyui-find-models/api/v1/downloads 注册成功")
+    
+    def parse_duplicate_options(params):
+        """解析重复文件查找的参数（folders 为逗号分隔的模型目录名）"""
+        folders = params.get("folders") or None
+        if isinstance(folders, str):
+            folders = [name.strip() for name in folders.split(",") if name.strip()]
+        min_size = int(params.get("min_size") or duplicate_finder.DEFAULT_MIN_SIZE)
+        return duplicate_finder.get_model_directories(folders), min_size
+    
+    # 注册重复模型查找 API（扫描和哈希计算在哈希线程池中执行）
+    @routes.get("/comfyui-find-models/api/v1/models/duplicates")
+    async def find_duplicate_models(request):
+        """查找所有模型目录中内容相同的文件，返回重复文件分组和可以释放的空间"""
+        try:
+            directories, min_size = parse_duplicate_options(request.query)
+            report = await run_hash(duplicate_finder.find_duplicates, directories, min_size)
+            return web.json_response(report)
+        except ExecutorBusy as e:
+            return web.json_response({"error": str(e)}, status=503)
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        except Exception as e:
+            # logger.error(f"查找重复模型失败: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+    
+    @routes.post("/comfyui-find-models/api/v1/models/duplicates/dedupe")
+    async def dedupe_models(request):
+        """
+        把重复的模型文件替换为硬链接或符号链接
+        
+        请求体: {mode: "hardlink" | "symlink", apply: false, folders, min_size}
+        apply 不为 true 时只返回将要执行的操作
+        """
+        try:
+            data = await request.json()
+            mode = data.get("mode", "hardlink")
+            if mode not in duplicate_finder.LINK_MODES:
+                return web.json_response({"error": f"不支持的链接方式: {mode}"}, status=400)
+            directories, min_size = parse_duplicate_options(data)
+            dry_run = data.get("apply") is not True
+            
+            def scan_and_dedupe():
+                report = duplicate_finder.find_duplicates(directories, min_size)
+                return {"report": report, "dedupe": duplicate_finder.dedupe(report, mode, dry_run=dry_run)}
+            
+            return web.json_response(await run_hash(scan_and_dedupe))
+        except ExecutorBusy as e:
+            return web.json_response({"error": str(e)}, status=503)
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        except Exception as e:
+            # logger.error(f"替换重复模型失败: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+    
+    # logger.info("✓ API 路由 /comfyui-find-models/api/v1/models/duplicates 注册成功")
+    
+    # 模型头部元数据缓存（按路径、大小和修改时间缓存）
+    metadata_cache = MetadataCache(os.path.join(get_data_dir(), "model_metadata_cache.json"))
+    
+    # 注册模型元数据 API（只读取 safetensors/GGUF 的头部，识别模型的派系和类型）
+    @routes.post("/comfyui-find-models/api/v1/models/metadata")
+    async def get_models_metadata(request):
+        """
+        批量获取已安装模型的元数据
+        
+        请求体: {"models": [{"model_type": "LoRA", "name": "xxx.safetensors"}, ...]}
+        返回: {"results": {"类型:名称": 元数据}}，找不到的模型不包含在结果中
+        """
+        try:
+            data = await request.json()
+            paths = {}
+            for item in data.get("models") or []:
+                model_type = item.get("model_type", "")
+                name = item.get("name", "")
+                path = find_installed_path(model_type, name)
+                if path:
+                    paths[f"{model_type}:{name}"] = path
+            
+            def read_all():
+                infos = metadata_cache.get_many(paths.values())
+                metadata_cache.save()
+                return infos
+            
+            infos = await run_io(read_all)
+            results = {key: dict(infos[path], path=path) for key, path in paths.items()}
+            return web.json_response({"results": results})
+        except ExecutorBusy as e:
+            return web.json_response({"error": str(e)}, status=503)
+        except Exception as e:
+            # logger.error(f"获取模型元数据失败: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+    
+    @routes.get("/comfyui-find-models/api/v1/models/metadata/scan")
+    async def scan_models_metadata(request):
+        """读取所有已安装模型（可用 folders 参数指定模型目录，逗号分隔）的元数据"""
+        try:
+            folders = [name.strip() for name in request.query.get("folders", "").split(",") if name.strip()]
+            if not folders:
+                folders = [name for name in folder_paths.folder_names_and_paths
+                           if name not in NON_MODEL_FOLDERS]
+            
+            def scan():
+                started = time.monotonic()
+                results = {}
+                for folder in folders:
+                    names = folder_paths.get_filename_list(folder)
+                    paths = {name: folder_paths.get_full_path(folder, name) for name in names}
+                    infos = metadata_cache.get_many(path for path in paths.values() if path)
+                    results[folder] = {name: infos[path] for name, path in paths.items() if path}
+                metadata_cache.save()
+                return {"results": results, "elapsed": time.monotonic() - started}
+            
+            return web.json_response(await run_io(scan))
+        except ExecutorBusy as e:
+            return web.json_response({"error": str(e)}, status=503)
+        except Exception as e:
+            # logger.error(f"扫描模型元数据失败: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+    
+    # logger.info("✓ API 路由 /comfyui-find-models/api/v1/models/metadata 注册成功")
+    
+    # 模型完整性校验（哈希按路径、大小和修改时间缓存）
+    hash_cache = HashCache(os.path.join(get_data_dir(), "model_hash_cache.json"))
+    
+    async def resolve_expected_hash(model_name):
+        """获取上游文件的哈希和大小（优先使用搜索缓存，没有缓存时搜索 Civitai 和 Hugging Face）"""
+        links = search_cache.get(model_name)
+        if links is None:
+            links = await resolve_model_links_shared(model_name)
+        return expected_from_links(links, model_name)
+    
+    def send_verify_event(result):
+        """通过 websocket 推送单个模型的校验结果"""
+        try:
+            PromptServer.instance.send_sync("comfyui-find-models.verify", result)
+        except Exception:
+            pass
+    
+    integrity_verifier = IntegrityVerifier(resolve_expected_hash, hash_cache, on_result=send_verify_event,
+                                           run_blocking=run_hash)
+    
+    @routes.post("/comfyui-find-models/api/v1/models/verify")
+    async def verify_models(request):
+        """
+        校验已安装模型的完整性（与 Civitai / Hugging Face 上的文件大小和 SHA-256 比较）
+        
+        请求体: {"models": [{"model_type": "LoRA", "name": "xxx.safetensors"}, ...], "full": false}
+        full 为 false 时只使用已缓存的搜索结果和哈希，直接返回 {"results": {"类型:名称": 结果}}；
+        full 为 true 时在后台搜索并计算哈希，结果通过 comfyui-find-models.verify 事件逐个推送
+        """
+        try:
+            data = await request.json()
+            models = []
+            for item in data.get("models") or []:
+                model_type = item.get("model_type", "")
+                name = item.get("name", "")
+                path = find_installed_path(model_type, name)
+                if path:
+                    models.append({"key": f"{model_type}:{name}", "name": name, "path": path})
+            
+            if data.get("full") is True:
+                queued = integrity_verifier.submit(models)
+                return web.json_response({"queued": queued, **integrity_verifier.status()})
+            
+            def verify_cached():
+                results = {}
+                for model in models:
+                    expected = expected_from_links(search_cache.get(model["name"]), model["name"])
+                    results[model["key"]] = dict(verify_file(model["path"], expected, hash_cache, compute_hash=False),
+                                                 key=model["key"], name=model["name"])
+                return results
+            
+            return web.json_response({"results": await run_io(verify_cached)})
+        except ExecutorBusy as e:
+            return web.json_response({"error": str(e)}, status=503)
+        except Exception as e:
+            # logger.error(f"校验模型失败: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+    
+    @routes.get("/comfyui-find-models/api/v1/models/verify")
+    async def get_verify_status(request):
+        """获取后台校验的状态"""
+        return web.json_response(integrity_verifier.status())
+    
+    # logger.info("✓ API 路由 /comfyui-find-models/api/v1/models/verify 注册成功")
+    
+    # 已安装模型名称索引（前缀、子串和分词搜索），启动后在线程池中建立，查询时增量更新
+    installed_index = InstalledModelIndex()
+    
+    async def build_installed_index():
+        try:
+            await run_io(installed_index.refresh)
+        except ExecutorBusy:
+            # 第一次查询时会重新建立
+            pass
+    
+    try:
+        PromptServer.instance.loop.call_soon(lambda: asyncio.ensure_future(build_installed_index()))
+    except Exception:
+        pass
+    
+    @routes.get("/comfyui-find-models/api/v1/models/installed/search")
+    async def search_installed_models(request):
+        """
+        在已安装的模型文件名中搜索（用于自动补全）
+        
+        参数: q（搜索词）、type（前端模型类型如 LoRA，或 ComfyUI 目录名如 loras，可选）、limit（可选）
+        返回: {"query": 搜索词, "results": [{"name": 文件名, "folder": 目录名}], "total": 索引中的文件数}
+        """
+        query = request.query.get("q", "")
+        model_type = request.query.get("type", "")
+        try:
+            limit = int(request.query.get("limit") or 0)
+        except ValueError:
+            return web.json_response({"error": "limit 必须是整数"}, status=400)
+        folders = None
+        if model_type and model_type != "其他":
+            if model_type in folder_paths.folder_names_and_paths:
+                folders = [model_type]
+            else:
+                folders = get_model_folder_names(model_type)
+        try:
+            await run_io(installed_index.refresh)
+            results = installed_index.search(query, folders, limit)
+            return web.json_response({"query": query, "results": results, "total": len(installed_index)})
+        except ExecutorBusy as e:
+            return web.json_response({"error": str(e)}, status=503)
+        except Exception as e:
+            # logger.error(f"搜索已安装模型失败: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+    
+    def get_extra_model_paths_version():
+        """模型目录配置的版本（folder_paths 中的目录、扩展名和 extra_model_paths.yaml 修改时间的摘要）"""
+        config = {}
+        for folder_name, path_info in getattr(folder_paths, "folder_names_and_paths", {}).items():
+            if isinstance(path_info, tuple) and len(path_info) >= 2:
+                config[folder_name] = [list(path_info[0]), sorted(path_info[1])]
+            else:
+                config[folder_name] = repr(path_info)
+        try:
+            stat = os.stat(os.path.join(getattr(folder_paths, "base_path", ""), "extra_model_paths.yaml"))
+            config["extra_model_paths.yaml"] = [stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            pass
+        return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+    
+    @routes.get("/comfyui-find-models/api/v1/models/inventory/version")
+    async def get_inventory_version(request):
+        """
+        已安装模型列表和模型目录配置的版本（前端缓存完整的分析结果，版本变化时失效）
+        
+        返回: {"inventory": 文件列表的摘要, "extra_model_paths": 目录配置的摘要, "total": 文件数}
+        """
+        def collect_versions():
+            # 重新读取文件列表（ComfyUI 按目录修改时间缓存文件列表，没有变化时很快）
+            installed_index.refresh(force=True)
+            return {
+                "inventory": installed_index.version(),
+                "extra_model_paths": get_extra_model_paths_version(),
+                "total": len(installed_index),
+            }
+        
+        try:
+            return web.json_response(await run_io(collect_versions))
+        except ExecutorBusy as e:
+            return web.json_response({"error": str(e)}, status=503)
+        except Exception as e:
+            # logger.error(f"获取已安装模型列表的版本失败: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+    
+    # 多节点模型清单同步（渲染农场）：定期把本机清单的变化推送给其他节点，检查工作流在哪些节点上可以运行
+    def collect_federation_inventory():
+        """读取本机清单（哈希只使用完整性校验时缓存的结果）"""
+        return collect_local_inventory(hash_lookup=hash_cache.peek)
+    
+    federation = Federation(collect_federation_inventory, load_node_id(get_data_dir()), run_blocking=run_io,
+                            **load_settings().get("federation", {}))
+    if federation.enabled:
+        try:
+            PromptServer.instance.loop.call_soon(federation.start)
+        except Exception:
+            pass
+    
+    # 局域网节点下载来源：在其他节点的清单中按文件名或哈希查找，哈希与上游一致时排在 Civitai 和 Hugging Face 前面
+    peer_source = PeerSource(federation)
+    
+    def get_peer_headers(url):
+        """从其他节点下载时带上共享的令牌"""
+        if federation.token and peer_source.is_peer_url(url):
+            return {TOKEN_HEADER: federation.token}
+        return None
+    
+    @routes.get("/comfyui-find-models/api/v1/peer/files/{folder}/{name:.+}")
+    async def serve_peer_file(request):
+        """
+        向其他节点提供模型文件（只在启用多节点同步时可用，必须带上共享的令牌，支持 Range 请求，用于分段和续传下载）
+        """
+        if not federation.enabled:
+            return web.json_response({"error": "没有启用多节点同步"}, status=404)
+        if not federation.authorized(request.headers.get(TOKEN_HEADER)):
+            return web.json_response({"error": "令牌不正确"}, status=401)
+        key = split_file_key(request.match_info["folder"], request.match_info["name"])
+        if key is None or key[0] not in getattr(folder_paths, "folder_names_and_paths", {}):
+            return web.json_response({"error": "不允许下载这个文件"}, status=403)
+        try:
+            path = await run_io(folder_paths.get_full_path, *key)
+        except ExecutorBusy as e:
+            return web.json_response({"error": str(e)}, status=503)
+        if not path or not os.path.isfile(path):
+            return web.json_response({"error": "文件不存在"}, status=404)
+        metrics.incr("peer.files_served")
+        return web.FileResponse(path, headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(os.path.basename(path))}"})
+    
+    @routes.get("/comfyui-find-models/api/v1/federation")
+    async def get_federation_status(request):
+        """获取本机清单的版本、推送状态和已收到的其他节点"""
+        return web.json_response(federation.status())
+    
+    @routes.put("/comfyui-find-models/api/v1/federation/settings")
+    async def update_federation_settings(request):
+        """
+        修改多节点同步设置（enabled、node_name、public_url、peers、sync_interval、token、include_hashes）
+        
+        启用时必须设置令牌，否则返回 400
+        """
+        try:
+            data = await request.json()
+            if isinstance(data.get("peers"), list):
+                data["peers"] = ", ".join(str(peer) for peer in data["peers"])
+            values = update_settings("federation", data, validate=check_settings)
+            federation.configure(**values)
+            if federation.enabled:
+                federation.start()
+            return web.json_response(federation.status())
+        except (TypeError, ValueError) as e:
+            return web.json_response({"error": str(e)}, status=400)
+    
+    @routes.post("/comfyui-find-models/api/v1/federation/inventory")
+    async def receive_federation_inventory(request):
+        """
+        接收其他节点推送的清单（完整清单或增量）
+        
+        返回: 200 {"version": 持有的版本}；增量与持有的版本不一致时返回 409 {"version": 持有的版本}
+        """
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.json_response({"error": "请求体不是有效的 JSON"}, status=400)
+        status, body = federation.handle_push(data, request.headers.get(TOKEN_HEADER))
+        return web.json_response(body, status=status)
+    
+    @routes.post("/comfyui-find-models/api/v1/federation/check")
+    async def check_federation_workflow(request):
+        """
+        检查工作流中的模型在每个节点上是否都已安装
+        
+        请求体: {"workflow": 工作流或 prompt} 或 {"models": [{"name", "type"}]}
+        返回: {"models", "nodes": [{node_id, name, url, self, stale, complete, missing}], "ready": [节点名], "conflicts"}
+        """
+        try:
+            data = await request.json()
+            if isinstance(data.get("models"), list):
+                models = [model for model in data["models"] if isinstance(model, dict) and model.get("name")]
+            elif isinstance(data.get("workflow"), dict):
+                models = extract_models(data["workflow"])
+            else:
+                return web.json_response({"error": "请提供 workflow 或 models 参数"}, status=400)
+            await federation.refresh_local()
+            return web.json_response(federation.check(models))
+        except ExecutorBusy as e:
+            return web.json_response({"error": str(e)}, status=503)
+        except Exception as e:
+            # logger.error(f"检查多节点模型失败: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+    
+    # 注册工作流批量检查 API（解析工作流在进程池中执行）
+    @routes.post("/comfyui-find-models/api/v1/workflows/audit")
+    async def audit_workflow_library(request):
+        """
+        检查目录中所有工作流（.json 和嵌入了工作流的 .png/.webp）需要的模型
+        
+        请求体: {directory（默认为用户的工作流目录）, recursive: true, workers, format: "json" | "csv"}
+        返回: 每个工作流缺失的模型、没有被使用的已安装模型、需要下载的总大小（来自搜索缓存）
+        """
+        try:
+            data = await request.json() if request.can_read_body else {}
+            directory = data.get("directory") or workflow_auditor.get_default_workflow_dir()
+            if not directory or not os.path.isdir(directory):
+                return web.json_response({"error": f"工作流目录不存在: {directory}"}, status=400)
+            output_format = data.get("format", "json")
+            if output_format not in ("json", "csv"):
+                return web.json_response({"error": f"不支持的格式: {output_format}"}, status=400)
+            # 只使用线程池解析（不在 ComfyUI 进程中创建子进程），线程数不超过 CPU 核心数
+            workers = max(1, min(int(data.get("workers") or workflow_auditor.DEFAULT_WORKERS), os.cpu_count() or 1))
+            recursive = data.get("recursive") is not False
+            
+            def audit():
+                paths = workflow_auditor.find_workflow_files(directory, recursive=recursive)
+                inventory = workflow_auditor.get_installed_inventory()
+                size_lookup = lambda name: workflow_auditor.size_from_links(search_cache.get(name))
+                return workflow_auditor.audit_workflows(paths, inventory, size_lookup=size_lookup, workers=workers)
+            
+            report = await run_io(audit)
+            report["directory"] = directory
+            if output_format == "csv":
+                return web.Response(text=workflow_auditor.report_to_csv(report), content_type="text/csv", charset="utf-8")
+            return web.json_response(report)
+        except ExecutorBusy as e:
+            return web.json_response({"error": str(e)}, status=503)
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        except Exception as e:
+            # logger.error(f"检查工作流失败: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+    
     # 注册获取 extra_model_paths 配置的 API
     @routes.get("/comfyui-find-models/api/v1/system/extra-model-paths")
     async def get_extra_model_paths_api(request):
         """获取 extra_model_paths.yaml 的配置数据"""
-        try:
+        def collect_extra_model_paths():
+            """收集 folder_paths 中的路径和 extra_model_paths.yaml 的配置（会读取 YAML 文件，在 I/O 线程池中调用）"""
             extra_paths = {}
             yaml_config = {}
             
@@ -662,9 +1443,17 @@ if routes is not None:
                 "merged": merged
             }
             
-            # logger.info(f"✓ 返回 extra_model_paths 配置: {len(merged)} 个模型类型")
+            return result
+        
+        try:
+            # 读取 YAML 文件放到 I/O 线程池中执行，不阻塞事件循环
+            result = await run_io(collect_extra_model_paths)
+            
+            # logger.info(f"✓ 返回 extra_model_paths 配置: {len(result['merged'])} 个模型类型")
             return web.json_response(result)
             
+        except ExecutorBusy as e:
+            return web.json_response({"error": str(e)}, status=503)
         except Exception as e:
             # logger.error(f"获取 extra_model_paths 配置失败: {e}")
             import traceback
@@ -673,6 +1462,45 @@ if routes is not None:
     
     # logger.info("✓ API 路由 GET /comfyui-find-models/api/v1/system/extra-model-paths 注册成功")
     
+    # 事件循环卡顿监控：超过阈值时记录正在执行的请求处理函数和调用栈（通过 /system/metrics 查看）
+    watchdog_settings = load_settings().get("watchdog", {})
+    loop_watchdog = LoopWatchdog(PromptServer.instance.loop, watchdog_settings.get("threshold_ms", 200))
+    try:
+        # 中间件需要在服务器启动前添加（应用启动后中间件列表不能修改）
+        PromptServer.instance.app.middlewares.append(loop_watchdog.middleware)
+    except Exception:
+        pass
+    if watchdog_settings.get("enabled", True):
+        try:
+            PromptServer.instance.loop.call_soon(loop_watchdog.start)
+        except Exception:
+            pass
+    
+    @routes.get("/comfyui-find-models/api/v1/system/metrics")
+    async def get_metrics(request):
+        """运行指标：计数器、耗时统计、最近的事件循环卡顿、线程池和卡顿监控的状态"""
+        data = metrics.snapshot()
+        data["executors"] = executors_status()
+        data["watchdog"] = loop_watchdog.status()
+        return web.json_response(data)
+    
+    @routes.put("/comfyui-find-models/api/v1/system/watchdog")
+    async def update_watchdog_settings(request):
+        """修改卡顿监控设置（enabled、threshold_ms）"""
+        try:
+            data = await request.json()
+            if "threshold_ms" in data and int(data["threshold_ms"]) <= 0:
+                raise ValueError("threshold_ms 必须大于 0")
+            values = update_settings("watchdog", data)
+            loop_watchdog.configure(threshold_ms=values["threshold_ms"])
+            if values["enabled"]:
+                loop_watchdog.start()
+            else:
+                loop_watchdog.stop()
+            return web.json_response(loop_watchdog.status())
+        except (TypeError, ValueError) as e:
+            return web.json_response({"error": str(e)}, status=400)
+    
     # 验证路由注册（调试信息）
     try:
         # 尝试获取路由信息
@@ -0,0 +1,160 @@
+"""
+设置模块
+插件的持久化设置和数据目录（ComfyUI 用户目录下的 comfyui-find-models 文件夹）
+"""
+
+import os
+import copy
+import json
+import threading
+
+try:
+    import folder_paths
+except ImportError:
+    # 在 ComfyUI 之外运行（命令行工具、测试）时没有 folder_paths
+    folder_paths = None
+
+SETTINGS_FILE_NAME = "settings.json"
+
+# 默认设置（按功能分组）
+DEFAULT_SETTINGS = {
+    "download": {
+        # 同时进行的下载任务数
+        "max_parallel_jobs": 2,
+        # 每个下载任务的并发连接（分段）数
+        "segments": 4,
+        # 全局带宽上限（字节/秒，0 表示不限制）
+        "global_bandwidth_limit": 0,
+        # 每个主机的带宽上限（字节/秒，0 表示不限制）
+        "per_host_bandwidth_limit": 0,
+    },
+    "prefetch": {
+        # 是否在后台预取工作流中缺失模型的下载链接
+        "enabled": False,
+        # 两次后台搜索之间的间隔（秒），避免占用搜索 API 的配额
+        "delay": 2.0,
+    },
+    "sidecar": {
+        # 是否在搜索完成后保存模型信息和预览图
+        "enabled": True,
+        # 模型信息和预览图的总大小上限（MB），超过时删除最久没有使用的记录
+        "max_size_mb": 64.0,
+    },
+    "federation": {
+        # 是否启用多节点同步（推送和接收模型清单、向其他节点提供模型文件，需要设置令牌）
+        "enabled": False,
+        # 显示用的节点名称（为空时使用节点 ID）
+        "node_name": "",
+        # 其他节点访问本机的地址（如 http://192.168.1.10:8188）
+        "public_url": "",
+        # 接收本机清单的节点地址（逗号分隔）
+        "peers": "",
+        # 两次同步之间的间隔（秒）
+        "sync_interval": 30.0,
+        # 节点之间共享的令牌（启用时必须设置）
+        "token": "",
+        # 清单中是否包含已缓存的 SHA-256
+        "include_hashes": True,
+    },
+    "watchdog": {
+        # 是否监控事件循环卡顿
+        "enabled": True,
+        # 事件循环超过这个时间（毫秒）没有响应时记录卡顿
+        "threshold_ms": 200,
+    },
+}
+
+_lock = threading.Lock()
+_settings = None
+
+
+def get_data_dir():
+    """
+    获取插件的数据目录（不存在时自动创建）
+
+    优先使用环境变量 COMFYUI_FIND_MODELS_DATA_DIR，其次是 ComfyUI 的用户目录，
+    最后退回到插件目录下的 data 文件夹。
+    """
+    data_dir = os.environ.get("COMFYUI_FIND_MODELS_DATA_DIR")
+    if not data_dir and folder_paths is not None and hasattr(folder_paths, "get_user_directory"):
+        try:
+            data_dir = os.path.join(folder_paths.get_user_directory(), "comfyui-find-models")
+        except Exception:
+            data_dir = None
+    if not data_dir:
+        data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    os.makedirs(data_dir, exist_ok=True)
+    return data_dir
+
+
+def _merge(defaults, overrides):
+    merged = copy.deepcopy(defaults)
+    for section, values in (overrides or {}).items():
+        if isinstance(values, dict) and isinstance(merged.get(section), dict):
+            merged[section].update(values)
+        else:
+            merged[section] = values
+    return merged
+
+
+def load_settings():
+    """读取设置（缺少的项使用默认值）"""
+    global _settings
+    with _lock:
+        if _settings is None:
+            stored = {}
+            try:
+                with open(os.path.join(get_data_dir(), SETTINGS_FILE_NAME), "r", encoding="utf-8") as f:
+                    stored = json.load(f) or {}
+            except (OSError, ValueError):
+                stored = {}
+            _settings = _merge(DEFAULT_SETTINGS, stored)
+        return copy.deepcopy(_settings)
+
+
+def get_setting(section, key, default=None):
+    """获取单个设置项"""
+    return load_settings().get(section, {}).get(key, default)
+
+
+def _convert(default, value):
+    """把设置值转换成默认值的类型（bool 需要单独处理，bool("false") 为 True）"""
+    if default is None:
+        return value
+    if isinstance(default, bool):
+        if isinstance(value, str):
+            return value.strip().lower() in ("true", "1", "yes", "on")
+        return bool(value)
+    return type(default)(value)
+
+
+def update_settings(section, values, validate=None):
+    """
+    更新某一组设置并保存到文件
+
+    Args:
+        section: 设置分组（如 "download"）
+        values: 要更新的设置项（dict），只接受该分组中已有的键
+        validate: 检查更新后的整组设置的函数 validate(设置)，不合法时抛出 ValueError（不修改设置），可选
+
+    Returns:
+        更新后的该组设置
+    """
+    load_settings()
+    with _lock:
+        allowed = DEFAULT_SETTINGS.get(section, {})
+        # 先转换全部的值，任何一个不合法时都不修改设置
+        converted = {
+            key: _convert(allowed[key], value)
+            for key, value in values.items() if key in allowed
+        }
+        current = _settings.setdefault(section, {})
+        if validate is not None:
+            validate(dict(current, **converted))
+        current.update(converted)
+        path = os.path.join(get_data_dir(), SETTINGS_FILE_NAME)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(_settings, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        return copy.deepcopy(current)
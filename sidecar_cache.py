@@ -0,0 +1,404 @@
+"""
+模型信息缓存（sidecar）
+搜索到模型的下载链接后，在后台获取模型的名称、版本、触发词、基础模型、文件哈希和预览图，
+把信息（JSON）和缩小后的预览图保存在数据目录中。对话框从本地接口读取，
+不需要打开 Civitai 或 Hugging Face 的页面就能确认是哪个模型，离线时也能查看。
+
+信息按上游文件的 SHA-256 从 Civitai 获取（/model-versions/by-hash），没有哈希或 Civitai 上没有这个文件时
+只保存搜索结果中的信息。预览图只使用非 NSFW 的图片，缩小后保存为 WebP（需要 Pillow，没有时不保存预览图）。
+所有记录的总大小超过上限时删除最久没有使用的记录。
+"""
+
+import io
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import threading
+
+import aiohttp
+
+try:
+    from PIL import Image
+except ImportError:
+    # 没有 Pillow 时只保存模型信息，不生成预览图
+    Image = None
+
+try:
+    from .integrity import expected_from_links
+    from .model_paths import base_key
+    from .search_cache import cache_key
+    from .metrics import metrics
+except ImportError:
+    from integrity import expected_from_links
+    from model_paths import base_key
+    from search_cache import cache_key
+    from metrics import metrics
+
+CIVITAI_BY_HASH_URL = "https://civitai.com/api/v1/model-versions/by-hash/{}"
+# 所有记录（信息和预览图）的总大小上限（字节）
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# 预览图的最大边长（像素）
+DEFAULT_THUMBNAIL_SIZE = 256
+# 记录的有效期（秒），过期后重新获取
+REFRESH_TTL = 30 * 24 * 60 * 60
+# 下载的原始图片的大小上限（字节），以及解码前的像素数上限（防止解压炸弹）
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+MAX_IMAGE_PIXELS = 40 * 1000 * 1000
+# 同时在后台获取的模型数
+MAX_CONCURRENT_UPDATES = 2
+# 单个请求的超时时间（秒）
+REQUEST_TIMEOUT = 15
+# 超过上限时删除记录，直到总大小低于上限的这个比例
+EVICT_TO_RATIO = 0.9
+
+# 显示用的来源（按顺序选择第一个匹配的链接）
+_INFO_SOURCES = ("Civitai", "Hugging Face")
+# Civitai 图片地址中的尺寸参数（请求缩小后的图片，减少下载量）
+_CIVITAI_IMAGE_SIZE_RE = re.compile(r"/(width=\d+|original=true)/")
+_KEY_RE = re.compile(r"^[0-9a-f]{20}$")
+
+
+def sidecar_key(model_name):
+    """记录的文件名（模型文件名不区分大小写的哈希，避免文件名中的特殊字符）"""
+    return hashlib.sha1(cache_key(model_name).encode("utf-8")).hexdigest()[:20]
+
+
+def _pick_link(links, model_name):
+    # 只使用文件名与模型一致的链接（相似度匹配到的可能是另一个模型，信息和预览图都会不对）
+    name_key = base_key(model_name or "")
+    for source in _INFO_SOURCES:
+        for link in links or []:
+            if isinstance(link, dict) and link.get("source") == source \
+                    and name_key and base_key(link.get("file_name") or "") == name_key:
+                return link
+    return None
+
+
+def build_info(model_name, links):
+    """
+    从搜索结果中取模型信息（不请求网络）
+
+    Returns:
+        信息 dict；搜索结果中没有 Civitai 或 Hugging Face 上文件名一致的文件时返回 None
+    """
+    link = _pick_link(links, model_name)
+    if link is None:
+        return None
+    expected = expected_from_links(links, model_name) or {}
+    sha256 = expected.get("sha256")
+    return {
+        "model_name": model_name,
+        "key": sidecar_key(model_name),
+        "source": link.get("source"),
+        "name": link.get("name"),
+        "version": link.get("version"),
+        "url": link.get("url"),
+        "file_size": link.get("file_size"),
+        "hashes": {"SHA256": sha256.upper()} if sha256 else {},
+        "base_model": None,
+        "model_type": None,
+        "trigger_words": [],
+        "thumbnail": False,
+        "updated_at": time.time(),
+    }
+
+
+def merge_civitai_version(info, version):
+    """
+    把 Civitai 的版本信息（/model-versions/by-hash 的响应）合并到 info 中
+
+    Returns:
+        预览图的地址（没有可用的图片时返回 None）
+    """
+    model = version.get("model") or {}
+    info["source"] = "Civitai"
+    info["name"] = model.get("name") or info["name"]
+    info["version"] = version.get("name") or info["version"]
+    info["model_type"] = model.get("type")
+    info["base_model"] = version.get("baseModel")
+    info["trigger_words"] = [word.strip() for word in version.get("trainedWords") or []
+                             if isinstance(word, str) and word.strip()]
+    if version.get("modelId"):
+        info["url"] = f"https://civitai.com/models/{version['modelId']}?modelVersionId={version.get('id')}"
+    sha256 = info["hashes"].get("SHA256")
+    for file_info in version.get("files") or []:
+        hashes = file_info.get("hashes") or {}
+        if sha256 and (hashes.get("SHA256") or "").upper() == sha256:
+            info["hashes"] = {name: value for name, value in hashes.items() if isinstance(value, str)}
+            break
+    for image in version.get("images") or []:
+        # 只使用图片（不使用视频），跳过 NSFW 的图片（nsfwLevel 大于 1 表示有成人内容）
+        if image.get("type", "image") != "image" or (image.get("nsfwLevel") or 0) > 1 or image.get("nsfw") is True:
+            continue
+        if image.get("url"):
+            return image["url"]
+    return None
+
+
+def make_thumbnail(data, size=DEFAULT_THUMBNAIL_SIZE):
+    """
+    把图片缩小到最大边长为 size 的 WebP（在线程池中调用）
+
+    Returns:
+        WebP 图片的字节；没有 Pillow 或无法解码时返回 None
+    """
+    if Image is None or not data:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.width * image.height > MAX_IMAGE_PIXELS:
+                return None
+            # JPEG 解码时直接按比例缩小，减少内存和计算量
+            image.draft("RGB", (size, size))
+            image = image.convert("RGB")
+            image.thumbnail((size, size))
+            output = io.BytesIO()
+            image.save(output, format="WEBP", quality=80)
+            return output.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+class SidecarCache:
+    """
+    模型信息和预览图的本地缓存
+
+    Args:
+        directory: 保存记录的目录（每个模型一个 <key>.json，预览图为 <key>.webp）
+        max_bytes: 所有记录的总大小上限
+        thumbnail_size: 预览图的最大边长
+        run_blocking: 执行阻塞函数的协程函数 run_blocking(func, *args)，默认使用事件循环的默认线程池
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, thumbnail_size=DEFAULT_THUMBNAIL_SIZE,
+                 run_blocking=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.thumbnail_size = thumbnail_size
+        self.run_blocking = run_blocking
+        self._lock = threading.Lock()
+        # key -> [大小, 最后使用时间, 更新时间]
+        self._index = {}
+        self._tasks = {}
+        self._semaphore = None
+        self._scan()
+
+    def _scan(self):
+        """读取目录中已有的记录（信息文件的修改时间是更新时间，重启后也作为最后使用时间）"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            key, ext = os.path.splitext(name)
+            if not _KEY_RE.match(key) or ext not in (".json", ".webp"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entry = self._index.setdefault(key, [0, 0.0, 0.0])
+            entry[0] += stat.st_size
+            if ext == ".json":
+                entry[1] = entry[2] = stat.st_mtime
+
+    def _path(self, key, ext):
+        return os.path.join(self.directory, key + ext)
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return sum(entry[0] for entry in self._index.values())
+
+    def __len__(self):
+        return len(self._index)
+
+    def get(self, model_name):
+        """读取模型的信息（没有记录时返回 None），同时更新最后使用时间"""
+        key = sidecar_key(model_name)
+        if key not in self._index:
+            return None
+        try:
+            with open(self._path(key, ".json"), "r", encoding="utf-8") as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            if key in self._index:
+                self._index[key][1] = time.time()
+        return info
+
+    def get_many(self, model_names):
+        """批量读取，返回 {模型名: 信息}（没有记录的模型不包含在结果中）"""
+        results = {}
+        for name in model_names:
+            info = self.get(name)
+            if info is not None:
+                results[name] = info
+        return results
+
+    def thumbnail_path(self, key):
+        """预览图的路径（key 不合法或没有预览图时返回 None）"""
+        if not isinstance(key, str) or not _KEY_RE.match(key):
+            return None
+        path = self._path(key, ".webp")
+        return path if os.path.isfile(path) else None
+
+    def is_fresh(self, model_name):
+        """是否已有未过期的记录"""
+        entry = self._index.get(sidecar_key(model_name))
+        return entry is not None and time.time() - entry[2] < REFRESH_TTL
+
+    def store(self, info, thumbnail=None):
+        """保存一条记录（阻塞函数），超过总大小上限时删除最久没有使用的记录"""
+        key = info["key"]
+        info = dict(info, thumbnail=bool(thumbnail))
+        data = json.dumps(info, ensure_ascii=False).encode("utf-8")
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self._path(key, ".json.tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path(key, ".json"))
+        # 重启后按修改时间判断记录是否过期（获取失败的记录为 0，下次搜索时重新获取）
+        os.utime(self._path(key, ".json"), (time.time(), info["updated_at"]))
+        size = len(data)
+        thumbnail_path = self._path(key, ".webp")
+        if thumbnail:
+            with open(thumbnail_path + ".tmp", "wb") as f:
+                f.write(thumbnail)
+            os.replace(thumbnail_path + ".tmp", thumbnail_path)
+            size += len(thumbnail)
+        elif os.path.exists(thumbnail_path):
+            os.remove(thumbnail_path)
+        with self._lock:
+            self._index[key] = [size, time.time(), info["updated_at"]]
+        metrics.incr("sidecar.saved")
+        self.evict()
+        return info
+
+    def evict(self):
+        """总大小超过上限时删除最久没有使用的记录，返回删除的记录数"""
+        with self._lock:
+            total = sum(entry[0] for entry in self._index.values())
+            if total <= self.max_bytes:
+                return 0
+            target = self.max_bytes * EVICT_TO_RATIO
+            removed = []
+            for key, (size, _, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+                if total <= target:
+                    break
+                total -= size
+                removed.append(key)
+                del self._index[key]
+        for key in removed:
+            for ext in (".json", ".webp"):
+                try:
+                    os.remove(self._path(key, ext))
+                except OSError:
+                    pass
+        metrics.incr("sidecar.evicted", len(removed))
+        return len(removed)
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._index)
+            self._index.clear()
+        for key in keys:
+            for ext in (".json", ".webp"):
+                try:
+                    os.remove(self._path(key, ext))
+                except OSError:
+                    pass
+
+    async def _run_blocking(self, func, *args):
+        if self.run_blocking is not None:
+            return await self.run_blocking(func, *args)
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def _fetch_civitai(self, session, sha256):
+        url = CIVITAI_BY_HASH_URL.format(sha256)
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)) as response:
+            if response.status != 200:
+                return None
+            return await response.json()
+
+    async def _fetch_image(self, session, url):
+        # Civitai 的图片服务按地址中的 width 参数返回缩小后的图片
+        url = _CIVITAI_IMAGE_SIZE_RE.sub(f"/width={self.thumbnail_size * 2}/", url, count=1)
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)) as response:
+            if response.status != 200 or (response.content_length or 0) > MAX_IMAGE_BYTES:
+                return None
+            data = bytearray()
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                data.extend(chunk)
+                if len(data) > MAX_IMAGE_BYTES:
+                    return None
+            return bytes(data)
+
+    async def update(self, model_name, links, session=None):
+        """
+        获取并保存模型的信息和预览图
+
+        Returns:
+            保存的信息；搜索结果中没有可用的链接时返回 None
+        """
+        info = build_info(model_name, links)
+        if info is None:
+            return None
+        if session is None:
+            # 使用环境变量中的代理设置（HTTP_PROXY 和 HTTPS_PROXY）
+            async with aiohttp.ClientSession(trust_env=True) as own_session:
+                return await self.update(model_name, links, own_session)
+        thumbnail = None
+        sha256 = info["hashes"].get("SHA256")
+        try:
+            version = await self._fetch_civitai(session, sha256) if sha256 else None
+            image_url = merge_civitai_version(info, version) if version else None
+            if image_url and Image is not None:
+                data = await self._fetch_image(session, image_url)
+                thumbnail = await self._run_blocking(make_thumbnail, data, self.thumbnail_size) if data else None
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            # logger.warning(f"[{model_name}] 获取模型信息失败: {e}")
+            # 网络错误时只保存搜索结果中的信息，下次搜索时重新获取
+            metrics.incr("sidecar.failed")
+            info["updated_at"] = 0
+        return await self._run_blocking(self.store, info, thumbnail)
+
+    def schedule(self, model_name, links):
+        """
+        在后台更新模型的信息（已有未过期的记录或正在更新时跳过，需要在事件循环中调用）
+
+        Returns:
+            是否开始了新的更新
+        """
+        key = sidecar_key(model_name)
+        if key in self._tasks or build_info(model_name, links) is None or self.is_fresh(model_name):
+            return False
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_UPDATES)
+
+        async def run():
+            try:
+                async with self._semaphore:
+                    await self.update(model_name, links)
+            except Exception as e:
+                # logger.warning(f"[{model_name}] 保存模型信息失败: {e}")
+                metrics.incr("sidecar.failed")
+            finally:
+                self._tasks.pop(key, None)
+
+        self._tasks[key] = asyncio.get_running_loop().create_task(run())
+        return True
+
+    def status(self):
+        return {
+            "entries": len(self._index),
+            "total_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "updating": len(self._tasks),
+            "thumbnails": Image is not None,
+        }
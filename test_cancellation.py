@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试请求取消（客户端断开连接时取消搜索，共享的搜索只在所有调用者离开后取消）
+"""
+
+import sys
+import io
+import time
+import asyncio
+
+import aiohttp
+from aiohttp import web
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+from cancellation import CLIENT_CLOSED_STATUS, ClientDisconnected, SingleFlight, cancel_on_disconnect
+from metrics import metrics
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+class SlowSearch:
+    """模拟上游搜索：等待 release 后返回结果，记录开始和被取消的次数"""
+
+    def __init__(self):
+        self.started = 0
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self, name):
+        self.started += 1
+        try:
+            await self.release.wait()
+            return [name]
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+async def test_single_flight():
+    # 测试用例 1: 同一个键的并发调用只执行一次
+    search = SlowSearch()
+    flights = SingleFlight("test.search")
+    callers = [asyncio.ensure_future(flights.run("a", lambda: search("a"))) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    check(search.started == 1 and flights.waiters("a") == 3, "测试用例 1: 三个调用者共享一次搜索")
+
+    # 测试用例 2: 一个调用者离开时，其他调用者仍在等待，搜索继续
+    callers[0].cancel()
+    await asyncio.sleep(0.01)
+    check(search.cancelled == 0 and flights.waiters("a") == 2
+          and metrics.get_counter("test.search.detached") == 1, "测试用例 2: 还有其他调用者时不取消共享的搜索")
+    search.release.set()
+    results = await asyncio.gather(*callers[1:])
+    check(results == [["a"], ["a"]] and len(flights) == 0, "测试用例 2: 剩下的调用者得到同一个结果")
+
+    # 测试用例 3: 所有调用者都离开时取消搜索
+    search = SlowSearch()
+    callers = [asyncio.ensure_future(flights.run("b", lambda: search("b"))) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    for caller in callers:
+        caller.cancel()
+    await asyncio.gather(*callers, return_exceptions=True)
+    await asyncio.sleep(0.01)
+    check(search.cancelled == 1 and metrics.get_counter("test.search.cancelled") == 1 and len(flights) == 0,
+          "测试用例 3: 最后一个调用者离开时取消搜索")
+    search.release.set()
+    check(await flights.run("b", lambda: search("b")) == ["b"] and search.started == 2,
+          "测试用例 3: 取消后再次调用时重新搜索")
+
+    # 测试用例 4: 搜索失败时所有调用者都收到异常
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("上游错误")
+
+    outcomes = await asyncio.gather(flights.run("c", failing), flights.run("c", failing), return_exceptions=True)
+    check(all(isinstance(outcome, ValueError) for outcome in outcomes), "测试用例 4: 异常传给所有调用者")
+
+
+async def test_disconnect():
+    search = SlowSearch()
+    flights = SingleFlight("test.request")
+
+    async def handle(request):
+        try:
+            results = await cancel_on_disconnect(request, flights.run("model", lambda: search("model")),
+                                                 poll_interval=0.05)
+            return web.json_response({"results": results})
+        except ClientDisconnected:
+            return web.Response(status=CLIENT_CLOSED_STATUS)
+
+    app = web.Application()
+    app.router.add_post("/search", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{runner.addresses[0][1]}/search"
+
+    async def request(timeout):
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                return await response.json()
+
+    # 测试用例 5: 客户端中止请求后取消搜索
+    disconnected = metrics.get_counter("requests.disconnected")
+    try:
+        await request(0.2)
+    except asyncio.TimeoutError:
+        pass
+    deadline = time.monotonic() + 2
+    while search.cancelled == 0 and time.monotonic() < deadline:
+        await asyncio.sleep(0.02)
+    check(search.cancelled == 1 and metrics.get_counter("requests.disconnected") == disconnected + 1,
+          "测试用例 5: 客户端断开连接后取消上游搜索")
+
+    # 测试用例 6: 两个客户端共享搜索，其中一个中止时另一个仍然得到结果
+    waiting = asyncio.ensure_future(request(5))
+    await asyncio.sleep(0.05)
+    try:
+        await request(0.2)
+    except asyncio.TimeoutError:
+        pass
+    await asyncio.sleep(0.2)
+    started = search.started
+    search.release.set()
+    data = await waiting
+    check(data == {"results": ["model"]} and search.cancelled == 1 and started == 2,
+          "测试用例 6: 共享搜索的另一个客户端不受影响")
+
+    # 测试用例 7: 正常完成时返回结果
+    check(await request(5) == {"results": ["model"]}, "测试用例 7: 没有断开连接时正常返回")
+
+    await runner.cleanup()
+
+
+async def run_tests():
+    await test_single_flight()
+    await test_disconnect()
+
+
+print("=" * 70)
+print("请求取消测试")
+print("=" * 70)
+print()
+
+asyncio.run(run_tests())
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
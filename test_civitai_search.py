@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试搜索关键词变体和 Civitai 深度搜索（使用本地 HTTP 服务器模拟 Civitai 接口）
+"""
+
+import sys
+import io
+import time
+import asyncio
+
+from aiohttp import web
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+import civitai_search
+from civitai_search import search_civitai_model, search_civitai_model_deep
+from executors import ExecutorBusy
+from name_matcher import generate_query_variants
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+def make_item(model_id, name, file_name):
+    return {
+        "id": model_id,
+        "name": name,
+        "modelVersions": [{
+            "name": "v1",
+            "files": [{"name": file_name, "sizeKB": 1024,
+                       "downloadUrl": f"https://civitai.com/api/download/models/{model_id}"}],
+        }],
+    }
+
+
+def test_query_variants():
+    # 测试用例 1: 去掉修饰词和版本号，从具体到宽泛
+    variants = generate_query_variants("myModel_v1.5-pruned_fp16-000010.safetensors")
+    check(variants == ["myModel_v1.5-pruned_fp16-000010", "my model v1 5", "my model"],
+          f"测试用例 1: 生成三个变体 {variants}")
+    variants = generate_query_variants("flux1-dev-fp8-e4m3fn.safetensors")
+    check(variants[0] == "flux1-dev-fp8-e4m3fn" and all("fp8" not in v and "e4m3fn" not in v for v in variants[1:]),
+          f"测试用例 1: 去掉精度和量化格式 {variants}")
+
+    # 测试用例 2: 没有修饰词时去重，空名称返回空列表
+    check(generate_query_variants("detail.safetensors") == ["detail"], "测试用例 2: 相同的变体只保留一个")
+    check(generate_query_variants("") == [] and generate_query_variants(None) == [], "测试用例 2: 空名称")
+
+
+async def test_deep_search():
+    requests = []
+    slow = {"delay": 0}
+
+    async def models(request):
+        query = request.query.get("query")
+        cursor = request.query.get("cursor", "")
+        requests.append((query, cursor))
+        if query == "hit" and not cursor:
+            items = [make_item(1, "Other Model", "other.safetensors"),
+                     make_item(2, "Detail Tweaker XL", "detail-tweaker-xl.safetensors")]
+            return web.json_response({"items": items, "metadata": {"nextCursor": "next"}})
+        if query != "hit" and slow["delay"]:
+            await asyncio.sleep(slow["delay"])
+        page = int(cursor or 0)
+        items = [make_item(100 + page, f"Page {page}", f"page_{page}.safetensors")]
+        return web.json_response({"items": items, "metadata": {"nextCursor": str(page + 1)}})
+
+    app = web.Application()
+    app.router.add_get("/api/v1/models", models)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    civitai_search.CIVITAI_MODELS_URL = f"http://127.0.0.1:{runner.addresses[0][1]}/api/v1/models"
+
+    # 测试用例 3: 每个变体按 cursor 翻页，达到页数上限后停止，候选合并排序
+    result = await search_civitai_model_deep("myModel_v1.5-pruned_fp16-000010.safetensors", max_pages=3)
+    variants = generate_query_variants("myModel_v1.5-pruned_fp16-000010.safetensors")
+    check(sorted(requests) == sorted((query, cursor) for query in variants for cursor in ("", "1", "2")),
+          f"测试用例 3: 每个变体请求 3 页并传递 cursor（{len(requests)} 个请求）")
+    check(result is not None and result["is_non_exact_match"] and len(result["candidates"]) == 3
+          and result["candidates"][0]["similarity"] >= result["candidates"][-1]["similarity"],
+          "测试用例 3: 同一个文件去重，候选按相似度排序")
+
+    # 测试用例 4: 相似度 >= 0.95 时停止翻页并取消其他变体的请求
+    requests.clear()
+    slow["delay"] = 5
+    original = civitai_search.generate_query_variants
+    civitai_search.generate_query_variants = lambda name: ["hit", "slow a", "slow b"]
+    try:
+        started = time.monotonic()
+        result = await search_civitai_model_deep("detail_tweaker_xl.safetensors", max_pages=3)
+        elapsed = time.monotonic() - started
+    finally:
+        civitai_search.generate_query_variants = original
+    check(result is not None and result["name"] == "Detail Tweaker XL" and not result["is_non_exact_match"]
+          and result["similarity"] >= civitai_search.DEEP_SEARCH_STOP_SIMILARITY,
+          "测试用例 4: 返回相似度最高的文件")
+    check(result["file_name"] == "detail-tweaker-xl.safetensors", "测试用例 4: 结果带有上游文件名")
+    check(elapsed < 2 and ("hit", "next") not in requests,
+          f"测试用例 4: 命中后不再翻页，也不等待其他变体（{elapsed:.2f} 秒）")
+
+    # 测试用例 5: 文件名完全一致时立即命中
+    requests.clear()
+    civitai_search.generate_query_variants = lambda name: ["hit", "slow a"]
+    try:
+        result = await search_civitai_model_deep("other.safetensors")
+    finally:
+        civitai_search.generate_query_variants = original
+    check(result is not None and result["similarity"] == 1.0 and result["name"] == "Other Model",
+          "测试用例 5: 精确匹配的相似度为 1.0")
+
+    # 测试用例 6: 打分线程池繁忙时抛出 ExecutorBusy（不能当作没有找到，否则会缓存不完整的结果）
+    async def busy(*args):
+        raise ExecutorBusy("cpu 线程池繁忙")
+
+    slow["delay"] = 0
+    original_run_cpu = civitai_search.run_cpu
+    civitai_search.run_cpu = busy
+    outcomes = []
+    try:
+        for search in (search_civitai_model, search_civitai_model_deep):
+            try:
+                outcomes.append(await search("nothing_similar.safetensors"))
+            except ExecutorBusy:
+                outcomes.append("busy")
+    finally:
+        civitai_search.run_cpu = original_run_cpu
+    check(outcomes == ["busy", "busy"], f"测试用例 6: 普通搜索和深度搜索都抛出 ExecutorBusy {outcomes}")
+
+    await runner.cleanup()
+
+
+print("=" * 70)
+print("Civitai 深度搜索测试")
+print("=" * 70)
+print()
+
+test_query_variants()
+asyncio.run(test_deep_search())
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
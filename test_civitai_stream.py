@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试 Civitai 响应流式解析功能
+"""
+
+import sys
+import io
+import json
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+from civitai_stream import CivitaiItemStream
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+def make_item(model_id, name, file_names):
+    """构造一个带有大量无关字段的 Civitai 条目"""
+    return {
+        "id": model_id,
+        "name": name,
+        "description": "<p>描述 \"引号\" \\ 反斜杠 {花括号} [方括号]</p>" * 20,
+        "tags": ["a", "b"],
+        "modelVersions": [{
+            "id": model_id * 10,
+            "name": "v1.0",
+            "images": [{"url": "https://example.com/x.png", "meta": {"prompt": "x" * 500}}],
+            "files": [{
+                "name": file_name,
+                "sizeKB": 2048000.5,
+                "downloadUrl": f"https://civitai.com/api/download/models/{model_id}",
+                "hashes": {"SHA256": "ABCDEF"},
+            } for file_name in file_names],
+        }],
+    }
+
+
+def feed_in_chunks(text, chunk_size):
+    """按固定大小分块喂入，返回 (条目列表, 解析器)"""
+    stream = CivitaiItemStream()
+    data = text.encode("utf-8")
+    items = []
+    for i in range(0, len(data), chunk_size):
+        items.extend(stream.feed(data[i:i + chunk_size]))
+    items.extend(stream.close())
+    return items, stream
+
+
+print("=" * 70)
+print("Civitai 流式解析测试")
+print("=" * 70)
+print()
+
+payload = {
+    "items": [
+        make_item(1, "模型一", ["one.safetensors"]),
+        make_item(2, "Model Two", ["two_fp16.safetensors", "two.safetensors"]),
+        make_item(3, "Model Three", ["three.ckpt"]),
+    ],
+    "metadata": {"nextCursor": "abc|123", "pageSize": 3},
+}
+text = json.dumps(payload, ensure_ascii=False)
+
+# 测试用例 1: 不同分块大小下解析结果一致（包括在多字节字符和转义符中间切分）
+for chunk_size in (1, 3, 7, 64, 4096, len(text) * 4):
+    items, stream = feed_in_chunks(text, chunk_size)
+    check(
+        [item["id"] for item in items] == [1, 2, 3] and stream.metadata == payload["metadata"],
+        f"测试用例 1: 分块大小 {chunk_size} 时解析出全部条目和分页元数据"
+    )
+
+# 测试用例 2: 只保留需要的字段
+items, _ = feed_in_chunks(text, 128)
+file_info = items[1]["modelVersions"][0]["files"][1]
+check(
+    set(items[1].keys()) == {"id", "name", "modelVersions"}
+    and set(items[1]["modelVersions"][0].keys()) == {"name", "files"}
+    and file_info == {"name": "two.safetensors", "sizeKB": 2048000.5,
+                      "downloadUrl": "https://civitai.com/api/download/models/2",
+                      "hashes": {"SHA256": "ABCDEF"}},
+    "测试用例 2: 条目只保留 id、名称、版本名称和文件信息"
+)
+
+# 测试用例 3: 条目在完整到达时立即产出（无需等待响应结束）
+stream = CivitaiItemStream()
+data = text.encode("utf-8")
+first_item_end = text.index(', {"id": 2')
+produced = stream.feed(data[:len(text[:first_item_end].encode("utf-8"))])
+check(
+    len(produced) == 1 and produced[0]["id"] == 1 and not stream.finished,
+    "测试用例 3: 第一个条目结束后立即产出，剩余数据未读取"
+)
+
+# 测试用例 4: 空结果
+items, stream = feed_in_chunks('{"items": [], "metadata": {"totalItems": 0}}', 5)
+check(items == [] and stream.finished, "测试用例 4: 空的 items 数组")
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试下载队列（限速、优先级、按目标路径去重、暂停/继续和重启后恢复）
+使用模拟的下载器，不访问网络
+"""
+
+import sys
+import io
+import os
+import json
+import time
+import asyncio
+import tempfile
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+from download_queue import BandwidthLimiter, DownloadQueue, TokenBucket, compute_priority
+from model_downloader import DownloadError
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+class FakeDownloads:
+    """模拟的下载器工厂：每个下载等待 finish(path) 后完成，记录开始和被中断的顺序"""
+
+    def __init__(self):
+        self.started = []
+        self.cancelled = []
+        self.gates = {}
+        self.errors = {}
+
+    def finish(self, path, error=None):
+        if error:
+            self.errors[path] = error
+        self.gates.setdefault(path, asyncio.Event()).set()
+
+    def __call__(self, url, path, **kwargs):
+        fake = self
+
+        class Downloader:
+            async def run(self):
+                fake.started.append(os.path.basename(path))
+                gate = fake.gates.setdefault(path, asyncio.Event())
+                try:
+                    await gate.wait()
+                except asyncio.CancelledError:
+                    fake.cancelled.append(os.path.basename(path))
+                    raise
+                if path in fake.errors:
+                    raise DownloadError(fake.errors.pop(path))
+                return {"size": 10}
+
+        return Downloader()
+
+
+async def settle():
+    """让调度和任务回调执行完"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_rate_limit():
+    # 测试用例 1: 令牌桶允许 1 秒的突发流量，透支时等待补回
+    bucket = TokenBucket(rate=2000)
+    started = time.monotonic()
+    await bucket.consume(2000)
+    burst = time.monotonic() - started
+    await bucket.consume(400)
+    waited = time.monotonic() - started
+    check(burst < 0.05 and 0.15 <= waited < 0.5, f"测试用例 1: 突发不等待（{burst:.3f} 秒），透支等待（{waited:.3f} 秒）")
+    unlimited = TokenBucket(0)
+    started = time.monotonic()
+    await unlimited.consume(10 ** 9)
+    check(time.monotonic() - started < 0.05, "测试用例 1: 速率为 0 时不限速")
+
+    # 测试用例 2: 每个主机单独限速，全局限速对所有主机生效
+    limiter = BandwidthLimiter(global_rate=0, per_host_rate=1000)
+    slow_host = limiter.throttle_for("https://a.example.com/x")
+    other_host = limiter.throttle_for("https://b.example.com/y")
+    await slow_host(1000)
+    started = time.monotonic()
+    await other_host(500)
+    check(time.monotonic() - started < 0.05, "测试用例 2: 一个主机用完额度不影响其他主机")
+    started = time.monotonic()
+    await limiter.throttle_for("https://A.example.com/z")(200)
+    check(time.monotonic() - started >= 0.15, "测试用例 2: 同一个主机（不区分大小写）共享额度")
+    limiter.configure(global_rate=1000, per_host_rate=0)
+    await limiter.throttle_for("https://c.example.com/")(1000)
+    started = time.monotonic()
+    await limiter.throttle_for("https://d.example.com/")(200)
+    check(time.monotonic() - started >= 0.15 and limiter.per_host_rate == 0, "测试用例 2: 全局限速对所有主机生效")
+
+
+async def test_queue(tmpdir):
+    state_path = os.path.join(tmpdir, "queue.json")
+    downloads = FakeDownloads()
+    changes = []
+    queue = DownloadQueue(state_path, max_parallel_jobs=1, downloader_factory=downloads,
+                          on_change=lambda job: changes.append(job["status"]))
+
+    def target(name):
+        return os.path.join(tmpdir, "models", name)
+
+    # 测试用例 3: 优先级：主模型 > VAE > LoRA，未使用的模型排在最后
+    check(compute_priority("Checkpoint") < compute_priority("VAE") < compute_priority("LoRA")
+          < compute_priority("Checkpoint", is_used=False), "测试用例 3: 按模型类型和是否使用计算优先级")
+    lora = queue.enqueue("https://a.example.com/lora", "lora.safetensors", "LoRA", target("lora.safetensors"))
+    unused = queue.enqueue("https://a.example.com/unused", "unused.safetensors", "Checkpoint",
+                           target("unused.safetensors"), is_used=False)
+    vae = queue.enqueue("https://a.example.com/vae", "vae.safetensors", "VAE", target("vae.safetensors"))
+    ckpt = queue.enqueue("https://b.example.com/ckpt", "ckpt.safetensors", "Checkpoint", target("ckpt.safetensors"))
+    check([job["id"] for job in queue.list_jobs()] == [ckpt["id"], vae["id"], lora["id"], unused["id"]],
+          "测试用例 3: 按优先级和加入顺序排列")
+
+    # 测试用例 4: 同一个目标路径只保留一个任务，更高的优先级会提升已有任务
+    again = queue.enqueue("https://mirror.example.com/lora", "lora.safetensors", "LoRA", target("lora.safetensors"))
+    check(again is lora and len(queue.jobs) == 4, "测试用例 4: 重复的目标路径返回已有任务")
+    queue.enqueue("https://a.example.com/lora", "lora.safetensors", "LoRA", target("lora.safetensors"), priority=1)
+    check(lora["priority"] == 1 and [job["id"] for job in queue.list_jobs()][:3] == [ckpt["id"], lora["id"], vae["id"]],
+          "测试用例 4: 提升已有任务的优先级")
+
+    # 测试用例 5: 同时只运行 max_parallel_jobs 个任务，按优先级开始
+    queue.start()
+    await settle()
+    check(downloads.started == ["ckpt.safetensors"] and ckpt["status"] == "downloading"
+          and vae["status"] == "queued", "测试用例 5: 先下载优先级最高的任务")
+    downloads.finish(ckpt["path"])
+    await settle()
+    check(ckpt["status"] == "completed" and ckpt["downloaded"] == 10 and downloads.started[-1] == "lora.safetensors",
+          "测试用例 5: 完成后开始下一个任务")
+
+    # 测试用例 6: 暂停正在下载的任务，下一个任务开始；继续后重新排队
+    await queue.pause(lora["id"])
+    await settle()
+    check(lora["status"] == "paused" and downloads.cancelled == ["lora.safetensors"]
+          and downloads.started[-1] == "vae.safetensors", "测试用例 6: 暂停中断下载并开始下一个任务")
+    queue.resume(lora["id"])
+    await settle()
+    check(lora["status"] == "queued" and vae["status"] == "downloading", "测试用例 6: 继续后等待空闲位置")
+
+    # 测试用例 7: 暂停整个队列，正在下载的任务回到排队状态
+    await queue.pause_all()
+    await settle()
+    check(queue.paused and vae["status"] == "queued" and "vae.safetensors" in downloads.cancelled
+          and not queue._tasks, "测试用例 7: 暂停队列后没有正在下载的任务")
+    queue.resume_all()
+    await settle()
+    check(lora["status"] == "downloading" and vae["status"] == "queued" and downloads.started[-1] == "lora.safetensors",
+          "测试用例 7: 继续队列后按优先级重新开始")
+    downloads.finish(lora["path"])
+    await settle()
+    check(lora["status"] == "completed" and vae["status"] == "downloading", "测试用例 7: 完成后下载剩下的任务")
+
+    # 测试用例 8: 下载失败后可以重新排队
+    downloads.finish(vae["path"], error="哈希不一致")
+    await settle()
+    check(vae["status"] == "failed" and vae["error"] == "哈希不一致" and "failed" in changes,
+          "测试用例 8: 记录失败原因并通知前端")
+    check(queue.enqueue("https://a.example.com/vae", "vae.safetensors", "VAE", vae["path"]) is not vae,
+          "测试用例 8: 失败的任务不阻止同一个路径的新任务")
+
+    # 测试用例 9: 重启后恢复队列，正在下载的任务重新排队
+    await queue.pause_all()
+    await queue.shutdown()
+    # 模拟上次退出时正在下载
+    with open(state_path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    for stored in state["jobs"]:
+        if stored["id"] == unused["id"]:
+            stored["status"] = "downloading"
+    with open(state_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    reloaded = DownloadQueue(state_path, max_parallel_jobs=1, downloader_factory=FakeDownloads())
+    restored = reloaded.get(unused["id"])
+    check(reloaded.paused and len(reloaded.jobs) == len(queue.jobs)
+          and reloaded.get(ckpt["id"])["status"] == "completed" and reloaded.get(vae["id"])["status"] == "failed",
+          "测试用例 9: 恢复所有任务和暂停状态")
+    check(restored["status"] == "queued" and restored["priority"] == unused["priority"] and restored["speed"] == 0,
+          "测试用例 9: 上次正在下载的任务重新排队")
+    new_job = reloaded.enqueue("https://a.example.com/new", "new.safetensors", "LoRA", target("new.safetensors"))
+    check(new_job["seq"] > max(job["seq"] for job in queue.jobs.values()), "测试用例 9: 加入顺序继续递增")
+    await reloaded.shutdown()
+
+
+async def test_save(tmpdir):
+    # 测试用例 10: 队列文件在线程池中写入，同一时刻的多次变化合并为一次写入
+    state_path = os.path.join(tmpdir, "save", "queue.json")
+    writes = []
+
+    async def run_blocking(func, *args):
+        writes.append(len(args[1]["jobs"]))
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    queue = DownloadQueue(state_path, downloader_factory=FakeDownloads(), run_blocking=run_blocking)
+    for index in range(3):
+        queue.enqueue(f"https://a.example.com/{index}", f"{index}.safetensors", "LoRA",
+                      os.path.join(tmpdir, "save", f"{index}.safetensors"))
+    check(not os.path.exists(state_path), "测试用例 10: 不在事件循环中同步写文件")
+    await queue.flush()
+    with open(state_path, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    check(writes == [3] and len(saved["jobs"]) == 3, f"测试用例 10: 三次变化合并为一次写入 {writes}")
+    queue.clear_finished()
+    await queue.shutdown()
+    check(writes[-1] == 3 and len(writes) == 2, "测试用例 10: 关闭时等待最后一次写入完成")
+
+
+async def run_tests(tmpdir):
+    await test_rate_limit()
+    await test_queue(tmpdir)
+    await test_save(tmpdir)
+
+
+print("=" * 70)
+print("下载队列测试")
+print("=" * 70)
+print()
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    asyncio.run(run_tests(tmpdir))
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
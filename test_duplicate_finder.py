@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试重复模型查找功能
+"""
+
+import sys
+import io
+import os
+import tempfile
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+import duplicate_finder
+from duplicate_finder import find_duplicates, dedupe
+
+# 测试时使用更小的边缘大小，让小文件也会经过三个阶段
+duplicate_finder.EDGE_SIZE = 4096
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+print("=" * 70)
+print("重复模型查找功能测试")
+print("=" * 70)
+print()
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    checkpoints = os.path.join(tmpdir, "checkpoints")
+    loras = os.path.join(tmpdir, "extra", "loras")
+    payload = os.urandom(64 * 1024)
+    # 开头和结尾相同、中间不同的文件只能在完整哈希阶段区分
+    middle_changed = bytearray(payload)
+    middle_changed[32 * 1024] ^= 0xFF
+
+    write(os.path.join(checkpoints, "model.safetensors"), payload)
+    write(os.path.join(checkpoints, "sub", "model_copy.safetensors"), payload)
+    write(os.path.join(loras, "model.safetensors"), payload)
+    write(os.path.join(loras, "middle.safetensors"), bytes(middle_changed))
+    write(os.path.join(loras, "other.safetensors"), os.urandom(64 * 1024))
+    write(os.path.join(loras, "small.safetensors"), payload[:100])
+
+    # 测试用例 1: 找出三个相同的文件，不同内容的文件不算重复
+    report = find_duplicates([checkpoints, loras], min_size=1024, workers=2)
+    check(len(report["groups"]) == 1 and len(report["groups"][0]["files"]) == 3,
+          "测试用例 1: 找到 1 组 3 个重复文件")
+    check(report["reclaimable_bytes"] == 2 * len(payload),
+          f"测试用例 1: 可释放 {report['reclaimable_bytes']} 字节")
+    check(report["scanned_files"] == 5, "测试用例 1: 小于 min_size 的文件被忽略")
+
+    # 测试用例 2: 默认只预演，不修改文件
+    result = dedupe(report, "hardlink")
+    check(result["dry_run"] and len(result["replaced"]) == 2
+          and os.stat(os.path.join(loras, "model.safetensors")).st_nlink == 1,
+          "测试用例 2: 预演时不修改文件")
+
+    # 测试用例 3: 替换为硬链接后内容不变，再次扫描不再报告重复
+    result = dedupe(report, "hardlink", dry_run=False)
+    replaced = result["replaced"][0]["duplicate"]
+    with open(replaced, "rb") as f:
+        content = f.read()
+    check(not result["errors"] and content == payload and os.stat(replaced).st_nlink == 3,
+          "测试用例 3: 重复文件被替换为硬链接")
+    report = find_duplicates([checkpoints, loras], min_size=1024, workers=2)
+    check(report["duplicate_files"] == 0, "测试用例 3: 替换后再次扫描没有重复文件")
+
+    # 测试用例 4: 符号链接
+    write(os.path.join(loras, "copy2.safetensors"), payload[:50 * 1024])
+    write(os.path.join(checkpoints, "copy2.safetensors"), payload[:50 * 1024])
+    report = find_duplicates([checkpoints, loras], min_size=1024, workers=2)
+    result = dedupe(report, "symlink", dry_run=False)
+    check(len(result["replaced"]) == 1 and os.path.islink(result["replaced"][0]["duplicate"]),
+          "测试用例 4: 重复文件被替换为符号链接")
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试有界线程池（繁忙时拒绝、取消后的计数）、运行指标和事件循环卡顿监控
+"""
+
+import sys
+import io
+import time
+import asyncio
+import threading
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+from executors import BoundedExecutor, ExecutorBusy, io_executor, run_hash, run_io
+from loop_watchdog import LoopWatchdog
+from metrics import Metrics, metrics
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+async def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    return condition()
+
+
+async def test_bounded_executor():
+    executor = BoundedExecutor("test", max_workers=1, max_queue=1)
+    release = threading.Event()
+    ran = []
+
+    def blocking(name):
+        release.wait(5)
+        ran.append(name)
+        return name
+
+    # 测试用例 1: 执行中 + 等待中的任务达到上限时拒绝新任务
+    running = asyncio.ensure_future(executor.run(blocking, "running"))
+    waiting = asyncio.ensure_future(executor.run(blocking, "waiting"))
+    await asyncio.sleep(0.05)
+    try:
+        await executor.run(blocking, "rejected")
+        rejected = False
+    except ExecutorBusy:
+        rejected = True
+    check(rejected and executor.pending == 2 and metrics.get_counter("executor.test.rejected") == 1,
+          "测试用例 1: 线程池已满时抛出 ExecutorBusy")
+
+    # 测试用例 2: 取消等待中的任务后释放位置，任务不再执行
+    waiting.cancel()
+    await asyncio.gather(waiting, return_exceptions=True)
+    check(executor.pending == 1 and metrics.get_counter("executor.test.cancelled") == 1,
+          "测试用例 2: 取消后等待中的任务数减少")
+    accepted = asyncio.ensure_future(executor.run(lambda: "accepted"))
+    await asyncio.sleep(0.05)
+    check(executor.pending == 2, "测试用例 2: 取消后可以加入新任务")
+
+    # 测试用例 3: 取消执行中的任务，线程执行完后结果被丢弃
+    running.cancel()
+    await asyncio.gather(running, return_exceptions=True)
+    check(executor.pending == 1 and running.cancelled(), "测试用例 3: 调用方被取消后不再计入")
+    release.set()
+    check(await accepted == "accepted", "测试用例 3: 之后的任务正常执行")
+    check(await wait_until(lambda: ran == ["running"]) and executor.pending == 0,
+          f"测试用例 3: 已经开始的任务执行完，被取消的等待任务没有执行 {ran}")
+
+    # 测试用例 4: 异常传给调用方，计数恢复
+    def failing():
+        raise ValueError("失败")
+
+    try:
+        await executor.run(failing)
+        raised = False
+    except ValueError:
+        raised = True
+    check(raised and executor.pending == 0 and executor.status()["pending"] == 0, "测试用例 4: 异常后计数恢复")
+    executor.shutdown()
+
+
+async def test_hash_executor():
+    # 测试用例 5: 同时计算的哈希数达到 I/O 线程数时，I/O 任务不受影响（哈希在单独的线程池中排队）
+    release = threading.Event()
+    hashing = [asyncio.ensure_future(run_hash(release.wait, 5)) for _ in range(io_executor.max_workers)]
+    await asyncio.sleep(0.05)
+    started = time.monotonic()
+    result = await run_io(lambda: "listed")
+    elapsed = time.monotonic() - started
+    release.set()
+    await asyncio.gather(*hashing)
+    check(result == "listed" and elapsed < 0.5, f"测试用例 5: 哈希任务不占用 I/O 线程池（{elapsed:.3f} 秒）")
+
+
+def test_metrics():
+    # 测试用例 6: 计数器、耗时统计和事件
+    local = Metrics(max_events=2)
+    local.incr("a")
+    local.incr("a", 2)
+    local.observe("t", 0.1)
+    local.observe("t", 0.3)
+    for index in range(3):
+        local.record_event("e", {"index": index})
+    snapshot = local.snapshot()
+    check(snapshot["counters"] == {"a": 3} and snapshot["timings"]["t"]["count"] == 2
+          and snapshot["timings"]["t"]["max_ms"] == 300.0 and abs(snapshot["timings"]["t"]["avg_ms"] - 200.0) < 1e-6,
+          "测试用例 6: 计数器和耗时统计")
+    check([event["index"] for event in snapshot["events"]["e"]] == [1, 2], "测试用例 6: 只保留最近的事件")
+
+
+def block_event_loop(seconds):
+    """在事件循环线程中阻塞"""
+    time.sleep(seconds)
+
+
+async def test_watchdog():
+    loop = asyncio.get_running_loop()
+    watchdog = LoopWatchdog(loop, threshold_ms=100)
+    watchdog.start()
+    stalls = metrics.get_counter("loop.stalls")
+
+    # 测试用例 7: 记录卡顿的持续时间和调用栈
+    await asyncio.sleep(0.1)
+    block_event_loop(0.4)
+    await wait_until(lambda: watchdog.stalls == 1)
+    event = metrics.snapshot()["events"].get("loop_stall", [{}])[-1]
+    check(watchdog.stalls == 1 and metrics.get_counter("loop.stalls") == stalls + 1, "测试用例 7: 检测到一次卡顿")
+    check(event.get("duration_ms", 0) >= 200 and "block_event_loop" in (event.get("culprit") or ""),
+          f"测试用例 7: 记录持续时间和阻塞的函数 {event.get('duration_ms')} {event.get('culprit')}")
+
+    # 测试用例 8: 正常运行时不记录
+    await asyncio.sleep(0.3)
+    check(watchdog.stalls == 1, "测试用例 8: 没有卡顿时不记录")
+
+    # 测试用例 9: 卡顿发生在请求处理函数中时记录处理函数
+    async def slow_handler(request):
+        block_event_loop(0.4)
+        return web.Response(text="ok")
+
+    app = web.Application(middlewares=[watchdog.middleware])
+    app.router.add_get("/slow", slow_handler)
+    async with TestClient(TestServer(app)) as client:
+        response = await client.get("/slow")
+        await wait_until(lambda: watchdog.stalls == 2)
+    event = metrics.snapshot()["events"]["loop_stall"][-1]
+    check(response.status == 200 and watchdog.stalls == 2 and event["handler"].startswith("test_watchdog.<locals>.slow_handler")
+          and "GET /slow" in event["handler"], f"测试用例 9: 记录处理函数 {event['handler']}")
+
+    watchdog.stop()
+    check(not watchdog.running, "测试用例 9: 停止监控")
+
+
+async def run_tests():
+    await test_bounded_executor()
+    await test_hash_executor()
+    test_metrics()
+    await test_watchdog()
+
+
+print("=" * 70)
+print("线程池和事件循环监控测试")
+print("=" * 70)
+print()
+
+asyncio.run(run_tests())
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
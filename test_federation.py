@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试多节点模型清单同步功能（在本机启动多个实例）
+"""
+
+import sys
+import io
+import asyncio
+
+from aiohttp import web
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+import federation as federation_module
+from federation import Federation, InventoryLog, check_settings, INVENTORY_PATH, TOKEN_HEADER
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+class Instance:
+    """一个本机实例：独立的清单、Federation 和 HTTP 服务器（与 server.py 中的路由相同）"""
+
+    def __init__(self, name, entries, token="farm"):
+        self.entries = dict(entries)
+        self.federation = Federation(lambda: dict(self.entries), name, enabled=True, node_name=name, token=token,
+                                     sync_interval=3600)
+        self.runner = None
+        self.url = None
+
+    async def start(self):
+        async def receive(request):
+            status, body = self.federation.handle_push(await request.json(), request.headers.get(TOKEN_HEADER))
+            return web.json_response(body, status=status)
+
+        app = web.Application()
+        app.router.add_post(INVENTORY_PATH, receive)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}"
+        self.federation.configure(public_url=self.url)
+
+    async def restart(self):
+        """模拟重启：新的 epoch，收到的其他节点清单丢失"""
+        federation = Federation(self.federation.collect, self.federation.node_id, enabled=True,
+                                node_name=self.federation.node_name,
+                                public_url=self.url, peers=self.federation.peers, token=self.federation.token,
+                                sync_interval=3600)
+        self.federation = federation
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+WORKFLOW_MODELS = [
+    {"name": "sd_xl_base_1.0.safetensors", "type": "主模型"},
+    {"name": "detail.safetensors", "type": "LoRA"},
+    {"name": "4x-UltraSharp.pth", "type": "放大模型"},
+]
+
+
+async def run_tests():
+    base = {
+        "checkpoints/sd_xl_base_1.0.safetensors": [6938078334, "aa" * 32],
+        "loras/detail.safetensors": [151110122, None],
+        "upscale_models/4x-UltraSharp.pth": [66961958, None],
+    }
+    worker_a = Instance("worker-a", base)
+    worker_b = Instance("worker-b", {key: value for key, value in base.items() if not key.startswith("loras/")})
+    coordinator = Instance("coordinator", {"loras/sub/detail.safetensors": [151110122, None]})
+    for instance in (worker_a, worker_b, coordinator):
+        await instance.start()
+    for worker in (worker_a, worker_b):
+        worker.federation.configure(peers=[coordinator.url])
+
+    # 测试用例 1: 第一次同步发送完整清单
+    pushed = [await worker.federation.sync_once() for worker in (worker_a, worker_b)]
+    nodes = {node["name"]: node for node in coordinator.federation.status()["nodes"]}
+    state = worker_a.federation.status()["peers"][0]
+    check(pushed == [1, 1] and nodes["worker-a"]["entries"] == 3 and nodes["worker-b"]["entries"] == 2,
+          "测试用例 1: 协调节点收到两个节点的完整清单")
+    check(state["full_sent"] == 1 and state["delta_sent"] == 0 and state["acked"] == 1, "测试用例 1: 推送状态")
+
+    # 测试用例 2: 检查工作流在哪些节点上可以运行（与 API 相同，检查前先读取本机清单）
+    await coordinator.federation.refresh_local()
+    report = coordinator.federation.check(WORKFLOW_MODELS)
+    by_name = {node["name"]: node for node in report["nodes"]}
+    check(report["ready"] == ["worker-a"], f"测试用例 2: 只有 worker-a 有全部模型 -> {report['ready']}")
+    check([model["name"] for model in by_name["worker-b"]["missing"]] == ["detail.safetensors"]
+          and len(by_name["coordinator"]["missing"]) == 2 and by_name["coordinator"]["self"],
+          "测试用例 2: 每个节点缺少的文件（子目录中的文件按文件名匹配）")
+
+    # 测试用例 3: 之后只发送变化
+    worker_b.entries["loras/detail.safetensors"] = [151110122, None]
+    del worker_b.entries["upscale_models/4x-UltraSharp.pth"]
+    worker_b.entries["checkpoints/sd_xl_base_1.0.safetensors"] = [6938078334, "bb" * 32]
+    await worker_b.federation.sync_once()
+    state = worker_b.federation.status()["peers"][0]
+    report = coordinator.federation.check(WORKFLOW_MODELS)
+    by_name = {node["name"]: node for node in report["nodes"]}
+    check(state["delta_sent"] == 1 and state["acked"] == 2
+          and [model["name"] for model in by_name["worker-b"]["missing"]] == ["4x-UltraSharp.pth"],
+          "测试用例 3: 增量同步（添加、删除和修改）")
+    conflicts = {conflict["name"] for conflict in report["conflicts"]}
+    check(conflicts == {"sd_xl_base_1.0.safetensors"}, f"测试用例 3: 同名文件的哈希不同 -> {conflicts}")
+    await worker_b.federation.sync_once()
+    state = worker_b.federation.status()["peers"][0]
+    check(state["delta_sent"] == 2 and state["full_sent"] == 1, "测试用例 3: 没有变化时只发送空的增量")
+
+    # 测试用例 4: 协调节点重启后，增量被拒绝，自动改为发送完整清单
+    await coordinator.restart()
+    worker_a.entries["loras/new.safetensors"] = [1024, None]
+    pushed = await worker_a.federation.sync_once()
+    state = worker_a.federation.status()["peers"][0]
+    nodes = {node["name"]: node for node in coordinator.federation.status()["nodes"]}
+    check(pushed == 1 and state["full_sent"] == 2 and nodes["worker-a"]["entries"] == 4,
+          "测试用例 4: 对方重启后重新发送完整清单")
+
+    # 测试用例 5: 发送方重启（新的 epoch）时发送完整清单
+    await worker_b.restart()
+    worker_b.federation.configure(peers=[coordinator.url])
+    await worker_b.federation.sync_once()
+    state = worker_b.federation.status()["peers"][0]
+    nodes = {node["name"]: node for node in coordinator.federation.status()["nodes"]}
+    check(state["full_sent"] == 1 and nodes["worker-b"]["entries"] == 2, "测试用例 5: 发送方重启后发送完整清单")
+
+    # 测试用例 6: 令牌
+    secure = Instance("secure", {}, token="secret")
+    await secure.start()
+    worker_a.federation.configure(peers=[secure.url])
+    pushed = await worker_a.federation.sync_once()
+    check(pushed == 0 and "401" in (worker_a.federation.status()["peers"][0]["last_error"] or ""),
+          "测试用例 6: 令牌不正确时拒绝")
+    worker_a.federation.configure(token="secret")
+    check(await worker_a.federation.sync_once() == 1, "测试用例 6: 令牌正确时接受")
+
+    # 测试用例 7: 无法连接的节点不影响其他节点
+    worker_a.federation.configure(peers=[secure.url, "http://127.0.0.1:1"])
+    check(await worker_a.federation.sync_once() == 1, "测试用例 7: 无法连接的节点记录错误")
+
+    # 测试用例 8: 没有令牌时不启用，不接收清单
+    open_node = Federation(lambda: {}, "open", enabled=True, token="")
+    status, _ = open_node.handle_push({"node_id": "x", "epoch": "e", "version": 1, "full": True, "added": {}})
+    check(not open_node.enabled and status == 404, "测试用例 8: 没有令牌时不启用，推送返回 404")
+    secure.federation.configure(enabled=False)
+    worker_a.federation.configure(peers=[secure.url])
+    check(await worker_a.federation.sync_once() == 0
+          and "404" in (worker_a.federation.status()["peers"][0]["last_error"] or ""), "测试用例 8: 关闭后拒绝推送")
+    try:
+        check_settings({"enabled": True, "token": "  "})
+        rejected = False
+    except ValueError:
+        rejected = True
+    check(rejected, "测试用例 8: 设置中启用但没有令牌时拒绝")
+
+    for instance in (worker_a, worker_b, coordinator, secure):
+        await instance.stop()
+
+
+def test_validation():
+    node = Federation(lambda: {}, "self", enabled=True, token="farm")
+
+    def push(added, node_id="peer", full=True, base=0, version=1, removed=None):
+        return node.handle_push({"node_id": node_id, "epoch": "e", "base": base, "version": version, "full": full,
+                                 "added": added, "removed": removed or []}, "farm")[0]
+
+    # 测试用例 9: 拒绝格式不正确的条目，不修改已持有的清单
+    check(push({"loras/a.safetensors": [10, "ab" * 32]}) == 200, "测试用例 9: 接受正确的条目")
+    for bad in ({"loras/a.safetensors": []}, {"loras/a.safetensors": ["10", None]},
+                {"loras/a.safetensors": [-1, None]}, {"loras/a.safetensors": [True, None]},
+                {"loras/a.safetensors": [10, "not-a-hash"]}, {"loras/a.safetensors": 10},
+                {"a.safetensors": [10, None]}):
+        check(push(bad, full=False, base=1, version=2) == 400, f"测试用例 9: 拒绝 {bad}")
+    entries = node.remote.nodes()[0]["entries"]
+    check(node.remote.nodes()[0]["version"] == 1 and entries == {"loras/a.safetensors": [10, "ab" * 32]},
+          "测试用例 9: 被拒绝的增量没有修改清单")
+
+    # 测试用例 10: 节点数和条目数的上限
+    original = federation_module.MAX_NODES, federation_module.MAX_ENTRIES
+    federation_module.MAX_NODES, federation_module.MAX_ENTRIES = 2, 3
+    try:
+        check(push({}, node_id="second") == 200 and push({}, node_id="third") == 400 and len(node.remote) == 2,
+              "测试用例 10: 节点数达到上限时拒绝新节点")
+        many = {f"loras/{i}.safetensors": [i, None] for i in range(3)}
+        check(push(many, full=False, base=1, version=2) == 400, "测试用例 10: 增量超过条目数上限时拒绝")
+        check(push(many, full=False, base=1, version=2, removed=["loras/a.safetensors"]) == 200,
+              "测试用例 10: 先删除的条目不计入上限")
+    finally:
+        federation_module.MAX_NODES, federation_module.MAX_ENTRIES = original
+
+
+print("=" * 70)
+print("多节点模型清单同步功能测试")
+print("=" * 70)
+print()
+
+# 测试用例 0: 变化记录不够时发送完整清单
+log = InventoryLog(max_log=2)
+for index in range(4):
+    log.update({f"loras/{i}.safetensors": [i, None] for i in range(index + 1)})
+check(log.delta(3, log.epoch)["full"] is False and log.delta(1, log.epoch)["full"] is True
+      and log.delta(4, "other")["full"] is True, "测试用例 0: 变化记录只保留最近的版本")
+delta = log.delta(2, log.epoch)
+check(sorted(delta["added"]) == ["loras/2.safetensors", "loras/3.safetensors"] and delta["removed"] == [],
+      "测试用例 0: 合并多个版本的变化")
+
+asyncio.run(run_tests())
+test_validation()
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
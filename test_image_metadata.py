@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试图片元数据读取功能
+"""
+
+import sys
+import io
+import os
+import json
+import zlib
+import struct
+import tempfile
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+import image_metadata
+from image_metadata import read_embedded_texts, read_workflow, extract_models_from_file, benchmark
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+def png_chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+def make_png(chunks, pixels=b"\x00\x00"):
+    """生成 PNG，chunks 为 [(块类型, 数据)]，放在 IDAT 之前"""
+    data = b"\x89PNG\r\n\x1a\n" + png_chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 0, 0, 0, 0))
+    for chunk_type, chunk_data in chunks:
+        data += png_chunk(chunk_type, chunk_data)
+    return data + png_chunk(b"IDAT", zlib.compress(pixels)) + png_chunk(b"IEND", b"")
+
+
+def text_chunk(key, value):
+    return b"tEXt", key.encode("latin-1") + b"\x00" + value.encode("utf-8")
+
+
+def make_webp(texts):
+    """生成带 EXIF 块的 WebP（与 ComfyUI 相同，文本写在 IFD0 中，格式为 "键:文本"）"""
+    values = [f"{key}:{value}".encode("utf-8") + b"\x00" for key, value in texts.items()]
+    entries = b""
+    offset = 8 + 2 + 12 * len(values) + 4
+    payload = b""
+    for tag, value in zip((0x0110, 0x010f), values):
+        entries += struct.pack("<HHII", tag, 2, len(value), offset + len(payload))
+        payload += value
+    exif = b"II*\x00" + struct.pack("<I", 8) + struct.pack("<H", len(values)) + entries + b"\x00" * 4 + payload
+    chunks = b"VP8 " + struct.pack("<I", 3) + b"\x00\x00\x00\x00"
+    chunks += b"EXIF" + struct.pack("<I", len(exif)) + exif + (b"\x00" if len(exif) & 1 else b"")
+    return b"RIFF" + struct.pack("<I", 4 + len(chunks)) + b"WEBP" + chunks
+
+
+WORKFLOW = {"nodes": [{"id": 1, "type": "CheckpointLoaderSimple", "mode": 0,
+                       "widgets_values": ["sd_xl_base_1.0.safetensors"]}]}
+PROMPT = {"3": {"class_type": "LoraLoader", "inputs": {"lora_name": "detail.safetensors"}}}
+
+print("=" * 70)
+print("图片元数据读取功能测试")
+print("=" * 70)
+print()
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    def write(name, data):
+        path = os.path.join(tmpdir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    # 测试用例 1: tEXt（ComfyUI 先写 prompt，再写 workflow）
+    path = write("text.png", make_png([
+        text_chunk("parameters", "a cat"),
+        text_chunk("prompt", json.dumps(PROMPT)),
+        text_chunk("workflow", json.dumps(WORKFLOW)),
+    ]))
+    texts = read_embedded_texts(path)
+    check(sorted(texts) == ["prompt", "workflow"], "测试用例 1: 只读取 workflow 和 prompt")
+    check(read_workflow(path) == WORKFLOW, "测试用例 1: 优先使用 workflow")
+    models = extract_models_from_file(path)
+    check([model["name"] for model in models] == ["sd_xl_base_1.0.safetensors"], "测试用例 1: 提取模型")
+
+    # 测试用例 2: zTXt 和压缩的 iTXt
+    path = write("compressed.png", make_png([
+        (b"zTXt", b"prompt\x00\x00" + zlib.compress(json.dumps(PROMPT).encode("utf-8"))),
+        (b"iTXt", b"workflow\x00\x01\x00\x00\x00" + zlib.compress(json.dumps(WORKFLOW).encode("utf-8"))),
+    ]))
+    texts = read_embedded_texts(path)
+    check(json.loads(texts["prompt"]) == PROMPT and json.loads(texts["workflow"]) == WORKFLOW,
+          "测试用例 2: 解压 zTXt 和 iTXt")
+    path = write("itxt.png", make_png([(b"iTXt", b"workflow\x00\x00\x00zh\x00\xe5\xb7\xa5\xe4\xbd\x9c\xe6\xb5\x81\x00"
+                                        + json.dumps(WORKFLOW, ensure_ascii=False).encode("utf-8"))]))
+    check(read_workflow(path) == WORKFLOW, "测试用例 2: 未压缩的 iTXt（带语言标签）")
+
+    # 测试用例 2: 解压后超过上限的块被忽略（不解压整个块）
+    original = image_metadata.MAX_TEXT_BYTES
+    image_metadata.MAX_TEXT_BYTES = 64 * 1024
+    try:
+        bomb = zlib.compress(b"{" + b" " * (1024 * 1024) + b"}")
+        path = write("bomb.png", make_png([
+            (b"zTXt", b"workflow\x00\x00" + bomb),
+            (b"iTXt", b"workflow\x00\x01\x00\x00\x00" + bomb),
+            text_chunk("prompt", json.dumps(PROMPT)),
+        ]))
+        texts = read_embedded_texts(path)
+    finally:
+        image_metadata.MAX_TEXT_BYTES = original
+    check(list(texts) == ["prompt"] and len(bomb) < image_metadata.MAX_TEXT_BYTES,
+          "测试用例 2: 忽略解压后过大的 zTXt 和 iTXt，继续读取其他块")
+
+    # 测试用例 3: 找到 workflow 后停止（后面损坏的块不影响结果）
+    data = make_png([text_chunk("workflow", json.dumps(WORKFLOW))], pixels=os.urandom(4096))
+    broken = data[:-12] + struct.pack(">I", 0x7FFFFFFF) + b"zTXt"
+    path = write("stop.png", make_png([text_chunk("workflow", json.dumps(WORKFLOW)),
+                                       (b"zTXt", b"prompt\x00\x00not zlib")]))
+    check(read_workflow(path) == WORKFLOW, "测试用例 3: 找到 workflow 后不再解析后面的块")
+    path = write("truncated.png", broken)
+    check(read_workflow(path) == WORKFLOW, "测试用例 3: 文件被截断时返回已读取的内容")
+
+    # 测试用例 4: WebP EXIF
+    path = write("image.webp", make_webp({"prompt": json.dumps(PROMPT), "workflow": json.dumps(WORKFLOW)}))
+    texts = read_embedded_texts(path)
+    check(json.loads(texts["workflow"]) == WORKFLOW and json.loads(texts["prompt"]) == PROMPT,
+          "测试用例 4: 读取 WebP EXIF 中的 workflow 和 prompt")
+    path = write("prompt.webp", make_webp({"prompt": json.dumps(PROMPT)}))
+    check([model["name"] for model in extract_models_from_file(path)] == ["detail.safetensors"],
+          "测试用例 4: 只有 prompt 时从 prompt 中提取模型")
+
+    # 测试用例 5: 没有元数据、不支持的文件
+    empty = write("empty.png", b"")
+    plain = write("plain.png", make_png([]))
+    other = write("other.webp", b"not an image at all")
+    check(read_workflow(empty) is None and read_workflow(plain) is None and read_workflow(other) is None,
+          "测试用例 5: 没有工作流时返回 None")
+
+    # 测试用例 6: 读取速度
+    paths = [write(f"bench_{index}.png", make_png([text_chunk("workflow", json.dumps(WORKFLOW))],
+                                                  pixels=os.urandom(64 * 1024)))
+             for index in range(200)]
+    result = benchmark(paths, models=True)
+    check(result["with_workflow"] == 200 and result["failed"] == 0,
+          f"测试用例 6: 每秒读取 {result['files_per_second']:.0f} 个文件")
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
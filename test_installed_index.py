@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试已安装模型名称索引（前缀、子串、分词搜索和增量更新）
+"""
+
+import sys
+import io
+import time
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+from installed_index import InstalledModelIndex
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+def names(results):
+    return [result["name"] for result in results]
+
+
+print("=" * 70)
+print("已安装模型索引测试")
+print("=" * 70)
+print()
+
+listing = {
+    "loras": ["detail_tweaker.safetensors", "style/add_detail.safetensors", "Detail.safetensors",
+              "pixel-art-xl.safetensors", "ab.pt"],
+    "checkpoints": ["sd_xl_base_1.0.safetensors", "details_v2.safetensors"],
+}
+index = InstalledModelIndex(list_files=lambda: listing)
+index.refresh()
+
+# 测试用例 1: 完全匹配（不含扩展名）排在最前面，然后是前缀匹配，最后是单词开头匹配
+results = names(index.search("detail", folders=["loras"]))
+check(results == ["Detail.safetensors", "detail_tweaker.safetensors", "style/add_detail.safetensors"],
+      f"测试用例 1: 排序和目录过滤 -> {results}")
+
+# 测试用例 2: 子串匹配（三元组倒排表）和分词匹配
+check(names(index.search("xel-ar")) == ["pixel-art-xl.safetensors"], "测试用例 2a: 子串匹配")
+check(names(index.search("xl pixel")) == ["pixel-art-xl.safetensors"], "测试用例 2b: 分词匹配（顺序无关）")
+check(names(index.search("ab")) == ["ab.pt"] and index.search("zzz") == [], "测试用例 2c: 短搜索词和没有结果")
+
+# 测试用例 3: 增量更新（添加和删除的文件）
+listing["loras"] = ["detail_tweaker.safetensors", "new_lora.safetensors"]
+index.invalidate()
+index.refresh()
+check(names(index.search("detail", folders=["loras"])) == ["detail_tweaker.safetensors"]
+      and names(index.search("new")) == ["new_lora.safetensors"] and len(index) == 4,
+      f"测试用例 3: 增量更新 -> {index.stats()}")
+
+# 测试用例 4: 间隔内不重新读取目录
+check(index.refresh() is False and index.refresh(force=True) is True, "测试用例 4: 刷新间隔")
+
+# 测试用例 4b: 版本只在文件增删时变化
+version = index.version()
+index.refresh(force=True)
+same = index.version() == version
+listing["loras"].append("another.safetensors")
+index.refresh(force=True)
+changed = index.version() != version
+listing["loras"].remove("another.safetensors")
+index.refresh(force=True)
+check(same and changed and index.version() == version, "测试用例 4b: 已安装模型列表的版本")
+
+# 测试用例 5: 大目录的性能
+big = {"loras": [f"character_{i:05d}_v{i % 7}.safetensors" for i in range(60000)]}
+index = InstalledModelIndex(list_files=lambda: big)
+start = time.time()
+index.refresh()
+build_time = time.time() - start
+start = time.time()
+for query in ("character_1234", "1234_v", "v3 0042", "zzz"):
+    index.search(query, limit=20)
+query_time = (time.time() - start) / 4
+check(names(index.search("character_01234"))[0] == "character_01234_v2.safetensors"
+      and query_time < 0.05,
+      f"测试用例 5: 60000 个文件，建立 {build_time:.2f}s，每次查询 {query_time * 1000:.1f}ms")
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
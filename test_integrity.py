@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试模型完整性校验功能
+"""
+
+import sys
+import io
+import os
+import time
+import asyncio
+import hashlib
+import tempfile
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+from integrity import HashCache, IntegrityVerifier, expected_from_links, sha256_file, verify_file
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+def write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+print("=" * 70)
+print("模型完整性校验功能测试")
+print("=" * 70)
+print()
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    payload = os.urandom(100 * 1024 + 7)
+    digest = hashlib.sha256(payload).hexdigest()
+    good = os.path.join(tmpdir, "good.safetensors")
+    truncated = os.path.join(tmpdir, "truncated.safetensors")
+    flipped = os.path.join(tmpdir, "flipped.safetensors")
+    write(good, payload)
+    write(truncated, payload[:50 * 1024])
+    changed = bytearray(payload)
+    changed[1000] ^= 0xFF
+    write(flipped, bytes(changed))
+
+    # 测试用例 1: 流式哈希
+    check(sha256_file(good, read_size=4096) == digest, "测试用例 1: 分块计算的哈希与一次计算的相同")
+
+    # 测试用例 2: 从搜索结果中取上游信息
+    links = [
+        {"source": "Civitai", "is_non_exact_match": True, "file_name": "good_fp16.safetensors",
+         "sha256": "aa", "file_size": 10},
+        {"source": "Google", "url": "https://www.google.com"},
+        {"source": "Hugging Face", "file_name": "Good.safetensors", "sha256": digest.upper(), "file_size": len(payload)},
+    ]
+    expected = expected_from_links(links, "loras/good.safetensors")
+    check(expected == {"source": "Hugging Face", "sha256": digest, "size": len(payload), "size_exact": True},
+          "测试用例 2: 只使用文件名一致的文件（不含子目录，不区分大小写），跳过 Google 结果")
+    check(expected_from_links([{"source": "Google"}], "good.safetensors") is None
+          and expected_from_links(None, "good.safetensors") is None,
+          "测试用例 2: 没有上游信息时返回 None")
+    # 相似度足够高（不是非精确匹配）但文件名不同的文件不能作为校验依据
+    near_miss = [{"source": "Civitai", "is_non_exact_match": False, "file_name": "good.safetensors",
+                  "sha256": "bb" * 32, "file_size": 10}]
+    check(expected_from_links(near_miss, "good_fp16.safetensors") is None,
+          "测试用例 2: 文件名不同的相似匹配不作为上游信息")
+    check(expected_from_links([dict(near_miss[0], file_name=None)], "good.safetensors") is None,
+          "测试用例 2: 没有上游文件名的结果不作为上游信息")
+
+    # 测试用例 3: 校验结果
+    cache = HashCache(os.path.join(tmpdir, "hashes.json"))
+    result = verify_file(good, expected, cache)
+    check(result["status"] == "ok" and result["checked"] == "sha256", "测试用例 3: 完整的文件校验通过")
+    result = verify_file(truncated, expected, cache)
+    check(result["status"] == "corrupt" and result["checked"] == "size" and cache.peek(truncated) is None,
+          "测试用例 3: 大小不一致时判定为损坏（不计算哈希）")
+    result = verify_file(flipped, expected, cache)
+    check(result["status"] == "corrupt" and result["checked"] == "sha256", "测试用例 3: 内容不一致时判定为损坏")
+    civitai = {"source": "Civitai", "sha256": None, "size": len(payload) - 500, "size_exact": False}
+    check(verify_file(good, civitai)["status"] == "ok", "测试用例 3: Civitai 的近似大小允许误差")
+    check(verify_file(good, None)["status"] == "unverified", "测试用例 3: 没有上游信息时无法校验")
+    # 上游只有相似度足够高的 good.safetensors，已安装的 good_fp16.safetensors 是另一个文件
+    near_miss = os.path.join(tmpdir, "good_fp16.safetensors")
+    write(near_miss, bytes(changed))
+    similar = [{"source": "Civitai", "is_non_exact_match": False, "file_name": "good.safetensors",
+                "sha256": digest, "file_size": len(payload)}]
+    result = verify_file(near_miss, expected_from_links(similar, "good_fp16.safetensors"), cache)
+    check(result["status"] == "unverified", "测试用例 3: 只有文件名相近的上游文件时无法校验（不判定为损坏）")
+
+    # 测试用例 4: 哈希缓存（按大小和修改时间）
+    fresh = os.path.join(tmpdir, "fresh.safetensors")
+    write(fresh, payload)
+    result = verify_file(fresh, expected, cache, compute_hash=False)
+    check(result["status"] == "ok" and result["checked"] == "size", "测试用例 4: 只比较大小时不计算哈希")
+    cache.save()
+    reloaded = HashCache(os.path.join(tmpdir, "hashes.json"))
+    check(reloaded.peek(good) == digest, "测试用例 4: 哈希缓存保存到文件")
+    time.sleep(0.01)
+    write(good, bytes(changed))
+    check(reloaded.peek(good) is None and reloaded.get(good) != digest, "测试用例 4: 文件变化后重新计算")
+    hashes = reloaded.get_many([good, flipped, os.path.join(tmpdir, "missing")])
+    check(hashes[good] == hashes[flipped] and hashes[os.path.join(tmpdir, "missing")] is None,
+          "测试用例 4: 并行计算多个文件")
+
+    # 测试用例 5: 后台校验任务
+    async def run_verifier():
+        pushed = []
+
+        async def resolve(name):
+            return expected
+
+        verifier = IntegrityVerifier(resolve, HashCache(), on_result=pushed.append)
+        queued = verifier.submit([
+            {"key": "LoRA:fresh", "name": "fresh.safetensors", "path": fresh},
+            {"key": "LoRA:truncated", "name": "truncated.safetensors", "path": truncated},
+            {"key": "LoRA:fresh", "name": "fresh.safetensors", "path": fresh},
+        ])
+        for _ in range(200):
+            if len(pushed) == 2:
+                break
+            await asyncio.sleep(0.01)
+        await verifier.stop()
+        return queued, pushed, verifier.status()
+
+    queued, pushed, status = asyncio.run(run_verifier())
+    by_key = {result["key"]: result["status"] for result in pushed}
+    check(queued == 2 and by_key == {"LoRA:fresh": "ok", "LoRA:truncated": "corrupt"},
+          "测试用例 5: 后台校验并逐个推送结果（重复的模型只校验一次）")
+    check(status["verified"] == 2 and status["corrupt"] == 1 and status["pending"] == 0,
+          "测试用例 5: 校验状态")
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试下载链接检查功能（使用本地 HTTP 服务器）
+"""
+
+import sys
+import io
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+from link_validator import LinkValidator
+from search_cache import SearchCache
+
+FILE_SIZE = 123456789
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+class ProbeHandler(BaseHTTPRequestHandler):
+    """按路径返回不同的响应，记录请求方法和同时进行的请求数"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _enter(self):
+        state = self.server.state
+        with state["lock"]:
+            state["requests"].append((self.command, self.path))
+            state["active"] += 1
+            state["max_active"] = max(state["max_active"], state["active"])
+
+    def _leave(self):
+        state = self.server.state
+        with state["lock"]:
+            state["active"] -= 1
+
+    def _respond(self, status, headers=()):
+        self.send_response(status)
+        for key, value in headers:
+            self.send_header(key, value)
+        if not any(key == "Content-Length" for key, _ in headers):
+            self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _handle(self):
+        self._enter()
+        try:
+            if self.path.startswith("/slow/"):
+                time.sleep(0.1)
+                self._respond(200, [("Content-Length", "10")])
+            elif self.path == "/ok.safetensors":
+                self._respond(200, [("Content-Length", str(FILE_SIZE))])
+            elif self.path == "/no-head.safetensors":
+                if self.command == "HEAD":
+                    self._respond(405)
+                else:
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes 0-0/{FILE_SIZE}")
+                    self.send_header("Content-Length", "1")
+                    self.end_headers()
+                    self.wfile.write(b"\x00")
+            elif self.path == "/gated.safetensors":
+                self._respond(401, [("X-Error-Code", "GatedRepo")])
+            elif self.path == "/missing-repo.safetensors":
+                self._respond(401, [("X-Error-Code", "RepoNotFound")])
+            elif self.path == "/redirect.safetensors":
+                self._respond(302, [("Location", "/ok.safetensors")])
+            else:
+                self._respond(404)
+        finally:
+            self._leave()
+
+    do_HEAD = _handle
+    do_GET = _handle
+
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ProbeHandler)
+    server.daemon_threads = True
+    server.state = {"lock": threading.Lock(), "requests": [], "active": 0, "max_active": 0}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+async def run_tests():
+    server, base = start_server()
+    validator = LinkValidator(per_host_limit=2)
+
+    # 测试用例 1: HEAD 请求获取状态和大小
+    result = await validator.probe(f"{base}/ok.safetensors")
+    check(result["ok"] and result["status"] == 200 and result["content_length"] == FILE_SIZE,
+          "测试用例 1: HEAD 请求获取状态码和文件大小")
+    result = await validator.probe(f"{base}/redirect.safetensors")
+    check(result["ok"] and result["final_url"].endswith("/ok.safetensors"), "测试用例 1: 跟随重定向")
+
+    # 测试用例 2: 不支持 HEAD 时改用 1 字节的 Range 请求
+    result = await validator.probe(f"{base}/no-head.safetensors")
+    methods = [method for method, path in server.state["requests"] if path == "/no-head.safetensors"]
+    check(result["ok"] and result["status"] == 206 and result["content_length"] == FILE_SIZE
+          and methods == ["HEAD", "GET"], "测试用例 2: HEAD 返回 405 时使用 Range GET，大小取 Content-Range 中的总大小")
+
+    # 测试用例 3: 需要授权、不存在的链接
+    result = await validator.probe(f"{base}/gated.safetensors")
+    check(not result["ok"] and result["gated"] and result["status"] == 401, "测试用例 3: 识别需要授权的链接")
+    result = await validator.probe(f"{base}/missing-repo.safetensors")
+    check(not result["ok"] and not result["gated"], "测试用例 3: 仓库不存在时不算需要授权")
+    result = await validator.probe(f"{base}/gone.safetensors")
+    check(not result["ok"] and result["status"] == 404 and not result["gated"], "测试用例 3: 404")
+    result = await validator.probe("http://127.0.0.1:1/unreachable.safetensors")
+    check(not result["ok"] and result["status"] is None and result["error"], "测试用例 3: 无法连接时记录错误")
+
+    # 测试用例 4: 结果缓存
+    probes = validator.probes
+    result = await validator.probe(f"{base}/ok.safetensors")
+    check(result["ok"] and validator.probes == probes, "测试用例 4: 缓存期内不重复请求")
+    expired = LinkValidator(ttl=0)
+    await expired.probe(f"{base}/ok.safetensors")
+    await expired.probe(f"{base}/ok.safetensors")
+    check(expired.probes == 2, "测试用例 4: 缓存过期后重新请求")
+
+    # 测试用例 5: 并发检查（每个主机的并发数受限制，同一个链接只请求一次）
+    server.state["max_active"] = 0
+    urls = [f"{base}/slow/{index}.safetensors" for index in range(8)]
+    probes = validator.probes
+    results = await validator.probe_many(urls + urls[:3])
+    check(len(results) == 8 and all(result["ok"] for result in results.values())
+          and validator.probes - probes == 8, "测试用例 5: 并发检查多个链接（重复的链接只请求一次）")
+    check(server.state["max_active"] == 2, f"测试用例 5: 同一主机最多同时 {server.state['max_active']} 个请求")
+
+    # 测试用例 6: 在搜索结果上添加检查结果并补全文件大小
+    links = [
+        {"source": "Hugging Face", "download_url": f"{base}/no-head.safetensors", "file_size": None},
+        {"source": "Civitai", "download_url": f"{base}/gated.safetensors", "file_size": 5000},
+        {"source": "Google", "url": "https://www.google.com/search?q=model"},
+    ]
+    await validator.annotate(links)
+    check(links[0]["file_size"] == FILE_SIZE and links[0]["link_status"]["ok"],
+          "测试用例 6: 用 Content-Length 补全缺少的文件大小")
+    check(links[1]["link_status"]["gated"] and links[1]["file_size"] == 5000 and "link_status" not in links[2],
+          "测试用例 6: 标记需要授权的链接，没有下载地址的链接不检查")
+
+    # 测试用例 7: 搜索缓存不保存检查结果，返回缓存的结果时使用检查器中没有过期的结果
+    cache = SearchCache()
+    cache.set("model.safetensors", links)
+    cached = cache.get("model.safetensors")
+    check(all("link_status" not in link for link in cached) and cached[0]["file_size"] == FILE_SIZE
+          and "link_status" in links[0], "测试用例 7: 写入缓存时去掉 link_status（不修改传入的结果）")
+    applied = validator.apply_cached(cached)
+    check(applied[0]["link_status"]["ok"] and applied[1]["link_status"]["gated"] and "link_status" not in applied[2]
+          and "link_status" not in cached[0], "测试用例 7: 按检查器的缓存添加 link_status")
+    validator.invalidate(links[0]["download_url"])
+    stale = dict(cached[1], link_status={"ok": True, "checked_at": 0})
+    applied = validator.apply_cached([cached[0], stale])
+    check("link_status" not in applied[0] and applied[1]["link_status"]["gated"],
+          "测试用例 7: 过期的检查结果不再返回（旧的 link_status 被替换）")
+
+    server.shutdown()
+
+
+print("=" * 70)
+print("下载链接检查功能测试")
+print("=" * 70)
+print()
+
+asyncio.run(run_tests())
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
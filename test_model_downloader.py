@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试模型下载功能（使用本地 HTTP 服务器）
+"""
+
+import sys
+import io
+import os
+import asyncio
+import hashlib
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+import model_downloader
+from model_downloader import ModelDownloader, DownloadError
+
+# 测试时使用更小的分段，让 8MB 的文件也会被拆分
+model_downloader.MIN_SEGMENT_SIZE = 1024 * 1024
+model_downloader.CHUNK_SIZE = 64 * 1024
+
+PAYLOAD = os.urandom(8 * 1024 * 1024 + 12345)
+PAYLOAD_SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """支持 Range 的简单文件服务器，可以模拟连接中断和慢速传输"""
+
+    server_version = "TestRange/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        state = self.server.state
+        range_header = self.headers.get("Range")
+        start, end = 0, len(PAYLOAD) - 1
+        if range_header and state["supports_range"]:
+            spec = range_header.split("=", 1)[1]
+            first, last = spec.split("-")
+            start = int(first)
+            end = int(last) if last else len(PAYLOAD) - 1
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(PAYLOAD)}")
+        else:
+            self.send_response(200)
+        body = PAYLOAD[start:end + 1]
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"test-etag"')
+        self.end_headers()
+
+        with state["lock"]:
+            state["requests"] += 1
+            drop = state["drop_connections"] > 0 and len(body) > 1
+            if drop:
+                state["drop_connections"] -= 1
+        if drop:
+            # 只发送一半数据后断开连接
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            with state["lock"]:
+                state["bytes_sent"] += len(body) // 2
+            self.close_connection = True
+            return
+        for i in range(0, len(body), 256 * 1024):
+            if state["delay"]:
+                threading.Event().wait(state["delay"])
+            piece = body[i:i + 256 * 1024]
+            try:
+                self.wfile.write(piece)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            with state["lock"]:
+                state["bytes_sent"] += len(piece)
+
+
+def start_server(**options):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    server.daemon_threads = True
+    server.state = {
+        "lock": threading.Lock(),
+        "requests": 0,
+        "bytes_sent": 0,
+        "drop_connections": options.get("drop_connections", 0),
+        "supports_range": options.get("supports_range", True),
+        "delay": options.get("delay", 0),
+    }
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/model.safetensors"
+
+
+async def run_tests(tmpdir):
+    # 测试用例 1: 多连接分段下载并校验哈希
+    server, url = start_server()
+    target = os.path.join(tmpdir, "loras", "model.safetensors")
+    progress = []
+    result = await ModelDownloader(url, target, expected_sha256=PAYLOAD_SHA256.upper(),
+                                   progress_callback=progress.append).run()
+    with open(target, "rb") as f:
+        content = f.read()
+    check(content == PAYLOAD and result["sha256"] == PAYLOAD_SHA256,
+          "测试用例 1: 分段下载的文件内容和 SHA-256 正确")
+    check(server.state["requests"] > 2, f"测试用例 1: 使用了多个分段请求（{server.state['requests']} 个）")
+    check(not os.path.exists(target + ".part") and not os.path.exists(target + ".part.json"),
+          "测试用例 1: 临时文件和状态文件已清理")
+    check(progress and progress[-1]["status"] == "completed", "测试用例 1: 进度回调报告完成")
+    server.shutdown()
+
+    # 测试用例 2: 哈希不一致时不生成目标文件
+    server, url = start_server()
+    target = os.path.join(tmpdir, "bad.safetensors")
+    try:
+        await ModelDownloader(url, target, expected_sha256="0" * 64).run()
+        check(False, "测试用例 2: 哈希不一致应该抛出 DownloadError")
+    except DownloadError:
+        check(not os.path.exists(target) and not os.path.exists(target + ".part"),
+              "测试用例 2: 哈希不一致时抛出 DownloadError 且不留下文件")
+    server.shutdown()
+
+    # 测试用例 3: 连接中断后自动重试并从断开的位置继续
+    server, url = start_server(drop_connections=2)
+    target = os.path.join(tmpdir, "retry.safetensors")
+    result = await ModelDownloader(url, target, expected_sha256=PAYLOAD_SHA256).run()
+    check(result["sha256"] == PAYLOAD_SHA256, "测试用例 3: 连接中断后重试成功")
+    server.shutdown()
+
+    # 测试用例 4: 取消后再次运行只下载剩余部分
+    server, url = start_server(delay=0.02)
+    target = os.path.join(tmpdir, "resume.safetensors")
+    task = asyncio.ensure_future(ModelDownloader(url, target, expected_sha256=PAYLOAD_SHA256).run())
+    while server.state["bytes_sent"] < len(PAYLOAD) // 3:
+        await asyncio.sleep(0.01)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    check(os.path.exists(target + ".part.json"), "测试用例 4: 取消后保留续传状态")
+    server.state["delay"] = 0
+    sent_before = server.state["bytes_sent"]
+    result = await ModelDownloader(url, target, expected_sha256=PAYLOAD_SHA256).run()
+    resumed_bytes = server.state["bytes_sent"] - sent_before
+    check(result["sha256"] == PAYLOAD_SHA256 and resumed_bytes < len(PAYLOAD),
+          f"测试用例 4: 续传成功，第二次只传输了 {resumed_bytes} / {len(PAYLOAD)} 字节")
+    server.shutdown()
+
+    # 测试用例 5: 服务器不支持 Range 时退化为单连接下载
+    server, url = start_server(supports_range=False)
+    target = os.path.join(tmpdir, "single.safetensors")
+    result = await ModelDownloader(url, target, expected_sha256=PAYLOAD_SHA256).run()
+    check(result["sha256"] == PAYLOAD_SHA256 and result["size"] == len(PAYLOAD),
+          "测试用例 5: 不支持 Range 时单连接下载成功")
+    server.shutdown()
+
+    # 测试用例 6: 回读临时文件时不使用预读的旧数据（分段写到一半时回读，之后其他位置继续写入）
+    downloader = ModelDownloader(url, os.path.join(tmpdir, "catchup.safetensors"))
+    with open(downloader.temp_path, "wb") as f:
+        f.truncate(len(PAYLOAD))
+    with open(downloader.temp_path, "r+b", buffering=0) as handle:
+        downloader._read_handle = downloader._open_for_hashing()
+        try:
+            handle.write(PAYLOAD[:1000])
+            first = downloader._read_at(0, 1000)
+            handle.write(PAYLOAD[1000:2000])
+            second = downloader._read_at(1000, 1000)
+        finally:
+            downloader._read_handle.close()
+    check(first == PAYLOAD[:1000] and second == PAYLOAD[1000:2000], "测试用例 6: 回读到之后写入的数据")
+
+
+print("=" * 70)
+print("模型下载功能测试")
+print("=" * 70)
+print()
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    asyncio.run(run_tests(tmpdir))
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
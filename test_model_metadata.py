@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试模型头部元数据读取和分类功能（使用生成的 safetensors/GGUF 文件）
+"""
+
+import sys
+import io
+import os
+import json
+import time
+import struct
+import tempfile
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+from model_metadata import MetadataCache, read_model_metadata, family_from_architecture
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+def write_safetensors(path, shapes, metadata=None, data_size=1024):
+    """生成 safetensors 文件（张量数据为 0，只有头部是有效的）"""
+    header = {}
+    for name, shape in shapes.items():
+        header[name] = {"dtype": "F16", "shape": shape, "data_offsets": [0, 0]}
+    if metadata:
+        header["__metadata__"] = metadata
+    raw = json.dumps(header).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(raw)))
+        f.write(raw)
+        f.write(b"\0" * data_size)
+
+
+def gguf_string(text):
+    raw = text.encode("utf-8")
+    return struct.pack("<Q", len(raw)) + raw
+
+
+def write_gguf(path, kv, tensors):
+    """生成 GGUF 文件（只有字符串类型的键值对，以及一个会被跳过的大数组）"""
+    body = b""
+    for key, value in kv.items():
+        body += gguf_string(key) + struct.pack("<I", 8) + gguf_string(value)
+    # 大的字符串数组（模拟词表）
+    body += gguf_string("tokenizer.tokens") + struct.pack("<I", 9) + struct.pack("<I", 8) + struct.pack("<Q", 100)
+    body += b"".join(gguf_string(f"tok{i}") for i in range(100))
+    for name, shape in tensors.items():
+        body += gguf_string(name) + struct.pack("<I", len(shape))
+        body += b"".join(struct.pack("<Q", dim) for dim in reversed(shape))
+        body += struct.pack("<I", 1) + struct.pack("<Q", 0)
+    with open(path, "wb") as f:
+        f.write(b"GGUF" + struct.pack("<I", 3) + struct.pack("<Q", len(tensors)) + struct.pack("<Q", len(kv) + 1))
+        f.write(body)
+        f.write(b"\0" * 64)
+
+
+print("=" * 70)
+print("模型元数据读取测试")
+print("=" * 70)
+print()
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    # 测试用例 1: 文件名看不出派系的 SDXL 主模型
+    path = os.path.join(tmpdir, "renamed_model.safetensors")
+    write_safetensors(path, {
+        "model.diffusion_model.input_blocks.0.0.weight": [320, 4, 3, 3],
+        "model.diffusion_model.label_emb.0.0.weight": [1280, 2816],
+        "first_stage_model.decoder.conv_in.weight": [512, 4, 3, 3],
+    })
+    info = read_model_metadata(path)
+    check(info["type"] == "主模型" and info["families"] == ["SDXL"],
+          f"测试用例 1: SDXL 主模型 -> {info['type']} {info['families']}")
+
+    # 测试用例 2: SD1.5 与 SD2 通过交叉注意力维度区分
+    for family, context_dim in (("SD1.5", 768), ("SD2", 1024)):
+        path = os.path.join(tmpdir, f"unet_{context_dim}.safetensors")
+        write_safetensors(path, {
+            "input_blocks.0.0.weight": [320, 4, 3, 3],
+            "input_blocks.1.1.transformer_blocks.0.attn2.to_k.weight": [320, context_dim],
+        })
+        info = read_model_metadata(path)
+        check(info["families"] == [family], f"测试用例 2: 上下文维度 {context_dim} -> {info['families']}")
+
+    # 测试用例 3: LoRA 的 ss_* 元数据优先
+    path = os.path.join(tmpdir, "my_lora.safetensors")
+    write_safetensors(path, {
+        "lora_unet_down_blocks_0_attentions_0_proj_in.lora_down.weight": [16, 320],
+        "lora_te_text_model_encoder_layers_0_mlp_fc1.lora_up.weight": [3072, 16],
+    }, metadata={"ss_base_model_version": "sdxl_base_v1-0", "ss_network_module": "networks.lora",
+                 "ss_tag_frequency": "x" * 10000})
+    info = read_model_metadata(path)
+    check(info["type"] == "LoRA" and info["families"] == ["SDXL"], f"测试用例 3: LoRA -> {info['type']} {info['families']}")
+    check("ss_network_module" in info["metadata"] and "ss_tag_frequency" not in info["metadata"],
+          "测试用例 3: 保留较短的 ss_* 字段，丢弃过大的字段")
+
+    # 测试用例 4: Flux GGUF 和 VAE
+    path = os.path.join(tmpdir, "model-Q4.gguf")
+    write_gguf(path, {"general.architecture": "flux"}, {
+        "double_blocks.0.img_attn.qkv.weight": [9216, 3072],
+        "single_blocks.0.linear1.weight": [21504, 3072],
+    })
+    info = read_model_metadata(path)
+    check(info["format"] == "gguf" and info["type"] == "主模型" and info["families"] == ["Flux"]
+          and info["tensor_count"] == 2, f"测试用例 4: GGUF -> {info['type']} {info['families']}")
+    path = os.path.join(tmpdir, "ae.safetensors")
+    write_safetensors(path, {"encoder.down.0.block.0.conv1.weight": [128, 128, 3, 3],
+                             "decoder.up.0.block.0.conv1.weight": [128, 128, 3, 3],
+                             "decoder.conv_in.weight": [512, 16, 3, 3]})
+    info = read_model_metadata(path)
+    check(info["type"] == "VAE" and info["families"] == ["Flux"], f"测试用例 4: VAE -> {info['type']} {info['families']}")
+
+    # 测试用例 5: 架构名称映射
+    check(family_from_architecture("stable-diffusion-xl-v1-base") == "SDXL"
+          and family_from_architecture("stable-diffusion-v1") == "SD1.5"
+          and family_from_architecture("flux-1-dev") == "Flux",
+          "测试用例 5: modelspec.architecture 映射到派系")
+    check(family_from_architecture("sd_v2_768_v") == "SD2" and family_from_architecture("wan2.1") == "Wan"
+          and family_from_architecture("sdxl_base_v1-0") == "SDXL", "测试用例 5: kohya 和 GGUF 的架构名称")
+    unrelated = ["t5xxl", "swan", "mochi_v1", "qwen2", "model-v2"]
+    check(all(family_from_architecture(name) is None for name in unrelated),
+          f"测试用例 5: 只包含相同字母的名称不匹配 {[family_from_architecture(name) for name in unrelated]}")
+
+    # 测试用例 5: 张量名称按段匹配（"transformer_blocks.0.cross_attn" 不是 Wan 的 "blocks.0.cross_attn"）
+    path = os.path.join(tmpdir, "other_lora.safetensors")
+    write_safetensors(path, {"transformer.transformer_blocks.0.cross_attn.to_k.lora_A.weight": [16, 1152],
+                             "transformer.transformer_blocks.0.cross_attn.to_k.lora_B.weight": [1152, 16]},
+                      metadata={"ss_base_model_version": "t5xxl"})
+    info = read_model_metadata(path)
+    check(info["type"] == "LoRA" and info["families"] == [], f"测试用例 5: 不误判为 Wan / SDXL -> {info['families']}")
+    path = os.path.join(tmpdir, "wan_lora.safetensors")
+    write_safetensors(path, {"diffusion_model.blocks.0.cross_attn.k.lora_A.weight": [16, 5120]})
+    check(read_model_metadata(path)["families"] == ["Wan"], "测试用例 5: Wan LoRA")
+
+    # 测试用例 6: 损坏的文件返回错误，缓存在文件未变化时不重新读取
+    path = os.path.join(tmpdir, "broken.safetensors")
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", 10 ** 12) + b"{}")
+    cache = MetadataCache(os.path.join(tmpdir, "cache.json"))
+    check("error" in cache.get(path), "测试用例 6: 损坏的文件返回错误")
+
+    # 测试用例 7: 批量读取速度和持久化缓存
+    lora_dir = os.path.join(tmpdir, "loras")
+    os.makedirs(lora_dir)
+    shapes = {f"lora_unet_input_blocks_{i}_1_proj_in.lora_down.weight": [16, 320] for i in range(200)}
+    paths = []
+    for i in range(1000):
+        path = os.path.join(lora_dir, f"lora_{i}.safetensors")
+        write_safetensors(path, shapes, metadata={"ss_network_module": "networks.lora"}, data_size=0)
+        paths.append(path)
+    started = time.monotonic()
+    infos = cache.get_many(paths)
+    elapsed = time.monotonic() - started
+    cache.save()
+    check(all(info["type"] == "LoRA" for info in infos.values()),
+          f"测试用例 7: 读取 1000 个文件用时 {elapsed:.2f} 秒（约 {len(paths) / max(elapsed, 1e-6):.0f} 个/秒）")
+    started = time.monotonic()
+    MetadataCache(os.path.join(tmpdir, "cache.json")).get_many(paths)
+    check(time.monotonic() - started < elapsed, "测试用例 7: 从缓存文件加载后不再读取文件头部")
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
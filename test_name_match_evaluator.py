@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试名称匹配评估（精确率、召回率、语料读取和并行打分）
+"""
+
+import sys
+import io
+import os
+import json
+import asyncio
+import tempfile
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+import name_match_evaluator
+from name_matcher import calculate_name_similarity, MATCH_THRESHOLD
+from name_match_evaluator import (
+    evaluate, evaluate_async, load_corpus, parse_pairs, score_pairs, threshold_metrics, main
+)
+from executors import BoundedExecutor
+
+CORPUS = [
+    ("zuki_cute_ill_v40.safetensors", "zuki cute ill v40 sdxl.safetensors", True),
+    ("detail_tweaker_xl.safetensors", "Detail Tweaker XL.safetensors", True),
+    ("sd_xl_base_1.0.safetensors", "sd_xl_base_1.0.safetensors", True),
+    ("add_detail.safetensors", "add-detail.safetensors", True),
+    ("pov_cheek_grabbing_concept.safetensors", "open_door_concept_sliding_doors.safetensors", False),
+    ("flux1-dev.safetensors", "sd_xl_refiner_1.0.safetensors", False),
+    ("juggernautXL_v9.safetensors", "realisticVision_v60.safetensors", False),
+]
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+print("=" * 70)
+print("名称匹配评估测试")
+print("=" * 70)
+print()
+
+# 测试用例 1: 精确率和召回率
+result = threshold_metrics([0.95, 0.9, 0.7, 0.88, 0.2], [True, True, True, False, False], 0.85)
+check((result["tp"], result["fp"], result["fn"], result["tn"]) == (2, 1, 1, 1)
+      and result["precision"] == 0.6667 and result["recall"] == 0.6667, f"测试用例 1: 混淆矩阵 {result}")
+result = threshold_metrics([0.1, 0.2], [False, False], 0.5)
+check(result["precision"] == 1.0 and result["recall"] == 1.0 and result["tn"] == 2,
+      "测试用例 1: 没有正例和预测为正的情况")
+
+# 测试用例 2: 解析标注
+pairs = parse_pairs([{"required": "a", "candidate": "b", "label": "yes"}, ["c", "d", 0], ("e", "f", "false")])
+check(pairs == [("a", "b", True), ("c", "d", False), ("e", "f", False)], "测试用例 2: 对象和数组格式")
+for bad in ([{"required": "a", "label": 1}], [["a", "b", "maybe"]], ["abc"]):
+    try:
+        parse_pairs(bad)
+        check(False, f"测试用例 2: 拒绝格式错误的条目 {bad}")
+    except ValueError:
+        check(True, f"测试用例 2: 拒绝格式错误的条目 {bad}")
+
+# 测试用例 3: 默认权重与原来的打分相同，并行与串行结果相同
+large = CORPUS * 200
+serial = score_pairs(large, workers=1)
+check(serial[:len(CORPUS)] == [calculate_name_similarity(a, b) for a, b, _ in CORPUS],
+      "测试用例 3: 默认权重与 calculate_name_similarity 相同")
+check(score_pairs(large, workers=2, use_processes=True) == serial, "测试用例 3: 多进程与单进程的结果相同")
+process_pools = []
+original = name_match_evaluator.ProcessPoolExecutor
+name_match_evaluator.ProcessPoolExecutor = lambda *args, **kwargs: process_pools.append(args) or original(*args, **kwargs)
+try:
+    threaded = score_pairs(large, workers=2)
+finally:
+    name_match_evaluator.ProcessPoolExecutor = original
+check(threaded == serial and process_pools == [], "测试用例 3: 默认使用线程池，结果相同，没有创建进程池")
+changed = score_pairs(CORPUS, {"jaccard_weight": 0.0, "sequence_weight": 1.0}, workers=1)
+check(changed != serial[:len(CORPUS)], "测试用例 3: 修改权重后打分变化")
+
+# 测试用例 4: 评估报告
+report = evaluate(CORPUS, thresholds=[0.5, 0.9], workers=1)
+thresholds = [result["threshold"] for result in report["thresholds"]]
+check(report["pairs"] == len(CORPUS) and report["positives"] == 4 and thresholds == [0.5, MATCH_THRESHOLD, 0.9],
+      f"测试用例 4: 包含当前使用的阈值 {thresholds}")
+check(report["pairs_per_second"] and report["best_threshold"] in thresholds
+      and report["mistake_count"] == len(report["mistakes"]), "测试用例 4: 报告速度、最佳阈值和误判")
+
+
+async def evaluate_in_loop():
+    """与接口相同：按块交给有界线程池打分，同时最多 workers 块"""
+    executor = BoundedExecutor("evaluate-test", max_workers=2, max_queue=0)
+    calls = []
+
+    async def run_blocking(func, *args):
+        calls.append(func.__name__)
+        return await executor.run(func, *args)
+
+    try:
+        return await evaluate_async(large, run_blocking, thresholds=[0.5, 0.9], workers=2), calls
+    finally:
+        executor.shutdown()
+
+
+# 测试用例 5: 在事件循环中评估（不超过线程池的容量，结果与同步评估相同）
+async_report, calls = asyncio.run(evaluate_in_loop())
+sync_report = evaluate(large, thresholds=[0.5, 0.9], workers=1)
+check(calls.count("_score_chunk") == -(-len(large) // name_match_evaluator.CHUNK_SIZE) and calls[-1] == "_build_report",
+      f"测试用例 5: 每块单独打分，报告也在线程池中生成（{len(calls)} 次调用）")
+check(all(async_report[key] == sync_report[key] for key in ("thresholds", "best_threshold", "mistakes", "mistake_count")),
+      "测试用例 5: 与同步评估的结果相同")
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    # 测试用例 6: 读取 CSV、JSON Lines 和 JSON 语料
+    csv_path = os.path.join(tmpdir, "corpus.csv")
+    with open(csv_path, "w", encoding="utf-8") as f:
+        f.write("required,candidate,label\n")
+        f.writelines(f"{a},{b},{int(label)}\n" for a, b, label in CORPUS)
+    jsonl_path = os.path.join(tmpdir, "corpus.jsonl")
+    with open(jsonl_path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps({"required": a, "candidate": b, "label": label}) + "\n\n" for a, b, label in CORPUS)
+    json_path = os.path.join(tmpdir, "corpus.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump([list(pair) for pair in CORPUS], f)
+    check(load_corpus(csv_path) == load_corpus(jsonl_path) == load_corpus(json_path) == CORPUS,
+          "测试用例 6: 三种格式读取结果相同")
+
+    # 测试用例 7: 命令行（使用进程池）
+    output = os.path.join(tmpdir, "report.json")
+    exit_code = main([csv_path, "--workers", "1", "--thresholds", "0.8,0.9", "--format", "json", "-o", output])
+    with open(output, "r", encoding="utf-8") as f:
+        cli_report = json.load(f)
+    check(exit_code == 0 and cli_report["pairs"] == len(CORPUS) and len(cli_report["thresholds"]) == 3,
+          "测试用例 7: 命令行输出 JSON 报告")
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
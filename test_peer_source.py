@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试局域网节点下载来源（在本机启动一个提供模型文件的节点）
+"""
+
+import sys
+import io
+import os
+import asyncio
+import hashlib
+import tempfile
+
+from aiohttp import web
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+import model_downloader
+from model_downloader import ModelDownloader, DownloadError
+from federation import Federation, TOKEN_HEADER
+from peer_source import PeerSource, FILE_PATH_PREFIX, SOURCE_NAME, split_file_key
+
+# 测试时使用更小的分段，让 4MB 的文件也会被拆分
+model_downloader.MIN_SEGMENT_SIZE = 1024 * 1024
+model_downloader.CHUNK_SIZE = 64 * 1024
+
+PAYLOAD = os.urandom(4 * 1024 * 1024 + 321)
+PAYLOAD_SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+def push(federation, node_id, name, url, entries):
+    """模拟其他节点推送的完整清单"""
+    status, _ = federation.handle_push({"node_id": node_id, "name": name, "url": url, "epoch": node_id,
+                                        "version": 1, "full": True, "added": entries}, federation.token)
+    return status
+
+
+async def run_tests(tmpdir):
+    # 提供文件的节点（与 server.py 中的文件接口相同：检查令牌和路径，使用 FileResponse 支持 Range）
+    models_dir = os.path.join(tmpdir, "peer", "loras")
+    os.makedirs(os.path.join(models_dir, "style"))
+    with open(os.path.join(models_dir, "style", "detail.safetensors"), "wb") as f:
+        f.write(PAYLOAD)
+    requests = []
+
+    async def serve(request):
+        if not federation.authorized(request.headers.get(TOKEN_HEADER)):
+            return web.json_response({"error": "令牌不正确"}, status=401)
+        key = split_file_key(request.match_info["folder"], request.match_info["name"])
+        if key is None or key[0] != "loras":
+            return web.json_response({"error": "不允许下载这个文件"}, status=403)
+        requests.append(request.headers.get("Range"))
+        return web.FileResponse(os.path.join(models_dir, key[1]))
+
+    app = web.Application()
+    app.router.add_get(FILE_PATH_PREFIX + "{folder}/{name:.+}", serve)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    peer_url = f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+    federation = Federation(lambda: {}, "self", enabled=True, token="secret", peers=[peer_url])
+    source = PeerSource(federation)
+    statuses = [
+        push(federation, "node-a", "node-a", peer_url, {"loras/style/detail.safetensors": [len(PAYLOAD), None]}),
+        push(federation, "node-b", "node-b", "http://127.0.0.1:9",
+             {"loras/renamed.safetensors": [len(PAYLOAD), PAYLOAD_SHA256]}),
+        push(federation, "node-c", "node-c", "", {"loras/detail.safetensors": [len(PAYLOAD), None]}),
+    ]
+    check(statuses == [200, 200, 200], "测试用例 1: 收到其他节点的清单")
+
+    # 测试用例 1: 按文件名和哈希查找，哈希与上游一致的排在 Civitai 和 Hugging Face 前面
+    upstream = [{"source": "Hugging Face", "download_url": "https://huggingface.co/x/detail.safetensors",
+                 "file_name": "detail.safetensors", "file_size": len(PAYLOAD), "sha256": PAYLOAD_SHA256}]
+    results = source.rank("detail.safetensors", upstream)
+    check([link["source"] for link in results] == [SOURCE_NAME, "Hugging Face", SOURCE_NAME],
+          "测试用例 1: 已验证的局域网节点排在最前面，未验证的排在最后（没有地址的节点不使用）")
+    check(results[0]["name"] == "node-b" and results[0]["match"] == "sha256" and results[0]["verified"],
+          "测试用例 1: 按哈希找到改过名的文件")
+    check(results[2]["name"] == "node-a" and results[2]["match"] == "name" and not results[2]["verified"]
+          and results[2]["download_url"] == peer_url + FILE_PATH_PREFIX + "loras/style/detail.safetensors",
+          "测试用例 1: 按文件名找到子目录中的文件（只有文件名匹配时标记为未验证）")
+    check(results[2]["sha256"] == PAYLOAD_SHA256, "测试用例 1: 对方没有哈希时使用大小一致的上游文件的哈希")
+    check(source.rank("detail.safetensors", results) == results, "测试用例 1: 重复调用时不重复添加")
+    check(source.find("other.safetensors") == [], "测试用例 1: 没有节点有这个文件")
+    alone = source.rank("detail.safetensors", [])
+    check([link["name"] for link in alone] == ["node-a"] and not alone[0]["verified"],
+          "测试用例 1: 没有上游结果时只有文件名匹配，不能验证")
+
+    # 测试用例 1: 对方声称的哈希与上游不一致时不排在上游前面
+    push(federation, "node-d", "node-d", "http://127.0.0.1:9", {"loras/detail.safetensors": [len(PAYLOAD), "ff" * 32]})
+    results = source.rank("detail.safetensors", upstream)
+    check([link["name"] for link in results if link["source"] == SOURCE_NAME][:1] == ["node-b"]
+          and results[1]["source"] == "Hugging Face" and {link["name"] for link in results[2:]} == {"node-a", "node-d"},
+          "测试用例 1: 哈希不一致的节点排在上游后面")
+    federation.remote.remove("node-d")
+
+    # 测试用例 1: 上游只有文件名相近的文件时不用它的哈希查找、补全和排序
+    similar = [{"source": "Civitai", "is_non_exact_match": False, "download_url": "https://civitai.com/api/download/models/1",
+                "file_name": "detail_fp16.safetensors", "file_size": len(PAYLOAD), "sha256": PAYLOAD_SHA256}]
+    results = source.rank("detail.safetensors", similar)
+    peers = [link for link in results if link["source"] == SOURCE_NAME]
+    check([link["source"] for link in results] == ["Civitai", SOURCE_NAME]
+          and peers[0]["name"] == "node-a" and not peers[0]["verified"],
+          "测试用例 1: 文件名相近的上游文件不作为参考（不按哈希找到其他文件，不标记为已验证）")
+    check(peers[0]["sha256"] is None, "测试用例 1: 不使用文件名相近的上游文件的哈希")
+    results = source.rank("detail.safetensors", upstream)
+
+    # 测试用例 2: 路径检查
+    check(split_file_key("loras", "a/b.safetensors") == ("loras", "a/b.safetensors")
+          and split_file_key("loras", "../secret") is None and split_file_key("custom_nodes", "x.py") is None
+          and split_file_key("loras", "/etc/passwd") is None, "测试用例 2: 不能下载模型目录以外的文件")
+
+    # 测试用例 3: 分段下载并校验哈希（带上节点令牌）
+    link = results[2]
+    headers = {TOKEN_HEADER: federation.token} if source.is_peer_url(link["download_url"]) else None
+    target = os.path.join(tmpdir, "local", "loras", "detail.safetensors")
+    result = await ModelDownloader(link["download_url"], target, expected_sha256=link["sha256"],
+                                   expected_size=link["file_size"], headers=headers).run()
+    with open(target, "rb") as f:
+        content = f.read()
+    check(content == PAYLOAD and result["sha256"] == PAYLOAD_SHA256, "测试用例 3: 下载的文件内容和哈希正确")
+    check(sum(1 for value in requests if value and value != "bytes=0-0") > 1,
+          f"测试用例 3: 使用多个 Range 请求分段下载（{len(requests)} 个请求）")
+    check(not source.is_peer_url("https://huggingface.co/x/detail.safetensors"), "测试用例 3: 其他地址不带令牌")
+
+    # 测试用例 4: 没有令牌时被拒绝
+    try:
+        await ModelDownloader(link["download_url"], target + ".2").run()
+        rejected = False
+    except DownloadError:
+        rejected = True
+    check(rejected and not os.path.exists(target + ".2"), "测试用例 4: 没有令牌时无法下载")
+
+    # 测试用例 5: 关闭多节点同步后不使用局域网节点
+    federation.configure(enabled=False)
+    check(source.find("detail.safetensors") == [], "测试用例 5: 关闭后不返回局域网链接")
+
+    await runner.cleanup()
+
+
+print("=" * 70)
+print("局域网节点下载来源测试")
+print("=" * 70)
+print()
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    asyncio.run(run_tests(tmpdir))
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
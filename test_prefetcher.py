@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试后台预取器（开关、等待队列去重、跳过已安装的模型、用户搜索时暂停和线程池已满）
+使用模拟的搜索函数，不访问网络
+"""
+
+import sys
+import io
+import asyncio
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+import prefetcher
+from prefetcher import Prefetcher
+from executors import ExecutorBusy
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+class FakeCache:
+    """模拟的搜索结果缓存，记录写入次数"""
+
+    def __init__(self, names=()):
+        self.names = set(names)
+        self.writes = 0
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def set(self, name, results):
+        self.writes += 1
+        self.names.add(name)
+
+
+class FakeResolve:
+    """模拟的搜索函数：记录搜索的模型，可以指定抛出异常的模型"""
+
+    def __init__(self, cache, errors=None):
+        self.cache = cache
+        self.errors = errors or {}
+        self.calls = []
+
+    async def __call__(self, model_name):
+        self.calls.append(model_name)
+        await asyncio.sleep(0)
+        if model_name in self.errors:
+            raise self.errors[model_name]
+        # 和服务器的搜索函数一样，由搜索函数写入缓存
+        self.cache.set(model_name, [])
+        return [{"source": "Fake", "name": model_name}]
+
+
+def model(name, model_type="checkpoints"):
+    return {"name": name, "type": model_type, "is_used": True}
+
+
+async def wait_until(condition, timeout=2.0):
+    """等待条件成立（超时返回 False）"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        if loop.time() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+async def make(cache=None, errors=None, enabled=True):
+    cache = cache if cache is not None else FakeCache()
+    resolve = FakeResolve(cache, errors)
+    results = []
+    p = Prefetcher(resolve, cache, on_result=lambda name, r: results.append(name),
+                   enabled=enabled, delay=0)
+    p.start()
+    return p, resolve, cache, results
+
+
+async def run_tests():
+    installed = set()
+    prefetcher.get_installed_file_names = lambda model_type: installed
+
+    print("\n测试用例 1: 关闭时不接受模型，开启后开始预取")
+    p, resolve, cache, results = await make(enabled=False)
+    check(p.submit([model("a.safetensors")]) == 0, "关闭时 submit 返回 0")
+    check(p.submit_data({"nodes": []}) == 0, "关闭时 submit_data 返回 0")
+    await asyncio.sleep(0.05)
+    check(resolve.calls == [], "关闭时不搜索")
+    p.configure(enabled=True)
+    check(p.submit([model("a.safetensors")]) == 1, "开启后加入等待队列")
+    check(await wait_until(lambda: p.resolved == 1), "开启后完成预取")
+    check(results == ["a.safetensors"], "搜索完成后调用 on_result")
+    check(cache.writes == 1, f"每个模型只写入一次缓存（由搜索函数写入，实际 {cache.writes} 次）")
+    p._worker.cancel()
+
+    print("\n测试用例 2: 等待队列去重，已有缓存结果的模型不加入")
+    p, resolve, cache, results = await make(cache=FakeCache(["cached.safetensors"]))
+    with p.user_search():
+        added = p.submit([model("a.safetensors"), model("A.safetensors"), model("b.safetensors"),
+                          model("a.safetensors", "loras"), model("cached.safetensors")])
+        check(added == 2, f"重复的文件名只加入一次（实际 {added}）")
+        check(p.submit([model("b.safetensors")]) == 0, "已在等待队列中的模型不重复加入")
+        check(p.status()["pending"] == 2, "等待中的模型数为 2")
+    check(await wait_until(lambda: p.resolved == 2), "两个模型都完成预取")
+    check(sorted(resolve.calls) == ["a.safetensors", "b.safetensors"], f"每个模型只搜索一次: {resolve.calls}")
+    check(p.status()["pending"] == 0, "完成后等待队列为空")
+    p._worker.cancel()
+
+    print("\n测试用例 3: 跳过已安装的模型")
+    installed.add("installed.safetensors")
+    p, resolve, cache, results = await make()
+    p.submit([model("installed.safetensors"), model("missing.safetensors")])
+    check(await wait_until(lambda: p.resolved == 1), "未安装的模型完成预取")
+    check(p.skipped == 1, "已安装的模型计入 skipped")
+    check(resolve.calls == ["missing.safetensors"], f"不搜索已安装的模型: {resolve.calls}")
+    installed.clear()
+    p._worker.cancel()
+
+    print("\n测试用例 4: 用户搜索期间暂停")
+    p, resolve, cache, results = await make()
+    with p.user_search():
+        p.submit([model("a.safetensors")])
+        await asyncio.sleep(0.05)
+        check(resolve.calls == [], "用户搜索期间不开始后台搜索")
+        with p.user_search():
+            pass
+        await asyncio.sleep(0.05)
+        check(resolve.calls == [], "嵌套的用户搜索结束后仍然暂停")
+    check(await wait_until(lambda: p.resolved == 1), "用户搜索结束后继续预取")
+    p._worker.cancel()
+
+    print("\n测试用例 5: 线程池已满和搜索失败")
+    errors = {"busy.safetensors": ExecutorBusy("io"), "error.safetensors": ValueError("boom")}
+    p, resolve, cache, results = await make(errors=errors)
+    with p.user_search():
+        p.submit([model("busy.safetensors"), model("error.safetensors"), model("ok.safetensors")])
+    check(await wait_until(lambda: p.resolved == 1 and p.failed == 2), "失败的模型计入 failed")
+    check(len(resolve.calls) == 3, "失败后继续搜索后面的模型")
+    check(results == ["ok.safetensors"], "失败的模型不调用 on_result")
+    check(not p._worker.done(), "工作协程没有退出")
+    check(p.status()["pending"] == 0 and p.status()["current"] is None, "失败后清除等待和当前状态")
+    p._worker.cancel()
+
+    print("\n测试用例 6: 关闭时清空等待队列")
+    p, resolve, cache, results = await make()
+    with p.user_search():
+        p.submit([model("a.safetensors"), model("b.safetensors")])
+        p.configure(enabled=False)
+        check(p.status()["pending"] == 0, "关闭后等待队列为空")
+    await asyncio.sleep(0.05)
+    check(resolve.calls == [], "关闭后不再搜索等待中的模型")
+    p.configure(enabled=True, delay=-1)
+    check(p.delay == 0.0, "间隔不小于 0")
+    check(p.submit([model("a.safetensors")]) == 1, "重新开启后可以再加入")
+    check(await wait_until(lambda: p.resolved == 1), "重新开启后完成预取")
+    p._worker.cancel()
+
+    print("\n测试用例 7: 读取模型目录时线程池已满")
+    run_io = prefetcher.run_io
+    busy = ["busy.safetensors"]
+
+    async def fake_run_io(func, *args):
+        if busy:
+            busy.pop()
+            raise ExecutorBusy("io")
+        return await run_io(func, *args)
+
+    prefetcher.run_io = fake_run_io
+    p, resolve, cache, results = await make()
+    with p.user_search():
+        p.submit([model("busy.safetensors"), model("ok.safetensors")])
+    check(await wait_until(lambda: p.resolved == 1), "后面的模型完成预取")
+    check(p.failed == 1, "线程池已满的模型计入 failed")
+    check(resolve.calls == ["ok.safetensors"], f"线程池已满时不搜索: {resolve.calls}")
+    check(p.submit([model("busy.safetensors")]) == 1, "之后可以重新加入")
+    check(await wait_until(lambda: p.resolved == 2), "重新加入后完成预取")
+    prefetcher.run_io = run_io
+    p._worker.cancel()
+
+
+print("=" * 70)
+print("后台预取测试")
+print("=" * 70)
+
+asyncio.run(run_tests())
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
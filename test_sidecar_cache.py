@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试模型信息缓存（使用本地 HTTP 服务器模拟 Civitai 接口和图片服务）
+"""
+
+import sys
+import io
+import os
+import time
+import asyncio
+import tempfile
+
+from aiohttp import web
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+import sidecar_cache
+from sidecar_cache import SidecarCache, build_info, make_thumbnail, sidecar_key
+
+SHA256 = "ab" * 32
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+def sample_image():
+    """生成一张 1024x768 的测试图片（没有 Pillow 时返回任意字节）"""
+    if sidecar_cache.Image is None:
+        return b"not an image"
+    output = io.BytesIO()
+    sidecar_cache.Image.new("RGB", (1024, 768), (200, 80, 40)).save(output, format="JPEG")
+    return output.getvalue()
+
+
+def links_for(name, sha256=SHA256):
+    return [
+        {"source": "Civitai", "name": "Loose match", "url": "https://civitai.com/models/9", "is_non_exact_match": True,
+         "file_name": "loose_" + name, "file_size": 300 * 1024 * 1024, "sha256": "cd" * 32},
+        {"source": "Hugging Face", "name": "org/repo", "url": "https://huggingface.co/org/repo",
+         "download_url": f"https://huggingface.co/org/repo/resolve/main/{name}", "file_name": name,
+         "file_size": 200 * 1024 * 1024,
+         "sha256": sha256},
+        {"source": "Google", "name": name, "url": "https://www.google.com/search?q=x"},
+    ]
+
+
+async def run_tests(tmpdir):
+    requested = []
+    image = sample_image()
+
+    async def by_hash(request):
+        requested.append(request.path)
+        if request.match_info["sha256"].lower() != SHA256:
+            return web.json_response({"error": "Model not found"}, status=404)
+        return web.json_response({
+            "id": 456, "modelId": 123, "name": "v2.0", "baseModel": "SDXL 1.0",
+            "trainedWords": ["detailed ", "", "sharp focus"],
+            "model": {"name": "Detail Tweaker", "type": "LORA"},
+            "files": [{"name": "detail.safetensors", "hashes": {"SHA256": SHA256.upper(), "AutoV2": "ABCDEF1234"}}],
+            "images": [
+                {"url": f"{base}/img/nsfw/width=1024/1.jpeg", "nsfwLevel": 8, "type": "image"},
+                {"url": f"{base}/img/video/width=1024/2.mp4", "nsfwLevel": 1, "type": "video"},
+                {"url": f"{base}/img/safe/width=1024/3.jpeg", "nsfwLevel": 1, "type": "image"},
+            ],
+        })
+
+    async def image_handler(request):
+        requested.append(request.path)
+        return web.Response(body=image, content_type="image/jpeg")
+
+    app = web.Application()
+    app.router.add_get("/api/v1/model-versions/by-hash/{sha256}", by_hash)
+    app.router.add_get("/img/{path:.+}", image_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base = f"http://127.0.0.1:{runner.addresses[0][1]}"
+    sidecar_cache.CIVITAI_BY_HASH_URL = base + "/api/v1/model-versions/by-hash/{}"
+
+    # 测试用例 1: 从搜索结果中取基本信息（只使用文件名一致的链接）
+    info = build_info("detail.safetensors", links_for("detail.safetensors"))
+    check(info["source"] == "Hugging Face" and info["name"] == "org/repo" and info["hashes"] == {"SHA256": SHA256.upper()},
+          "测试用例 1: 使用精确匹配的链接和哈希")
+    check(build_info("x.safetensors", [{"source": "Google", "url": "u"}]) is None, "测试用例 1: 只有 Google 链接时不保存")
+    # 相似度足够高（不是非精确匹配）但文件名不同的文件是另一个模型
+    near_miss = [{"source": "Civitai", "name": "Detail FP16", "url": "https://civitai.com/models/8", "is_non_exact_match": False,
+                  "file_name": "detail_fp16.safetensors", "file_size": 100 * 1024 * 1024, "sha256": "ab" * 32}]
+    check(build_info("detail.safetensors", near_miss) is None, "测试用例 1: 只有文件名相近的链接时不保存")
+    info = build_info("detail.safetensors", near_miss + links_for("detail.safetensors"))
+    check(info["source"] == "Hugging Face" and info["hashes"] == {"SHA256": SHA256.upper()},
+          "测试用例 1: 跳过文件名相近的链接，使用文件名一致的链接和哈希")
+
+    # 测试用例 2: 按哈希从 Civitai 获取信息和预览图
+    directory = os.path.join(tmpdir, "sidecars")
+    cache = SidecarCache(directory)
+    info = await cache.update("detail.safetensors", links_for("detail.safetensors"))
+    check(info["name"] == "Detail Tweaker" and info["version"] == "v2.0" and info["base_model"] == "SDXL 1.0"
+          and info["trigger_words"] == ["detailed", "sharp focus"] and info["hashes"].get("AutoV2") == "ABCDEF1234"
+          and info["url"] == "https://civitai.com/models/123?modelVersionId=456", "测试用例 2: 合并 Civitai 的版本信息")
+    image_requests = [path for path in requested if path.startswith("/img/")]
+    if sidecar_cache.Image is not None:
+        check(image_requests == ["/img/safe/width=512/3.jpeg"], f"测试用例 2: 跳过 NSFW 图片和视频，请求缩小的图片 {image_requests}")
+        thumbnail = cache.thumbnail_path(info["key"])
+        with sidecar_cache.Image.open(thumbnail) as saved:
+            size = saved.size
+        check(info["thumbnail"] and max(size) == cache.thumbnail_size, f"测试用例 2: 预览图缩小为 {size}")
+    else:
+        check(image_requests == [] and not info["thumbnail"] and cache.thumbnail_path(info["key"]) is None,
+              "测试用例 2: 没有 Pillow 时只保存模型信息")
+    check(cache.get("Detail.safetensors") == info and cache.is_fresh("detail.safetensors"),
+          "测试用例 2: 读取记录（文件名不区分大小写）")
+
+    # 测试用例 3: Civitai 上没有这个文件时只保存搜索结果中的信息
+    info = await cache.update("other.safetensors", links_for("other.safetensors", sha256="ef" * 32))
+    check(info["source"] == "Hugging Face" and not info["thumbnail"] and info["trigger_words"] == [],
+          "测试用例 3: 使用搜索结果中的信息")
+    check(cache.thumbnail_path("../settings") is None and cache.thumbnail_path(info["key"]) is None,
+          "测试用例 3: 不合法的键和没有预览图时返回 None")
+    check(set(cache.get_many(["detail.safetensors", "other.safetensors", "none.safetensors"]))
+          == {"detail.safetensors", "other.safetensors"}, "测试用例 3: 批量读取")
+
+    # 测试用例 4: 重启后恢复记录，获取失败的记录已过期
+    sidecar_cache.CIVITAI_BY_HASH_URL = "http://127.0.0.1:1/{}"
+    failed = await cache.update("failed.safetensors", links_for("failed.safetensors"))
+    reloaded = SidecarCache(directory)
+    check(len(reloaded) == 3 and reloaded.total_bytes == cache.total_bytes
+          and reloaded.get("detail.safetensors")["name"] == "Detail Tweaker", "测试用例 4: 重新读取目录中的记录")
+    check(failed["updated_at"] == 0 and not reloaded.is_fresh("failed.safetensors")
+          and reloaded.is_fresh("other.safetensors"), "测试用例 4: 获取失败的记录下次搜索时重新获取")
+
+    # 测试用例 5: 超过总大小上限时删除最久没有使用的记录
+    small = SidecarCache(os.path.join(tmpdir, "small"), max_bytes=2000)
+    for index in range(3):
+        small.store(dict(build_info(f"m{index}.safetensors", links_for(f"m{index}.safetensors")), updated_at=time.time()))
+        time.sleep(0.01)
+    small.get("m0.safetensors")
+    for index in range(3, 6):
+        small.store(dict(build_info(f"m{index}.safetensors", links_for(f"m{index}.safetensors")), updated_at=time.time()))
+        time.sleep(0.01)
+    kept = {name for name in (f"m{index}.safetensors" for index in range(6)) if small.get(name) is not None}
+    check(small.total_bytes <= small.max_bytes and "m0.safetensors" in kept and "m1.safetensors" not in kept
+          and "m5.safetensors" in kept, f"测试用例 5: 删除最久没有使用的记录（保留 {sorted(kept)}）")
+    check(sorted(os.listdir(small.directory)) == sorted(f"{sidecar_key(name)}.json" for name in kept),
+          "测试用例 5: 同时删除文件")
+
+    # 测试用例 6: 后台更新（正在更新或已有记录时跳过）
+    sidecar_cache.CIVITAI_BY_HASH_URL = base + "/api/v1/model-versions/by-hash/{}"
+    started = [cache.schedule("new.safetensors", links_for("new.safetensors")),
+               cache.schedule("new.safetensors", links_for("new.safetensors")),
+               cache.schedule("detail.safetensors", links_for("detail.safetensors")),
+               cache.schedule("google.safetensors", [{"source": "Google", "url": "u"}])]
+    while cache.status()["updating"]:
+        await asyncio.sleep(0.01)
+    check(started == [True, False, False, False] and cache.get("new.safetensors")["name"] == "Detail Tweaker",
+          "测试用例 6: 只更新没有记录的模型，同一个模型只更新一次")
+
+    # 测试用例 7: 无法解码的图片
+    check(make_thumbnail(b"garbage") is None and make_thumbnail(b"") is None, "测试用例 7: 无法解码时不生成预览图")
+
+    await runner.cleanup()
+
+
+print("=" * 70)
+print("模型信息缓存测试")
+print("=" * 70)
+print()
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    asyncio.run(run_tests(tmpdir))
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
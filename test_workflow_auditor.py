@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试工作流批量检查功能
+"""
+
+import sys
+import io
+import os
+import csv
+import json
+import zlib
+import struct
+import tempfile
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+import workflow_auditor
+from workflow_auditor import (
+    audit_workflows, find_workflow_files, get_installed_inventory, report_to_csv, main
+)
+from image_metadata import read_workflow
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def png_chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+def make_png(text_chunks):
+    """生成 1x1 的 PNG，带有 tEXt 块"""
+    data = b"\x89PNG\r\n\x1a\n" + png_chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 0, 0, 0, 0))
+    for key, value in text_chunks.items():
+        data += png_chunk(b"tEXt", key.encode("latin-1") + b"\x00" + value.encode("utf-8"))
+    data += png_chunk(b"IDAT", zlib.compress(b"\x00\x00")) + png_chunk(b"IEND", b"")
+    return data
+
+
+def workflow(*nodes):
+    return json.dumps({"nodes": [
+        {"id": index + 1, "type": node_type, "mode": 0, "widgets_values": [value]}
+        for index, (node_type, value) in enumerate(nodes)
+    ]}).encode("utf-8")
+
+
+print("=" * 70)
+print("工作流批量检查功能测试")
+print("=" * 70)
+print()
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    models = os.path.join(tmpdir, "models")
+    workflows = os.path.join(tmpdir, "workflows")
+    write(os.path.join(models, "checkpoints", "sd_xl_base_1.0.safetensors"), b"x")
+    write(os.path.join(models, "checkpoints", "unused.safetensors"), b"x")
+    write(os.path.join(models, "loras", "sub", "detail.safetensors"), b"x")
+    write(os.path.join(models, "custom_nodes", "node.py"), b"x")
+
+    write(os.path.join(workflows, "a.json"), workflow(
+        ("CheckpointLoaderSimple", "sd_xl_base_1.0.safetensors"),
+        ("LoraLoader", "SUB\\Detail.safetensors"),
+        ("VAELoader", "missing_vae.safetensors"),
+    ))
+    write(os.path.join(workflows, "nested", "b.json"), workflow(
+        ("VAELoader", "missing_vae.safetensors"),
+        ("UpscaleModelLoader", "4x_upscale.pth"),
+    ))
+    # 嵌入了工作流的图片（API 格式的 prompt）
+    write(os.path.join(workflows, "c.png"), make_png({
+        "prompt": json.dumps({"1": {"class_type": "CheckpointLoaderSimple",
+                                    "inputs": {"ckpt_name": "other_ckpt.safetensors"}}})
+    }))
+    write(os.path.join(workflows, "broken.json"), b"{not json")
+    write(os.path.join(workflows, "notes.txt"), b"ignored")
+
+    inventory = get_installed_inventory([models])
+
+    # 测试用例 1: 模型目录和工作流文件
+    check(sorted(inventory) == ["checkpoints", "loras"] and inventory["loras"] == ["sub/detail.safetensors"],
+          "测试用例 1: 读取已安装的模型（忽略 custom_nodes）")
+    paths = find_workflow_files(workflows)
+    check([os.path.basename(path) for path in paths] == ["a.json", "broken.json", "c.png", "b.json"],
+          "测试用例 1: 找到 .json 和 .png 文件（包括子目录）")
+    check(len(find_workflow_files(workflows, recursive=False)) == 3, "测试用例 1: 可以不扫描子目录")
+
+    # 测试用例 2: PNG 中的工作流
+    data = read_workflow(os.path.join(workflows, "c.png"))
+    check(isinstance(data, dict) and data["1"]["class_type"] == "CheckpointLoaderSimple",
+          "测试用例 2: 读取 PNG tEXt 块中的 prompt")
+
+    # 测试用例 3: 缺失模型、没有被使用的模型、下载大小（进程池，命令行使用）
+    sizes = {"missing_vae.safetensors": 300, "other_ckpt.safetensors": 2000}
+    report = audit_workflows(paths, inventory, size_lookup=sizes.get, workers=2, use_processes=True)
+    by_name = {os.path.basename(entry["path"]): entry for entry in report["workflows"]}
+    check([model["name"] for model in by_name["a.json"]["missing"]] == ["missing_vae.safetensors"],
+          "测试用例 3: 已安装的模型不算缺失（子目录和大小写不影响）")
+    check(by_name["broken.json"]["error"] and report["failed_files"] == 1, "测试用例 3: 记录无法解析的文件")
+    missing = {entry["name"]: entry for entry in report["missing"]}
+    check(sorted(missing) == ["4x_upscale.pth", "missing_vae.safetensors", "other_ckpt.safetensors"]
+          and len(missing["missing_vae.safetensors"]["workflows"]) == 2,
+          "测试用例 3: 汇总缺失的模型和使用它们的工作流")
+    check(report["total_download_size"] == 2300 and report["unknown_size"] == 1,
+          f"测试用例 3: 需要下载 {report['total_download_size']} 字节，{report['unknown_size']} 个大小未知")
+    check(report["unreferenced"] == [{"name": "unused.safetensors", "folder": "checkpoints"}],
+          "测试用例 3: 找到没有被任何工作流使用的模型")
+
+    # 测试用例 4: 单进程的结果相同
+    serial = audit_workflows(paths, inventory, size_lookup=sizes.get, workers=1)
+    check(serial["missing"] == report["missing"] and serial["workflows"] == report["workflows"],
+          "测试用例 4: 单进程和多进程的结果相同")
+
+    # 测试用例 4: 默认（检查接口）只使用线程池，不创建子进程
+    process_pools = []
+    original = workflow_auditor.ProcessPoolExecutor
+    workflow_auditor.ProcessPoolExecutor = lambda *args, **kwargs: process_pools.append(args) or original(*args, **kwargs)
+    try:
+        threaded = audit_workflows(paths, inventory, size_lookup=sizes.get, workers=2)
+    finally:
+        workflow_auditor.ProcessPoolExecutor = original
+    check(process_pools == [] and threaded["missing"] == report["missing"]
+          and threaded["workflows"] == report["workflows"], "测试用例 4: 线程池的结果相同，没有创建进程池")
+
+    # 测试用例 5: CSV 报告和命令行
+    rows = list(csv.DictReader(io.StringIO(report_to_csv(report))))
+    check(sum(1 for row in rows if row["kind"] == "missing") == 4
+          and sum(1 for row in rows if row["kind"] == "unreferenced") == 1,
+          "测试用例 5: CSV 报告包含缺失和未使用的模型")
+    output = os.path.join(tmpdir, "report.json")
+    exit_code = main([workflows, "--models-dir", models, "--format", "json", "-o", output, "--workers", "1"])
+    with open(output, "r", encoding="utf-8") as f:
+        cli_report = json.load(f)
+    check(exit_code == 0 and len(cli_report["missing"]) == 3 and cli_report["unknown_size"] == 3,
+          "测试用例 5: 命令行输出 JSON 报告")
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试服务器端的工作流模型提取功能（workflow 格式和 prompt 格式）
+"""
+
+import sys
+import io
+
+# 设置输出编码为 UTF-8
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+from workflow_models import extract_models
+
+failures = 0
+
+
+def check(condition, description):
+    """检查单个断言"""
+    global failures
+    status = "[OK]" if condition else "[FAIL]"
+    if not condition:
+        failures += 1
+    print(f"{status} {description}")
+
+
+def by_name(models):
+    return {model["name"]: model for model in models}
+
+
+print("=" * 70)
+print("工作流模型提取测试")
+print("=" * 70)
+print()
+
+workflow = {
+    "nodes": [
+        {"id": 1, "type": "CheckpointLoaderSimple", "mode": 0,
+         "widgets_values": ["SDXL\\sd_xl_base_1.0.safetensors"],
+         "outputs": [{"name": "MODEL", "links": [1]}]},
+        {"id": 2, "type": "LoraLoader", "mode": 4, "widgets_values": ["detail.safetensors", 1.0, 1.0],
+         "outputs": [{"name": "MODEL", "links": [2]}]},
+        {"id": 3, "type": "HighRes-Fix Script", "mode": 0,
+         "widgets_values": ["latent", "(use same)", 1, "4x-UltraSharp.pth"],
+         "outputs": [{"name": "SCRIPT", "links": [3]}]},
+        {"id": 4, "type": "VAELoader", "mode": 0, "widgets_values": ["None"], "outputs": []},
+        {"id": 5, "type": "CustomLoader", "mode": 0,
+         "inputs": [{"name": "model_name", "widget": {"name": "model_name"}, "link": None}],
+         "widgets_values": ["face_yolov8m.pt", 0.5],
+         "outputs": [{"name": "DETECTOR", "links": [4]}]},
+        {"id": 6, "type": "CheckpointLoaderSimple", "mode": 0,
+         "widgets_values": ["sd_xl_base_1.0.safetensors"], "outputs": []},
+    ]
+}
+models = by_name(extract_models(workflow))
+
+# 测试用例 1: 加载器节点按 widgets_values 索引提取，去掉子目录
+model = models.get("sd_xl_base_1.0.safetensors")
+check(model is not None and model["type"] == "主模型" and model["node_ids"] == [1, 6],
+      "测试用例 1: 主模型去掉子目录，合并两个节点")
+
+# 测试用例 2: 使用状态（静音节点未使用；同一模型只要有一个节点使用就是已使用）
+check(models["detail.safetensors"]["is_used"] is False and model["is_used"] is True,
+      "测试用例 2: 节点使用状态")
+
+# 测试用例 3: HighRes-Fix Script 的模型在索引 3，无效值被过滤
+check(models.get("4x-UltraSharp.pth", {}).get("type") == "放大模型" and "None" not in models,
+      "测试用例 3: 索引 3 的放大模型，过滤 None")
+
+# 测试用例 4: 通用检测（有 model 输入字段的未知节点）
+check("face_yolov8m.pt" in models, "测试用例 4: 未知节点中的模型文件名")
+
+# 测试用例 5: API 格式的 prompt（连接输入被忽略）
+prompt = {
+    "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "flux/flux1-dev.safetensors"}},
+    "10": {"class_type": "LoraLoaderModelOnly", "inputs": {"model": ["4", 0], "lora_name": "style.safetensors",
+                                                           "strength_model": 1.0}},
+    "12": {"class_type": "KSampler", "inputs": {"seed": 1, "sampler_name": "euler"}},
+}
+models = by_name(extract_models(prompt))
+check(set(models) == {"flux1-dev.safetensors", "style.safetensors"}
+      and models["style.safetensors"]["type"] == "LoRA" and models["flux1-dev.safetensors"]["node_ids"] == [4],
+      f"测试用例 5: prompt 格式 -> {sorted(models)}")
+
+print()
+print("=" * 70)
+print("测试完成" if failures == 0 else f"测试完成，失败 {failures} 个")
+print("=" * 70)
+sys.exit(1 if failures else 0)
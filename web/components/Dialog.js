@@ -151,9 +151,13 @@ export function createDialog(version) {
     modal.appendChild(dialog);
     document.body.appendChild(modal);
 
-    // 当对话框关闭时，清理引用
+    // 对话框中发起的搜索请求共用一个 AbortController，关闭对话框时中止（服务器端随之取消搜索）
+    content._abortController = new AbortController();
+
+    // 当对话框关闭时，清理引用并中止未完成的请求
     const originalRemove = modal.remove.bind(modal);
     modal.remove = function() {
+        content._abortController.abort();
         originalRemove();
     };
 
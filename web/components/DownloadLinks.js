@@ -2,11 +2,55 @@
  * 下载链接组件
  */
 
-import { filterLinksBySize, filterNonExactMatches } from './LinkFilter.js';
+import { filterLinksBySize, filterNonExactMatches, PEER_SOURCE } from './LinkFilter.js';
 import { renderRefreshButton } from './RefreshButton.js';
 import { t } from '../i18n/i18n.js';
+import { getDownloadJob, getDownloadButtonLabel } from '../utils/downloads.js';
 
-export function renderDownloadLinks(links, modelName, modelType, isInstalled) {
+// 渲染"下载到服务器"按钮（由后端直接下载到模型目录，overwrite 为 true 时替换已损坏的文件）
+function renderServerDownloadButton(link, modelName, modelType, isUsed, overwrite = false) {
+    const job = getDownloadJob(modelName);
+    const busy = job && ["verifying", "completed"].includes(job.status);
+    return `
+        <button class="server-download-btn"
+                data-url="${link.download_url}"
+                data-model-name="${modelName}"
+                data-model-type="${modelType}"
+                data-sha256="${link.sha256 || ''}"
+                data-file-size="${link.file_size || ''}"
+                data-is-used="${isUsed !== false}"
+                data-overwrite="${overwrite === true}"
+                ${busy ? 'disabled' : ''}
+                style="margin-left: 4px; padding: 1px 6px; font-size: 11px; background: #2d2d2d; color: #81c784; border: 1px solid #444; border-radius: 3px; cursor: pointer;">
+            ${getDownloadButtonLabel(job)}
+        </button>
+    `;
+}
+
+// 链接检查结果的标记（需要授权、已失效），未检查或可用时不显示
+function renderLinkStatusBadge(link) {
+    const status = link.link_status;
+    if (!status || status.ok) {
+        return '';
+    }
+    if (status.gated) {
+        return `<span title="${t('linkGatedTooltip')}" style="margin-left: 4px; color: #ffb74d; font-size: 11px;">🔒 ${t('linkGated')}</span>`;
+    }
+    // 网络错误（status 为空）时无法判断，不显示
+    if (status.status && status.status < 500) {
+        return `<span title="HTTP ${status.status}" style="margin-left: 4px; color: #e57373; font-size: 11px;">✗ ${t('linkBroken')}</span>`;
+    }
+    return '';
+}
+
+// 已确认失效或需要授权的链接无法由服务器直接下载
+function isLinkUnusable(link) {
+    const status = link.link_status;
+    return Boolean(status && !status.ok && (status.gated || (status.status && status.status < 500)));
+}
+
+// overwrite: 已安装的文件损坏，下载后替换
+export function renderDownloadLinks(links, modelName, modelType, isInstalled, isUsed = true, overwrite = false) {
     if (links.length === 0) {
         if (!isInstalled) {
             return `<span style="color: #666; font-size: 12px;">${t('notFound')}</span>`;
@@ -31,8 +75,10 @@ export function renderDownloadLinks(links, modelName, modelType, isInstalled) {
             html += `
                 <div style="margin-bottom: 4px;">
                     <a href="${link.download_url}" target="_blank" rel="noopener noreferrer" style="color: ${linkColor}; text-decoration: none; font-size: 12px; word-break: break-all;">
-                        ${link.source} ${t('download')}${fileSize}
+                        ${link.source === PEER_SOURCE ? t('peerSource', { name: link.name }) : link.source} ${t('download')}${fileSize}
                     </a>
+                    ${renderLinkStatusBadge(link)}
+                    ${!isInstalled && !isLinkUnusable(link) ? renderServerDownloadButton(link, modelName, modelType, isUsed, overwrite) : ''}
                 </div>
             `;
         } else if (link.url && link.source === "Google") {
@@ -2,13 +2,17 @@
  * 链接过滤工具函数
  */
 
+// 局域网节点的来源名称（peer_source.py 中的 SOURCE_NAME）
+export const PEER_SOURCE = "LAN Peer";
+
 /**
- * 过滤链接：Civitai 和 Hugging Face 必须有 file_size 且 >= 10MB，Google 链接可以没有
+ * 过滤链接：Civitai 和 Hugging Face 必须有 file_size 且 >= 10MB，Google 链接可以没有，
+ * 局域网节点上的文件一定存在，不限制大小
  */
 export function filterLinksBySize(links) {
     return links.filter(link => {
         const source = link.source || "";
-        if (source.includes("Google")) {
+        if (source.includes("Google") || source === PEER_SOURCE) {
             return true;
         }
         if (source === "Civitai" || source === "Hugging Face") {
@@ -3,9 +3,45 @@
  */
 
 import { filterLinksBySize, filterNonExactMatches } from './LinkFilter.js';
+import { getSidecarThumbnailUrl } from '../utils/api.js';
 import { t } from '../i18n/i18n.js';
 
-export function renderModelPageLinks(links, isInstalled) {
+// 转义来自 Civitai 的文本（模型名称和触发词由用户填写）
+function escapeText(text) {
+    return String(text).replace(/[&<>"']/g, ch => ({ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' })[ch]);
+}
+
+// 本地保存的模型信息（预览图、名称、版本、基础模型和触发词），不需要打开模型页面就能确认是哪个模型
+export function renderSidecarPreview(sidecar) {
+    if (!sidecar) {
+        return '';
+    }
+    const thumbnail = sidecar.thumbnail
+        ? `<img src="${getSidecarThumbnailUrl(sidecar.key)}" loading="lazy" alt="" style="width: 56px; height: 56px; object-fit: cover; border-radius: 4px; flex-shrink: 0; background: #222;">`
+        : '';
+    const details = [];
+    if (sidecar.name) {
+        details.push(`<div style="color: #e0e0e0; word-break: break-all;">${escapeText(sidecar.name)}${sidecar.version ? ` <span style="color: #999;">(${escapeText(sidecar.version)})</span>` : ''}</div>`);
+    }
+    if (sidecar.base_model) {
+        details.push(`<div style="color: #999;">${t('sidecarBaseModel')}: ${escapeText(sidecar.base_model)}</div>`);
+    }
+    if (sidecar.trigger_words && sidecar.trigger_words.length > 0) {
+        const words = sidecar.trigger_words.map(escapeText).join(', ');
+        details.push(`<div style="color: #ffb74d; word-break: break-word;" title="${words}">${t('sidecarTriggerWords')}: ${words}</div>`);
+    }
+    if (!thumbnail && details.length === 0) {
+        return '';
+    }
+    return `
+        <div style="display: flex; gap: 8px; align-items: flex-start; margin-bottom: 6px; font-size: 11px;">
+            ${thumbnail}
+            <div style="min-width: 0;">${details.join('')}</div>
+        </div>
+    `;
+}
+
+export function renderModelPageLinks(links, isInstalled, sidecar = null) {
     if (links.length === 0) {
         if (!isInstalled) {
             return `<span style="color: #666; font-size: 12px;">${t('notFound')}</span>`;
@@ -33,7 +69,7 @@ export function renderModelPageLinks(links, isInstalled) {
     // 按类型顺序显示（保持原始字符串，因为用于匹配键值）
     const sourceOrder = ["Civitai", "Hugging Face", "Google → Civitai", "Google → Hugging Face", "Google → GitHub", "Google", "其他"];
     let isFirstGroup = true;
-    let html = '';
+    let html = renderSidecarPreview(sidecar);
     
     for (const sourceType of sourceOrder) {
         if (linksBySource[sourceType] && linksBySource[sourceType].length > 0) {
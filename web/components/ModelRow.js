@@ -39,19 +39,23 @@ function translateModelType(type) {
 }
 
 export function renderModelRow(model, links, modelTypeToDir, showLoading = false, extraModelPaths = null) {
-    const statusColor = model.installed ? "#81c784" : "#e57373";
-    const statusText = model.installed ? `✓ ${t('installed')}` : `✗ ${t('missing')}`;
-    const rowBgColor = model.installed ? "#1e2e1e" : "#2e1e1e";
+    // 已安装但校验失败（大小或 SHA-256 与上游不一致）的模型单独显示，并提供下载链接用于替换
+    const corrupt = Boolean(model.installed && model.corrupt);
+    const isInstalled = model.installed && !corrupt;
+    const statusColor = corrupt ? "#ffb74d" : (model.installed ? "#81c784" : "#e57373");
+    const statusText = corrupt ? `⚠ ${t('corrupt')}` : (model.installed ? `✓ ${t('installed')}` : `✗ ${t('missing')}`);
+    const statusTitle = corrupt && model.integrity ? (model.integrity.reason || '') : '';
+    const rowBgColor = corrupt ? "#2e2a1e" : (model.installed ? "#1e2e1e" : "#2e1e1e");
     const rowId = `model-row-${model.name.replace(/[^a-zA-Z0-9]/g, '-')}`;
     
     // 本地目录（传递 extraModelPaths 和模型名称）
     const localPathHtml = renderLocalPath(model, model.type, modelTypeToDir, extraModelPaths);
     
     // 模型页面链接（如果需要显示加载状态，显示加载动画）
-    const modelPageHtml = showLoading ? renderSpinner(t('searching')) : renderModelPageLinks(links, model.installed);
+    const modelPageHtml = showLoading ? renderSpinner(t('searching')) : renderModelPageLinks(links, isInstalled, model.sidecar);
     
     // 下载链接（如果需要显示加载状态，显示加载动画）
-    const downloadLinksHtml = showLoading ? renderSpinner(t('searching')) : renderDownloadLinks(links, model.name, model.type, model.installed);
+    const downloadLinksHtml = showLoading ? renderSpinner(t('searching')) : renderDownloadLinks(links, model.name, model.type, isInstalled, model.isUsed, corrupt);
     
     // 高亮按钮（为每个节点创建一个按钮）
     let highlightButtonsHtml = '';
@@ -90,7 +94,7 @@ export function renderModelRow(model, links, modelTypeToDir, showLoading = false
                 </div>
             </td>
             <td style="padding: 12px; text-align: center; border-bottom: 1px solid #333; width: 200px; max-width: 200px;">
-                <span style="color: ${statusColor}; font-weight: bold;">${statusText}</span>
+                <span style="color: ${statusColor}; font-weight: bold;" title="${statusTitle.replace(/"/g, '&quot;')}">${statusText}</span>
             </td>
             <td style="padding: 12px; border-bottom: 1px solid #333; width: 200px; max-width: 200px; word-wrap: break-word; overflow-wrap: break-word;">
                 ${localPathHtml}
@@ -4,11 +4,17 @@
 
 import { t } from '../i18n/i18n.js';
 
-export function renderStatsCards(totalRequired, installedCount, missingCount) {
+// corruptCount: 已安装但校验失败的模型数（大于 0 时显示第四张卡片）
+export function renderStatsCards(totalRequired, installedCount, missingCount, corruptCount = 0) {
+    const corruptCard = corruptCount > 0 ? `
+                <div style="background: #3d321e; padding: 15px; border-radius: 4px; border: 1px solid #5a4a2d;">
+                    <div style="font-size: 24px; font-weight: bold; color: #ffb74d;">${corruptCount}</div>
+                    <div style="color: #b0b0b0;">${t('corrupt')}</div>
+                </div>` : '';
     return `
-        <div style="margin-bottom: 20px;">
+        <div id="model-stats-cards" style="margin-bottom: 20px;">
             <h3 style="color: #e0e0e0;">📊 ${t('statistics')}</h3>
-            <div style="display: grid; grid-template-columns: repeat(3, 1fr); gap: 10px; margin-bottom: 20px;">
+            <div style="display: grid; grid-template-columns: repeat(${corruptCount > 0 ? 4 : 3}, 1fr); gap: 10px; margin-bottom: 20px;">
                 <div style="background: #1e3a5f; padding: 15px; border-radius: 4px; border: 1px solid #2d4a6b;">
                     <div style="font-size: 24px; font-weight: bold; color: #64b5f6;">${totalRequired}</div>
                     <div style="color: #b0b0b0;">${t('totalModels')}</div>
@@ -20,7 +26,7 @@ export function renderStatsCards(totalRequired, installedCount, missingCount) {
                 <div style="background: #3d1e1e; padding: 15px; border-radius: 4px; border: 1px solid #5a2d2d;">
                     <div style="font-size: 24px; font-weight: bold; color: #e57373;">${missingCount}</div>
                     <div style="color: #b0b0b0;">${t('missing')}</div>
-                </div>
+                </div>${corruptCard}
             </div>
         </div>
     `;
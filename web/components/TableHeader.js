@@ -14,16 +14,28 @@ export function renderTableHeader() {
             <label for="model-search-input" style="color: #e0e0e0; font-size: 14px; white-space: nowrap;">${t('searchModel')}</label>
             <input type="text" 
                    id="model-search-input" 
+                   list="installed-model-suggestions"
+                   autocomplete="off"
                    placeholder="${t('searchPlaceholder')}" 
                    style="flex: 1; max-width: 400px; padding: 8px 12px; background: #2d2d2d; border: 1px solid #555; border-radius: 4px; color: #e0e0e0; font-size: 14px; outline: none; transition: border-color 0.2s;"
                    onfocus="this.style.borderColor='#64b5f6';"
                    onblur="this.style.borderColor='#555';">
+            <datalist id="installed-model-suggestions"></datalist>
             <button id="clear-search-btn" 
                     style="padding: 8px 16px; background: #4a5568; color: #e0e0e0; border: 1px solid #666; border-radius: 4px; cursor: pointer; font-size: 14px; transition: all 0.2s; display: none;"
                     onmouseover="this.style.background='#5a6578';"
                     onmouseout="this.style.background='#4a5568';">
                 ${t('clear')}
             </button>
+            <button id="verify-integrity-btn"
+                    title="${t('verifyIntegrityTooltip')}"
+                    style="margin-left: auto; padding: 8px 16px; background: #2d2d2d; color: #ffb74d; border: 1px solid #444; border-radius: 4px; cursor: pointer; font-size: 14px;">
+                ${t('verifyIntegrity')}
+            </button>
+            <button id="download-all-missing-btn"
+                    style="padding: 8px 16px; background: #2d2d2d; color: #81c784; border: 1px solid #444; border-radius: 4px; cursor: pointer; font-size: 14px;">
+                ${t('downloadAllMissing')}
+            </button>
         </div>
         <div style="overflow-x: auto; margin-bottom: 20px; width: 100%; box-sizing: border-box;">
             <table style="width: 100%; min-width: 1000px; border-collapse: collapse; background: #1e1e1e; box-shadow: 0 2px 4px rgba(0,0,0,0.3); table-layout: fixed;">
@@ -11,6 +11,8 @@ import { t } from "./i18n/i18n.js";
 
 // 从 utils 导入所有功能函数
 import { clearExpiredCache } from "./utils/cache.js";
+import { registerPrefetchSetting, schedulePrefetch } from "./utils/prefetch.js";
+import { attachGraphListeners } from "./utils/incrementalAnalyzer.js";
 import { analyzeCurrentWorkflow, displayModelStatus } from "./utils/workflowAnalysis.js";
 import { addFindModelsButton } from "./utils/ui.js";
 
@@ -139,6 +141,9 @@ app.registerExtension({
         // 异步清理过期缓存，不阻塞初始化
         setTimeout(() => clearExpiredCache(), 1000);
         
+        // 后台预取下载链接的设置（默认关闭）
+        registerPrefetchSetting();
+        
         // 获取版本信息
         try {
             const response = await api.fetchApi("/comfyui-find-models/api/v1/system/version");
@@ -160,6 +165,8 @@ app.registerExtension({
                         if (typeof window !== 'undefined') {
                             window._currentWorkflow = workflow;
                         }
+                        // 把缺失的模型交给后端预取下载链接
+                        schedulePrefetch(workflow);
                     }
                 }
             } catch (error) {
@@ -176,6 +183,14 @@ app.registerExtension({
                 return;
             }
             
+            // 监听节点增删、连接变化和 widget 修改，只重新提取变化的节点
+            // 对话框打开时，工作流中的模型变化后立即更新显示（只重新检查受影响的模型）
+            attachGraphListeners(app.graph, () => {
+                if (window._currentDialogContent) {
+                    analyzeCurrentWorkflow(window._currentDialogContent);
+                }
+            });
+            
             // 方法1: 监听 loadGraphData（加载 workflow 文件）
             if (app.graph.loadGraphData) {
                 const originalLoadGraphData = app.graph.loadGraphData;
@@ -74,11 +74,37 @@ export const translations = {
         // Links
         notFound: "Not Found",
         download: "Download",
+        linkGated: "Login required",
+        linkGatedTooltip: "This file requires logging in or accepting the license on the site before downloading",
+        linkBroken: "Link broken",
+        sidecarBaseModel: "Base model",
+        sidecarTriggerWords: "Trigger words",
+        peerSource: "LAN node {name}",
         search: "Search",
         other: "Other",
         
         // Local Path
-        downloadToPath: "Download to this path"
+        downloadToPath: "Download to this path",
+        
+        // Server Download
+        downloadToServer: "⬇ Download to ComfyUI",
+        downloadQueued: "Queued...",
+        downloadingProgress: "Downloading {percent}%",
+        downloadVerifying: "Verifying...",
+        downloadCompleted: "✓ Downloaded",
+        downloadCancelled: "Cancelled, click to resume",
+        downloadFailed: "✗ Failed, click to retry",
+        downloadPaused: "Paused {percent}%, click to resume",
+        downloadAllMissing: "⬇ Download all missing",
+        downloadAllQueued: "Queued {count} downloads",
+        // Integrity
+        corrupt: "Corrupt",
+        verifyIntegrity: "🔍 Verify files",
+        verifyIntegrityTooltip: "Compare installed models' size and SHA-256 with the files on Civitai / Hugging Face",
+        verifyQueued: "Verifying {count} models...",
+        // Prefetch
+        prefetchSetting: "Find Models: prefetch download links in the background",
+        prefetchSettingTooltip: "Search download links for missing models of loaded and queued workflows in the background, so the dialog opens with results already filled in"
     },
     zh: {
         // Dialog
@@ -151,10 +177,36 @@ export const translations = {
         // Links
         notFound: "未找到",
         download: "下载",
+        linkGated: "需要登录",
+        linkGatedTooltip: "下载这个文件需要先在网站上登录或同意许可协议",
+        linkBroken: "链接已失效",
+        sidecarBaseModel: "基础模型",
+        sidecarTriggerWords: "触发词",
+        peerSource: "局域网节点 {name}",
         search: "搜索",
         other: "其他",
         
         // Local Path
-        downloadToPath: "下载到此路径"
+        downloadToPath: "下载到此路径",
+        
+        // Server Download
+        downloadToServer: "⬇ 下载到 ComfyUI",
+        downloadQueued: "排队中...",
+        downloadingProgress: "下载中 {percent}%",
+        downloadVerifying: "校验中...",
+        downloadCompleted: "✓ 已下载",
+        downloadCancelled: "已取消，点击继续",
+        downloadFailed: "✗ 失败，点击重试",
+        downloadPaused: "已暂停 {percent}%，点击继续",
+        downloadAllMissing: "⬇ 下载全部缺失模型",
+        downloadAllQueued: "已加入 {count} 个下载任务",
+        // 完整性校验
+        corrupt: "已损坏",
+        verifyIntegrity: "🔍 校验文件",
+        verifyIntegrityTooltip: "把已安装模型的大小和 SHA-256 与 Civitai / Hugging Face 上的文件比较",
+        verifyQueued: "正在校验 {count} 个模型...",
+        // 预取
+        prefetchSetting: "Find Models: 在后台预取下载链接",
+        prefetchSettingTooltip: "在后台搜索已加载和已提交到队列的工作流中缺失模型的下载链接，打开对话框时直接显示结果"
     }
 };
@@ -0,0 +1,57 @@
+/**
+ * 完整分析结果缓存模块
+ * 键由工作流中与模型有关的内容的哈希、已安装模型列表的版本和模型目录配置的版本组成，
+ * 工作流没有变化、模型没有增删时重新打开对话框直接显示上一次的分析结果
+ */
+
+import { getInventoryVersion } from "./api.js";
+import { getWorkflowModelHash, invalidateInstalledModels } from "./incrementalAnalyzer.js";
+
+// 最多缓存的分析结果数（按最近使用淘汰）
+const MAX_ENTRIES = 8;
+
+// 缓存键 -> analyzeCurrentWorkflow 生成的结果（Map 按插入顺序保存，最近使用的在最后）
+const _entries = new Map();
+// 上一次获取到的已安装模型列表和目录配置的版本
+let _inventoryKey = null;
+
+// 计算当前工作流的缓存键（获取版本失败时返回 null，不使用缓存）
+// 版本变化时（模型增删、目录配置修改）已安装模型列表和所有缓存的结果都失效
+export async function getAnalysisCacheKey(graph) {
+    const versions = await getInventoryVersion();
+    if (!versions || !versions.inventory) {
+        return null;
+    }
+    const inventoryKey = `${versions.inventory}:${versions.extra_model_paths}`;
+    if (_inventoryKey !== null && inventoryKey !== _inventoryKey) {
+        invalidateInstalledModels();
+        _entries.clear();
+    }
+    _inventoryKey = inventoryKey;
+    return `${getWorkflowModelHash(graph)}:${inventoryKey}`;
+}
+
+// 获取缓存的分析结果（没有时返回 null）
+export function getCachedAnalysis(key) {
+    const result = _entries.get(key);
+    if (!result) {
+        return null;
+    }
+    _entries.delete(key);
+    _entries.set(key, result);
+    return result;
+}
+
+// 保存分析结果
+export function setCachedAnalysis(key, result) {
+    _entries.delete(key);
+    _entries.set(key, result);
+    while (_entries.size > MAX_ENTRIES) {
+        _entries.delete(_entries.keys().next().value);
+    }
+}
+
+// 清空缓存的分析结果（单个模型重新搜索后，缓存的结果中的下载链接已经过期）
+export function clearAnalysisCache() {
+    _entries.clear();
+}
@@ -29,6 +29,186 @@ export async function getExtraModelPaths() {
     }
 }
 
+// 批量获取已安装模型的头部元数据（派系和类型），models: [{ model_type, name }]
+// 返回 { "类型:名称": 元数据 }，失败时返回空对象
+export async function getModelsMetadata(models) {
+    if (!models || models.length === 0) {
+        return {};
+    }
+    try {
+        const response = await api.fetchApi("/comfyui-find-models/api/v1/models/metadata", {
+            method: "POST",
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ models }),
+        });
+        if (!response.ok) {
+            return {};
+        }
+        const data = await response.json();
+        return data.results || {};
+    } catch (error) {
+        // console.warn("[ComfyUI-find-models] 获取模型元数据失败:", error);
+        return {};
+    }
+}
+
+// 校验已安装模型的完整性（models: [{ model_type, name }]）
+// full 为 false 时只使用服务器端已缓存的信息，返回 { results: { "类型:名称": 结果 } }；
+// full 为 true 时在后台计算哈希，结果通过 comfyui-find-models.verify 事件推送
+export async function verifyModels(models, full = false) {
+    if (!models || models.length === 0) {
+        return {};
+    }
+    try {
+        const response = await api.fetchApi("/comfyui-find-models/api/v1/models/verify", {
+            method: "POST",
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ models, full }),
+        });
+        return response.ok ? await response.json() : {};
+    } catch (error) {
+        // console.warn("[ComfyUI-find-models] 校验模型失败:", error);
+        return {};
+    }
+}
+
+// 检查下载链接是否可用（服务器端缓存 6 小时），返回 { 下载地址: { ok, status, gated, content_length, ... } }
+// signal: 中止请求的 AbortSignal（关闭对话框时服务器端同时取消检查）
+export async function validateLinks(urls, signal = undefined) {
+    if (!urls || urls.length === 0) {
+        return {};
+    }
+    try {
+        const response = await api.fetchApi("/comfyui-find-models/api/v1/links/validate", {
+            method: "POST",
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ urls }),
+            signal,
+        });
+        if (!response.ok) {
+            return {};
+        }
+        const data = await response.json();
+        return data.results || {};
+    } catch (error) {
+        // console.warn("[ComfyUI-find-models] 检查下载链接失败:", error);
+        return {};
+    }
+}
+
+// 批量获取本地保存的模型信息（名称、版本、触发词、基础模型、哈希、是否有预览图），返回 { 模型名: 信息 }
+export async function getModelSidecars(modelNames, signal = undefined) {
+    if (!modelNames || modelNames.length === 0) {
+        return {};
+    }
+    try {
+        const response = await api.fetchApi("/comfyui-find-models/api/v1/models/sidecar", {
+            method: "POST",
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ model_names: modelNames }),
+            signal,
+        });
+        if (!response.ok) {
+            return {};
+        }
+        const data = await response.json();
+        return data.results || {};
+    } catch (error) {
+        // console.warn("[ComfyUI-find-models] 获取模型信息失败:", error);
+        return {};
+    }
+}
+
+// 本地保存的模型预览图地址
+export function getSidecarThumbnailUrl(key) {
+    return api.apiURL(`/comfyui-find-models/api/v1/models/sidecar/${encodeURIComponent(key)}/thumbnail`);
+}
+
+// 批量获取服务器端缓存的搜索结果（后台预取的结果），返回 { 模型名: 链接列表 }
+export async function getServerCachedResults(modelNames) {
+    if (!modelNames || modelNames.length === 0) {
+        return {};
+    }
+    try {
+        const response = await api.fetchApi("/comfyui-find-models/api/v1/models/search/cached", {
+            method: "POST",
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ model_names: modelNames }),
+        });
+        if (!response.ok) {
+            return {};
+        }
+        const data = await response.json();
+        return data.results || {};
+    } catch (error) {
+        // console.warn("[ComfyUI-find-models] 获取服务器端缓存失败:", error);
+        return {};
+    }
+}
+
+// 把工作流中缺失的模型加入后台预取
+export async function prefetchWorkflow(workflow) {
+    try {
+        const response = await api.fetchApi("/comfyui-find-models/api/v1/prefetch", {
+            method: "POST",
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ workflow }),
+        });
+        return response.ok ? await response.json() : null;
+    } catch (error) {
+        // console.warn("[ComfyUI-find-models] 添加预取任务失败:", error);
+        return null;
+    }
+}
+
+// 修改后台预取设置（enabled、delay）
+export async function updatePrefetchSettings(values) {
+    try {
+        const response = await api.fetchApi("/comfyui-find-models/api/v1/prefetch/settings", {
+            method: "PUT",
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(values),
+        });
+        return response.ok ? await response.json() : null;
+    } catch (error) {
+        // console.warn("[ComfyUI-find-models] 修改预取设置失败:", error);
+        return null;
+    }
+}
+
+// 在后端的已安装模型索引中搜索文件名（前缀、子串和分词匹配），返回 [{ name, folder }]
+export async function searchInstalledModels(query, modelType = "", limit = 20) {
+    if (!query) {
+        return [];
+    }
+    try {
+        const params = new URLSearchParams({ q: query, limit: String(limit) });
+        if (modelType) {
+            params.set("type", modelType);
+        }
+        const response = await api.fetchApi(`/comfyui-find-models/api/v1/models/installed/search?${params}`);
+        if (!response.ok) {
+            return [];
+        }
+        const data = await response.json();
+        return data.results || [];
+    } catch (error) {
+        // console.warn("[ComfyUI-find-models] 搜索已安装模型失败:", error);
+        return [];
+    }
+}
+
+// 获取已安装模型列表和模型目录配置的版本，返回 { inventory, extra_model_paths, total }，失败时返回 null
+export async function getInventoryVersion() {
+    try {
+        const response = await api.fetchApi("/comfyui-find-models/api/v1/models/inventory/version");
+        return response.ok ? await response.json() : null;
+    } catch (error) {
+        // console.warn("[ComfyUI-find-models] 获取已安装模型列表的版本失败:", error);
+        return null;
+    }
+}
+
 // 从 ComfyUI API 获取已安装的模型列表
 export async function getInstalledModels() {
     try {
@@ -281,10 +461,12 @@ export async function getInstalledModels() {
 }
 
 // 搜索模型链接（通过后端API，带缓存）
-export async function searchModelLinks(modelName, modelType, skipCache = false, getCachedResults, setCachedResults) {
+// deepSearch: 如果为 true，后端使用多个关键词变体并翻页搜索 Civitai（较慢，但能找到带 _fp16、-pruned 等后缀的模型）
+// signal: 中止请求的 AbortSignal（中止后服务器端取消这次搜索，结果不缓存，返回空数组）
+export async function searchModelLinks(modelName, modelType, skipCache = false, getCachedResults, setCachedResults, deepSearch = false, signal = undefined) {
     // 先检查缓存（除非跳过缓存）
     if (!skipCache && getCachedResults) {
-        const cachedResults = getCachedResults(modelName);
+        const cachedResults = await getCachedResults(modelName);
         if (cachedResults !== null) {
             return cachedResults;
         }
@@ -300,8 +482,11 @@ export async function searchModelLinks(modelName, modelType, skipCache = false,
                 model_type: modelType,
                 search_civitai: true,
                 search_hf: true,
-                search_google: false  // 默认不搜索 Google，只在其他搜索失败时手动添加
+                search_google: false,  // 默认不搜索 Google，只在其他搜索失败时手动添加
+                deep_search: deepSearch,
+                skip_cache: skipCache  // 重新搜索时同时跳过服务器端缓存
             }),
+            signal,
         });
         
         if (response.ok) {
@@ -1,125 +1,174 @@
 /**
  * 缓存管理功能模块
+ * 搜索结果保存在 IndexedDB 中（cacheStore.js）：读取在一个事务中批量完成，
+ * 写入、过期清理和 LRU 淘汰在 worker 中执行（cacheWorker.js），不支持 worker 时退回到主线程异步执行
  */
 
-const CACHE_PREFIX = "comfyui-find-models-cache-";
-const CACHE_DURATION = 7 * 24 * 60 * 60 * 1000; // 一周
+import { getCacheKey, getRecords, CACHE_DURATION } from "./cacheStore.js";
+import { handleMessage } from "./cacheWorker.js";
 
-// 获取缓存键
-export function getCacheKey(modelName) {
-    return CACHE_PREFIX + modelName.toLowerCase().trim();
-}
+export { getCacheKey };
+
+// 旧版本使用 localStorage 缓存（每个模型一个键），启动时迁移到 IndexedDB
+const LEGACY_CACHE_PREFIX = "comfyui-find-models-cache-";
+// 合并写入的等待时间（毫秒）
+const WRITE_DELAY = 200;
+
+let _worker; // undefined: 还没创建；null: 不可用
+let _messageId = 0;
+const _callbacks = new Map();
+// 还没写入数据库的结果（key -> { key, results, timestamp }），读取时优先使用
+const _pendingWrites = new Map();
+let _flushTimer = null;
 
-// 从缓存获取搜索结果
-export function getCachedResults(modelName) {
+// 获取缓存 worker（创建失败时返回 null）
+function getWorker() {
+    if (_worker !== undefined) {
+        return _worker;
+    }
     try {
-        const cacheKey = getCacheKey(modelName);
-        const cached = localStorage.getItem(cacheKey);
-        
-        if (!cached) {
-            return null;
+        _worker = new Worker(new URL("./cacheWorker.js", import.meta.url), { type: "module" });
+        _worker.onmessage = (event) => {
+            const { id, result } = event.data || {};
+            const callback = _callbacks.get(id);
+            if (callback) {
+                _callbacks.delete(id);
+                callback.resolve(result);
+            }
+        };
+        _worker.onerror = () => {
+            // worker 加载失败（如不支持模块 worker），等待中的操作改在主线程执行
+            _worker.terminate();
+            _worker = null;
+            for (const callback of _callbacks.values()) {
+                handleMessage(callback.message).catch(() => null).then(callback.resolve);
+            }
+            _callbacks.clear();
+        };
+    } catch (error) {
+        _worker = null;
+    }
+    return _worker;
+}
+
+// 在 worker 中执行缓存操作
+function runInWorker(message) {
+    const worker = getWorker();
+    if (!worker) {
+        return handleMessage(message).catch(() => null);
+    }
+    return new Promise((resolve) => {
+        const id = ++_messageId;
+        _callbacks.set(id, { resolve, message });
+        worker.postMessage({ ...message, id });
+    });
+}
+
+// 把等待中的写入合并成一次提交给 worker
+function scheduleFlush() {
+    if (_flushTimer) {
+        return;
+    }
+    _flushTimer = setTimeout(() => {
+        _flushTimer = null;
+        const entries = [..._pendingWrites.values()];
+        runInWorker({ type: "put", entries }).then(() => {
+            // 写入期间可能又有新的结果，只删除已经写入的那一份
+            for (const entry of entries) {
+                if (_pendingWrites.get(entry.key) === entry) {
+                    _pendingWrites.delete(entry.key);
+                }
+            }
+        });
+    }, WRITE_DELAY);
+}
+
+// 批量获取缓存的搜索结果，返回 { 模型名: 搜索结果 }（只包含有缓存的模型）
+export async function getManyCachedResults(modelNames) {
+    const found = {};
+    const keysToRead = [];
+    const namesByKey = {};
+    for (const modelName of modelNames) {
+        const key = getCacheKey(modelName);
+        const pending = _pendingWrites.get(key);
+        if (pending) {
+            found[modelName] = pending.results;
+        } else {
+            keysToRead.push(key);
+            (namesByKey[key] = namesByKey[key] || []).push(modelName);
         }
-        
-        // 快速检查：先检查前几个字符是否包含时间戳信息
-        // 使用 try-catch 包裹 JSON.parse，避免解析大对象时的阻塞
-        let cacheData;
-        try {
-            cacheData = JSON.parse(cached);
-        } catch (e) {
-            // 如果解析失败，删除损坏的缓存
-            localStorage.removeItem(cacheKey);
-            return null;
+    }
+
+    try {
+        const records = await getRecords(keysToRead);
+        const hitKeys = Object.keys(records);
+        for (const key of hitKeys) {
+            for (const modelName of namesByKey[key]) {
+                found[modelName] = records[key].results;
+            }
         }
-        
-        const now = Date.now();
-        
-        // 检查是否过期（一周）
-        if (now - cacheData.timestamp > CACHE_DURATION) {
-            // 缓存已过期，异步删除（不阻塞）
-            setTimeout(() => localStorage.removeItem(cacheKey), 0);
-            return null;
+        // 更新最后访问时间（LRU），不等待完成
+        if (hitKeys.length > 0) {
+            runInWorker({ type: "touch", keys: hitKeys });
         }
-        
-        // console.log(`[ComfyUI-find-models] 使用缓存结果: ${modelName}`);
-        return cacheData.results;
     } catch (error) {
         // console.error(`[ComfyUI-find-models] 读取缓存失败: ${error}`);
-        return null;
     }
+    return found;
+}
+
+// 从缓存获取搜索结果（没有缓存时返回 null）
+export async function getCachedResults(modelName) {
+    const found = await getManyCachedResults([modelName]);
+    return found[modelName] !== undefined ? found[modelName] : null;
 }
 
-// 保存搜索结果到缓存
+// 保存搜索结果到缓存（合并后在 worker 中写入）
 export function setCachedResults(modelName, results) {
+    const key = getCacheKey(modelName);
+    _pendingWrites.set(key, { key, results, timestamp: Date.now() });
+    scheduleFlush();
+}
+
+// 把旧版本 localStorage 中的缓存迁移到 IndexedDB
+function migrateLegacyCache() {
+    const now = Date.now();
+    const entries = [];
+    const keysToRemove = [];
     try {
-        const cacheKey = getCacheKey(modelName);
-        const cacheData = {
-            timestamp: Date.now(),
-            results: results
-        };
-        localStorage.setItem(cacheKey, JSON.stringify(cacheData));
-        // console.log(`[ComfyUI-find-models] 缓存搜索结果: ${modelName}`);
-    } catch (error) {
-        // console.error(`[ComfyUI-find-models] 保存缓存失败: ${error}`);
-        // 如果存储空间不足，异步清理过期缓存（不阻塞）
-        if (error.name === 'QuotaExceededError') {
-            setTimeout(() => clearExpiredCache(), 0);
+        for (let i = 0; i < localStorage.length; i++) {
+            const key = localStorage.key(i);
+            if (key && key.startsWith(LEGACY_CACHE_PREFIX)) {
+                keysToRemove.push(key);
+            }
+        }
+        for (const key of keysToRemove) {
+            try {
+                const cacheData = JSON.parse(localStorage.getItem(key));
+                if (cacheData && now - cacheData.timestamp <= CACHE_DURATION) {
+                    entries.push({ key: key.slice(LEGACY_CACHE_PREFIX.length), results: cacheData.results, timestamp: cacheData.timestamp });
+                }
+            } catch (e) {
+                // 损坏的缓存直接删除
+            }
+            localStorage.removeItem(key);
         }
+    } catch (error) {
+        // console.error(`[ComfyUI-find-models] 迁移旧缓存失败: ${error}`);
     }
+    return entries;
 }
 
-// 清理过期的缓存（优化性能，异步执行）
+// 清理过期的缓存并按大小上限淘汰最久未使用的记录（在 worker 中执行）
 export function clearExpiredCache() {
-    // 使用 requestIdleCallback 或 setTimeout 异步执行，不阻塞主线程
-    const executeCleanup = () => {
-        try {
-            const now = Date.now();
-            const keysToRemove = [];
-            const maxCheck = 100; // 限制每次检查的数量，避免阻塞
-            
-            // 只检查前 maxCheck 个缓存项
-            let checked = 0;
-            for (let i = 0; i < localStorage.length && checked < maxCheck; i++) {
-                const key = localStorage.key(i);
-                if (key && key.startsWith(CACHE_PREFIX)) {
-                    checked++;
-                    try {
-                        const cached = localStorage.getItem(key);
-                        if (cached) {
-                            // 快速检查：只解析时间戳部分
-                            const cacheData = JSON.parse(cached);
-                            if (now - cacheData.timestamp > CACHE_DURATION) {
-                                keysToRemove.push(key);
-                            }
-                        }
-                    } catch (e) {
-                        // 如果解析失败，也删除
-                        keysToRemove.push(key);
-                    }
-                }
-            }
-            
-            // 批量删除
-            keysToRemove.forEach(key => {
-                try {
-                    localStorage.removeItem(key);
-                } catch (e) {
-                    // 忽略删除错误
-                }
-            });
-            
-            if (keysToRemove.length > 0) {
-                // console.log(`[ComfyUI-find-models] 清理了 ${keysToRemove.length} 个过期缓存`);
-            }
-            
-            // 如果还有更多缓存项需要检查，继续异步检查
-            if (checked >= maxCheck && localStorage.length > checked) {
-                setTimeout(executeCleanup, 100);
-            }
-        } catch (error) {
-            // console.error(`[ComfyUI-find-models] 清理过期缓存失败: ${error}`);
+    const executeCleanup = async () => {
+        const legacyEntries = migrateLegacyCache();
+        if (legacyEntries.length > 0) {
+            await runInWorker({ type: "put", entries: legacyEntries });
         }
+        await runInWorker({ type: "maintain" });
     };
-    
+
     // 使用 requestIdleCallback 如果可用，否则使用 setTimeout
     if (window.requestIdleCallback) {
         requestIdleCallback(executeCleanup, { timeout: 1000 });
@@ -130,11 +179,7 @@ export function clearExpiredCache() {
 
 // 清除指定模型的缓存
 export function clearModelCache(modelName) {
-    try {
-        const cacheKey = getCacheKey(modelName);
-        localStorage.removeItem(cacheKey);
-        // console.log(`[ComfyUI-find-models] 已清除模型缓存: ${modelName}`);
-    } catch (error) {
-        // console.error(`[ComfyUI-find-models] 清除模型缓存失败: ${error}`);
-    }
+    const key = getCacheKey(modelName);
+    _pendingWrites.delete(key);
+    return runInWorker({ type: "delete", keys: [key] });
 }
@@ -0,0 +1,195 @@
+/**
+ * 搜索结果缓存的 IndexedDB 存储
+ * 主线程（读取）和缓存 worker（写入、过期清理、LRU 淘汰）共用，不依赖 DOM
+ */
+
+export const DB_NAME = "comfyui-find-models";
+export const DB_VERSION = 1;
+export const STORE_NAME = "search-cache";
+export const CACHE_DURATION = 7 * 24 * 60 * 60 * 1000; // 一周
+export const CACHE_MAX_BYTES = 20 * 1024 * 1024; // 缓存总大小上限（按 JSON 长度估算）
+
+// 记录格式: { key, timestamp: 写入时间, accessed: 最后访问时间, size: 估算的字节数, results }
+// 索引 timestamp 用于清理过期记录，索引 lru（[accessed, size]）用于按最后访问时间淘汰，只读键不读值
+
+// 获取缓存键（不区分大小写）
+export function getCacheKey(modelName) {
+    return modelName.toLowerCase().trim();
+}
+
+let _dbPromise = null;
+
+// 打开数据库（只打开一次）；不支持 IndexedDB 时返回 null
+export function openCacheDB() {
+    if (_dbPromise) {
+        return _dbPromise;
+    }
+    _dbPromise = new Promise((resolve) => {
+        if (typeof indexedDB === "undefined") {
+            resolve(null);
+            return;
+        }
+        let request;
+        try {
+            request = indexedDB.open(DB_NAME, DB_VERSION);
+        } catch (error) {
+            resolve(null);
+            return;
+        }
+        request.onupgradeneeded = () => {
+            const db = request.result;
+            if (!db.objectStoreNames.contains(STORE_NAME)) {
+                const store = db.createObjectStore(STORE_NAME, { keyPath: "key" });
+                store.createIndex("timestamp", "timestamp");
+                store.createIndex("lru", ["accessed", "size"]);
+            }
+        };
+        request.onsuccess = () => {
+            const db = request.result;
+            // 其他页面升级数据库时关闭连接，下次使用时重新打开
+            db.onversionchange = () => {
+                db.close();
+                _dbPromise = null;
+            };
+            resolve(db);
+        };
+        request.onerror = () => resolve(null);
+        request.onblocked = () => resolve(null);
+    });
+    return _dbPromise;
+}
+
+// 等待事务完成
+function transactionDone(tx) {
+    return new Promise((resolve, reject) => {
+        tx.oncomplete = () => resolve();
+        tx.onerror = () => reject(tx.error);
+        tx.onabort = () => reject(tx.error);
+    });
+}
+
+// 在一个只读事务中批量读取，返回 { 缓存键: 记录 }（不包含已过期的记录）
+export async function getRecords(keys) {
+    const db = await openCacheDB();
+    const records = {};
+    if (!db || keys.length === 0) {
+        return records;
+    }
+    const now = Date.now();
+    const tx = db.transaction(STORE_NAME, "readonly");
+    const store = tx.objectStore(STORE_NAME);
+    for (const key of keys) {
+        store.get(key).onsuccess = (event) => {
+            const record = event.target.result;
+            if (record && now - record.timestamp <= CACHE_DURATION) {
+                records[key] = record;
+            }
+        };
+    }
+    await transactionDone(tx);
+    return records;
+}
+
+// 批量写入，entries: [{ key, results, timestamp? }]
+export async function putRecords(entries) {
+    const db = await openCacheDB();
+    if (!db || entries.length === 0) {
+        return;
+    }
+    const now = Date.now();
+    const tx = db.transaction(STORE_NAME, "readwrite");
+    const store = tx.objectStore(STORE_NAME);
+    for (const entry of entries) {
+        const timestamp = entry.timestamp || now;
+        store.put({
+            key: entry.key,
+            timestamp,
+            accessed: now,
+            size: JSON.stringify(entry.results).length,
+            results: entry.results
+        });
+    }
+    await transactionDone(tx);
+}
+
+// 更新最后访问时间（LRU）
+export async function touchRecords(keys) {
+    const db = await openCacheDB();
+    if (!db || keys.length === 0) {
+        return;
+    }
+    const now = Date.now();
+    const tx = db.transaction(STORE_NAME, "readwrite");
+    const store = tx.objectStore(STORE_NAME);
+    for (const key of keys) {
+        store.get(key).onsuccess = (event) => {
+            const record = event.target.result;
+            if (record) {
+                record.accessed = now;
+                store.put(record);
+            }
+        };
+    }
+    await transactionDone(tx);
+}
+
+// 批量删除
+export async function deleteRecords(keys) {
+    const db = await openCacheDB();
+    if (!db || keys.length === 0) {
+        return;
+    }
+    const tx = db.transaction(STORE_NAME, "readwrite");
+    const store = tx.objectStore(STORE_NAME);
+    for (const key of keys) {
+        store.delete(key);
+    }
+    await transactionDone(tx);
+}
+
+// 删除过期记录（通过 timestamp 索引只遍历过期的部分），返回删除的数量
+export async function deleteExpired() {
+    const db = await openCacheDB();
+    if (!db) {
+        return 0;
+    }
+    let removed = 0;
+    const tx = db.transaction(STORE_NAME, "readwrite");
+    const store = tx.objectStore(STORE_NAME);
+    const range = IDBKeyRange.upperBound(Date.now() - CACHE_DURATION);
+    store.index("timestamp").openKeyCursor(range).onsuccess = (event) => {
+        const cursor = event.target.result;
+        if (cursor) {
+            store.delete(cursor.primaryKey);
+            removed++;
+            cursor.continue();
+        }
+    };
+    await transactionDone(tx);
+    return removed;
+}
+
+// 总大小超过上限时，按最后访问时间从旧到新淘汰（从新到旧累加大小，超出上限的部分全部删除）
+export async function evictLRU(maxBytes = CACHE_MAX_BYTES) {
+    const db = await openCacheDB();
+    if (!db) {
+        return 0;
+    }
+    let total = 0;
+    let removed = 0;
+    const tx = db.transaction(STORE_NAME, "readwrite");
+    const store = tx.objectStore(STORE_NAME);
+    store.index("lru").openKeyCursor(null, "prev").onsuccess = (event) => {
+        const cursor = event.target.result;
+        if (cursor) {
+            total += cursor.key[1];
+            if (total > maxBytes) {
+                store.delete(cursor.primaryKey);
+                removed++;
+            }
+            cursor.continue();
+        }
+    };
+    await transactionDone(tx);
+    return removed;
+}
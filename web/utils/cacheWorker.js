@@ -0,0 +1,39 @@
+/**
+ * 搜索结果缓存 worker
+ * 在 worker 线程中执行 IndexedDB 写入、过期清理和 LRU 淘汰，不阻塞对话框
+ */
+
+import { putRecords, touchRecords, deleteRecords, deleteExpired, evictLRU } from "./cacheStore.js";
+
+// ComfyUI 会把 web 目录下的所有脚本作为扩展加载，只有在 worker 中运行时才监听消息
+const isWorker = typeof WorkerGlobalScope !== "undefined" && self instanceof WorkerGlobalScope;
+
+async function handleMessage(message) {
+    switch (message.type) {
+        case "put":
+            await putRecords(message.entries);
+            return await evictLRU();
+        case "touch":
+            return await touchRecords(message.keys);
+        case "delete":
+            return await deleteRecords(message.keys);
+        case "maintain":
+            return { expired: await deleteExpired(), evicted: await evictLRU() };
+        default:
+            return null;
+    }
+}
+
+if (isWorker) {
+    self.addEventListener("message", async (event) => {
+        const message = event.data || {};
+        try {
+            const result = await handleMessage(message);
+            self.postMessage({ id: message.id, result });
+        } catch (error) {
+            self.postMessage({ id: message.id, error: String(error) });
+        }
+    });
+}
+
+export { handleMessage };
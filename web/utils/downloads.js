@@ -0,0 +1,217 @@
+/**
+ * 服务器端下载功能模块
+ * 通过后端的下载队列把模型下载到 ComfyUI 的模型目录，进度通过 websocket 事件推送
+ */
+
+import { api } from "../../../scripts/api.js";
+import { t } from "../i18n/i18n.js";
+import { filterLinksBySize, filterNonExactMatches } from "../components/LinkFilter.js";
+import { invalidateInstalledModels } from "./incrementalAnalyzer.js";
+import { forgetIntegrityResult } from "./integrity.js";
+
+const DOWNLOAD_EVENT = "comfyui-find-models.download";
+const DOWNLOADS_API = "/comfyui-find-models/api/v1/downloads";
+
+// 每个模型最近一次的下载任务（key: 模型名称，value: 任务状态）
+const _jobsByModel = {};
+
+// 获取模型最近一次的下载任务
+export function getDownloadJob(modelName) {
+    return _jobsByModel[modelName] || null;
+}
+
+// 下载按钮的文字（根据任务状态）
+export function getDownloadButtonLabel(job) {
+    if (!job) {
+        return t('downloadToServer');
+    }
+    const percent = job.total ? Math.floor((job.downloaded / job.total) * 100) : 0;
+    switch (job.status) {
+        case "queued":
+            return t('downloadQueued');
+        case "downloading": {
+            const speed = job.speed ? ` ${(job.speed / (1024 * 1024)).toFixed(1)} MB/s` : '';
+            return `${t('downloadingProgress', { percent })}${speed}`;
+        }
+        case "paused":
+            return t('downloadPaused', { percent });
+        case "verifying":
+            return t('downloadVerifying');
+        case "completed":
+            return t('downloadCompleted');
+        case "cancelled":
+            return t('downloadCancelled');
+        case "failed":
+            return t('downloadFailed');
+        default:
+            return t('downloadToServer');
+    }
+}
+
+// 更新页面上该模型的所有下载按钮
+function updateDownloadButtons(job) {
+    const buttons = document.querySelectorAll('.server-download-btn');
+    buttons.forEach(btn => {
+        if (btn.getAttribute('data-model-name') === job.model_name) {
+            btn.textContent = getDownloadButtonLabel(job);
+            btn.title = job.error || job.path || '';
+            btn.disabled = job.status === "verifying" || job.status === "completed";
+        }
+    });
+}
+
+// 监听后端推送的下载进度
+api.addEventListener(DOWNLOAD_EVENT, (event) => {
+    const job = event.detail;
+    if (!job || !job.model_name) {
+        return;
+    }
+    _jobsByModel[job.model_name] = job;
+    updateDownloadButtons(job);
+    // 下载完成后已安装模型列表发生变化，下次分析时重新获取
+    if (job.status === "completed") {
+        invalidateInstalledModels();
+        forgetIntegrityResult(job.model_name);
+    }
+});
+
+// 把下载请求加入后端的下载队列
+// overwrite: 替换已损坏的模型文件
+export async function startServerDownload({ url, modelName, modelType, sha256, fileSize, isUsed, overwrite = false }) {
+    try {
+        const response = await api.fetchApi(DOWNLOADS_API, {
+            method: "POST",
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                url: url,
+                model_name: modelName,
+                model_type: modelType,
+                sha256: sha256 || null,
+                file_size: fileSize || null,
+                is_used: isUsed !== false,
+                overwrite: overwrite === true
+            }),
+        });
+        const job = await response.json();
+        if (!response.ok) {
+            return { model_name: modelName, status: "failed", error: job.error };
+        }
+        return job;
+    } catch (error) {
+        return { model_name: modelName, status: "failed", error: error.message };
+    }
+}
+
+// 暂停或继续下载任务（action: "pause" | "resume"）
+async function controlServerDownload(job, action) {
+    try {
+        const response = await api.fetchApi(`${DOWNLOADS_API}/${job.id}/${action}`, { method: "POST" });
+        const updated = await response.json();
+        return response.ok ? updated : job;
+    } catch (error) {
+        return job;
+    }
+}
+
+// 选择用于服务器下载的链接（与下载链接列的过滤规则一致，取第一个有下载地址的链接）
+function pickDownloadLink(links) {
+    const filtered = filterNonExactMatches(filterLinksBySize(links || []));
+    return filtered.find(link => link.download_url) || null;
+}
+
+// 把所有缺失（或已损坏）且有下载链接的模型批量加入下载队列（优先级由后端根据模型类型和使用状态计算）
+export async function downloadAllMissing(result) {
+    if (!result || !result.models) {
+        return { jobs: [], errors: [] };
+    }
+    const jobs = [];
+    for (const model of Object.values(result.models)) {
+        if (model.installed && !model.corrupt) {
+            continue;
+        }
+        const existing = getDownloadJob(model.name);
+        if (existing && ["queued", "downloading", "verifying", "paused", "completed"].includes(existing.status)) {
+            continue;
+        }
+        const link = pickDownloadLink(result.model_links && result.model_links[model.name]);
+        if (!link) {
+            continue;
+        }
+        jobs.push({
+            url: link.download_url,
+            model_name: model.name,
+            model_type: model.type,
+            sha256: link.sha256 || null,
+            file_size: link.file_size || null,
+            is_used: model.isUsed !== false,
+            overwrite: Boolean(model.installed && model.corrupt)
+        });
+    }
+    if (jobs.length === 0) {
+        return { jobs: [], errors: [] };
+    }
+    try {
+        const response = await api.fetchApi(DOWNLOADS_API, {
+            method: "POST",
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ jobs }),
+        });
+        const data = await response.json();
+        for (const job of data.jobs || []) {
+            _jobsByModel[job.model_name] = job;
+            updateDownloadButtons(job);
+        }
+        return data;
+    } catch (error) {
+        return { jobs: [], errors: [{ error: error.message }] };
+    }
+}
+
+// 绑定下载按钮事件（使用事件委托，重新渲染表格后不需要重新绑定）
+export function bindServerDownloadButtons(contentDiv) {
+    if (contentDiv._serverDownloadBound) {
+        return;
+    }
+    contentDiv._serverDownloadBound = true;
+
+    contentDiv.addEventListener('click', async (e) => {
+        const allBtn = e.target.closest('#download-all-missing-btn');
+        if (allBtn && !allBtn.disabled) {
+            allBtn.disabled = true;
+            const data = await downloadAllMissing(window._currentDialogResult);
+            allBtn.textContent = t('downloadAllQueued', { count: (data.jobs || []).length });
+            allBtn.disabled = false;
+            return;
+        }
+
+        const btn = e.target.closest('.server-download-btn');
+        if (!btn || btn.disabled) {
+            return;
+        }
+        const modelName = btn.getAttribute('data-model-name');
+        const current = getDownloadJob(modelName);
+        btn.disabled = true;
+
+        let job;
+        if (current && current.id && (current.status === "queued" || current.status === "downloading")) {
+            // 正在排队或下载中：暂停
+            job = await controlServerDownload(current, "pause");
+        } else if (current && current.id && current.status === "paused") {
+            // 已暂停：继续
+            job = await controlServerDownload(current, "resume");
+        } else {
+            btn.textContent = t('downloadQueued');
+            job = await startServerDownload({
+                url: btn.getAttribute('data-url'),
+                modelName: modelName,
+                modelType: btn.getAttribute('data-model-type'),
+                sha256: btn.getAttribute('data-sha256'),
+                fileSize: parseInt(btn.getAttribute('data-file-size')) || null,
+                isUsed: btn.getAttribute('data-is-used') !== "false",
+                overwrite: btn.getAttribute('data-overwrite') === "true"
+            });
+        }
+        _jobsByModel[modelName] = job;
+        updateDownloadButtons(job);
+    });
+}
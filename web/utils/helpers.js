@@ -25,10 +25,12 @@ export function groupByType(modelInfo) {
     const byType = {};
     
     for (const info of Object.values(modelInfo)) {
-        if (!byType[info.type]) {
-            byType[info.type] = [];
+        // 优先使用从模型文件头部识别出的类型
+        const type = info.detectedType || info.type;
+        if (!byType[type]) {
+            byType[type] = [];
         }
-        byType[info.type].push(info);
+        byType[type].push(info);
     }
     
     return byType;
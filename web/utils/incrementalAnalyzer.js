@@ -0,0 +1,372 @@
+/**
+ * 增量工作流分析模块
+ * 按节点 ID 保存上一次的提取结果（以及节点签名：类型、模式、连接和 widget 值），
+ * 节点增删、连接变化和 widget 修改时只重新提取变化的节点，并只对受影响的模型重新检查安装状态；
+ * 已安装模型列表、extra_model_paths 和模型元数据在两次分析之间复用，刷新（r 键）或下载完成后失效
+ * 提取出模型的节点签名的哈希用作完整分析结果缓存的键（analysisCache.js）
+ */
+
+import {
+    extractModelsFromNode,
+    createEmptyExtraction,
+    addNodeModels,
+    checkModelStatus,
+    applyModelMetadata,
+    MODEL_TYPE_TO_DIR
+} from "../workflowModelExtractor.js";
+import { getInstalledModels, getExtraModelPaths, getModelsMetadata } from "./api.js";
+
+// 图变化后合并同步的等待时间（毫秒）
+const SYNC_DELAY = 100;
+
+const _state = {
+    graph: null,
+    // nodeId -> { signature, models: extractModelsFromNode 的结果 }
+    nodeEntries: new Map(),
+    // 事件标记为已变化、还没重新提取的节点 ID
+    dirtyNodes: new Set(),
+    // 已经重新提取、还没在分析中重新检查安装状态的模型键
+    pendingAffected: new Set(),
+    // 已安装模型列表和 extra_model_paths（null 表示需要重新获取）
+    installed: null,
+    // "modelType:modelName" -> checkModelStatus 生成的模型信息（已应用元数据）
+    statusCache: new Map(),
+    // "modelType:matchedName" -> 模型文件头部元数据
+    metadataCache: {},
+    syncTimer: null,
+    onChange: null
+};
+
+// 获取图中的节点（LiteGraph 使用 _nodes）
+function getGraphNodes(graph) {
+    return (graph && (graph._nodes || graph.nodes)) || [];
+}
+
+// 计算节点签名（不序列化节点，只读取会影响提取结果和使用状态的字段）
+function getNodeSignature(node) {
+    let signature = `${node.type}|${node.mode || 0}|`;
+    if (node.inputs) {
+        for (const input of node.inputs) {
+            signature += input && input.link !== null && input.link !== undefined ? '1' : '0';
+        }
+    }
+    signature += '|';
+    if (node.outputs) {
+        for (const output of node.outputs) {
+            signature += output && output.links && output.links.length > 0 ? '1' : '0';
+        }
+    }
+    const values = node.widgets ? node.widgets.map(widget => widget.value) : (node.widgets_values || []);
+    for (const value of values) {
+        signature += '|' + (typeof value === 'string' || typeof value === 'number' ? value : '');
+    }
+    return signature;
+}
+
+// 提取单个节点的模型（只对变化的节点序列化）
+function extractNode(node) {
+    let data = node;
+    if (typeof node.serialize === 'function') {
+        try {
+            data = node.serialize();
+        } catch (error) {
+            data = node;
+        }
+    }
+    return extractModelsFromNode(data);
+}
+
+// 切换到新的图时清空节点状态（已安装模型列表仍然有效）
+function resetGraph(graph) {
+    _state.graph = graph;
+    _state.nodeEntries.clear();
+    _state.dirtyNodes.clear();
+    _state.pendingAffected.clear();
+    _state.statusCache.clear();
+}
+
+// 同步节点状态，返回受影响的模型键（"modelType:modelName"）
+// fullScan 为 true 时比较所有节点的签名，否则只检查事件标记过的节点
+function syncNodes(graph, fullScan) {
+    if (graph !== _state.graph) {
+        resetGraph(graph);
+        fullScan = true;
+    }
+    const affectedKeys = new Set();
+    const markAffected = (models) => {
+        for (const { modelType, modelName } of models) {
+            affectedKeys.add(`${modelType}:${modelName}`);
+        }
+    };
+    const nodes = getGraphNodes(graph);
+    const nodesToCheck = fullScan
+        ? nodes
+        : [..._state.dirtyNodes].map(id => graph.getNodeById ? graph.getNodeById(id) : null);
+    const presentIds = fullScan ? new Set() : null;
+
+    for (const node of nodesToCheck) {
+        if (!node) {
+            continue;
+        }
+        if (presentIds) {
+            presentIds.add(node.id);
+        }
+        const signature = getNodeSignature(node);
+        const entry = _state.nodeEntries.get(node.id);
+        if (entry && entry.signature === signature) {
+            continue;
+        }
+        const models = extractNode(node);
+        if (entry) {
+            markAffected(entry.models);
+        }
+        markAffected(models);
+        _state.nodeEntries.set(node.id, { signature, models });
+    }
+
+    // 删除已经不在图中的节点
+    for (const [nodeId, entry] of _state.nodeEntries) {
+        const removed = presentIds
+            ? !presentIds.has(nodeId)
+            : _state.dirtyNodes.has(nodeId) && !(graph.getNodeById && graph.getNodeById(nodeId));
+        if (removed) {
+            markAffected(entry.models);
+            _state.nodeEntries.delete(nodeId);
+        }
+    }
+    _state.dirtyNodes.clear();
+    return affectedKeys;
+}
+
+// 按图中的节点顺序汇总提取结果（只合并已经提取好的模型，不重新读取节点）
+function buildExtraction(graph) {
+    const extracted = createEmptyExtraction();
+    for (const node of getGraphNodes(graph)) {
+        const entry = _state.nodeEntries.get(node.id);
+        if (entry) {
+            addNodeModels(extracted, entry.models);
+        }
+    }
+    return extracted;
+}
+
+// 获取已安装模型列表和 extra_model_paths（有缓存时直接返回）
+async function loadInstalled(refresh) {
+    if (refresh || !_state.installed) {
+        const [installedModelsData, extraModelPaths] = await Promise.all([
+            getInstalledModels(),
+            getExtraModelPaths()
+        ]);
+        // 适配新的数据结构：getInstalledModels 返回 { models, nodeTypeMap }
+        _state.installed = {
+            models: installedModelsData.models || installedModelsData,
+            nodeTypeMap: installedModelsData.nodeTypeMap || {},
+            extraModelPaths
+        };
+        _state.statusCache.clear();
+        _state.metadataCache = {};
+        return true;
+    }
+    return false;
+}
+
+// 只对受影响（或还没有检查过）的模型重新检查安装状态，其余模型复用上一次的结果
+async function updateStatus(extracted, affectedKeys) {
+    const { models: requiredModels, modelUsageMap, modelNodeMap, modelNodeTypeMap } = extracted;
+    const { models: installedModels, nodeTypeMap, extraModelPaths } = _state.installed;
+
+    const modelsToCheck = {};
+    for (const [modelType, names] of Object.entries(requiredModels)) {
+        const pending = names.filter(name => {
+            const modelKey = `${modelType}:${name}`;
+            return affectedKeys.has(modelKey) || !_state.statusCache.has(modelKey);
+        });
+        if (pending.length > 0) {
+            modelsToCheck[modelType] = pending;
+        }
+    }
+
+    if (Object.keys(modelsToCheck).length > 0) {
+        const checked = checkModelStatus(modelsToCheck, installedModels, modelUsageMap, modelNodeMap, MODEL_TYPE_TO_DIR, extraModelPaths, modelNodeTypeMap, nodeTypeMap);
+
+        // 只读取还没有元数据的已安装模型
+        const metadataToLoad = checked.installed.filter(info => !(`${info.type}:${info.matchedName}` in _state.metadataCache));
+        if (metadataToLoad.length > 0) {
+            const modelsMetadata = await getModelsMetadata(
+                metadataToLoad.map(info => ({ model_type: info.type, name: info.matchedName }))
+            );
+            for (const info of metadataToLoad) {
+                const metadataKey = `${info.type}:${info.matchedName}`;
+                _state.metadataCache[metadataKey] = modelsMetadata[metadataKey] || null;
+            }
+        }
+        applyModelMetadata(checked.modelInfo, _state.metadataCache);
+
+        for (const [modelKey, info] of Object.entries(checked.modelInfo)) {
+            _state.statusCache.set(modelKey, info);
+        }
+    }
+
+    // 按提取顺序组装结果（与 checkModelStatus 的返回格式一致）
+    const installed = [];
+    const missing = [];
+    const modelInfo = {};
+    for (const [modelType, names] of Object.entries(requiredModels)) {
+        for (const name of names) {
+            const modelKey = `${modelType}:${name}`;
+            const info = _state.statusCache.get(modelKey);
+            modelInfo[modelKey] = info;
+            (info.installed ? installed : missing).push(info);
+        }
+    }
+    // 删除已经不在工作流中的模型
+    for (const modelKey of _state.statusCache.keys()) {
+        if (!(modelKey in modelInfo)) {
+            _state.statusCache.delete(modelKey);
+        }
+    }
+    return { installed, missing, modelInfo };
+}
+
+// 增量分析图中的模型
+// refreshInstalled: 为 true 时重新获取已安装模型列表（刷新时使用），所有模型都会重新检查
+// 返回提取结果、已安装模型列表和模型状态
+export async function analyzeGraph(graph, { refreshInstalled = false, onInstalledLoading = null } = {}) {
+    const affectedKeys = syncNodes(graph, true);
+    for (const modelKey of _state.pendingAffected) {
+        affectedKeys.add(modelKey);
+    }
+    _state.pendingAffected.clear();
+    const extracted = buildExtraction(graph);
+    if ((refreshInstalled || !_state.installed) && onInstalledLoading) {
+        onInstalledLoading();
+    }
+    await loadInstalled(refreshInstalled);
+    const status = await updateStatus(extracted, affectedKeys);
+    return {
+        ...extracted,
+        installedModels: _state.installed.models,
+        installedNodeTypeMap: _state.installed.nodeTypeMap,
+        extraModelPaths: _state.installed.extraModelPaths,
+        status
+    };
+}
+
+// 工作流中与模型有关的内容的哈希（按节点顺序组合提取出模型的节点的 ID 和签名）
+// 只重新提取变化过的节点，受影响的模型在下一次 analyzeGraph 时重新检查
+export function getWorkflowModelHash(graph) {
+    for (const modelKey of syncNodes(graph, true)) {
+        _state.pendingAffected.add(modelKey);
+    }
+    // cyrb53：两个 32 位 FNV 风格的哈希组合成 53 位
+    let h1 = 0xdeadbeef;
+    let h2 = 0x41c6ce57;
+    const update = (text) => {
+        for (let i = 0; i < text.length; i++) {
+            const code = text.charCodeAt(i);
+            h1 = Math.imul(h1 ^ code, 2654435761);
+            h2 = Math.imul(h2 ^ code, 1597334677);
+        }
+    };
+    for (const node of getGraphNodes(graph)) {
+        const entry = _state.nodeEntries.get(node.id);
+        if (entry && entry.models.length > 0) {
+            update(`${node.id}\u0000${entry.signature}\u0001`);
+        }
+    }
+    h1 = Math.imul(h1 ^ (h1 >>> 16), 2246822507) ^ Math.imul(h2 ^ (h2 >>> 13), 3266489909);
+    h2 = Math.imul(h2 ^ (h2 >>> 16), 2246822507) ^ Math.imul(h1 ^ (h1 >>> 13), 3266489909);
+    return (4294967296 * (2097151 & h2) + (h1 >>> 0)).toString(16);
+}
+
+// 让已安装模型列表失效（下次分析时重新获取），例如下载完成后
+export function invalidateInstalledModels() {
+    _state.installed = null;
+}
+
+// 合并一段时间内的图变化，只重新提取标记过的节点；有模型受影响时通知 onChange
+function scheduleSync() {
+    if (_state.syncTimer) {
+        return;
+    }
+    _state.syncTimer = setTimeout(() => {
+        _state.syncTimer = null;
+        if (!_state.graph) {
+            return;
+        }
+        try {
+            const affectedKeys = syncNodes(_state.graph, false);
+            for (const modelKey of affectedKeys) {
+                _state.pendingAffected.add(modelKey);
+            }
+            if (affectedKeys.size > 0 && _state.onChange) {
+                _state.onChange(affectedKeys);
+            }
+        } catch (error) {
+            // 同步失败时下次分析会完整比较签名
+        }
+    }, SYNC_DELAY);
+}
+
+function markNodeDirty(node) {
+    if (node && node.id !== undefined && node.id !== null) {
+        _state.dirtyNodes.add(node.id);
+        scheduleSync();
+    }
+}
+
+// 包装节点的 onWidgetChanged（每个节点只包装一次）
+function hookNode(node) {
+    if (!node || node._findModelsHooked) {
+        return;
+    }
+    node._findModelsHooked = true;
+    const originalOnWidgetChanged = node.onWidgetChanged;
+    node.onWidgetChanged = function(...args) {
+        markNodeDirty(this);
+        if (originalOnWidgetChanged) {
+            return originalOnWidgetChanged.apply(this, args);
+        }
+    };
+}
+
+// 监听图的节点增删、连接变化和 widget 修改（每个图只绑定一次）
+// onChange(affectedKeys): 工作流中的模型发生变化时调用
+export function attachGraphListeners(graph, onChange = null) {
+    _state.onChange = onChange;
+    if (!graph || graph._findModelsListening) {
+        return;
+    }
+    graph._findModelsListening = true;
+    if (graph !== _state.graph) {
+        resetGraph(graph);
+    }
+
+    getGraphNodes(graph).forEach(hookNode);
+
+    const originalOnNodeAdded = graph.onNodeAdded;
+    graph.onNodeAdded = function(node, ...args) {
+        hookNode(node);
+        markNodeDirty(node);
+        if (originalOnNodeAdded) {
+            return originalOnNodeAdded.call(this, node, ...args);
+        }
+    };
+
+    const originalOnNodeRemoved = graph.onNodeRemoved;
+    graph.onNodeRemoved = function(node, ...args) {
+        markNodeDirty(node);
+        if (originalOnNodeRemoved) {
+            return originalOnNodeRemoved.call(this, node, ...args);
+        }
+    };
+
+    // 连接变化会改变两端节点的使用状态
+    const originalOnConnectionChange = graph.onConnectionChange;
+    graph.onConnectionChange = function(node, ...args) {
+        markNodeDirty(node);
+        if (originalOnConnectionChange) {
+            return originalOnConnectionChange.call(this, node, ...args);
+        }
+    };
+}
@@ -0,0 +1,133 @@
+/**
+ * 模型完整性校验模块
+ * 已安装模型的大小和 SHA-256 与 Civitai / Hugging Face 上的文件比较，
+ * 损坏的模型在表格中显示为"已损坏"，并提供下载链接用于替换
+ */
+
+import { api } from "../../../scripts/api.js";
+import { t } from "../i18n/i18n.js";
+import { renderStatsCards } from "../components/StatsCards.js";
+import { verifyModels, getServerCachedResults } from "./api.js";
+import { setCachedResults } from "./cache.js";
+import { refreshTableRow } from "./virtualTable.js";
+
+const VERIFY_EVENT = "comfyui-find-models.verify";
+
+// 最近的校验结果（key: "类型:名称"，与分析结果中 models 的键一致）
+const _results = {};
+// 正在显示的对话框内容（后台校验的结果推送到这里）
+let _contentDiv = null;
+
+// 把已知的校验结果应用到分析结果中的模型（设置 model.corrupt）
+export function applyIntegrityResults(models) {
+    for (const [key, model] of Object.entries(models || {})) {
+        const result = _results[key] || null;
+        model.integrity = result;
+        model.corrupt = Boolean(model.installed && result && result.status === "corrupt");
+    }
+}
+
+// 已安装但校验失败的模型数
+export function countCorruptModels(models) {
+    return Object.values(models || {}).filter(model => model.installed && model.corrupt).length;
+}
+
+// 模型重新下载后文件已替换，之前的校验结果不再有效
+export function forgetIntegrityResult(modelName) {
+    for (const key of Object.keys(_results)) {
+        if (_results[key].name === modelName) {
+            delete _results[key];
+        }
+    }
+}
+
+// 更新统计卡片（损坏的模型不计入已安装）
+function updateStatsCards(contentDiv) {
+    const table = contentDiv._modelTable;
+    const cards = contentDiv.querySelector('#model-stats-cards');
+    if (!table || !cards) {
+        return;
+    }
+    const result = table.result;
+    const corruptCount = countCorruptModels(result.models);
+    cards.outerHTML = renderStatsCards(result.total_required, result.installed_count - corruptCount, result.missing_count, corruptCount);
+}
+
+// 应用单个校验结果并更新对应的行
+async function applyResult(contentDiv, result) {
+    const previous = _results[result.key];
+    // 只使用缓存信息的快速校验无法判断时，保留之前完整校验的结果
+    if (result.status === "unverified" && previous && previous.path === result.path) {
+        return;
+    }
+    _results[result.key] = result;
+
+    const table = contentDiv && contentDiv._modelTable;
+    const row = table ? table.rows.find(item => item.key === result.key) : null;
+    if (!row) {
+        return;
+    }
+    const corrupt = Boolean(row.model.installed && result.status === "corrupt");
+    const changed = row.model.corrupt !== corrupt;
+    row.model.integrity = result;
+    row.model.corrupt = corrupt;
+
+    // 损坏的模型需要下载链接（校验时已搜索过，结果在服务器端缓存中）
+    if (corrupt && !row.links.length) {
+        const cached = await getServerCachedResults([row.model.name]);
+        const links = cached[row.model.name];
+        if (links && links.length) {
+            row.links = links;
+            if (table.result.model_links) {
+                table.result.model_links[row.model.name] = links;
+            }
+            setCachedResults(row.model.name, links);
+        }
+    }
+    refreshTableRow(contentDiv, row);
+    if (changed) {
+        updateStatsCards(contentDiv);
+    }
+}
+
+// 校验分析结果中所有已安装的模型
+// full 为 false 时只比较已缓存的信息（打开对话框时自动执行）；为 true 时在后台搜索上游信息并计算哈希
+export async function startIntegrityCheck(contentDiv, result, full = false) {
+    _contentDiv = contentDiv;
+    const models = Object.values((result && result.models) || {})
+        .filter(model => model.installed)
+        .map(model => ({ model_type: model.type, name: model.name }));
+    const data = await verifyModels(models, full);
+    for (const item of Object.values(data.results || {})) {
+        await applyResult(contentDiv, item);
+    }
+    return data;
+}
+
+// 监听后台校验推送的结果
+api.addEventListener(VERIFY_EVENT, (event) => {
+    const result = event.detail;
+    if (!result || !result.key) {
+        return;
+    }
+    applyResult(_contentDiv, result);
+});
+
+// 绑定"校验文件"按钮（事件委托，每个 contentDiv 只绑定一次）
+export function bindIntegrityButton(contentDiv) {
+    if (contentDiv._integrityButtonBound) {
+        return;
+    }
+    contentDiv._integrityButtonBound = true;
+
+    contentDiv.addEventListener('click', async (e) => {
+        const btn = e.target.closest('#verify-integrity-btn');
+        if (!btn || btn.disabled) {
+            return;
+        }
+        btn.disabled = true;
+        const data = await startIntegrityCheck(contentDiv, window._currentDialogResult, true);
+        btn.textContent = t('verifyQueued', { count: data.queued || 0 });
+        btn.disabled = false;
+    });
+}
@@ -2,43 +2,32 @@
  * 模型操作功能模块
  */
 
-import { renderLocalPath } from '../components/LocalPath.js';
-import { renderModelPageLinks } from '../components/ModelPageLinks.js';
-import { renderDownloadLinks } from '../components/DownloadLinks.js';
-import { renderSpinner, ensureSpinnerStyle } from '../components/Spinner.js';
-import { getInstalledModels, getExtraModelPaths, searchModelLinks } from './api.js';
+import { ensureSpinnerStyle } from '../components/Spinner.js';
+import { getInstalledModels, getExtraModelPaths, getModelSidecars, searchModelLinks, validateLinks } from './api.js';
 import { clearModelCache, getCachedResults, setCachedResults } from './cache.js';
 import { checkModelStatus, MODEL_TYPE_TO_DIR, buildLocalPath, extractModelsFromWorkflow } from '../workflowModelExtractor.js';
-import { t } from '../i18n/i18n.js';
-import { bindHighlightButtons } from './nodeHighlight.js';
+import { findTableRow, refreshTableRow } from './virtualTable.js';
+import { clearAnalysisCache } from './analysisCache.js';
 import { app } from '../../../scripts/app.js';
 
-// 重新搜索单个模型并更新表格行
-export async function refreshModelSearch(modelName, modelType, rowElement) {
-    // 清除缓存
-    clearModelCache(modelName);
+// 重新搜索单个模型并更新表格行（更新表格数据模型后重新渲染该行）
+export async function refreshModelSearch(contentDiv, modelName, modelType) {
+    const row = findTableRow(contentDiv, modelName, modelType);
+    if (!row) return;
+    const table = contentDiv._modelTable;
     
-    // 找到该行的所有单元格
-    const cells = rowElement.querySelectorAll('td');
-    if (cells.length < 5) return; // 确保有足够的单元格
+    // 清除缓存（包括缓存的完整分析结果）
+    await clearModelCache(modelName);
+    clearAnalysisCache();
     
-    const statusCell = cells[1]; // 是否已安装
-    const localPathCell = cells[2]; // 本地目录
-    const modelPageCell = cells[3]; // 模型页面
-    const downloadCell = cells[4]; // 下载链接
-    
-    // 保存原始内容（用于恢复）
-    const originalStatus = statusCell.innerHTML;
-    const originalLocalPath = localPathCell.innerHTML;
-    const originalModelPage = modelPageCell.innerHTML;
-    const originalDownload = downloadCell.innerHTML;
+    // 保存原始数据（用于恢复）
+    const originalModel = row.model;
+    const originalLinks = row.links;
     
     // 显示加载状态（转圈圈）
     ensureSpinnerStyle();
-    statusCell.innerHTML = renderSpinner(t('searching'));
-    localPathCell.innerHTML = renderSpinner(t('searching'));
-    modelPageCell.innerHTML = renderSpinner(t('searching'));
-    downloadCell.innerHTML = renderSpinner(t('searching'));
+    row.loading = true;
+    refreshTableRow(contentDiv, row);
     
     try {
         // 1. 重新获取已安装模型列表和 extra_model_paths 配置
@@ -138,49 +127,37 @@ export async function refreshModelSearch(modelName, modelType, rowElement) {
             };
         }
         
-        // 3. 更新"是否已安装"单元格（使用重新检查后的状态）
-        const statusColor = modelInfo.installed ? "#81c784" : "#e57373";
-        const statusText = modelInfo.installed ? `✓ ${t('installed')}` : `✗ ${t('missing')}`;
-        statusCell.innerHTML = `<span style="color: ${statusColor}; font-weight: bold;">${statusText}</span>`;
-        
-        // 4. 更新"本地目录"单元格（传入重新获取的 extraModelPaths）
-        localPathCell.innerHTML = renderLocalPath(modelInfo, modelType, MODEL_TYPE_TO_DIR, extraModelPaths);
-        
-        // 5. 重新搜索下载链接（跳过缓存）
-        const links = await searchModelLinks(modelName, modelType, true, getCachedResults, setCachedResults);
+        // 5. 重新搜索下载链接（跳过缓存，使用深度搜索）
+        const links = await searchModelLinks(modelName, modelType, true, getCachedResults, setCachedResults, true, contentDiv._abortController?.signal);
         
-        // 6. 更新"模型页面"单元格（使用重新检查后的安装状态）
-        modelPageCell.innerHTML = renderModelPageLinks(links, modelInfo.installed);
-        
-        // 7. 更新"下载链接"单元格（使用重新检查后的安装状态）
-        downloadCell.innerHTML = renderDownloadLinks(links, modelName, modelType, modelInfo.installed);
-        
-        // 重新绑定事件
-        const refreshBtn = downloadCell.querySelector('.refresh-model-btn');
-        if (refreshBtn) {
-            refreshBtn.onclick = () => {
-                refreshModelSearch(modelName, modelType, rowElement);
-            };
+        // 6. 更新表格数据（安装状态和本地目录使用重新检查后的结果，保留节点和使用状态）
+        row.model = {
+            ...originalModel,
+            installed: modelInfo.installed,
+            localPath: modelInfo.localPath,
+            matchedName: modelInfo.matchedName
+        };
+        row.links = links;
+        row.loading = false;
+        table.result.models[row.key] = row.model;
+        table.result.extra_model_paths = extraModelPaths;
+        if (table.result.model_links) {
+            table.result.model_links[modelName] = links;
         }
-        
-        // 更新行背景色
-        const rowBgColor = modelInfo.installed ? "#1e2e1e" : "#2e1e1e";
-        rowElement.style.background = rowBgColor;
+        refreshTableRow(contentDiv, row);
         
     } catch (error) {
         // 恢复原始内容
-        statusCell.innerHTML = originalStatus;
-        localPathCell.innerHTML = originalLocalPath;
-        modelPageCell.innerHTML = originalModelPage;
-        downloadCell.innerHTML = originalDownload;
+        row.model = originalModel;
+        row.links = originalLinks;
+        row.loading = false;
+        refreshTableRow(contentDiv, row);
     }
 }
 
 // 显示模型行的加载状态
 export function showModelRowLoading(contentDiv, model) {
-    const rowId = `model-row-${model.name.replace(/[^a-zA-Z0-9]/g, '-')}`;
-    const row = contentDiv.querySelector(`#${rowId}`);
-    
+    const row = findTableRow(contentDiv, model.name, model.type);
     if (!row) {
         return;
     }
@@ -188,74 +165,103 @@ export function showModelRowLoading(contentDiv, model) {
     // 确保加载动画样式已添加
     ensureSpinnerStyle();
     
-    // 获取行中的单元格
-    const cells = row.querySelectorAll('td');
-    if (cells.length < 5) {
-        return;
-    }
-    
-    // 更新"模型页面"单元格（第4列，索引3）显示加载状态
-    const modelPageCell = cells[3];
-    if (modelPageCell) {
-        modelPageCell.innerHTML = renderSpinner(t('searching'));
-    }
-    
-    // 更新"下载链接"单元格（第5列，索引4）显示加载状态
-    const downloadCell = cells[4];
-    if (downloadCell) {
-        downloadCell.innerHTML = renderSpinner(t('searching'));
-    }
+    row.loading = true;
+    refreshTableRow(contentDiv, row);
 }
 
 // 更新单个模型行的显示
 export function updateModelRow(contentDiv, model, links) {
-    const rowId = `model-row-${model.name.replace(/[^a-zA-Z0-9]/g, '-')}`;
-    const row = contentDiv.querySelector(`#${rowId}`);
-    
+    const row = findTableRow(contentDiv, model.name, model.type);
     if (!row) {
         return;
     }
     
-    // 获取行中的单元格
-    const cells = row.querySelectorAll('td');
-    if (cells.length < 5) {
+    row.links = links;
+    row.loading = false;
+    refreshTableRow(contentDiv, row);
+}
+
+// 链接检查结果的有效期（与服务器端缓存相同）
+const LINK_STATUS_TTL = 6 * 60 * 60 * 1000;
+
+// 重新检查表格中缺失模型的下载链接（本地缓存的搜索结果中的检查结果可能已经过期）
+export async function refreshLinkStatuses(contentDiv) {
+    const table = contentDiv._modelTable;
+    if (!table) {
         return;
     }
-    
-    // 更新"模型页面"单元格（第4列，索引3）
-    const modelPageCell = cells[3];
-    if (modelPageCell) {
-        modelPageCell.innerHTML = renderModelPageLinks(links, model.installed);
+    const now = Date.now();
+    const rows = table.rows.filter(row => !row.model.installed && row.links.length);
+    const urls = [];
+    for (const row of rows) {
+        for (const link of row.links) {
+            const status = link.link_status;
+            // 局域网节点的链接每次搜索时按最新的节点清单生成，不需要检查
+            if (link.download_url && !link.peer_node && (!status || now - status.checked_at * 1000 > LINK_STATUS_TTL)) {
+                urls.push(link.download_url);
+            }
+        }
     }
-    
-    // 更新"下载链接"单元格（第5列，索引4）
-    const downloadCell = cells[4];
-    if (downloadCell) {
-        downloadCell.innerHTML = renderDownloadLinks(links, model.name, model.type, model.installed);
-        // 重新绑定该行的刷新按钮事件
-        const refreshBtn = downloadCell.querySelector('.refresh-model-btn');
-        if (refreshBtn) {
-            refreshBtn.onclick = () => {
-                const modelName = refreshBtn.getAttribute('data-model-name');
-                const modelType = refreshBtn.getAttribute('data-model-type');
-                // refreshModelSearch 在同一文件中定义，可以直接调用
-                refreshModelSearch(modelName, modelType, row);
-            };
+    if (urls.length === 0) {
+        return;
+    }
+    const results = await validateLinks(urls, contentDiv._abortController?.signal);
+    for (const row of rows) {
+        let changed = false;
+        for (const link of row.links) {
+            const result = results[link.download_url];
+            if (!result) {
+                continue;
+            }
+            link.link_status = { ok: result.ok, status: result.status, gated: result.gated, content_length: result.content_length, checked_at: result.checked_at };
+            if (!link.file_size && result.ok && result.content_length) {
+                link.file_size = result.content_length;
+            }
+            changed = true;
+        }
+        if (changed) {
+            setCachedResults(row.model.name, row.links);
+            refreshTableRow(contentDiv, row);
+        }
+    }
+}
+
+// 读取表格中缺失模型的本地模型信息（预览图、版本、触发词等，服务器端在搜索完成后保存）
+export async function loadModelSidecars(contentDiv) {
+    const table = contentDiv._modelTable;
+    if (!table) {
+        return;
+    }
+    const rows = table.rows.filter(row => (!row.model.installed || row.model.corrupt) && row.links.length);
+    if (rows.length === 0) {
+        return;
+    }
+    const results = await getModelSidecars(rows.map(row => row.model.name), contentDiv._abortController?.signal);
+    for (const row of rows) {
+        const sidecar = results[row.model.name];
+        if (sidecar && sidecar.updated_at !== row.model.sidecar?.updated_at) {
+            row.model.sidecar = sidecar;
+            refreshTableRow(contentDiv, row);
         }
     }
 }
 
-// 绑定刷新按钮事件（辅助函数）
+// 绑定刷新按钮事件（事件委托，每个 contentDiv 只绑定一次，滚动或搜索重新渲染后不需要重新绑定）
 export function bindRefreshButtons(contentDiv) {
-    const refreshButtons = contentDiv.querySelectorAll('.refresh-model-btn');
-    refreshButtons.forEach(btn => {
-        btn.onclick = () => {
-            const modelName = btn.getAttribute('data-model-name');
-            const modelType = btn.getAttribute('data-model-type');
-            const rowElement = btn.closest('tr');
-            if (rowElement && modelName) {
-                refreshModelSearch(modelName, modelType, rowElement);
-            }
-        };
+    if (contentDiv._refreshButtonsBound) {
+        return;
+    }
+    contentDiv._refreshButtonsBound = true;
+    
+    contentDiv.addEventListener('click', (e) => {
+        const btn = e.target.closest('.refresh-model-btn');
+        if (!btn) {
+            return;
+        }
+        const modelName = btn.getAttribute('data-model-name');
+        const modelType = btn.getAttribute('data-model-type');
+        if (modelName) {
+            refreshModelSearch(contentDiv, modelName, modelType);
+        }
     });
 }
@@ -116,33 +116,35 @@ export function clearNodeHighlights() {
     }
 }
 
-// 绑定高亮按钮事件
+// 绑定高亮按钮事件（事件委托，每个 contentDiv 只绑定一次，滚动或搜索重新渲染后不需要重新绑定）
 export function bindHighlightButtons(contentDiv) {
-    const highlightButtons = contentDiv.querySelectorAll('.highlight-node-btn');
+    if (contentDiv._highlightButtonsBound) {
+        return;
+    }
+    contentDiv._highlightButtonsBound = true;
     
-    highlightButtons.forEach(btn => {
-        btn.onclick = () => {
-            const nodeIdStr = btn.getAttribute('data-node-id');
-            const nodeIndex = btn.getAttribute('data-node-index');
-            
-            if (nodeIdStr) {
-                const nodeId = parseInt(nodeIdStr.trim());
-                if (!isNaN(nodeId)) {
-                    // console.log(`[ComfyUI-find-models] 点击高亮按钮，节点索引: ${nodeIndex}, 节点ID: ${nodeId}`);
-                    // 只高亮单个节点
-                    highlightNodes([nodeId]);
-                }
-            } else {
-                // 兼容旧的实现方式（如果还有使用 data-node-ids 的按钮）
-                const nodeIdsStr = btn.getAttribute('data-node-ids');
-                if (nodeIdsStr) {
-                    const nodeIds = nodeIdsStr.split(',').map(id => parseInt(id.trim())).filter(id => !isNaN(id));
-                    // console.log(`[ComfyUI-find-models] 点击高亮按钮（旧格式），节点IDs: ${nodeIds.join(', ')}`);
-                    if (nodeIds.length > 0) {
-                        highlightNodes(nodeIds);
-                    }
+    contentDiv.addEventListener('click', (e) => {
+        const btn = e.target.closest('.highlight-node-btn');
+        if (!btn) {
+            return;
+        }
+        const nodeIdStr = btn.getAttribute('data-node-id');
+        
+        if (nodeIdStr) {
+            const nodeId = parseInt(nodeIdStr.trim());
+            if (!isNaN(nodeId)) {
+                // 只高亮单个节点
+                highlightNodes([nodeId]);
+            }
+        } else {
+            // 兼容旧的实现方式（如果还有使用 data-node-ids 的按钮）
+            const nodeIdsStr = btn.getAttribute('data-node-ids');
+            if (nodeIdsStr) {
+                const nodeIds = nodeIdsStr.split(',').map(id => parseInt(id.trim())).filter(id => !isNaN(id));
+                if (nodeIds.length > 0) {
+                    highlightNodes(nodeIds);
                 }
             }
-        };
+        }
     });
 }
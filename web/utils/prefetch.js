@@ -0,0 +1,69 @@
+/**
+ * 后台预取模块
+ * 在 ComfyUI 设置中开关后台预取；加载工作流时把缺失的模型交给后端预取，
+ * 后端搜索完成后通过 websocket 推送结果，写入本地缓存
+ */
+
+import { app } from "../../../scripts/app.js";
+import { api } from "../../../scripts/api.js";
+import { t } from "../i18n/i18n.js";
+import { prefetchWorkflow, updatePrefetchSettings } from "./api.js";
+import { setCachedResults } from "./cache.js";
+
+const PREFETCH_EVENT = "comfyui-find-models.prefetch";
+const PREFETCH_SETTING_ID = "ComfyUI.FindModels.Prefetch";
+// 工作流变化后等待的时间（毫秒），避免连续编辑时重复提交
+const PREFETCH_DEBOUNCE = 1500;
+
+let _enabled = false;
+let _timer = null;
+let _lastWorkflowKey = null;
+
+// 工作流中模型相关内容的简单标识（只有节点类型和 widgets_values 变化时才重新提交）
+function getWorkflowKey(workflow) {
+    return JSON.stringify(workflow.nodes.map(n => [n.type, n.mode, n.widgets_values]));
+}
+
+// 注册 ComfyUI 设置项，开关变化时同步到后端
+export function registerPrefetchSetting() {
+    try {
+        app.ui.settings.addSetting({
+            id: PREFETCH_SETTING_ID,
+            name: t('prefetchSetting'),
+            tooltip: t('prefetchSettingTooltip'),
+            type: "boolean",
+            defaultValue: false,
+            onChange: (value) => {
+                _enabled = !!value;
+                _lastWorkflowKey = null;
+                updatePrefetchSettings({ enabled: _enabled });
+            }
+        });
+    } catch (error) {
+        // console.warn("[ComfyUI-find-models] 注册预取设置失败:", error);
+    }
+}
+
+// 加载或修改工作流后调用，延迟提交给后端预取
+export function schedulePrefetch(workflow) {
+    if (!_enabled || !workflow || !workflow.nodes) {
+        return;
+    }
+    clearTimeout(_timer);
+    _timer = setTimeout(() => {
+        const key = getWorkflowKey(workflow);
+        if (key === _lastWorkflowKey) {
+            return;
+        }
+        _lastWorkflowKey = key;
+        prefetchWorkflow(workflow);
+    }, PREFETCH_DEBOUNCE);
+}
+
+// 后端预取到结果后写入本地缓存，打开对话框时直接使用
+api.addEventListener(PREFETCH_EVENT, (event) => {
+    const data = event.detail;
+    if (data && data.model_name && Array.isArray(data.results)) {
+        setCachedResults(data.model_name, data.results);
+    }
+});
@@ -1,226 +1,149 @@
 /**
  * 搜索和排序功能模块
+ * 每次分析只建立一次搜索索引（小写名称和分词），输入防抖后只对数据排序，不读取或克隆 DOM
+ * 同时在后端的已安装模型索引中搜索，作为输入框的自动补全建议（不限于工作流中的模型）
  */
 
-// 存储原始行顺序和分隔行索引
-let _originalRowsOrder = null;
-let _originalSeparatorIndex = -1;
+import { searchInstalledModels } from "./api.js";
 
-// 保存原始行顺序
-export function saveOriginalRowsOrder(contentDiv) {
-    const tbody = contentDiv.querySelector('#models-table-body');
-    if (!tbody) {
-        return;
+// 输入防抖时间（毫秒）
+const SEARCH_DEBOUNCE = 150;
+// 自动补全建议的最大数量
+const SUGGESTION_LIMIT = 20;
+// 分词规则（与单词匹配一致）
+const TOKEN_SPLIT = /[_\-\s\.]+/;
+// 名称比较（复用同一个 Collator，比每次调用 localeCompare 快）
+const nameCollator = new Intl.Collator();
+
+// 为表格行建立搜索索引（小写名称和分词），每次分析结果只需要建立一次
+export function buildSearchIndex(rows) {
+    for (const row of rows) {
+        row.nameLower = row.model.name.toLowerCase();
+        row.tokens = row.nameLower.split(TOKEN_SPLIT);
     }
-    // 保存原始行的克隆（深拷贝）
-    const allRows = Array.from(tbody.querySelectorAll('tr'));
-    _originalSeparatorIndex = allRows.findIndex(row => row.classList.contains('model-separator-row'));
-    _originalRowsOrder = allRows.map((row, index) => ({
-        row: row.cloneNode(true),
-        isSeparator: row.classList.contains('model-separator-row'),
-        originalIndex: index
-    }));
 }
 
-// 恢复原始排序
-export function restoreOriginalOrder(contentDiv, bindRefreshButtons, bindHighlightButtons) {
-    const tbody = contentDiv.querySelector('#models-table-body');
-    if (!tbody || !_originalRowsOrder) {
-        return;
+// 计算匹配分数（完全匹配 > 开头匹配 > 包含匹配 > 单词匹配）
+function scoreRow(row, searchLower, searchWords) {
+    if (row.nameLower === searchLower) {
+        return 1000;
     }
-    
-    // 清空 tbody
-    tbody.innerHTML = '';
-    
-    // 恢复原始顺序
-    _originalRowsOrder.forEach(item => {
-        tbody.appendChild(item.row.cloneNode(true));
-    });
-    
-    // 重新绑定事件
-    bindRefreshButtons(contentDiv);
-    bindHighlightButtons(contentDiv);
+    if (row.nameLower.startsWith(searchLower)) {
+        return 500;
+    }
+    if (row.nameLower.includes(searchLower)) {
+        return 100;
+    }
+    let wordMatchCount = 0;
+    for (const searchWord of searchWords) {
+        if (row.tokens.some(word => word.includes(searchWord))) {
+            wordMatchCount++;
+        }
+    }
+    return wordMatchCount * 10;
 }
 
-// 搜索并排序模型列表
-export function searchAndSortModels(contentDiv, searchTerm, bindRefreshButtons, bindHighlightButtons) {
-    if (!searchTerm || searchTerm.trim() === '') {
-        restoreOriginalOrder(contentDiv, bindRefreshButtons, bindHighlightButtons);
-        return;
-    }
-    
-    const tbody = contentDiv.querySelector('#models-table-body');
-    if (!tbody) {
-        return;
+// 默认排序：缺失的在前，然后按名称排序
+function compareDefault(a, b) {
+    if (a.model.installed !== b.model.installed) {
+        return a.model.installed ? 1 : -1;
     }
-    
-    // 如果没有保存原始顺序，先保存
-    if (!_originalRowsOrder) {
-        saveOriginalRowsOrder(contentDiv);
+    return nameCollator.compare(a.model.name, b.model.name);
+}
+
+// 对表格行排序，返回 { used, unused }（已使用和未使用的模型分开）
+// 没有搜索词时按默认顺序；有搜索词时匹配的在前，然后按匹配分数和名称排序
+export function sortRows(rows, searchTerm) {
+    const searchLower = (searchTerm || '').toLowerCase().trim();
+    const used = rows.filter(row => row.isUsed);
+    const unused = rows.filter(row => !row.isUsed);
+
+    if (!searchLower) {
+        used.sort(compareDefault);
+        unused.sort(compareDefault);
+        return { used, unused };
     }
-    
-    // 从原始顺序开始搜索（使用保存的原始行）
-    if (!_originalRowsOrder || _originalRowsOrder.length === 0) {
-        return;
+
+    const searchWords = searchLower.split(TOKEN_SPLIT);
+    for (const row of rows) {
+        row.score = scoreRow(row, searchLower, searchWords);
     }
-    
-    // 使用保存的原始行
-    const modelRows = _originalRowsOrder.filter(item => !item.isSeparator);
-    const separatorRowItem = _originalRowsOrder.find(item => item.isSeparator);
-    
-    const searchLower = searchTerm.toLowerCase().trim();
-    
-    // 为每个模型行计算匹配度和使用状态
-    const rowsWithScore = modelRows.map((item) => {
-        const row = item.row;
-        const modelNameCell = row.querySelector('td:first-child');
-        if (!modelNameCell) {
-            return { row: row.cloneNode(true), score: 0, modelName: '', isUsed: true };
+    const compareScore = (a, b) => {
+        // 匹配的在前
+        if ((a.score > 0) !== (b.score > 0)) {
+            return a.score > 0 ? -1 : 1;
         }
-        
-        // 获取模型名称（排除按钮和额外信息）
-        const nameDiv = modelNameCell.querySelector('div:first-child > div:first-child');
-        const modelName = nameDiv ? nameDiv.textContent.trim() : modelNameCell.textContent.trim();
-        const modelNameLower = modelName.toLowerCase();
-        
-        // 判断是否已使用：在原始顺序中，如果分隔行存在，分隔行之前的为已使用，之后的为未使用
-        const isUsed = _originalSeparatorIndex === -1 || item.originalIndex < _originalSeparatorIndex;
-        
-        let score = 0;
-        
-        // 完全匹配
-        if (modelNameLower === searchLower) {
-            score = 1000;
-        }
-        // 开头匹配
-        else if (modelNameLower.startsWith(searchLower)) {
-            score = 500;
-        }
-        // 包含匹配
-        else if (modelNameLower.includes(searchLower)) {
-            score = 100;
-        }
-        // 部分匹配（单词匹配）
-        else {
-            const words = modelNameLower.split(/[_\-\s\.]+/);
-            const searchWords = searchLower.split(/[_\-\s\.]+/);
-            let wordMatchCount = 0;
-            for (const searchWord of searchWords) {
-                if (words.some(word => word.includes(searchWord))) {
-                    wordMatchCount++;
-                }
-            }
-            score = wordMatchCount * 10;
-        }
-        
-        return { row: row.cloneNode(true), score, modelName: modelName, isUsed: isUsed };
-    });
-    
-    // 按使用状态和匹配度排序
-    // 排序优先级：1. 使用状态（已使用 > 未使用） 2. 匹配度（匹配 > 不匹配） 3. 匹配分数 4. 名称
-    rowsWithScore.sort((a, b) => {
-        // 先按使用状态分组：已使用的在前
-        if (a.isUsed !== b.isUsed) {
-            return a.isUsed ? -1 : 1;
-        }
-        
-        // 如果使用状态相同，按是否匹配分组：匹配的在前
-        const aMatched = a.score > 0;
-        const bMatched = b.score > 0;
-        if (aMatched !== bMatched) {
-            return aMatched ? -1 : 1;
-        }
-        
-        // 如果匹配状态也相同，按匹配分数排序
+        // 分数高的在前
         if (a.score !== b.score) {
-            return b.score - a.score; // 分数高的在前
+            return b.score - a.score;
         }
-        
         // 分数相同，按名称排序
-        return a.modelName.localeCompare(b.modelName);
-    });
-    
-    // 分离已使用和未使用的行
-    const usedRows = [];
-    const unusedRows = [];
-    
-    for (const item of rowsWithScore) {
-        if (item.isUsed) {
-            usedRows.push(item);
-        } else {
-            unusedRows.push(item);
-        }
-    }
-    
-    // 在已使用的行中，匹配的在前，不匹配的在后
-    const usedMatchedRows = usedRows.filter(item => item.score > 0).map(item => item.row);
-    const usedUnmatchedRows = usedRows.filter(item => item.score === 0).map(item => item.row);
-    
-    // 在未使用的行中，匹配的在前，不匹配的在后
-    const unusedMatchedRows = unusedRows.filter(item => item.score > 0).map(item => item.row);
-    const unusedUnmatchedRows = unusedRows.filter(item => item.score === 0).map(item => item.row);
-    
-    // 清空 tbody
-    tbody.innerHTML = '';
-    
-    // 1. 先添加所有已使用的行（匹配的在前，不匹配的在后）
-    if (usedMatchedRows.length > 0 || usedUnmatchedRows.length > 0) {
-        usedMatchedRows.forEach(row => tbody.appendChild(row));
-        usedUnmatchedRows.forEach(row => tbody.appendChild(row));
-    }
-    
-    // 2. 如果有已使用的行和未使用的行，添加分隔行
-    if (usedRows.length > 0 && unusedRows.length > 0 && separatorRowItem) {
-        tbody.appendChild(separatorRowItem.row.cloneNode(true));
-    }
-    
-    // 3. 再添加所有未使用的行（匹配的在前，不匹配的在后）
-    if (unusedMatchedRows.length > 0 || unusedUnmatchedRows.length > 0) {
-        unusedMatchedRows.forEach(row => tbody.appendChild(row));
-        unusedUnmatchedRows.forEach(row => tbody.appendChild(row));
+        return nameCollator.compare(a.model.name, b.model.name);
+    };
+    used.sort(compareScore);
+    unused.sort(compareScore);
+    return { used, unused };
+}
+
+// 用后端索引的搜索结果更新输入框的自动补全建议（只保留最后一次输入的结果）
+let _suggestionRequest = 0;
+async function updateInstalledSuggestions(contentDiv, searchTerm) {
+    const requestId = ++_suggestionRequest;
+    const results = searchTerm ? await searchInstalledModels(searchTerm, '', SUGGESTION_LIMIT) : [];
+    const datalist = contentDiv.querySelector('#installed-model-suggestions');
+    if (!datalist || requestId !== _suggestionRequest) {
+        return;
     }
-    
-    // 重新绑定事件（因为 DOM 重新排列了）
-    bindRefreshButtons(contentDiv);
-    bindHighlightButtons(contentDiv);
+    datalist.replaceChildren(...results.map(({ name, folder }) => {
+        const option = document.createElement('option');
+        option.value = name.split(/[/\\]/).pop();
+        option.label = `${folder}/${name}`;
+        return option;
+    }));
 }
 
-// 绑定搜索功能
-export function bindSearchFunctionality(contentDiv, searchAndSortModels, restoreOriginalOrder, bindRefreshButtons, bindHighlightButtons) {
-    const searchInput = contentDiv.querySelector('#model-search-input');
-    const clearBtn = contentDiv.querySelector('#clear-search-btn');
-    
-    if (!searchInput) {
+// 绑定搜索功能（事件委托，每个 contentDiv 只绑定一次，重新渲染表格后不需要重新绑定）
+export function bindSearchFunctionality(contentDiv, onSearch) {
+    contentDiv._onModelSearch = onSearch;
+    if (contentDiv._searchBound) {
         return;
     }
-    
-    // 搜索输入事件
-    searchInput.addEventListener('input', (e) => {
-        const searchTerm = e.target.value.trim();
-        
-        if (searchTerm) {
-            // 显示清除按钮
-            if (clearBtn) {
-                clearBtn.style.display = 'block';
-            }
-            // 执行搜索排序
-            searchAndSortModels(contentDiv, searchTerm, bindRefreshButtons, bindHighlightButtons);
-        } else {
-            // 隐藏清除按钮
-            if (clearBtn) {
-                clearBtn.style.display = 'none';
-            }
-            // 恢复原始顺序
-            restoreOriginalOrder(contentDiv, bindRefreshButtons, bindHighlightButtons);
+    contentDiv._searchBound = true;
+
+    let timer = null;
+    const updateClearButton = (searchTerm) => {
+        const clearBtn = contentDiv.querySelector('#clear-search-btn');
+        if (clearBtn) {
+            clearBtn.style.display = searchTerm ? 'block' : 'none';
         }
+    };
+
+    // 搜索输入事件（防抖）
+    contentDiv.addEventListener('input', (e) => {
+        if (e.target.id !== 'model-search-input') {
+            return;
+        }
+        const searchTerm = e.target.value.trim();
+        updateClearButton(searchTerm);
+        clearTimeout(timer);
+        timer = setTimeout(() => {
+            contentDiv._onModelSearch(searchTerm);
+            updateInstalledSuggestions(contentDiv, searchTerm);
+        }, SEARCH_DEBOUNCE);
     });
-    
+
     // 清除按钮事件
-    if (clearBtn) {
-        clearBtn.addEventListener('click', () => {
+    contentDiv.addEventListener('click', (e) => {
+        if (!e.target.closest('#clear-search-btn')) {
+            return;
+        }
+        const searchInput = contentDiv.querySelector('#model-search-input');
+        if (searchInput) {
             searchInput.value = '';
-            clearBtn.style.display = 'none';
-            restoreOriginalOrder(contentDiv, bindRefreshButtons, bindHighlightButtons);
-        });
-    }
+        }
+        updateClearButton('');
+        clearTimeout(timer);
+        contentDiv._onModelSearch('');
+        updateInstalledSuggestions(contentDiv, '');
+    });
 }
@@ -0,0 +1,191 @@
+/**
+ * 虚拟滚动的模型表格
+ * 表格由数据模型（每个模型一行）生成，只渲染滚动区域内可见的行（上下用占位行撑开高度），
+ * 行高在渲染后测量并记录，没有测量过的行使用平均行高估算
+ */
+
+import { renderModelRow } from '../components/ModelRow.js';
+import { MODEL_TYPE_TO_DIR } from '../workflowModelExtractor.js';
+import { renderSeparatorRow } from './helpers.js';
+import { buildSearchIndex, sortRows } from './search.js';
+
+// 没有测量过时的默认行高（像素）
+const ESTIMATED_ROW_HEIGHT = 80;
+// 可见区域上下额外渲染的高度（像素），滚动时不会看到空白
+const OVERSCAN = 800;
+
+// 根据分析结果创建表格数据模型（同时建立搜索索引）
+export function createTableModel(result) {
+    const modelsToSearch = new Set(result.models_to_search || []);
+    const rows = Object.entries(result.models).map(([key, model]) => {
+        const links = (result.model_links && result.model_links[model.name]) || [];
+        return {
+            key,
+            model,
+            links,
+            isUsed: model.isUsed !== false,
+            // 缺失且没有缓存且需要搜索的模型显示加载状态
+            loading: !model.installed && !links.length && modelsToSearch.has(model.name),
+            height: null
+        };
+    });
+    buildSearchIndex(rows);
+    const table = { result, rows, items: [], separator: { separator: true, height: null }, searchTerm: '' };
+    setTableSearch(table, '');
+    return table;
+}
+
+// 按搜索词重新排列行（已使用的在前，有未使用的模型时中间显示分隔行）
+export function setTableSearch(table, searchTerm) {
+    table.searchTerm = searchTerm || '';
+    const { used, unused } = sortRows(table.rows, table.searchTerm);
+    const showSeparator = unused.length > 0 && (used.length > 0 || !table.searchTerm);
+    table.items = showSeparator ? [...used, table.separator, ...unused] : [...used, ...unused];
+    table.items.forEach((item, position) => {
+        item.position = position;
+    });
+    table.renderedStart = 0;
+    table.renderedEnd = 0;
+}
+
+// 查找模型对应的行（同名模型按类型区分）
+export function findTableRow(contentDiv, modelName, modelType = null) {
+    const table = contentDiv._modelTable;
+    if (!table) {
+        return null;
+    }
+    return table.rows.find(row => row.model.name === modelName && (!modelType || row.model.type === modelType)) || null;
+}
+
+// 获取滚动容器（对话框），找不到时使用页面
+function getScrollContainer(element) {
+    for (let node = element.parentElement; node; node = node.parentElement) {
+        const overflowY = getComputedStyle(node).overflowY;
+        if (overflowY === 'auto' || overflowY === 'scroll') {
+            return node;
+        }
+    }
+    return document.scrollingElement || document.documentElement;
+}
+
+function renderSpacer(height) {
+    return height > 0
+        ? `<tr class="virtual-spacer-row" style="height: ${height}px;"><td colspan="5" style="padding: 0; border: 0;"></td></tr>`
+        : '';
+}
+
+function renderItem(table, item) {
+    if (item.separator) {
+        return renderSeparatorRow();
+    }
+    return renderModelRow(item.model, item.links, MODEL_TYPE_TO_DIR, item.loading, table.result.extra_model_paths);
+}
+
+// 记录已渲染行的实际高度
+function measureRows(table, tbody) {
+    const trs = tbody.querySelectorAll(':scope > tr:not(.virtual-spacer-row)');
+    trs.forEach((tr, i) => {
+        const item = table.items[table.renderedStart + i];
+        if (item) {
+            item.height = tr.offsetHeight;
+        }
+    });
+    const measured = table.items.filter(item => item.height);
+    table.averageHeight = measured.length > 0
+        ? measured.reduce((sum, item) => sum + item.height, 0) / measured.length
+        : ESTIMATED_ROW_HEIGHT;
+}
+
+// 渲染可见区域内的行（可见范围没有变化时不重新渲染）
+export function renderVisibleRows(contentDiv, force = false) {
+    const table = contentDiv._modelTable;
+    const tbody = contentDiv.querySelector('#models-table-body');
+    if (!table || !tbody) {
+        return;
+    }
+    const container = getScrollContainer(contentDiv);
+    const containerTop = container === document.scrollingElement ? 0 : container.getBoundingClientRect().top;
+    const tableTop = tbody.getBoundingClientRect().top - containerTop;
+    const viewTop = -tableTop - OVERSCAN;
+    const viewBottom = -tableTop + container.clientHeight + OVERSCAN;
+    const estimate = table.averageHeight || ESTIMATED_ROW_HEIGHT;
+
+    // 根据累计高度计算可见范围 [start, end)
+    let offset = 0;
+    let start = table.items.length;
+    let end = table.items.length;
+    let topPadding = 0;
+    for (let i = 0; i < table.items.length; i++) {
+        const height = table.items[i].height || estimate;
+        if (start === table.items.length && offset + height > viewTop) {
+            start = i;
+            topPadding = offset;
+        }
+        if (offset > viewBottom) {
+            end = i;
+            break;
+        }
+        offset += height;
+    }
+    if (start === table.items.length) {
+        topPadding = offset;
+    }
+    let total = offset;
+    for (let i = end; i < table.items.length; i++) {
+        total += table.items[i].height || estimate;
+    }
+    const bottomPadding = Math.max(0, total - offset);
+
+    if (!force && start === table.renderedStart && end === table.renderedEnd) {
+        return;
+    }
+    table.renderedStart = start;
+    table.renderedEnd = end;
+
+    let html = renderSpacer(topPadding);
+    for (let i = start; i < end; i++) {
+        html += renderItem(table, table.items[i]);
+    }
+    html += renderSpacer(bottomPadding);
+    tbody.innerHTML = html;
+    measureRows(table, tbody);
+}
+
+// 重新渲染单行（数据变化后调用，行不在可见范围内时只更新数据）
+export function refreshTableRow(contentDiv, row) {
+    const table = contentDiv._modelTable;
+    const tbody = contentDiv.querySelector('#models-table-body');
+    if (!table || !tbody || row.position < table.renderedStart || row.position >= table.renderedEnd) {
+        return;
+    }
+    const trs = tbody.querySelectorAll(':scope > tr:not(.virtual-spacer-row)');
+    const tr = trs[row.position - table.renderedStart];
+    if (tr) {
+        tr.outerHTML = renderItem(table, row);
+        const updated = tbody.querySelectorAll(':scope > tr:not(.virtual-spacer-row)')[row.position - table.renderedStart];
+        if (updated) {
+            row.height = updated.offsetHeight;
+        }
+    }
+}
+
+// 挂载表格：记录数据模型，滚动容器的监听只绑定一次（每帧最多渲染一次）
+export function mountVirtualTable(contentDiv, table) {
+    contentDiv._modelTable = table;
+    if (!contentDiv._virtualScrollBound) {
+        contentDiv._virtualScrollBound = true;
+        let frame = null;
+        const schedule = () => {
+            if (frame === null) {
+                frame = requestAnimationFrame(() => {
+                    frame = null;
+                    renderVisibleRows(contentDiv);
+                });
+            }
+        };
+        const container = getScrollContainer(contentDiv);
+        const target = container === document.scrollingElement ? window : container;
+        target.addEventListener('scroll', schedule, { passive: true });
+    }
+    renderVisibleRows(contentDiv, true);
+}
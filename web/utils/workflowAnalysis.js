@@ -5,70 +5,71 @@
 import { app } from "../../../scripts/app.js";
 import { renderStatsCards } from "../components/StatsCards.js";
 import { renderTableHeader, renderTableFooter } from "../components/TableHeader.js";
-import { renderModelRow } from "../components/ModelRow.js";
 import { renderLoadingState, renderErrorState, renderNoWorkflowState } from "../components/LoadingState.js";
 import { renderSpinner, ensureSpinnerStyle } from "../components/Spinner.js";
 import { renderModelPageLinks } from "../components/ModelPageLinks.js";
 import { renderDownloadLinks } from "../components/DownloadLinks.js";
-import { 
-    extractModelsFromWorkflow, 
-    MODEL_TYPE_TO_DIR, 
-    checkModelStatus
-} from "../workflowModelExtractor.js";
 import { t } from "../i18n/i18n.js";
-import { getInstalledModels, getExtraModelPaths, searchModelLinks } from "./api.js";
-import { getCachedResults, setCachedResults } from "./cache.js";
-import { groupByFamily, groupByType, renderSeparatorRow } from "./helpers.js";
-import { bindRefreshButtons, showModelRowLoading, updateModelRow } from "./modelOperations.js";
+import { searchModelLinks, getServerCachedResults } from "./api.js";
+import { getCachedResults, getManyCachedResults, setCachedResults } from "./cache.js";
+import { groupByFamily, groupByType } from "./helpers.js";
+import { bindRefreshButtons, loadModelSidecars, refreshLinkStatuses, showModelRowLoading, updateModelRow } from "./modelOperations.js";
 import { bindHighlightButtons } from "./nodeHighlight.js";
-import { saveOriginalRowsOrder, bindSearchFunctionality, searchAndSortModels, restoreOriginalOrder } from "./search.js";
+import { bindServerDownloadButtons } from "./downloads.js";
+import { applyIntegrityResults, countCorruptModels, startIntegrityCheck, bindIntegrityButton } from "./integrity.js";
+import { bindSearchFunctionality } from "./search.js";
+import { analyzeGraph } from "./incrementalAnalyzer.js";
+import { getAnalysisCacheKey, getCachedAnalysis, setCachedAnalysis } from "./analysisCache.js";
+import { createTableModel, setTableSearch, mountVirtualTable, renderVisibleRows } from "./virtualTable.js";
 
 // 分析当前工作流（完全在前端完成）
 // skipCache: 如果为 true，跳过缓存检查，直接搜索所有缺失的模型
 export async function analyzeCurrentWorkflow(contentDiv, skipCache = false) {
+    // 关闭对话框时中止（见 Dialog.js），剩下的搜索不再发起
+    const signal = contentDiv._abortController?.signal;
     try {
-        // 步骤 1: 获取当前工作流数据
-        // 每次都从 app.graph 获取最新的 workflow，确保即使切换了 workflow 也能正确显示
-        // 不依赖任何缓存，这样可以确保第一次搜索时使用的是最新的 workflow
-        const workflow = app?.graph ? app.graph.serialize() : null;
+        // 步骤 1: 检查当前工作流
+        // 每次都从 app.graph 读取最新的节点，确保即使切换了 workflow 也能正确显示
+        const graph = app?.graph;
+        const nodes = graph ? (graph._nodes || graph.nodes || []) : [];
         
-        if (!workflow || !workflow.nodes || workflow.nodes.length === 0) {
+        if (nodes.length === 0) {
             contentDiv.innerHTML = renderNoWorkflowState();
             return;
         }
         
-        // 保存 workflow 到全局状态，供重新搜索时使用（虽然重新搜索也会从 app.graph 获取最新）
-        // 但保存一下可以用于调试或其他用途
-        if (typeof window !== 'undefined') {
-            window._currentWorkflow = workflow;
+        // 工作流和已安装模型都没有变化时直接显示上一次的分析结果（skipCache 为 true 时重新分析）
+        const analysisKey = await getAnalysisCacheKey(graph);
+        const cachedAnalysis = !skipCache && analysisKey ? getCachedAnalysis(analysisKey) : null;
+        if (cachedAnalysis) {
+            displayModelStatus(contentDiv, cachedAnalysis, (result) => {
+                window._currentDialogResult = result;
+            });
+            await loadModelSidecars(contentDiv);
+            return;
         }
         
-        // 步骤 2: 提取工作流中的模型需求
-        const { models: requiredModels, modelUsageMap, modelNodeMap, modelNodeTypeMap } = extractModelsFromWorkflow(workflow);
+        // 步骤 2-4: 增量分析（只重新提取变化过的节点，只对受影响的模型重新检查安装状态）
+        // 已安装模型列表有缓存时直接复用；skipCache 为 true（r 键刷新）时重新获取
+        const {
+            models: requiredModels,
+            installedModels,
+            installedNodeTypeMap,
+            extraModelPaths,
+            status
+        } = await analyzeGraph(graph, {
+            refreshInstalled: skipCache,
+            onInstalledLoading: () => {
+                contentDiv.innerHTML = renderLoadingState(t('gettingInstalledModels'));
+            }
+        });
         const totalRequired = Object.values(requiredModels).reduce((sum, models) => sum + models.length, 0);
         
-        // 步骤 3: 获取已安装的模型列表和 extra_model_paths 配置
-        contentDiv.innerHTML = renderLoadingState(t('gettingInstalledModels'));
-        
-        const [installedModelsData, extraModelPaths] = await Promise.all([
-            getInstalledModels(),
-            getExtraModelPaths()
-        ]);
-        
-        // 适配新的数据结构：getInstalledModels 现在返回 { models, nodeTypeMap }
-        const installedModels = installedModelsData.models || installedModelsData;
-        const installedNodeTypeMap = installedModelsData.nodeTypeMap || {};
-        
-        const totalInstalled = Object.values(installedModels).reduce((sum, models) => sum + models.length, 0);
-        
-        // 步骤 4: 检查模型状态（传入使用状态映射、节点映射、节点类型映射和 extra_model_paths 配置）
-        const status = checkModelStatus(requiredModels, installedModels, modelUsageMap, modelNodeMap, MODEL_TYPE_TO_DIR, extraModelPaths, modelNodeTypeMap, installedNodeTypeMap);
-        
         // 步骤 5: 先显示表格框架（所有模型，缺失的显示加载状态）
         const modelLinks = {};
         const missingModels = Object.values(status.modelInfo).filter(m => !m.installed);
         
-        // 批量检查缓存，优先使用缓存的结果（同步执行，快速）
+        // 批量检查缓存，优先使用缓存的结果（一次 IndexedDB 事务读取所有缺失的模型）
         // 如果 skipCache 为 true，跳过缓存检查，所有缺失的模型都需要搜索
         const modelsToSearch = [];
         if (skipCache) {
@@ -76,14 +77,26 @@ export async function analyzeCurrentWorkflow(contentDiv, skipCache = false) {
             modelsToSearch.push(...missingModels);
         } else {
             // 正常模式：检查缓存
+            const cachedResults = await getManyCachedResults(missingModels.map(m => m.name));
             for (const model of missingModels) {
-                const cached = getCachedResults(model.name);
-                if (cached !== null) {
+                const cached = cachedResults[model.name];
+                if (cached !== undefined) {
                     modelLinks[model.name] = cached;
                 } else {
                     modelsToSearch.push(model);
                 }
             }
+            
+            // 本地没有缓存的模型再查询服务器端缓存（后台预取的结果）
+            const serverCached = await getServerCachedResults(modelsToSearch.map(m => m.name));
+            for (let i = modelsToSearch.length - 1; i >= 0; i--) {
+                const links = serverCached[modelsToSearch[i].name];
+                if (links) {
+                    modelLinks[modelsToSearch[i].name] = links;
+                    setCachedResults(modelsToSearch[i].name, links);
+                    modelsToSearch.splice(i, 1);
+                }
+            }
         }
         
         // 先显示表格，缺失且没有缓存的模型显示加载状态
@@ -111,7 +124,7 @@ export async function analyzeCurrentWorkflow(contentDiv, skipCache = false) {
         if (modelsToSearch.length > 0) {
             const BATCH_SIZE = 3; // 每批处理3个
             
-            for (let i = 0; i < modelsToSearch.length; i += BATCH_SIZE) {
+            for (let i = 0; i < modelsToSearch.length && !signal?.aborted; i += BATCH_SIZE) {
                 const batch = modelsToSearch.slice(i, i + BATCH_SIZE);
                 
                 // 在开始搜索前，先显示加载状态
@@ -123,11 +136,14 @@ export async function analyzeCurrentWorkflow(contentDiv, skipCache = false) {
                 // 如果 skipCache 为 true，传递 skipCache=true 给 searchModelLinks
                 const searchPromises = batch.map(async (model) => {
                     try {
-                        const links = await searchModelLinks(model.name, model.type, skipCache, getCachedResults, setCachedResults);
+                        const links = await searchModelLinks(model.name, model.type, skipCache, getCachedResults, setCachedResults, false, signal);
+                        if (signal?.aborted) {
+                            return { model: model.name, success: false };
+                        }
                         if (links.length > 0) {
                             modelLinks[model.name] = links;
                         }
-                        // 实时更新该行的显示（updateModelRow 内部会处理 refreshModelSearch 的绑定）
+                        // 实时更新该行的显示（更新表格数据，行在可见范围内时重新渲染）
                         updateModelRow(contentDiv, model, links);
                         return { model: model.name, success: true };
                     } catch (error) {
@@ -146,6 +162,11 @@ export async function analyzeCurrentWorkflow(contentDiv, skipCache = false) {
             }
         }
         
+        // 对话框已关闭：不显示和缓存不完整的结果
+        if (signal?.aborted) {
+            return;
+        }
+        
         // 步骤 7: 最终结果（用于统计等）
         const result = {
             total_required: totalRequired,
@@ -167,6 +188,24 @@ export async function analyzeCurrentWorkflow(contentDiv, skipCache = false) {
             window._currentDialogResult = result;
         });
         
+        // 所有搜索都有结果（或结果已缓存）时保存完整的分析结果；有搜索失败时下次打开重新分析
+        if (analysisKey) {
+            const emptyNames = modelsToSearch.filter(m => !modelLinks[m.name]).map(m => m.name);
+            const settled = emptyNames.length > 0 ? await getManyCachedResults(emptyNames) : {};
+            if (emptyNames.every(name => settled[name] !== undefined)) {
+                setCachedAnalysis(analysisKey, result);
+            }
+        }
+        
+        // 显示本地保存的模型信息（预览图、版本、触发词）
+        await loadModelSidecars(contentDiv);
+        
+        // 步骤 9: 用服务器端已缓存的上游信息快速校验已安装的模型（大小不一致或哈希已知不一致时标记为损坏）
+        await startIntegrityCheck(contentDiv, result, false);
+        
+        // 步骤 10: 重新检查本地缓存中过期的下载链接（失效或需要登录的链接显示标记）
+        await refreshLinkStatuses(contentDiv);
+        
     } catch (error) {
         contentDiv.innerHTML = renderErrorState(error.message);
     }
@@ -187,78 +226,48 @@ export function displayModelStatus(contentDiv, result, saveResultCallback = null
     // 确保加载动画样式已添加
     ensureSpinnerStyle();
     
-    // 使用组件生成 HTML
-    let html = renderStatsCards(result.total_required, result.installed_count, result.missing_count);
-    html += renderTableHeader();
-    
-    // 获取所有模型并按使用状态和安装状态排序
-    const allModels = Object.values(result.models);
-    
-    // 分离已使用和未使用的模型
-    // 注意：isUsed 为 undefined 时也视为已使用（默认行为）
-    const usedModels = allModels.filter(m => m.isUsed !== false);
-    const unusedModels = allModels.filter(m => m.isUsed === false);
-    
-    // 对已使用的模型排序：缺失的在前，然后按名称排序
-    usedModels.sort((a, b) => {
-        if (a.installed !== b.installed) {
-            return a.installed ? 1 : -1; // 缺失的在前
-        }
-        return a.name.localeCompare(b.name);
-    });
-    
-    // 对未使用的模型排序：缺失的在前，然后按名称排序
-    unusedModels.sort((a, b) => {
-        if (a.installed !== b.installed) {
-            return a.installed ? 1 : -1; // 缺失的在前
-        }
-        return a.name.localeCompare(b.name);
-    });
-    
-    // 先显示已使用的模型
-    for (const model of usedModels) {
-        // 获取模型链接
-        const links = result.model_links && result.model_links[model.name] ? result.model_links[model.name] : [];
-        // 检查是否需要显示加载状态（缺失且没有缓存且需要搜索）
-        const needsLoading = !model.installed && 
-                            !links.length && 
-                            result.models_to_search && 
-                            result.models_to_search.includes(model.name);
-        // 使用组件生成表格行（传递 extraModelPaths）
-        html += renderModelRow(model, links, MODEL_TYPE_TO_DIR, needsLoading, result.extra_model_paths);
-    }
+    // 保留当前的搜索词（分析完成后会重新渲染整个表格）
+    const previousInput = contentDiv.querySelector('#model-search-input');
+    const searchTerm = previousInput ? previousInput.value.trim() : '';
     
-    // 如果有未使用的模型，添加分隔行
-    if (unusedModels.length > 0) {
-        html += renderSeparatorRow();
-        
-        // 显示未使用的模型
-        for (const model of unusedModels) {
-            // 获取模型链接
-            const links = result.model_links && result.model_links[model.name] ? result.model_links[model.name] : [];
-            // 检查是否需要显示加载状态（缺失且没有缓存且需要搜索）
-            const needsLoading = !model.installed && 
-                                !links.length && 
-                                result.models_to_search && 
-                                result.models_to_search.includes(model.name);
-            // 使用组件生成表格行（传递 extraModelPaths）
-            html += renderModelRow(model, links, MODEL_TYPE_TO_DIR, needsLoading, result.extra_model_paths);
-        }
-    }
+    // 应用已知的完整性校验结果（损坏的模型单独统计）
+    applyIntegrityResults(result.models);
+    const corruptCount = countCorruptModels(result.models);
     
+    // 使用组件生成 HTML（表格行由虚拟滚动渲染，只生成表格框架）
+    let html = renderStatsCards(result.total_required, result.installed_count - corruptCount, result.missing_count, corruptCount);
+    html += renderTableHeader();
     html += renderTableFooter();
     
     contentDiv.innerHTML = html;
     
-    // 绑定刷新按钮事件
+    // 从分析结果创建表格数据模型（同时建立搜索索引），只渲染可见的行
+    const table = createTableModel(result);
+    if (searchTerm) {
+        contentDiv.querySelector('#model-search-input').value = searchTerm;
+        contentDiv.querySelector('#clear-search-btn').style.display = 'block';
+        setTableSearch(table, searchTerm);
+    }
+    mountVirtualTable(contentDiv, table);
+    
+    // 绑定刷新按钮事件（事件委托，只绑定一次）
     bindRefreshButtons(contentDiv);
     
-    // 绑定高亮节点按钮事件
+    // 绑定高亮节点按钮事件（事件委托，只绑定一次）
     bindHighlightButtons(contentDiv);
     
-    // 绑定搜索功能
-    bindSearchFunctionality(contentDiv, searchAndSortModels, restoreOriginalOrder, bindRefreshButtons, bindHighlightButtons);
+    // 绑定服务器下载按钮事件（事件委托，只绑定一次）
+    bindServerDownloadButtons(contentDiv);
+    
+    // 绑定完整性校验按钮事件（事件委托，只绑定一次）
+    bindIntegrityButton(contentDiv);
     
-    // 保存原始行顺序（用于恢复排序）
-    saveOriginalRowsOrder(contentDiv);
+    // 绑定搜索功能（输入防抖后按搜索索引重新排序并渲染）
+    bindSearchFunctionality(contentDiv, (term) => {
+        const currentTable = contentDiv._modelTable;
+        if (currentTable) {
+            setTableSearch(currentTable, term);
+            renderVisibleRows(contentDiv, true);
+        }
+    });
 }
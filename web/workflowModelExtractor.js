@@ -38,6 +38,27 @@ export function detectModelFamily(modelName) {
     return families.length > 0 ? families : ["未知"];
 }
 
+// 用后端读取的模型文件头部元数据替换根据文件名推断的派系，并记录识别出的模型类型
+// metadataResults: getModelsMetadata 的返回值（key: "modelType:matchedName"）
+export function applyModelMetadata(modelInfo, metadataResults) {
+    for (const info of Object.values(modelInfo)) {
+        if (!info.installed || !info.matchedName) {
+            continue;
+        }
+        const metadata = metadataResults[`${info.type}:${info.matchedName}`];
+        if (!metadata || metadata.error) {
+            continue;
+        }
+        if (metadata.families && metadata.families.length > 0) {
+            info.families = metadata.families;
+        }
+        if (metadata.type) {
+            info.detectedType = metadata.type;
+        }
+    }
+    return modelInfo;
+}
+
 // 模型加载器节点类型及其对应的widgets_values索引（与 get_workflow_models.py 一致）
 export const MODEL_LOADER_NODES = {
     // Wan系列模型加载器
@@ -180,284 +201,229 @@ export function isNodeUsed(node) {
     return false;
 }
 
-// 从工作流中提取模型信息（使用与 get_workflow_models.py 相同的逻辑）
-export function extractModelsFromWorkflow(workflow) {
-    const models = {
-        "主模型": [],
-        "VAE": [],
-        "文本编码器": [],
-        "CLIP": [],
-        "CLIP Vision": [],
-        "ControlNet": [],
-        "IP-Adapter": [],
-        "LoRA": [],
-        "放大模型": [],
-        "其他": []
-    };
+// 根据输入字段名、节点类型和文件名推断通用检测到的模型类型
+function inferModelType(inputName, nodeType, modelName) {
+    let inferredType = "其他";
     
-    // 存储每个模型的使用状态（key: "modelType:modelName", value: isUsed）
-    const modelUsageMap = {};
-    // 存储每个模型对应的节点ID列表（key: "modelType:modelName", value: [nodeId1, nodeId2, ...]）
-    const modelNodeMap = {};
-    // 存储每个模型对应的节点类型列表（key: "modelType:modelName", value: [nodeType1, nodeType2, ...]）
-    const modelNodeTypeMap = {};
+    const nodeTypeLower = nodeType.toLowerCase();
+    const valueLower = modelName.toLowerCase();
     
-    if (!workflow || !workflow.nodes) {
-        return { models, modelUsageMap, modelNodeMap, modelNodeTypeMap };
+    if (inputName) {
+        inputName = inputName.toLowerCase();
+        
+        if (inputName.includes('lora')) {
+            inferredType = "LoRA";
+        } else if (inputName.includes('vae')) {
+            inferredType = "VAE";
+        } else if (inputName.includes('clip') && !inputName.includes('vision')) {
+            inferredType = "CLIP";
+        } else if (inputName.includes('clip') && inputName.includes('vision')) {
+            inferredType = "CLIP Vision";
+        } else if (inputName.includes('control')) {
+            inferredType = "ControlNet";
+        } else if (inputName.includes('checkpoint') || inputName.includes('ckpt')) {
+            inferredType = "主模型";
+        } else if (inputName.includes('upscale')) {
+            inferredType = "放大模型";
+        } else if (inputName.includes('ip') || inputName.includes('adapter')) {
+            inferredType = "IP-Adapter";
+        } else if (inputName.includes('text') || inputName.includes('t5') || inputName.includes('encoder')) {
+            inferredType = "文本编码器";
+        } else if (inputName.includes('sam')) {
+            inferredType = "其他"; // SAM 模型归类为其他
+        }
     }
     
-    // 使用 widgets_values 提取模型（与 get_workflow_models.py 一致）
-    // 方法1: 从预定义的节点类型中提取（优先）
-    for (const node of workflow.nodes) {
-        const nodeType = node.type || node.class_type || "";
-        const widgetsValues = node.widgets_values || [];
-        
-        if (nodeType in MODEL_LOADER_NODES) {
-            const [index, modelType] = MODEL_LOADER_NODES[nodeType];
-            if (widgetsValues && widgetsValues.length > index) {
-                let modelName = widgetsValues[index];
-                
-                // 确保 modelName 是字符串
-                if (typeof modelName !== "string") {
-                    modelName = String(modelName);
-                }
+    // 如果还没推断出类型，尝试从节点类型和文件名推断
+    if (inferredType === "其他") {
+        if (nodeTypeLower.includes('lora')) {
+            inferredType = "LoRA";
+        } else if (nodeTypeLower.includes('vae')) {
+            inferredType = "VAE";
+        } else if (nodeTypeLower.includes('clip')) {
+            inferredType = nodeTypeLower.includes('vision') ? "CLIP Vision" : "CLIP";
+        } else if (nodeTypeLower.includes('control')) {
+            inferredType = "ControlNet";
+        } else if (nodeTypeLower.includes('checkpoint') || nodeTypeLower.includes('ckpt')) {
+            inferredType = "主模型";
+        } else if (nodeTypeLower.includes('upscale')) {
+            inferredType = "放大模型";
+        } else if (nodeTypeLower.includes('sam')) {
+            inferredType = "其他"; // SAM 模型
+        } else if (valueLower.includes('lora') || valueLower.endsWith('.lora')) {
+            inferredType = "LoRA";
+        } else if (valueLower.includes('vae') || valueLower.endsWith('.vae')) {
+            inferredType = "VAE";
+        } else if (valueLower.includes('controlnet') || valueLower.includes('control')) {
+            inferredType = "ControlNet";
+        }
+    }
+    
+    return inferredType;
+}
+
+// 从单个节点中提取模型（使用与 get_workflow_models.py 相同的逻辑）
+// 返回 [{ modelType, modelName, isUsed, nodeId, nodeType }]
+export function extractModelsFromNode(node) {
+    const found = [];
+    const nodeType = node.type || node.class_type || "";
+    const widgetsValues = node.widgets_values || [];
+    // 确保节点ID是数字类型
+    const nodeId = typeof node.id === 'number' ? node.id : parseInt(node.id);
+    
+    // 方法1: 预定义的模型加载器节点，从固定的 widgets_values 索引中提取
+    if (nodeType in MODEL_LOADER_NODES) {
+        const [index, modelType] = MODEL_LOADER_NODES[nodeType];
+        if (widgetsValues && widgetsValues.length > index) {
+            let modelName = widgetsValues[index];
+            
+            // 确保 modelName 是字符串
+            if (typeof modelName !== "string") {
+                modelName = String(modelName);
+            }
+            
+            if (modelName && modelName.trim()) {
+                // 清理文件名（移除路径，只保留文件名）
+                modelName = modelName.split(/[/\\]/).pop().trim();
                 
-                if (modelName && modelName.trim()) {
-                    // 清理文件名（移除路径，只保留文件名）
-                    modelName = modelName.split(/[/\\]/).pop().trim();
-                    
-                    // 验证模型名是否有效（过滤掉 null、None、use same 等无效值）
-                    if (modelName && isValidModelName(modelName)) {
-                        // 检查节点是否被使用
-                        const isUsed = isNodeUsed(node);
-                        const modelKey = `${modelType}:${modelName}`;
-                        
-                        // 如果模型已存在，更新使用状态（只要有一个节点使用了，就标记为已使用）
-                        if (modelUsageMap[modelKey] !== undefined) {
-                            // 如果之前标记为已使用，保持已使用；如果之前未使用但现在使用了，改为已使用
-                            modelUsageMap[modelKey] = modelUsageMap[modelKey] || isUsed;
-                        } else {
-                            modelUsageMap[modelKey] = isUsed;
-                        }
-                        
-                        // 保存节点ID到模型映射
-                        // 确保节点ID是数字类型
-                        const nodeId = typeof node.id === 'number' ? node.id : parseInt(node.id);
-                        if (!isNaN(nodeId)) {
-                            if (!modelNodeMap[modelKey]) {
-                                modelNodeMap[modelKey] = [];
-                            }
-                            if (!modelNodeMap[modelKey].includes(nodeId)) {
-                                modelNodeMap[modelKey].push(nodeId);
-                                // 调试日志：记录模型和节点的映射
-                                if (modelName.includes('1x-ITF-SkinDiffDetail-Lite-v1')) {
-                                    // console.log(`[ComfyUI-find-models] 模型 ${modelName} 映射到节点 ID: ${nodeId} (类型: ${nodeType})`);
-                                }
-                            }
-                        }
-                        
-                        // 保存节点类型到模型映射
-                        if (!modelNodeTypeMap[modelKey]) {
-                            modelNodeTypeMap[modelKey] = [];
-                        }
-                        if (!modelNodeTypeMap[modelKey].includes(nodeType)) {
-                            modelNodeTypeMap[modelKey].push(nodeType);
-                        }
-                        
-                        // 调试日志（仅记录未使用的模型）
-                        if (!isUsed) {
-                            // console.log(`[ComfyUI-find-models] 节点 ${node.id} (${nodeType}) 模型 ${modelName} 未使用 - outputs:`, 
-                            //     node.outputs?.map(o => o.links?.length || 0), 
-                            //     `inputs:`, 
-                            //     node.inputs?.map(i => i.link !== undefined && i.link !== null ? '有连接' : '无连接')
-                            // );
-                        }
-                        
-                        if (modelType in models) {
-                            if (!models[modelType].includes(modelName)) {
-                                models[modelType].push(modelName);
-                            }
-                        } else {
-                            if (!models["其他"].includes(modelName)) {
-                                models["其他"].push(modelName);
-                            }
-                        }
-                    }
+                // 验证模型名是否有效（过滤掉 null、None、use same 等无效值）
+                if (modelName && isValidModelName(modelName)) {
+                    found.push({ modelType, modelName, isUsed: isNodeUsed(node), nodeId, nodeType });
                 }
             }
         }
+        return found;
     }
     
-    // 方法2: 通用检测 - 扫描所有节点的 widgets_values，查找可能的模型文件名
+    // 方法2: 通用检测 - 扫描 widgets_values，查找可能的模型文件名
     // 这样可以找到不在 MODEL_LOADER_NODES 中的节点类型（如 SAMLoader、UltralyticsDetectorProvider 等）
-    for (const node of workflow.nodes) {
-        const nodeType = node.type || node.class_type || "";
-        const widgetsValues = node.widgets_values || [];
+    // 检查节点的 inputs 是否有 model_name, model, ckpt_name, lora_name 等字段
+    // 这些通常表示该节点可能加载模型
+    const hasModelInput = node.inputs && Array.isArray(node.inputs) && node.inputs.some(input => {
+        const inputName = (input.name || '').toLowerCase();
+        return inputName.includes('model') || 
+               inputName.includes('ckpt') || 
+               inputName.includes('lora') || 
+               inputName.includes('vae') ||
+               inputName.includes('checkpoint');
+    });
+    
+    if (!hasModelInput || !widgetsValues || widgetsValues.length === 0) {
+        return found;
+    }
+    
+    // 找到所有有 widget 的 inputs，并记录它们在 widgets_values 中的对应索引
+    // widgets_values 按照 inputs 中有 widget 的字段顺序排列
+    const widgetInputNames = {}; // widgetIndex -> inputName
+    let widgetIndex = 0;
+    node.inputs.forEach((input) => {
+        // 如果 input 有 widget 属性且没有 link（表示是 widget 值而不是连接）
+        if (input && input.widget && (input.link === null || input.link === undefined)) {
+            if (widgetIndex < widgetsValues.length) {
+                widgetInputNames[widgetIndex] = input.name || '';
+                widgetIndex++;
+            }
+        }
+    });
+    
+    for (let i = 0; i < widgetsValues.length; i++) {
+        const value = widgetsValues[i];
         
-        // 如果已经在 MODEL_LOADER_NODES 中，跳过（已在方法1中处理）
-        if (nodeType in MODEL_LOADER_NODES) {
+        // 检查值是否看起来像模型文件名
+        if (!looksLikeModelFileName(value)) {
             continue;
         }
         
-        // 检查节点的 inputs 是否有 model_name, model, ckpt_name, lora_name 等字段
-        // 这些通常表示该节点可能加载模型
-        const hasModelInput = node.inputs && Array.isArray(node.inputs) && node.inputs.some(input => {
-            const inputName = (input.name || '').toLowerCase();
-            return inputName.includes('model') || 
-                   inputName.includes('ckpt') || 
-                   inputName.includes('lora') || 
-                   inputName.includes('vae') ||
-                   inputName.includes('checkpoint');
-        });
+        // 清理文件名（移除路径，只保留文件名）
+        const modelName = String(value).split(/[/\\]/).pop().trim();
         
-        // 如果节点有模型相关的输入字段，扫描 widgets_values 查找模型文件名
-        if (hasModelInput && widgetsValues && widgetsValues.length > 0) {
-            // 找到所有有 widget 的 inputs，并记录它们在 widgets_values 中的对应索引
-            // widgets_values 按照 inputs 中有 widget 的字段顺序排列
-            const widgetInputMap = []; // [{inputIndex, widgetIndex, inputName}]
-            let widgetIndex = 0;
-            
-            if (node.inputs && Array.isArray(node.inputs)) {
-                node.inputs.forEach((input, inputIdx) => {
-                    // 如果 input 有 widget 属性且没有 link（表示是 widget 值而不是连接）
-                    if (input && input.widget && (input.link === null || input.link === undefined)) {
-                        if (widgetIndex < widgetsValues.length) {
-                            widgetInputMap.push({
-                                inputIndex: inputIdx,
-                                widgetIndex: widgetIndex,
-                                inputName: input.name || ''
-                            });
-                            widgetIndex++;
-                        }
-                    }
-                });
+        // 验证模型名是否有效（过滤掉 null、None、use same 等无效值）
+        if (modelName && isValidModelName(modelName)) {
+            // 尝试推断模型类型（基于节点类型、输入字段名和文件名）
+            const modelType = inferModelType(widgetInputNames[i], nodeType, modelName);
+            found.push({ modelType, modelName, isUsed: isNodeUsed(node), nodeId, nodeType });
+        }
+    }
+    
+    return found;
+}
+
+// 创建空的提取结果
+export function createEmptyExtraction() {
+    return {
+        models: {
+            "主模型": [],
+            "VAE": [],
+            "文本编码器": [],
+            "CLIP": [],
+            "CLIP Vision": [],
+            "ControlNet": [],
+            "IP-Adapter": [],
+            "LoRA": [],
+            "放大模型": [],
+            "其他": []
+        },
+        // 存储每个模型的使用状态（key: "modelType:modelName", value: isUsed）
+        modelUsageMap: {},
+        // 存储每个模型对应的节点ID列表（key: "modelType:modelName", value: [nodeId1, nodeId2, ...]）
+        modelNodeMap: {},
+        // 存储每个模型对应的节点类型列表（key: "modelType:modelName", value: [nodeType1, nodeType2, ...]）
+        modelNodeTypeMap: {}
+    };
+}
+
+// 把单个节点中提取到的模型合并到提取结果中
+export function addNodeModels(extracted, nodeModels) {
+    const { models, modelUsageMap, modelNodeMap, modelNodeTypeMap } = extracted;
+    for (const { modelType, modelName, isUsed, nodeId, nodeType } of nodeModels) {
+        const type = modelType in models ? modelType : "其他";
+        const modelKey = `${modelType}:${modelName}`;
+        
+        // 如果模型已存在，更新使用状态（只要有一个节点使用了，就标记为已使用）
+        if (modelUsageMap[modelKey] !== undefined) {
+            modelUsageMap[modelKey] = modelUsageMap[modelKey] || isUsed;
+        } else {
+            modelUsageMap[modelKey] = isUsed;
+        }
+        
+        // 保存节点ID到模型映射
+        if (!isNaN(nodeId)) {
+            if (!modelNodeMap[modelKey]) {
+                modelNodeMap[modelKey] = [];
             }
-            
-            // 扫描 widgets_values，查找可能的模型文件名
-            for (let i = 0; i < widgetsValues.length; i++) {
-                const value = widgetsValues[i];
-                
-                // 检查值是否看起来像模型文件名
-                if (!looksLikeModelFileName(value)) {
-                    continue;
-                }
-                
-                let modelName = typeof value === 'string' ? value : String(value);
-                
-                if (modelName && modelName.trim()) {
-                    // 清理文件名（移除路径，只保留文件名）
-                    modelName = modelName.split(/[/\\]/).pop().trim();
-                    
-                    // 验证模型名是否有效（过滤掉 null、None、use same 等无效值）
-                    if (modelName && isValidModelName(modelName)) {
-                        
-                        // 尝试推断模型类型（基于节点类型、输入字段名和文件名）
-                        let inferredType = "其他";
-                        
-                        const nodeTypeLower = nodeType.toLowerCase();
-                        const valueLower = modelName.toLowerCase();
-                        
-                        // 查找对应的 input 字段名
-                        const widgetMapping = widgetInputMap.find(m => m.widgetIndex === i);
-                        if (widgetMapping) {
-                            const inputName = widgetMapping.inputName.toLowerCase();
-                            
-                            if (inputName.includes('lora')) {
-                                inferredType = "LoRA";
-                            } else if (inputName.includes('vae')) {
-                                inferredType = "VAE";
-                            } else if (inputName.includes('clip') && !inputName.includes('vision')) {
-                                inferredType = "CLIP";
-                            } else if (inputName.includes('clip') && inputName.includes('vision')) {
-                                inferredType = "CLIP Vision";
-                            } else if (inputName.includes('control')) {
-                                inferredType = "ControlNet";
-                            } else if (inputName.includes('checkpoint') || inputName.includes('ckpt')) {
-                                inferredType = "主模型";
-                            } else if (inputName.includes('upscale')) {
-                                inferredType = "放大模型";
-                            } else if (inputName.includes('ip') || inputName.includes('adapter')) {
-                                inferredType = "IP-Adapter";
-                            } else if (inputName.includes('text') || inputName.includes('t5') || inputName.includes('encoder')) {
-                                inferredType = "文本编码器";
-                            } else if (inputName.includes('sam')) {
-                                inferredType = "其他"; // SAM 模型归类为其他
-                            }
-                        }
-                        
-                        // 如果还没推断出类型，尝试从节点类型和文件名推断
-                        if (inferredType === "其他") {
-                            if (nodeTypeLower.includes('lora')) {
-                                inferredType = "LoRA";
-                            } else if (nodeTypeLower.includes('vae')) {
-                                inferredType = "VAE";
-                            } else if (nodeTypeLower.includes('clip')) {
-                                inferredType = nodeTypeLower.includes('vision') ? "CLIP Vision" : "CLIP";
-                            } else if (nodeTypeLower.includes('control')) {
-                                inferredType = "ControlNet";
-                            } else if (nodeTypeLower.includes('checkpoint') || nodeTypeLower.includes('ckpt')) {
-                                inferredType = "主模型";
-                            } else if (nodeTypeLower.includes('upscale')) {
-                                inferredType = "放大模型";
-                            } else if (nodeTypeLower.includes('sam')) {
-                                inferredType = "其他"; // SAM 模型
-                            } else if (valueLower.includes('lora') || valueLower.endsWith('.lora')) {
-                                inferredType = "LoRA";
-                            } else if (valueLower.includes('vae') || valueLower.endsWith('.vae')) {
-                                inferredType = "VAE";
-                            } else if (valueLower.includes('controlnet') || valueLower.includes('control')) {
-                                inferredType = "ControlNet";
-                            }
-                        }
-                        
-                        const modelKey = `${inferredType}:${modelName}`;
-                        const isUsed = isNodeUsed(node);
-                        
-                        // 如果模型已存在（可能通过方法1已添加），更新使用状态
-                        if (modelUsageMap[modelKey] !== undefined) {
-                            modelUsageMap[modelKey] = modelUsageMap[modelKey] || isUsed;
-                        } else {
-                            modelUsageMap[modelKey] = isUsed;
-                        }
-                        
-                        // 保存节点ID到模型映射
-                        const nodeId = typeof node.id === 'number' ? node.id : parseInt(node.id);
-                        if (!isNaN(nodeId)) {
-                            if (!modelNodeMap[modelKey]) {
-                                modelNodeMap[modelKey] = [];
-                            }
-                            if (!modelNodeMap[modelKey].includes(nodeId)) {
-                                modelNodeMap[modelKey].push(nodeId);
-                            }
-                        }
-                        
-                        // 保存节点类型到模型映射
-                        if (!modelNodeTypeMap[modelKey]) {
-                            modelNodeTypeMap[modelKey] = [];
-                        }
-                        if (!modelNodeTypeMap[modelKey].includes(nodeType)) {
-                            modelNodeTypeMap[modelKey].push(nodeType);
-                        }
-                        
-                        // 添加到模型列表
-                        if (inferredType in models) {
-                            if (!models[inferredType].includes(modelName)) {
-                                models[inferredType].push(modelName);
-                                // console.log(`[ComfyUI-find-models] 通用检测: 在节点 ${node.id} (${nodeType}, widgets_values[${i}]) 中发现模型 ${modelName}，类型推断为: ${inferredType}`);
-                            }
-                        } else {
-                            if (!models["其他"].includes(modelName)) {
-                                models["其他"].push(modelName);
-                                // console.log(`[ComfyUI-find-models] 通用检测: 在节点 ${node.id} (${nodeType}, widgets_values[${i}]) 中发现模型 ${modelName}，归类为: 其他`);
-                            }
-                        }
-                    }
-                }
+            if (!modelNodeMap[modelKey].includes(nodeId)) {
+                modelNodeMap[modelKey].push(nodeId);
             }
         }
+        
+        // 保存节点类型到模型映射
+        if (!modelNodeTypeMap[modelKey]) {
+            modelNodeTypeMap[modelKey] = [];
+        }
+        if (!modelNodeTypeMap[modelKey].includes(nodeType)) {
+            modelNodeTypeMap[modelKey].push(nodeType);
+        }
+        
+        if (!models[type].includes(modelName)) {
+            models[type].push(modelName);
+        }
+    }
+    return extracted;
+}
+
+// 从工作流中提取模型信息（只遍历一次节点，每个节点的提取规则见 extractModelsFromNode）
+export function extractModelsFromWorkflow(workflow) {
+    const extracted = createEmptyExtraction();
+    
+    if (!workflow || !workflow.nodes) {
+        return extracted;
+    }
+    
+    for (const node of workflow.nodes) {
+        addNodeModels(extracted, extractModelsFromNode(node));
     }
     
-    return { models, modelUsageMap, modelNodeMap, modelNodeTypeMap };
+    return extracted;
 }
 
 // 模型类型到目录的映射
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+工作流批量检查模块
+扫描目录中的工作流文件（.json，以及嵌入了工作流的 .png/.webp），用与前端相同的规则提取模型，
+再和已安装的模型比较，生成报告：
+- 每个工作流缺失的模型
+- 已安装但没有被任何工作流使用的模型
+- 下载所有缺失模型需要的总大小（来自搜索结果中的文件大小，没有搜索过的模型计入 unknown_size）
+
+命令行运行时工作流文件在进程池中解析（JSON 解析和模型提取是 CPU 密集的），进程池不可用时退回到线程池；
+在 ComfyUI 中（检查接口）只使用线程池，不在 ComfyUI 进程中创建子进程。
+
+命令行用法:
+    python workflow_auditor.py /path/to/workflows --models-dir /path/to/ComfyUI/models
+    python workflow_auditor.py /path/to/workflows --models-dir /path/to/models --format csv -o report.csv
+"""
+
+import os
+import io
+import csv
+import sys
+import json
+import time
+import zlib
+import pickle
+import struct
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import folder_paths
+except ImportError:
+    # 命令行运行时没有 folder_paths，需要用 --models-dir 指定模型目录
+    folder_paths = None
+
+try:
+    from .workflow_models import extract_models
+    from .image_metadata import METADATA_EXTENSIONS, read_workflow
+    from .model_paths import MODEL_TYPE_TO_DIR, NON_MODEL_FOLDERS, base_key, format_size, get_model_folder_names
+except ImportError:
+    # 作为命令行脚本运行
+    from workflow_models import extract_models
+    from image_metadata import METADATA_EXTENSIONS, read_workflow
+    from model_paths import MODEL_TYPE_TO_DIR, NON_MODEL_FOLDERS, base_key, format_size, get_model_folder_names
+
+# 解析工作流的默认进程数
+DEFAULT_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+# 报告中的 CSV 列
+CSV_FIELDS = ("kind", "workflow", "model_name", "model_type", "file_size")
+
+def audit_file(path):
+    """
+    解析单个工作流文件并提取模型（在进程池中调用）
+
+    Returns:
+        {"path", "models": [{"name", "type", "is_used", ...}], "error"}
+    """
+    try:
+        data = read_workflow(path)
+        if data is None:
+            return {"path": path, "models": [], "error": "没有嵌入的工作流"}
+        return {"path": path, "models": extract_models(data), "error": None}
+    except (OSError, ValueError, zlib.error, struct.error) as e:
+        return {"path": path, "models": [], "error": str(e)}
+
+
+def find_workflow_files(directory, recursive=True):
+    """列出目录中的工作流文件（按路径排序）"""
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(METADATA_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+        if not recursive:
+            break
+    return paths
+
+
+def get_default_workflow_dir():
+    """ComfyUI 用户目录中保存的工作流（user/default/workflows），没有 folder_paths 时返回 None"""
+    if folder_paths is None or not hasattr(folder_paths, "get_user_directory"):
+        return None
+    return os.path.join(folder_paths.get_user_directory(), "default", "workflows")
+
+
+def get_installed_inventory(models_dirs=None):
+    """
+    获取已安装的模型，返回 {目录名: [文件名, ...]}
+
+    Args:
+        models_dirs: ComfyUI 的 models 目录（第一级子目录是模型目录），None 表示使用 folder_paths
+    """
+    inventory = {}
+    if models_dirs:
+        for models_dir in models_dirs:
+            for folder_name in sorted(os.listdir(models_dir)):
+                folder = os.path.join(models_dir, folder_name)
+                if not os.path.isdir(folder) or folder_name in NON_MODEL_FOLDERS:
+                    continue
+                names = inventory.setdefault(folder_name, [])
+                for root, _, files in os.walk(folder):
+                    for name in files:
+                        names.append(os.path.relpath(os.path.join(root, name), folder).replace(os.sep, "/"))
+        return inventory
+    if folder_paths is None:
+        return inventory
+    for folder_name in list(folder_paths.folder_names_and_paths.keys()):
+        if folder_name in NON_MODEL_FOLDERS:
+            continue
+        try:
+            inventory[folder_name] = list(folder_paths.get_filename_list(folder_name))
+        except Exception:
+            continue
+    return inventory
+
+
+def size_from_links(links):
+    """从搜索结果中取下载文件的大小（第一个有大小的结果），没有时返回 None"""
+    for link in links or []:
+        size = link.get("file_size") if isinstance(link, dict) else None
+        if size:
+            return int(size)
+    return None
+
+
+def _parse_files(paths, workers, use_processes=False):
+    """
+    并行解析所有文件，按输入顺序返回结果
+
+    use_processes 为 True 时使用进程池（只用于命令行，进程池不可用时使用线程池），否则使用线程池。
+    """
+    if workers <= 1 or len(paths) <= 1:
+        return [audit_file(path) for path in paths]
+    if use_processes:
+        chunksize = max(1, len(paths) // (workers * 4))
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                return list(pool.map(audit_file, paths, chunksize=chunksize))
+        except (OSError, BrokenProcessPool, ImportError, AttributeError, pickle.PicklingError):
+            # 子进程无法启动或无法导入本模块，改用线程池
+            pass
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(audit_file, paths))
+
+
+def audit_workflows(paths, inventory, size_lookup=None, workers=DEFAULT_WORKERS, use_processes=False):
+    """
+    检查工作流文件中的模型是否已安装
+
+    Args:
+        paths: 工作流文件路径列表
+        inventory: 已安装的模型 {目录名: [文件名, ...]}
+        size_lookup: 根据模型名获取下载大小的函数（返回 None 表示不知道），可选
+        workers: 解析文件的线程数（或进程数）
+        use_processes: 使用进程池解析（只用于命令行，ComfyUI 进程中不能创建子进程）
+
+    Returns:
+        报告（dict）：workflows、missing、unreferenced、total_download_size、unknown_size 等
+    """
+    started = time.monotonic()
+    # {目录名: {小写文件名（不含子目录）: 原始名称}}
+    installed = {
+        folder: {base_key(name): name for name in names}
+        for folder, names in inventory.items()
+    }
+
+    def is_installed(model_name, model_type):
+        key = base_key(model_name)
+        folders = get_model_folder_names(model_type) if model_type in MODEL_TYPE_TO_DIR else list(installed)
+        return any(key in installed.get(folder, {}) for folder in folders)
+
+    workflows = []
+    missing = {}
+    referenced = set()
+    for parsed in _parse_files(list(paths), workers, use_processes):
+        missing_in_workflow = []
+        for model in parsed["models"]:
+            referenced.add(base_key(model["name"]))
+            if is_installed(model["name"], model["type"]):
+                continue
+            missing_in_workflow.append({"name": model["name"], "type": model["type"], "is_used": model["is_used"]})
+            entry = missing.setdefault((model["type"], model["name"]), {
+                "name": model["name"], "type": model["type"], "workflows": [], "file_size": None
+            })
+            entry["workflows"].append(parsed["path"])
+        workflows.append({
+            "path": parsed["path"],
+            "models": len(parsed["models"]),
+            "missing": missing_in_workflow,
+            "error": parsed["error"],
+        })
+
+    total_size = 0
+    unknown_size = 0
+    for entry in missing.values():
+        size = size_lookup(entry["name"]) if size_lookup else None
+        entry["file_size"] = size
+        if size:
+            total_size += size
+        else:
+            unknown_size += 1
+
+    unreferenced = [
+        {"name": name, "folder": folder}
+        for folder, names in inventory.items()
+        for name in sorted(names)
+        if base_key(name) not in referenced
+    ]
+
+    return {
+        "scanned_files": len(workflows),
+        "failed_files": sum(1 for workflow in workflows if workflow["error"]),
+        "workflows": workflows,
+        "missing": sorted(missing.values(), key=lambda entry: (-len(entry["workflows"]), entry["name"])),
+        "unreferenced": unreferenced,
+        "total_download_size": total_size,
+        "unknown_size": unknown_size,
+        "elapsed": time.monotonic() - started,
+    }
+
+
+def report_to_csv(report):
+    """把报告转换成 CSV（每个工作流缺失的模型一行，没有被使用的已安装模型一行）"""
+    sizes = {(entry["type"], entry["name"]): entry["file_size"] for entry in report["missing"]}
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for workflow in report["workflows"]:
+        for model in workflow["missing"]:
+            writer.writerow({
+                "kind": "missing",
+                "workflow": workflow["path"],
+                "model_name": model["name"],
+                "model_type": model["type"],
+                "file_size": sizes.get((model["type"], model["name"])) or "",
+            })
+    for model in report["unreferenced"]:
+        writer.writerow({
+            "kind": "unreferenced",
+            "workflow": "",
+            "model_name": model["name"],
+            "model_type": model["folder"],
+            "file_size": "",
+        })
+    return output.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量检查工作流中的模型是否已安装")
+    parser.add_argument("directory", help="工作流目录（.json 和嵌入了工作流的 .png/.webp）")
+    parser.add_argument("--models-dir", action="append", help="ComfyUI 的 models 目录（可以指定多个）")
+    parser.add_argument("--search-cache", help="插件的 search_cache.json（用于计算下载大小）")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="解析工作流的进程数")
+    parser.add_argument("--no-recursive", action="store_true", help="不扫描子目录")
+    parser.add_argument("--format", choices=("text", "json", "csv"), default="text", help="输出格式")
+    parser.add_argument("-o", "--output", help="输出文件（默认输出到标准输出）")
+    args = parser.parse_args(argv)
+
+    inventory = get_installed_inventory(args.models_dir)
+    if not inventory:
+        parser.error("请用 --models-dir 指定模型目录")
+
+    size_lookup = None
+    if args.search_cache:
+        try:
+            from .search_cache import SearchCache
+        except ImportError:
+            from search_cache import SearchCache
+        cache = SearchCache(args.search_cache)
+        size_lookup = lambda name: size_from_links(cache.get(name))
+
+    paths = find_workflow_files(args.directory, recursive=not args.no_recursive)
+    report = audit_workflows(paths, inventory, size_lookup=size_lookup, workers=args.workers, use_processes=True)
+
+    if args.format == "json":
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+    elif args.format == "csv":
+        text = report_to_csv(report)
+    else:
+        lines = []
+        for workflow in report["workflows"]:
+            if workflow["error"]:
+                lines.append(f"{workflow['path']}: 读取失败 ({workflow['error']})")
+            elif workflow["missing"]:
+                lines.append(f"{workflow['path']}: 缺失 {len(workflow['missing'])} 个模型")
+                for model in workflow["missing"]:
+                    lines.append(f"    [{model['type']}] {model['name']}")
+        lines.append("")
+        lines.append(f"扫描 {report['scanned_files']} 个文件，缺失模型 {len(report['missing'])} 个，"
+                     f"需要下载 {format_size(report['total_download_size'])}"
+                     + (f"（另有 {report['unknown_size']} 个模型大小未知）" if report["unknown_size"] else ""))
+        lines.append(f"没有被任何工作流使用的已安装模型 {len(report['unreferenced'])} 个")
+        text = "\n".join(lines) + "\n"
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
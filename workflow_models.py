@@ -0,0 +1,289 @@
+"""
+工作流模型提取模块
+在服务器端从 workflow（前端保存的格式）或 prompt（提交到队列的 API 格式）中提取模型文件名，
+规则与 web/workflowModelExtractor.js 中的 extractModelsFromWorkflow 保持一致
+"""
+
+import re
+
+# 模型加载器节点类型及其对应的 widgets_values 索引和模型类型（与 workflowModelExtractor.js 一致）
+MODEL_LOADER_NODES = {
+    # Wan系列模型加载器
+    "WanVideoModelLoader": (0, "主模型"),
+    "WanVideoVAELoader": (0, "VAE"),
+    "LoadWanVideoT5TextEncoder": (0, "文本编码器"),
+    "WanVideoLoraSelect": (0, "LoRA"),
+
+    # 标准ComfyUI模型加载器
+    "CheckpointLoaderSimple": (0, "主模型"),
+    "CheckpointLoader": (0, "主模型"),
+    "UNETLoader": (0, "主模型"),
+    "VAELoader": (0, "VAE"),
+    "CLIPLoader": (0, "CLIP"),
+    "CLIPVisionLoader": (0, "CLIP Vision"),
+    "ControlNetLoader": (0, "ControlNet"),
+    "IPAdapterModelLoader": (0, "IP-Adapter"),
+    "LoraLoader": (0, "LoRA"),
+    "UpscaleModelLoader": (0, "放大模型"),
+    "UpscalerLoader": (0, "放大模型"),
+
+    # Efficiency Nodes 扩展的 HighRes-Fix Script 节点（模型在 widgets_values 的索引 3 位置）
+    "HighRes-Fix Script": (3, "放大模型"),
+
+    # Impact Pack 和其他扩展的节点
+    "SAMLoader": (0, "其他"),
+    "UltralyticsDetectorProvider": (0, "其他"),
+
+    # 其他可能的加载器
+    "ModelLoader": (0, "其他"),
+    "VAELoaderSimple": (0, "VAE"),
+}
+
+# 前端使用的模型类型
+MODEL_TYPES = ("主模型", "VAE", "文本编码器", "CLIP", "CLIP Vision", "ControlNet", "IP-Adapter", "LoRA", "放大模型", "其他")
+
+# 常见的模型文件扩展名
+MODEL_FILE_EXTENSIONS = (
+    ".safetensors", ".ckpt", ".pt", ".pth", ".bin",
+    ".onnx", ".pb", ".tflite", ".h5", ".pkl", ".pth.tar", ".gguf", ".sft",
+)
+
+# 没有扩展名时，文件名中包含这些关键词也可能是模型名
+_MODEL_KEYWORDS = ("model", "checkpoint", "vae", "lora", "controlnet", "clip", "embedding")
+# 无效的模型名（不区分大小写）
+_INVALID_VALUES = {"null", "none", "use same", "(use same)", "auto", "default", "true", "false", "undefined"}
+_NUMERIC_RE = re.compile(r"^[\d\s\-+.]+$")
+# 表示节点可能加载模型的输入字段名关键词
+_MODEL_INPUT_KEYWORDS = ("model", "ckpt", "lora", "vae", "checkpoint")
+
+
+def base_name(value):
+    """去掉路径，只保留文件名"""
+    return re.split(r"[/\\]", str(value))[-1].strip()
+
+
+def has_model_extension(value):
+    return isinstance(value, str) and value.lower().endswith(MODEL_FILE_EXTENSIONS)
+
+
+def looks_like_model_file_name(value):
+    """检查一个值是否看起来像模型文件名"""
+    if not value or not isinstance(value, str):
+        return False
+    text = value.strip()
+    if len(text) < 3:
+        return False
+    file_name = base_name(text).lower()
+    if file_name.endswith(MODEL_FILE_EXTENSIONS):
+        return True
+    return any(keyword in file_name for keyword in _MODEL_KEYWORDS)
+
+
+def is_valid_model_name(name):
+    """检查模型名是否有效（过滤掉 null、None、use same 等无效值）"""
+    if not name or not isinstance(name, str):
+        return False
+    text = name.strip()
+    if len(text) < 2:
+        return False
+    if text.lower() in _INVALID_VALUES:
+        return False
+    return not _NUMERIC_RE.match(text)
+
+
+def is_node_used(node):
+    """
+    检查节点是否被使用
+
+    mode 为 2（禁用/旁路）或 4（静音）时视为未使用；否则有输出或输入连接时视为使用
+    """
+    if node.get("mode", 0) in (2, 4):
+        return False
+    for output in node.get("outputs") or []:
+        if isinstance(output, dict) and output.get("links"):
+            return True
+    for node_input in node.get("inputs") or []:
+        if isinstance(node_input, dict) and node_input.get("link") is not None:
+            return True
+    return False
+
+
+def infer_model_type(input_name, node_type, model_name):
+    """根据输入字段名、节点类型和文件名推断模型类型"""
+    input_name = (input_name or "").lower()
+    if input_name:
+        if "lora" in input_name:
+            return "LoRA"
+        if "vae" in input_name:
+            return "VAE"
+        if "clip" in input_name:
+            return "CLIP Vision" if "vision" in input_name else "CLIP"
+        if "control" in input_name:
+            return "ControlNet"
+        if "checkpoint" in input_name or "ckpt" in input_name:
+            return "主模型"
+        if "upscale" in input_name:
+            return "放大模型"
+        if "ip" in input_name or "adapter" in input_name:
+            return "IP-Adapter"
+        if "text" in input_name or "t5" in input_name or "encoder" in input_name:
+            return "文本编码器"
+
+    # 输入字段名推断不出类型时，再根据节点类型和文件名推断
+    node_type = (node_type or "").lower()
+    value = (model_name or "").lower()
+    if "lora" in node_type:
+        return "LoRA"
+    if "vae" in node_type:
+        return "VAE"
+    if "clip" in node_type:
+        return "CLIP Vision" if "vision" in node_type else "CLIP"
+    if "control" in node_type:
+        return "ControlNet"
+    if "checkpoint" in node_type or "ckpt" in node_type:
+        return "主模型"
+    if "upscale" in node_type:
+        return "放大模型"
+    if "sam" in node_type:
+        return "其他"
+    if "lora" in value:
+        return "LoRA"
+    if "vae" in value:
+        return "VAE"
+    if "control" in value:
+        return "ControlNet"
+    return "其他"
+
+
+class _ModelCollector:
+    """收集模型（同一个 类型:名称 只保留一条，合并使用状态、节点 ID 和节点类型）"""
+
+    def __init__(self):
+        self.models = {}
+
+    def add(self, model_type, name, is_used, node_id, node_type):
+        if model_type not in MODEL_TYPES:
+            model_type = "其他"
+        key = f"{model_type}:{name}"
+        entry = self.models.get(key)
+        if entry is None:
+            entry = self.models[key] = {
+                "name": name,
+                "type": model_type,
+                "is_used": is_used,
+                "node_ids": [],
+                "node_types": [],
+            }
+        else:
+            entry["is_used"] = entry["is_used"] or is_used
+        if node_id is not None and node_id not in entry["node_ids"]:
+            entry["node_ids"].append(node_id)
+        if node_type and node_type not in entry["node_types"]:
+            entry["node_types"].append(node_type)
+
+    def result(self):
+        return list(self.models.values())
+
+
+def _node_id(node):
+    try:
+        return int(node.get("id"))
+    except (TypeError, ValueError):
+        return None
+
+
+def extract_models_from_workflow(workflow):
+    """
+    从前端格式的 workflow（包含 nodes 列表）中提取模型
+
+    Returns:
+        [{"name", "type", "is_used", "node_ids", "node_types"}, ...]
+    """
+    collector = _ModelCollector()
+    nodes = [node for node in (workflow or {}).get("nodes") or [] if isinstance(node, dict)]
+
+    # 方法1: 从预定义的模型加载器节点中提取
+    for node in nodes:
+        node_type = node.get("type") or node.get("class_type") or ""
+        if node_type not in MODEL_LOADER_NODES:
+            continue
+        index, model_type = MODEL_LOADER_NODES[node_type]
+        widgets_values = node.get("widgets_values") or []
+        if not isinstance(widgets_values, list) or len(widgets_values) <= index:
+            continue
+        value = widgets_values[index]
+        if value is None or not str(value).strip():
+            continue
+        name = base_name(value)
+        if is_valid_model_name(name):
+            collector.add(model_type, name, is_node_used(node), _node_id(node), node_type)
+
+    # 方法2: 通用检测，扫描其他有模型相关输入字段的节点的 widgets_values
+    for node in nodes:
+        node_type = node.get("type") or node.get("class_type") or ""
+        if node_type in MODEL_LOADER_NODES:
+            continue
+        widgets_values = node.get("widgets_values") or []
+        inputs = [item for item in node.get("inputs") or [] if isinstance(item, dict)]
+        has_model_input = any(
+            keyword in (item.get("name") or "").lower()
+            for item in inputs for keyword in _MODEL_INPUT_KEYWORDS
+        )
+        if not has_model_input or not isinstance(widgets_values, list) or not widgets_values:
+            continue
+
+        # widgets_values 按照 inputs 中有 widget 且没有连接的字段顺序排列
+        widget_input_names = {}
+        widget_index = 0
+        for item in inputs:
+            if item.get("widget") and item.get("link") is None and widget_index < len(widgets_values):
+                widget_input_names[widget_index] = item.get("name") or ""
+                widget_index += 1
+
+        for i, value in enumerate(widgets_values):
+            if not looks_like_model_file_name(value):
+                continue
+            name = base_name(value)
+            if not is_valid_model_name(name):
+                continue
+            model_type = infer_model_type(widget_input_names.get(i), node_type, name)
+            collector.add(model_type, name, is_node_used(node), _node_id(node), node_type)
+
+    return collector.result()
+
+
+def extract_models_from_prompt(prompt):
+    """
+    从 API 格式的 prompt（{节点 ID: {"class_type", "inputs"}}）中提取模型
+
+    prompt 中只包含会被执行的节点，所有模型都视为使用中。
+    """
+    collector = _ModelCollector()
+    for node_id, node in (prompt or {}).items():
+        if not isinstance(node, dict):
+            continue
+        node_type = node.get("class_type") or ""
+        loader = MODEL_LOADER_NODES.get(node_type)
+        for input_name, value in (node.get("inputs") or {}).items():
+            # 连接到其他节点的输入是 [节点 ID, 输出索引]
+            if not isinstance(value, str) or not has_model_extension(value):
+                continue
+            name = base_name(value)
+            if not is_valid_model_name(name):
+                continue
+            model_type = loader[1] if loader else infer_model_type(input_name, node_type, name)
+            try:
+                numeric_id = int(node_id)
+            except (TypeError, ValueError):
+                numeric_id = None
+            collector.add(model_type, name, True, numeric_id, node_type)
+    return collector.result()
+
+
+def extract_models(data):
+    """自动识别 workflow 或 prompt 格式并提取模型"""
+    if not isinstance(data, dict):
+        return []
+    if isinstance(data.get("nodes"), list):
+        return extract_models_from_workflow(data)
+    return extract_models_from_prompt(data)